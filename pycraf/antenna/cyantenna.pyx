@@ -13,16 +13,26 @@ cimport cython
 cimport numpy as np
 from numpy cimport uint16_t, float64_t
 from cython.parallel import prange, parallel
+cimport openmp
 from numpy cimport PyArray_MultiIter_DATA as Py_Iter_DATA
 from libc.math cimport M_PI, NAN
 from libc.math cimport (
     exp, sqrt, fabs, sin, cos, tan, asin, acos, atan2, fmod, log10
     )
 import numpy as np
+from .. import utils
 
 
 np.import_array()
 
+
+cdef int _get_num_threads(object nthreads) except -1:
+    # per-call value, global PerformanceConf setting, or OpenMP default
+    cdef int num_threads = utils.get_num_threads(nthreads)
+
+    return num_threads if num_threads > 0 else openmp.omp_get_max_threads()
+
+
 # __all__ = ['inverse', 'direct']
 
 
@@ -63,6 +73,7 @@ cdef inline float64_t _ras_pattern(
 def ras_pattern_cython(
         phi, d_wlen, gmax, g1, phi_m, phi_r,
         gain=None,
+        nthreads=None,
         ):
     '''
     Parallelized RAS pattern (non-bessel part only).
@@ -79,6 +90,7 @@ def ras_pattern_cython(
         np.ndarray[float64_t] _gain
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -114,7 +126,7 @@ def ras_pattern_cython(
 
         size = _phi.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _gain[i] = _ras_pattern(
                 _phi[i], _d_wlen[i], _gmax[i], _g1[i], _phi_m[i], _phi_r[i]
@@ -176,6 +188,7 @@ def imt2020_single_element_pattern_cython(
         phi_3db, theta_3db,
         k=12.,
         gain=None,
+        nthreads=None,
         ):
     '''
     Parallelized IMT-2020 single element pattern.
@@ -193,6 +206,7 @@ def imt2020_single_element_pattern_cython(
         np.ndarray[float64_t] _gain
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -230,7 +244,7 @@ def imt2020_single_element_pattern_cython(
 
         size = _gain.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _gain[i] = _imt2020_single_element_pattern(
                 _azim[i], _elev[i], _G_Emax[i], _A_m[i], _SLA_nu[i],
@@ -251,6 +265,7 @@ def imt2020_composite_pattern_cython(
         rho,
         k=12.,
         gain=None,
+        nthreads=None,
         ):
     '''
     Parallelized IMT-2020 composite pattern.
@@ -271,6 +286,7 @@ def imt2020_composite_pattern_cython(
         float64_t _exp_arg, _gain_re, _gain_im
 
         int i, size, m, n
+        int num_threads = _get_num_threads(nthreads)
 
     # pre-compute some quantities
 
@@ -280,6 +296,7 @@ def imt2020_composite_pattern_cython(
         A_m, SLA_nu,
         phi_3db, theta_3db,
         k=k,
+        nthreads=num_threads,
         )
 
     phi = azim
@@ -337,7 +354,7 @@ def imt2020_composite_pattern_cython(
 
         size = _gain.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _gain_re = 0.
             _gain_im = 0.
@@ -487,6 +504,7 @@ def imt_advanced_sectoral_peak_sidelobe_pattern_cython(
         k_p, k_h, k_v,
         tilt_m, tilt_e,
         gain=None,
+        nthreads=None,
         ):
     '''
     Parallelized IMT advanced (LTE) antenna pattern (sectoral, peak side-lobe)
@@ -501,6 +519,7 @@ def imt_advanced_sectoral_peak_sidelobe_pattern_cython(
         np.ndarray[float64_t] _gain
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -545,7 +564,7 @@ def imt_advanced_sectoral_peak_sidelobe_pattern_cython(
 
         size = _gain.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _gain[i] = _imt_advanced_sectoral_peak_sidelobe_pattern(
                 _azim[i], _elev[i],
@@ -651,6 +670,7 @@ cdef float64_t _fl_pattern(
 def fl_pattern_cython(
         phi, diameter, wavelength, G_max,
         gain=None,
+        nthreads=None,
         ):
     '''
     Parallelized ITU-R Rec F.699 antenna pattern
@@ -662,6 +682,7 @@ def fl_pattern_cython(
         np.ndarray[float64_t] _gain
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -693,7 +714,7 @@ def fl_pattern_cython(
 
         size = _gain.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _gain[i] = _fl_pattern(
                 _phi[i], _diameter[i], _wavelength[i], _G_max[i]
@@ -160,7 +160,7 @@ def _fl_pattern_2_3(phi, diameter_over_wavelength, G_max):
     strip_input_units=True, output_unit=cnv.dBi
     )
 def fl_pattern(
-        phi, diameter, wavelength, G_max
+        phi, diameter, wavelength, G_max, nthreads=None
         ):
     '''
     Antenna gain as a function of angular distance after `ITU-R Rec F.699
@@ -176,6 +176,9 @@ def fl_pattern(
         Observing wavelength [m]
     G_max : `~astropy.units.Quantity`
         Antenna maximum gain [dBi]
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -192,7 +195,9 @@ def fl_pattern(
       explanation and applicability of this model.
     '''
 
-    return fl_pattern_cython(phi, diameter, wavelength, G_max)
+    return fl_pattern_cython(
+        phi, diameter, wavelength, G_max, nthreads=nthreads
+        )
 
 
 def _fl_hpbw_from_size(diameter, wavelength):
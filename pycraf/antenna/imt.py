@@ -89,6 +89,7 @@ def imt2020_single_element_pattern(
         A_m, SLA_nu,
         phi_3db, theta_3db,
         k=12.,
+        nthreads=None,
         ):
     '''
     Single antenna element's pattern according to `IMT.MODEL
@@ -113,6 +114,9 @@ def imt2020_single_element_pattern(
     k : float, optional
         Multiplication factor, can be used to get better match to
         measured antenna patters (default: 12). See `WP5D-C-0936`
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -130,6 +134,7 @@ def imt2020_single_element_pattern(
         A_m, SLA_nu,
         phi_3db, theta_3db,
         k=k,
+        nthreads=nthreads,
         )
 
 
@@ -158,6 +163,7 @@ def imt2020_composite_pattern(
         N_H, N_V,
         rho=1 * cnv.dimless,
         k=12.,
+        nthreads=None,
         ):
     '''
     Composite (array) antenna pattern according to `IMT.MODEL
@@ -185,6 +191,9 @@ def imt2020_composite_pattern(
     k : float, optional
         Multiplication factor, can be used to get better match to
         measured antenna patters (default: 12). See `WP5D-C-0936`
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -215,6 +224,7 @@ def imt2020_composite_pattern(
         N_H, N_V,
         rho,
         k=k,
+        nthreads=nthreads,
         )
 
 
@@ -330,6 +340,7 @@ def imt_advanced_sectoral_peak_sidelobe_pattern_400_to_6000_mhz(
         G0, phi_3db, theta_3db,
         k_p, k_h, k_v,
         tilt_m=0., tilt_e=0.,
+        nthreads=None,
         ):
     '''
     IMT advanced (LTE) antenna pattern (sectoral, peak side-lobe)
@@ -358,6 +369,9 @@ def imt_advanced_sectoral_peak_sidelobe_pattern_400_to_6000_mhz(
         Mechanical tilt angle (downwards) [deg]
     tilt_e : float
         Electrical tilt angle (downwards) [deg]
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -384,6 +398,7 @@ def imt_advanced_sectoral_peak_sidelobe_pattern_400_to_6000_mhz(
         G0, phi_3db, theta_3db,
         k_p, k_h, k_v,
         tilt_m, tilt_e,
+        nthreads=nthreads,
         )
 
 
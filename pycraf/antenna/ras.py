@@ -26,7 +26,8 @@ __all__ = [
     strip_input_units=True, output_unit=cnv.dBi
     )
 def ras_pattern(
-        phi, diameter, wavelength, eta_a=100. * apu.percent, do_bessel=False
+        phi, diameter, wavelength, eta_a=100. * apu.percent, do_bessel=False,
+        nthreads=None,
         ):
     '''
     Antenna gain as a function of angular distance after `ITU-R Rec RA.1631
@@ -45,6 +46,9 @@ def ras_pattern(
     do_bessel : bool, optional
         If set to True, use Bessel function approximation for inner 1 deg
         of the pattern (see RA.1631 for details). (default: False)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -110,7 +114,9 @@ def ras_pattern(
     # mask = (120. <= phi) & (phi <= 180.)
     # gain[mask] = -12.
 
-    gain = ras_pattern_cython(phi, d_wlen, gmax, g1, phi_m, phi_r)
+    gain = ras_pattern_cython(
+        phi, d_wlen, gmax, g1, phi_m, phi_r, nthreads=nthreads
+        )
 
     if do_bessel:
 
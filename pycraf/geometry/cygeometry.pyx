@@ -11,15 +11,25 @@ from __future__ import unicode_literals
 
 cimport cython
 from cython.parallel import prange, parallel
+cimport openmp
 cimport numpy as np
 from numpy cimport PyArray_MultiIter_DATA as Py_Iter_DATA
 from libc.math cimport (
     exp, sqrt, fabs, M_PI, sin, cos, tan, asin, acos, atan2, fmod
     )
 import numpy as np
+from .. import utils
 
 np.import_array()
 
+
+cdef int _get_num_threads(object nthreads) except -1:
+    # per-call value, global PerformanceConf setting, or OpenMP default
+    cdef int num_threads = utils.get_num_threads(nthreads)
+
+    return num_threads if num_threads > 0 else openmp.omp_get_max_threads()
+
+
 # __all__ = ['inverse', 'direct']
 
 
@@ -74,6 +84,7 @@ def true_angular_distance_cython(
         lon1_deg, lat1_deg,
         lon2_deg, lat2_deg,
         out_ang_dist_deg=None,
+        nthreads=None,
         ):
     '''
     Parallelized true angular distance.
@@ -90,6 +101,7 @@ def true_angular_distance_cython(
         np.ndarray[double] _out_ang_dist_deg
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -121,7 +133,7 @@ def true_angular_distance_cython(
 
         size = _lon1_deg.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _out_ang_dist_deg[i] = _true_angular_distance(
                 _lon1_deg[i] * DEG2RAD,
@@ -137,6 +149,7 @@ def great_circle_bearing_cython(
         lon1_deg, lat1_deg,
         lon2_deg, lat2_deg,
         out_bearing_deg=None,
+        nthreads=None,
         ):
     '''
     Parallelized true angular distance.
@@ -153,6 +166,7 @@ def great_circle_bearing_cython(
         np.ndarray[double] _out_bearing_deg
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -184,7 +198,7 @@ def great_circle_bearing_cython(
 
         size = _lon1_deg.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _out_bearing_deg[i] = _great_circle_bearing(
                 _lon1_deg[i] * DEG2RAD,
@@ -29,7 +29,7 @@ __all__ = [
     b2=(-90, 90, apu.deg),
     strip_input_units=True, output_unit=apu.deg,
     )
-def true_angular_distance(l1, b1, l2, b2):
+def true_angular_distance(l1, b1, l2, b2, nthreads=None):
     '''
     True angular distance between points (l1, b1) and (l2, b2).
 
@@ -43,6 +43,9 @@ def true_angular_distance(l1, b1, l2, b2):
         Longitude/Latitude of point 1 [deg]
     l2, b2 : `~astropy.units.Quantity`
         Longitude/Latitude of point 2 [deg]
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -65,7 +68,7 @@ def true_angular_distance(l1, b1, l2, b2):
     #     np.sqrt(num1 ** 2 + num2 ** 2), denominator
     #     ))
 
-    return true_angular_distance_cython(l1, b1, l2, b2)
+    return true_angular_distance_cython(l1, b1, l2, b2, nthreads=nthreads)
 
 
 @utils.ranged_quantity_input(
@@ -75,7 +78,7 @@ def true_angular_distance(l1, b1, l2, b2):
     b2=(-90, 90, apu.deg),
     strip_input_units=True, output_unit=apu.deg,
     )
-def great_circle_bearing(l1, b1, l2, b2):
+def great_circle_bearing(l1, b1, l2, b2, nthreads=None):
     '''
     Great circle bearing between points (l1, b1) and (l2, b2).
 
@@ -85,6 +88,9 @@ def great_circle_bearing(l1, b1, l2, b2):
         Longitude/Latitude of point 1 [deg]
     l2, b2 : `~astropy.units.Quantity`
         Longitude/Latitude of point 2 [deg]
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -107,7 +113,7 @@ def great_circle_bearing(l1, b1, l2, b2):
 
     # return np.degrees(np.arctan2(a, b))
 
-    return great_circle_bearing_cython(l1, b1, l2, b2)
+    return great_circle_bearing_cython(l1, b1, l2, b2, nthreads=nthreads)
 
 
 def _cart_to_sphere(x, y, z, broadcast_arrays=True):
@@ -180,6 +180,7 @@ class PycrafGui(QtWidgets.QMainWindow):
         self.pathprof_results = None
         self.map_hprof_data = None
         self.map_results = None
+        self.map_job_running = False
 
         self.setup_gui()
 
@@ -221,6 +222,16 @@ class PycrafGui(QtWidgets.QMainWindow):
             'Attenuation: Total loss with clutter'
             ))
 
+        # progress bar for map jobs (updated by polling the worker, as the
+        # worker thread is busy during the computation)
+        self.map_progress_bar = QtWidgets.QProgressBar()
+        self.map_progress_bar.setRange(0, 100)
+        self.map_progress_bar.setVisible(False)
+        self.ui.horizontalLayout_4.addWidget(self.map_progress_bar)
+
+        self.map_progress_timer = QtCore.QTimer()
+        self.map_progress_timer.timeout.connect(self.on_map_progress_timer)
+
         self.ui.srtmPathPushButton.setText(
             os.path.abspath(SrtmConf.srtm_dir)
             )
@@ -348,6 +359,7 @@ class PycrafGui(QtWidgets.QMainWindow):
         self.my_map_worker.job_started.connect(self.busy_start_map)
         self.my_map_worker.job_finished.connect(self.busy_stop_map)
         self.my_map_worker.job_excepted.connect(self.busy_stop_map)
+        self.my_map_worker.job_cancelled.connect(self.busy_stop_map)
         self.map_job_triggered.connect(self.my_map_worker.on_job_triggered)
         self.clear_caches_triggered.connect(
             self.my_map_worker.on_clear_caches_triggered
@@ -502,6 +514,10 @@ class PycrafGui(QtWidgets.QMainWindow):
         if self.ui.pathprofAutoUpdateCheckBox.isChecked():
             self.on_pathprof_compute_pressed()
 
+        # a running map job is outdated; restart it with the new parameters
+        if self.map_job_running:
+            self.on_map_compute_pressed()
+
     @QtCore.pyqtSlot()
     def busy_start_pp(self):
         self.ui.pathprofComputePushButton.setEnabled(False)
@@ -517,15 +533,28 @@ class PycrafGui(QtWidgets.QMainWindow):
 
     @QtCore.pyqtSlot()
     def busy_start_map(self):
-        self.ui.mapComputePushButton.setEnabled(False)
+        # the compute button stays enabled, pressing it again restarts
+        # the job (with the current parameters)
+        self.map_job_running = True
         self.ui.mapBusyIndicatorLabel.setMovie(self.busy_movie)
         self.busy_movie.start()
+        self.map_progress_bar.setValue(0)
+        self.map_progress_bar.setVisible(True)
+        self.map_progress_timer.start(100)
 
     @QtCore.pyqtSlot()
     def busy_stop_map(self):
+        self.map_job_running = False
+        self.map_progress_timer.stop()
+        self.map_progress_bar.setVisible(False)
         self.busy_movie.stop()
         self.ui.mapBusyIndicatorLabel.clear()
-        self.ui.mapComputePushButton.setEnabled(True)
+
+    @QtCore.pyqtSlot()
+    def on_map_progress_timer(self):
+        self.map_progress_bar.setValue(
+            int(100 * self.my_map_worker.job_progress())
+            )
 
     @QtCore.pyqtSlot()
     def on_pathprof_compute_pressed(self):
@@ -545,6 +574,9 @@ class PycrafGui(QtWidgets.QMainWindow):
         job_dict['size_lat'] = self.ui.mapSizeLatDoubleSpinBox.value()
         job_dict['map_reso'] = self.ui.mapResolutionDoubleSpinBox.value()
 
+        # abort a running (outdated) job immediately; not via a signal, as
+        # the worker thread is busy
+        self.my_map_worker.cancel_job()
         self.map_job_triggered.emit(job_dict)
 
     @QtCore.pyqtSlot(object, object)
@@ -3,6 +3,7 @@
 
 
 from PyQt5 import QtCore
+from collections import OrderedDict
 from functools import lru_cache
 import numpy as np
 from astropy import units as u
@@ -30,9 +31,27 @@ def cached_height_path_data_generic(*args, **kwargs):
     return res
 
 
-@lru_cache(maxsize=10, typed=False)
-def cached_height_map_data(*args, **kwargs):
-    return pathprof.height_map_data(*args, **kwargs)
+_height_map_data_cache = OrderedDict()
+
+
+def cached_height_map_data(*args, job=None, **kwargs):
+    # can't use lru_cache, as the job control must not be part of the key
+    key = (args, tuple(sorted(kwargs.items())))
+    try:
+        _height_map_data_cache.move_to_end(key)
+        return _height_map_data_cache[key]
+    except KeyError:
+        pass
+
+    res = pathprof.height_map_data(*args, job=job, **kwargs)
+    _height_map_data_cache[key] = res
+    if len(_height_map_data_cache) > 10:
+        _height_map_data_cache.popitem(last=False)
+
+    return res
+
+
+cached_height_map_data.cache_clear = _height_map_data_cache.clear
 
 
 @lru_cache(maxsize=10, typed=False)
@@ -46,6 +65,7 @@ class BaseWorker(QtCore.QObject):
     job_started = QtCore.pyqtSignal(name='job_started')
     job_finished = QtCore.pyqtSignal(name='job_finished')
     job_excepted = QtCore.pyqtSignal(str, name='job_excepted')
+    job_cancelled = QtCore.pyqtSignal(name='job_cancelled')
 
     def __init__(self, parent):
 
@@ -53,9 +73,29 @@ class BaseWorker(QtCore.QObject):
 
         self.parent = parent
         self.job_waiting = False
+        # progress and cancellation of the running job (if supported)
+        self.job_control = pathprof.JobControl()
 
         self.event_loop()
 
+    def cancel_job(self):
+        '''
+        Abort the running job (if any).
+
+        This is called directly from the GUI thread (the worker thread
+        is busy while the job is running); it only sets a flag, which is
+        checked regularly by the computation.
+        '''
+
+        self.job_control.cancel()
+
+    def job_progress(self):
+        '''
+        Fraction of the running job that is done (0 to 1).
+        '''
+
+        return self.job_control.fraction
+
     @QtCore.pyqtSlot(dict)
     def on_job_triggered(self, job_dict):
 
@@ -74,9 +114,12 @@ class BaseWorker(QtCore.QObject):
     def event_loop(self):
 
         if self.job_waiting:
+            self.job_control = pathprof.JobControl()
             self.job_started.emit()
             try:
                 self.do_job()
+            except pathprof.JobCancelledError:
+                self.job_cancelled.emit()
             except Exception as e:
                 self.job_excepted.emit(e.args[0])
             else:
@@ -249,24 +292,31 @@ class MapWorker(BaseWorker):
             jdict['size_lon'] * u.deg, jdict['size_lat'] * u.deg,
             jdict['map_reso'] * u.arcsec,
             zone_t=jdict['tx_clutter'], zone_r=jdict['rx_clutter'],
+            job=self.job_control,
+            )
+
+        # hprof_data contains only a high-res representation of height profs
+        lons, lats = hprof_data['xcoords'], hprof_data['ycoords']
+        hprof_data['height_map'] = pathprof.srtm_height_data(
+            lons[np.newaxis] * u.deg, lats[:, np.newaxis] * u.deg
             )
 
-        results = pathprof.atten_map_fast(
+        # the map is computed coarse-to-fine; each pass is displayed
+        # (the signal is delivered to the GUI thread); the last pass has
+        # the final result
+        def on_pass_done(step, results):
+            self.result_ready.emit(hprof_data, results)
+
+        pathprof.atten_map_progressive(
             jdict['freq'] * u.GHz,
             jdict['temp'] * u.K, jdict['press'] * u.hPa,
             jdict['tx_height'] * u.m, jdict['rx_height'] * u.m,
             jdict['timepercent'] * u.percent,
             hprof_data,
+            callback=on_pass_done,
             version=jdict['version'],
             polarization=jdict['polarization'],
+            job=self.job_control,
             )
 
-        # hprof_data contains only a high-res representation of height profs
-        lons, lats = hprof_data['xcoords'], hprof_data['ycoords']
-        hprof_data['height_map'] = pathprof.srtm_height_data(
-            lons[np.newaxis] * u.deg, lats[:, np.newaxis] * u.deg
-            )
-
-        self.result_ready.emit(hprof_data, results)
-
         print('job finished')
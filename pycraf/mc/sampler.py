@@ -23,6 +23,12 @@ class HistogramSampler(object):
     histvals : N-D `~numpy.ndarray`
         Discrete density distribution. (This is the histogram array, which
         one would get out of `~numpy.histogram` functions.)
+    method : str, optional
+        Sampling method. Either 'cdf', which uses a binary search in the
+        cumulative distribution function (O(log K) per sample for K bins),
+        or 'alias', which uses Walker's alias method (O(1) per sample).
+        For a given random seed, both methods produce different samples.
+        (default: 'cdf')
 
     Returns
     -------
@@ -101,6 +107,27 @@ class HistogramSampler(object):
     As can be seen, the value `((1.25, -1.5))` is now exceptionally
     often sampled from the distribution.
 
+    For large histograms and many samples, the alias method is much
+    faster. Independent random streams (e.g., for several worker
+    processes) can be created with `~numpy.random.SeedSequence`::
+
+        >>> my_sampler = mc.HistogramSampler(hist2d, method='alias')
+        >>> seeds = np.random.SeedSequence(12345).spawn(4)
+        >>> rngs = [np.random.default_rng(s) for s in seeds]
+        >>> indices = my_sampler.sample(10, seed=rngs[0])  # in worker #0
+
+    To limit memory usage, the samples can be drawn in chunks, either
+    into a pre-allocated output array or by iterating over the chunks::
+
+        >>> out = np.empty((2, 1000), dtype=np.int64)
+        >>> indices = my_sampler.sample(
+        ...     1000, seed=rngs[1], out=out, chunk_size=100
+        ...     )
+        >>> for indices in my_sampler.sample_chunks(
+        ...         1000, 100, seed=rngs[2]
+        ...         ):
+        ...     pass  # process chunk
+
     As discussed in the notes, for some use-cases a KDE might
     be the better tool::
 
@@ -133,19 +160,101 @@ class HistogramSampler(object):
     weighted data.
     '''
 
-    def __init__(self, histvals):
+    def __init__(self, histvals, method='cdf'):
+
+        if method not in ['cdf', 'alias']:
+            raise ValueError(
+                'Only the values "cdf" and "alias" are supported for '
+                '"method" option.'
+                )
 
         histvals = np.atleast_1d(histvals)
 
         self._hshape = histvals.shape
         self._ndim = histvals.ndim
+        self._method = method
         # cdf is flat, will need to unravel indices later
         self._cdf = np.cumsum(
             histvals.flatten().astype(np.float64, copy=False)
             )
         self._cdf /= self._cdf[-1]
 
-    def sample(self, n):
+        if method == 'alias':
+            self._alias_prob, self._alias = self._alias_table(
+                np.diff(self._cdf, prepend=0.)
+                )
+
+    @staticmethod
+    def _alias_table(pdf):
+        '''
+        Compute Walker's alias table (Vose's variant) for a normalized pdf.
+
+        The classical algorithm pairs one "small" bin (probability below
+        average) with one "large" bin at a time. Here, all small bins are
+        distributed at once over the excess of the large bins (via
+        cumulative sums), such that only few vectorized iterations are
+        necessary. Large bins that fall below average in the process are
+        handled in the next iteration.
+        '''
+
+        num = len(pdf)
+        prob = np.clip(pdf, 0, None) * num
+        alias = np.arange(num, dtype=np.int64)
+
+        small = np.flatnonzero(prob < 1.)
+        large = np.flatnonzero(prob >= 1.)
+
+        while len(small) > 0 and len(large) > 0:
+
+            deficit = 1. - prob[small]
+            deficit_start = np.cumsum(deficit) - deficit
+            excess_cum = np.cumsum(prob[large] - 1.)
+
+            # each small bin gets the large bin as alias, in whose excess
+            # interval its deficit starts; that large bin donates the full
+            # deficit (and may become small, itself)
+            lidx = np.searchsorted(excess_cum, deficit_start, side='right')
+            np.clip(lidx, 0, len(large) - 1, out=lidx)
+            alias[small] = large[lidx]
+            prob[large] -= np.bincount(
+                lidx, weights=deficit, minlength=len(large)
+                )
+
+            small = large[prob[large] < 1.]
+            large = large[prob[large] >= 1.]
+
+        # remaining bins only deviate from one due to round-off errors
+        prob[small] = 1.
+        prob[large] = 1.
+
+        return prob, alias
+
+    def _sample_flat(self, rng, n, out):
+
+        rsamples = rng.random(n) if rng is not None else np.random.rand(n)
+
+        if self._method == 'cdf':
+            out[:] = np.searchsorted(self._cdf, rsamples)
+        else:
+            rsamples *= len(self._alias)
+            bins = rsamples.astype(np.int64)
+            np.minimum(bins, len(self._alias) - 1, out=bins)
+            out[:] = np.where(
+                rsamples - bins < self._alias_prob[bins],
+                bins, self._alias[bins]
+                )
+
+        return out
+
+    def _prepare_rng(self, seed):
+
+        # seed=None means legacy behavior, i.e., use the global RNG
+        if seed is None:
+            return None
+
+        return np.random.default_rng(seed)
+
+    def sample(self, n, seed=None, out=None, chunk_size=None):
         '''
         Sample from the (discrete) density distribution.
 
@@ -153,26 +262,102 @@ class HistogramSampler(object):
         ----------
         n : int
             Number of samples to draw.
+        seed : None, int, `~numpy.random.SeedSequence`, or `~numpy.random.Generator`, optional
+            Random number generator (or seed for
+            `~numpy.random.default_rng`) to use. If None, the global
+            (legacy) `numpy.random` state is used, which can be controlled
+            via `~astropy.utils.misc.NumpyRNGContext`. Note, that providing
+            the same int or `~numpy.random.SeedSequence` in several calls
+            will produce identical samples; use a
+            `~numpy.random.Generator` instance to continue the stream.
+            (default: None)
+        out : `~numpy.ndarray`, optional
+            Integer-typed array to store the indices in. Must have shape
+            (n,) for 1D histograms and (ndim, n) otherwise. (default: None)
+        chunk_size : int, optional
+            If given, the samples are drawn in chunks of this size, to limit
+            the size of temporary arrays. The result does not depend on
+            `chunk_size`. (default: None)
 
         Returns
         -------
         Indices : tuple of `~numpy.ndarray`
             The indices of the drawn samples with respect to the
             discrete density array (aka histogram object). See
-            `~pycraf.mc.HistogramSampler` for examples of use.
+            `~pycraf.mc.HistogramSampler` for examples of use. If `out`
+            was provided, the indices are views into it.
         '''
 
-        rsamples = np.random.rand(n)
-        rbins = np.searchsorted(self._cdf, rsamples)
+        rng = self._prepare_rng(seed)
+
+        if out is None:
+            out = np.empty(
+                (n,) if self._ndim == 1 else (self._ndim, n), dtype=np.int64
+                )
+        elif out.shape != ((n,) if self._ndim == 1 else (self._ndim, n)):
+            raise ValueError('"out" array has the wrong shape')
 
-        indices = np.unravel_index(rbins, self._hshape)
+        if chunk_size is None:
+            chunk_size = max(n, 1)
+        elif chunk_size < 1:
+            raise ValueError('"chunk_size" must be a positive integer')
+
+        flat = np.empty(min(chunk_size, n), dtype=np.int64)
+        for start in range(0, n, chunk_size):
+
+            stop = min(start + chunk_size, n)
+            rbins = self._sample_flat(rng, stop - start, flat[:stop - start])
+
+            if self._ndim == 1:
+                out[start:stop] = rbins
+            else:
+                indices = np.unravel_index(rbins, self._hshape)
+                for i in range(self._ndim):
+                    out[i, start:stop] = indices[i]
 
         if self._ndim == 1:
-            return indices[0]
+            return out
         else:
-            return indices
+            return tuple(out)
+
+    def sample_chunks(self, n, chunk_size, seed=None):
+        '''
+        Iterate over chunks of samples from the (discrete) density
+        distribution.
+
+        This is useful if a very large number of samples needs to be
+        processed, which would not fit into memory at once.
+
+        Parameters
+        ----------
+        n : int
+            Total number of samples to draw.
+        chunk_size : int
+            Number of samples per chunk (the last chunk can be smaller).
+        seed : None, int, `~numpy.random.SeedSequence`, or `~numpy.random.Generator`, optional
+            Random number generator (or seed), see
+            `~pycraf.mc.HistogramSampler.sample`. (default: None)
+
+        Yields
+        ------
+        Indices : tuple of `~numpy.ndarray`
+            The indices of the drawn samples for each chunk (see
+            `~pycraf.mc.HistogramSampler.sample`).
+        '''
+
+        if chunk_size < 1:
+            raise ValueError('"chunk_size" must be a positive integer')
+
+        # need a Generator instance, such that the stream continues
+        rng = self._prepare_rng(seed)
+
+        for start in range(0, n, chunk_size):
+            yield self.sample(
+                min(chunk_size, n - start),
+                seed=rng,
+                )
 
-    def __call__(self, n):
+    def __call__(self, n, seed=None, out=None, chunk_size=None):
         '''
         Convenience method to allow using an *instance* of
         `~pycraf.mc.HistogramSampler` like a function::
@@ -183,4 +368,4 @@ class HistogramSampler(object):
         Calls `~pycraf.mc.HistogramSampler.sample` internally.
         '''
 
-        return self.sample(n)
+        return self.sample(n, seed=seed, out=out, chunk_size=chunk_size)
@@ -89,3 +89,98 @@ class TestHistogramSamper():
             np.array([2.5, 0.5, 1.5, -0.5, -1.5,
                       1.5, 1.5, 0.5, 2.5, 0.5]),
             )
+
+    def test_method(self):
+
+        with pytest.raises(ValueError):
+            mc.HistogramSampler(self.hist, method='foo')
+
+        # alias and cdf sampling must follow the same distribution
+        for method in ['cdf', 'alias']:
+            my_sampler = mc.HistogramSampler(self.hist2d, method=method)
+            indices = my_sampler.sample(200000, seed=1)
+            counts, *_ = np.histogram2d(
+                *indices, bins=self.hist2d.shape,
+                range=[(0, self.hist2d.shape[0]), (0, self.hist2d.shape[1])]
+                )
+            assert_allclose(
+                counts / counts.sum(),
+                self.hist2d / self.hist2d.sum(),
+                atol=3.e-3,
+                )
+            # empty bins must never be sampled
+            assert np.all(counts[self.hist2d == 0] == 0)
+
+    def test_alias_table(self):
+
+        for hist in [
+                self.hist2d.flatten(),
+                np.array([1.e7] + [1.] * 1000),
+                np.array([0., 1., 0., 0.]),
+                ]:
+            pdf = hist / hist.sum()
+            prob, alias = mc.HistogramSampler._alias_table(pdf)
+            num = len(pdf)
+
+            assert np.all((prob >= 0) & (prob <= 1))
+            assert_allclose(
+                prob / num + np.bincount(
+                    alias, weights=(1 - prob) / num, minlength=num
+                    ),
+                pdf, atol=1.e-12,
+                )
+
+    def test_seed(self):
+
+        for method in ['cdf', 'alias']:
+            my_sampler = mc.HistogramSampler(self.hist2d, method=method)
+
+            indices1 = my_sampler.sample(100, seed=1)
+            indices2 = my_sampler.sample(
+                100, seed=np.random.default_rng(1)
+                )
+            assert_equal(indices1, indices2)
+
+            # independent streams
+            rngs = [
+                np.random.default_rng(s)
+                for s in np.random.SeedSequence(1).spawn(2)
+                ]
+            indices1 = my_sampler.sample(100, seed=rngs[0])
+            indices2 = my_sampler.sample(100, seed=rngs[1])
+            assert np.any(indices1[0] != indices2[0])
+
+    def test_chunks(self):
+
+        for method in ['cdf', 'alias']:
+            my_sampler = mc.HistogramSampler(self.hist2d, method=method)
+
+            indices = my_sampler.sample(1000, seed=1)
+
+            out = np.zeros((2, 1000), dtype=np.int32)
+            indices_out = my_sampler.sample(
+                1000, seed=1, out=out, chunk_size=300
+                )
+            assert_equal(out, indices)
+            assert np.shares_memory(indices_out[0], out)
+
+            chunks = list(my_sampler.sample_chunks(1000, 300, seed=1))
+            assert [len(c[0]) for c in chunks] == [300, 300, 300, 100]
+            assert_equal(np.concatenate(chunks, axis=1), indices)
+
+            with pytest.raises(ValueError):
+                my_sampler.sample(1000, out=np.zeros(1000, dtype=np.int64))
+
+            for chunk_size in [0, -1]:
+                with pytest.raises(ValueError):
+                    my_sampler.sample(1000, chunk_size=chunk_size)
+                with pytest.raises(ValueError):
+                    list(my_sampler.sample_chunks(1000, chunk_size))
+
+        # legacy global RNG
+        my_sampler = mc.HistogramSampler(self.hist)
+        with NumpyRNGContext(1):
+            indices = my_sampler.sample(1000)
+        with NumpyRNGContext(1):
+            chunks = list(my_sampler.sample_chunks(1000, 300))
+        assert_equal(np.concatenate(chunks), indices)
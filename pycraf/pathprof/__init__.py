@@ -56,4 +56,19 @@ Clutter types are defined according to `ITU-R Recommendation P.452-16
 
 ''' + _clutter_table
 
+LANDSEA.__doc__ = '''
+Radio-climatic zones are defined according to `ITU-R Recommendation P.452-16
+<https://www.itu.int/rec/R-REC-P.452-16-201507-I/en>`_ (Table 3).
+
++-------+-------------------+----------------------------------------------+
+| Value | Alias             | Description                                  |
++=======+===================+==============================================+
+| 0     | SEA               | Seas, oceans and other large bodies of water |
++-------+-------------------+----------------------------------------------+
+| 1     | COASTAL_LAND      | Coastal land (zone A1)                       |
++-------+-------------------+----------------------------------------------+
+| 2     | INLAND            | All land, other than coastal land (zone A2)  |
++-------+-------------------+----------------------------------------------+
+'''
+
 # __doc__ += _clutter_table
@@ -11,15 +11,25 @@ from __future__ import unicode_literals
 
 cimport cython
 from cython.parallel import prange, parallel
+cimport openmp
 cimport numpy as np
 from numpy cimport PyArray_MultiIter_DATA as Py_Iter_DATA
 from libc.math cimport (
     exp, sqrt, fabs, M_PI, sin, cos, tan, asin, acos, atan2, fmod
     )
 import numpy as np
+from .. import utils
 
 np.import_array()
 
+
+cdef int _get_num_threads(object nthreads) except -1:
+    # per-call value, global PerformanceConf setting, or OpenMP default
+    cdef int num_threads = utils.get_num_threads(nthreads)
+
+    return num_threads if num_threads > 0 else openmp.omp_get_max_threads()
+
+
 # __all__ = ['inverse', 'direct']
 
 
@@ -125,7 +135,8 @@ def inverse_cython(
         int maxiter=50,
         out_dist=None,
         out_bearing1=None,
-        out_bearing2=None
+        out_bearing2=None,
+        nthreads=None,
         ):
     '''
     As `inverse_cython` but parallelized. Needs testing...
@@ -142,6 +153,7 @@ def inverse_cython(
         np.ndarray[double] _out_dist, _out_bearing1, _out_bearing2
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -176,7 +188,7 @@ def inverse_cython(
 
         size = _lon1_rad.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             (
                 _out_dist[i],
@@ -301,7 +313,8 @@ def direct_cython(
         wrap=True,
         out_lon2=None,
         out_lat2=None,
-        out_bearing2=None
+        out_bearing2=None,
+        nthreads=None,
         ):
     '''
     As `direct_cython` but parallelized. Needs testing...
@@ -319,6 +332,7 @@ def direct_cython(
 
         int cwrap = 1 if wrap else 0
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -353,7 +367,7 @@ def direct_cython(
 
         size = _lon1_rad.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             (
                 _out_lon2[i],
@@ -408,7 +422,9 @@ cdef double _area_wgs84(
     return area
 
 
-def area_wgs84_cython(lon1_rad, lon2_rad, lat1_rad, lat2_rad, out_area=None):
+def area_wgs84_cython(
+        lon1_rad, lon2_rad, lat1_rad, lat2_rad, out_area=None, nthreads=None
+        ):
 
     cdef:
 
@@ -416,6 +432,7 @@ def area_wgs84_cython(lon1_rad, lon2_rad, lat1_rad, lat2_rad, out_area=None):
         np.ndarray[double] _out_area
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     it = np.nditer(
         [
@@ -447,7 +464,7 @@ def area_wgs84_cython(lon1_rad, lon2_rad, lat1_rad, lat2_rad, out_area=None):
 
         size = _lon1_rad.shape[0]
 
-        for i in prange(size, nogil=True):
+        for i in prange(size, nogil=True, num_threads=num_threads):
 
             _out_area[i] = _area_wgs84(
                 _lon1_rad[i], _lat1_rad[i], _lon2_rad[i], _lat2_rad[i],
@@ -492,6 +509,184 @@ cdef inline double gauss1d(double offset, double s) nogil:
     return exp(-0.5 * offset * offset / s / s)
 
 
+cdef inline (int, int) _kernel_window(
+        cython.floating[:] x,
+        double this_x,
+        double width,
+        double dx,
+        bint regular,
+        bint ordered,
+        ) nogil:
+    '''
+    Index range [s, e) of support points within 5 widths of this_x.
+    '''
+
+    cdef:
+        int s, e
+        int length = x.shape[0]
+
+    if regular:
+
+        s = int((this_x - 5. * width) / dx - 0.5)
+        e = int((this_x + 5. * width) / dx + 1.5)
+        if s < 0:
+            s = 0
+        if e >= length:
+            e = length
+
+    elif ordered:
+        s = find_in_ordered(x, this_x)
+        e = s + 1
+
+        while True:
+            s -= 1
+            if s < 1:
+                s = 0
+                break
+            if fabs(x[s] - this_x) > 5. * width:
+                break
+
+        while True:
+            e += 1
+            if e >= length:
+                e = length
+                break
+            if fabs(x[e - 1] - this_x) > 5. * width:
+                break
+
+    else:
+        s = 0
+        e = length
+
+    return s, e
+
+
+def _box_radii(double sigma, int num_boxes=3):
+    '''
+    Radii of `num_boxes` successive box filters, which approximate a
+    Gaussian with standard deviation `sigma` (in samples); see
+    W. M. Wells, 1986, IEEE Trans. PAMI, 8, 234.
+    '''
+
+    cdef:
+        int wl, wu, m
+
+    wl = int(sqrt(12. * sigma * sigma / num_boxes + 1.))
+    if wl % 2 == 0:
+        wl -= 1
+    wu = wl + 2
+    m = int(round(
+        (12. * sigma * sigma - num_boxes * wl * wl - 4 * num_boxes * wl -
+         3 * num_boxes) / (-4. * wl - 4.)
+        ))
+
+    return [(wl - 1) // 2 if k < m else (wu - 1) // 2 for k in range(num_boxes)]
+
+
+cdef inline void _box_pass(
+        double[:, :] buf,
+        int src,
+        int dst,
+        int length,
+        int radius,
+        ) nogil:
+    '''
+    Running-mean filter of buf[src] into buf[dst] (buf[0] is scratch space
+    for the cumulative sum); the window is truncated at the edges.
+    '''
+
+    cdef:
+        int j, lo, hi
+
+    buf[0, 0] = 0.
+    for j in range(length):
+        buf[0, j + 1] = buf[0, j] + buf[src, j]
+
+    for j in range(length):
+        lo = j - radius
+        hi = j + radius + 1
+        if lo < 0:
+            lo = 0
+        if hi > length:
+            hi = length
+        buf[dst, j] = (buf[0, hi] - buf[0, lo]) / (hi - lo)
+
+
+def _regrid_boxes(
+        cython.floating[:] x,
+        cython.floating[:, :] y,
+        cython.floating[:] x_new,
+        cython.floating[:, :] y_new,
+        double width,
+        nthreads=None,
+        ):
+    '''
+    Regrid with repeated box filters (cost independent of width).
+
+    The support, x, must be evenly spaced and increasing. The rows of y are
+    smoothed on the support and then linearly interpolated to x_new.
+    '''
+
+    cdef:
+
+        int n, i, j, k, b, tid, src, dst
+        int maxn = y.shape[0]
+        int length = x.shape[0]
+        int length_new = x_new.shape[0]
+        int num_boxes
+        int num_threads = _get_num_threads(nthreads)
+        double x0, spacing, t, f
+
+        int[:] radii_v
+        double[:, :, :] buf_v
+
+    if length < 2:
+        raise ValueError('x must have at least two entries')
+
+    x0 = x[0]
+    spacing = (x[length - 1] - x[0]) / (length - 1)
+    if not spacing > 0:
+        raise ValueError('x must be increasing')
+
+    radii_v = np.array(_box_radii(width / spacing), dtype=np.int32)
+    num_boxes = radii_v.shape[0]
+
+    # per-thread buffers: cumulative sum and two work rows
+    buf_v = np.empty(
+        (num_threads, 3, length + 1), dtype=np.float64
+        )
+
+    for n in prange(
+            maxn, nogil=True, schedule='guided', num_threads=num_threads
+            ):
+
+        tid = openmp.omp_get_thread_num()
+
+        for j in range(length):
+            buf_v[tid, 1, j] = y[n, j]
+
+        src = 1
+        for b in range(num_boxes):
+            dst = 3 - src
+            _box_pass(buf_v[tid], src, dst, length, radii_v[b])
+            src = dst
+
+        for i in range(length_new):
+
+            t = (x_new[i] - x0) / spacing
+            if t <= 0.:
+                y_new[n, i] = buf_v[tid, src, 0]
+            elif t >= length - 1:
+                y_new[n, i] = buf_v[tid, src, length - 1]
+            else:
+                k = <int> t
+                f = t - k
+                y_new[n, i] = (
+                    (1. - f) * buf_v[tid, src, k] +
+                    f * buf_v[tid, src, k + 1]
+                    )
+
+
 def regrid1d_with_x(
         cython.floating[:] x not None,
         cython.floating[:] y not None,
@@ -500,10 +695,20 @@ def regrid1d_with_x(
         cython.floating width,
         bint regular=False,
         bint ordered=True,
+        str method='gauss',
+        nthreads=None,
         ):
     '''
     Regrid an array of values, measured at support x to a new support x_new.
 
+    With `method='gauss'` (default), each output value is the
+    Gaussian-weighted (standard deviation `width`) mean of the input values
+    within five widths. With `method='boxes'`, the input values are
+    smoothed with three successive box filters, which approximate the
+    Gaussian and have a cost independent of `width`, and are then linearly
+    interpolated to `x_new`. This needs an evenly spaced, increasing
+    support x (the `regular` and `ordered` options are ignored).
+
     Example code::
 
         >>> from pycraf.pathprof.cygeodesics import regrid1d_with_x
@@ -538,48 +743,27 @@ def regrid1d_with_x(
 
         double dx = fabs(x[0] - x[length - 1]) / length
 
+        int num_threads = _get_num_threads(nthreads)
+
     assert x.size == y.size, 'x and y must have equal size'
 
-    # for i in prange(length_new, nogil=True):
-    for i in range(length_new):
+    if method == 'boxes':
+        _regrid_boxes(
+            x, np.asarray(y)[np.newaxis], x_new, np.asarray(y_new)[np.newaxis],
+            width, nthreads=num_threads
+            )
+        return
+    elif method != 'gauss':
+        raise ValueError('method must be "gauss" or "boxes"')
+
+    for i in prange(
+            length_new, nogil=True, schedule='guided', num_threads=num_threads
+            ):
 
         this_x = x_new[i]
 
         # find optimal s, e (if in ordered mode)
-        if regular:
-
-            s = int((this_x - 5. * width) / dx - 0.5)
-            e = int((this_x + 5. * width) / dx + 1.5)
-            if s < 0:
-                s = 0
-            if e >= length:
-                e = length
-
-        elif ordered:
-            s = find_in_ordered(x, this_x)
-            e = s + 1
-
-            while True:
-                s -= 1
-                if s < 1:
-                    s = 0
-                    break
-                if fabs(x[s] - this_x) > 5. * width:
-                    break
-
-            while True:
-                e += 1
-                if e >= length:
-                    e = length
-                    break
-                if fabs(x[e - 1] - this_x) > 5. * width:
-                    break
-
-        else:
-            s = 0
-            e = length
-
-        # print(i, s, e)
+        s, e = _kernel_window(x, this_x, width, dx, regular, ordered)
 
         norm = 0.
         ssum = 0.
@@ -592,7 +776,6 @@ def regrid1d_with_x(
             ssum = ssum + kv * y[j]
             norm = norm + kv
 
-        # print(i, s, e, norm, ssum)
         if fabs(norm) < 1.e-12:
             y_new[i] = 0.
         else:
@@ -607,6 +790,8 @@ def regrid2d_with_x(
         cython.floating width,
         bint regular=False,
         bint ordered=True,
+        str method='gauss',
+        nthreads=None,
         ):
     '''
     Like regrid1d_with_x but for batches of 1D arrays; openmp powered::
@@ -623,75 +808,185 @@ def regrid2d_with_x(
         %timeit regrid1d_with_x(x, y_[0], x_new, y_new[0], 0.005, regular=True)
         %timeit regrid2d_with_x(x, y_, x_new, y_new, 0.005, regular=True)
 
+    The Gaussian kernel weights are computed only once for all rows.
     '''
 
     cdef:
 
-        double this_x, kv, ssum, norm
+        double this_x, ssum, norm
 
-        int n, i, j, s, e
+        int n, i, j, k, s, e
         int maxn = y.shape[0]
         int length = x.size
         int length_new = x_new.size
 
         double dx = fabs(x[0] - x[length - 1]) / length
 
-    assert x.size == y.shape[1], 'x and y[0] must have equal size'
+        int num_threads = _get_num_threads(nthreads)
 
-    for i in range(length_new):
+        int[:] starts_v, stops_v
+        long long[:] offsets_v
+        double[:] weights_v, norms_v
+
+    assert x.size == y.shape[1], 'x and y[0] must have equal size'
 
+    if method == 'boxes':
+        _regrid_boxes(x, y, x_new, y_new, width, nthreads=num_threads)
+        return
+    elif method != 'gauss':
+        raise ValueError('method must be "gauss" or "boxes"')
+
+    # kernel windows and weights (same for all rows)
+    starts = np.empty(length_new, dtype=np.int32)
+    stops = np.empty(length_new, dtype=np.int32)
+    starts_v = starts
+    stops_v = stops
+
+    for i in prange(
+            length_new, nogil=True, schedule='guided', num_threads=num_threads
+            ):
+        s, e = _kernel_window(x, x_new[i], width, dx, regular, ordered)
+        starts_v[i] = s
+        stops_v[i] = e
+
+    offsets = np.zeros(length_new + 1, dtype=np.int64)
+    np.cumsum(stops - starts, out=offsets[1:])
+    offsets_v = offsets
+    weights_v = np.empty(offsets[length_new], dtype=np.float64)
+    norms_v = np.empty(length_new, dtype=np.float64)
+
+    for i in prange(
+            length_new, nogil=True, schedule='guided', num_threads=num_threads
+            ):
         this_x = x_new[i]
+        norm = 0.
+        for j in range(starts_v[i], stops_v[i]):
+            k = offsets_v[i] + j - starts_v[i]
+            weights_v[k] = gauss1d(x[j] - this_x, width)
+            norm = norm + weights_v[k]
+        norms_v[i] = norm
+
+    for n in prange(
+            maxn, nogil=True, schedule='guided', num_threads=num_threads
+            ):
+        for i in range(length_new):
+
+            if fabs(norms_v[i]) < 1.e-12:
+                y_new[n, i] = 0.
+                continue
 
-        # find optimal s, e (if in ordered mode)
-        if regular:
+            ssum = 0.
+            k = offsets_v[i] - starts_v[i]
+            for j in range(starts_v[i], stops_v[i]):
+                # inplace operation leads to an error:
+                # Cannot read reduction variable in loop body
+                ssum = ssum + weights_v[k + j] * y[n, j]
+
+            y_new[n, i] = ssum / norms_v[i]
+
+
+def regrid_sections_with_x(
+        double[:] x not None,
+        double[::1] y not None,
+        np.int64_t[::1] offsets not None,
+        np.int64_t[::1] starts not None,
+        np.int64_t[::1] stops not None,
+        double[::1] x_new not None,
+        double[::1] y_new not None,  # output
+        np.int64_t[::1] new_offsets not None,
+        np.int64_t[::1] new_starts not None,
+        np.int64_t[::1] new_stops not None,
+        double width,
+        nthreads=None,
+        ):
+    '''
+    Like regrid2d_with_x (with a regular support), but for sections of
+    rows, which are stored in flat arrays.
+
+    Row n only has the values `y[offsets[n]:]` at the support points
+    `x[starts[n]:stops[n]]`; likewise, only the values at
+    `x_new[new_starts[n]:new_stops[n]]` are computed and stored in
+    `y_new[new_offsets[n]:]`. The kernel windows are clipped to the
+    section of the row. As long as they fit into the section, the
+    results are identical to the ones of regrid2d_with_x.
+    '''
 
-            s = int((this_x - 5. * width) / dx - 0.5)
-            e = int((this_x + 5. * width) / dx + 1.5)
-            if s < 0:
-                s = 0
-            if e >= length:
-                e = length
+    cdef:
 
-        elif ordered:
-            s = find_in_ordered(x, this_x)
-            e = s + 1
-
-            while True:
-                s -= 1
-                if s < 1:
-                    s = 0
-                    break
-                if fabs(x[s] - this_x) > 5. * width:
-                    break
-
-            while True:
-                e += 1
-                if e >= length:
-                    e = length
-                    break
-                if fabs(x[e - 1] - this_x) > 5. * width:
-                    break
+        double this_x, ssum, norm
 
-        else:
-            s = 0
-            e = length
+        int i, j, s, e
+        np.int64_t n, k
+        np.int64_t maxn = offsets.shape[0]
+        int length = x.size
+        int length_new = x_new.size
+
+        double dx = fabs(x[0] - x[length - 1]) / length
+
+        int num_threads = _get_num_threads(nthreads)
+
+        int[:] starts_v, stops_v
+        long long[:] koffsets_v
+        double[:] weights_v, norms_v
+
+    assert (
+        starts.shape[0] == maxn and stops.shape[0] == maxn and
+        new_offsets.shape[0] == maxn and new_starts.shape[0] == maxn and
+        new_stops.shape[0] == maxn
+        ), 'all section arrays must have equal size'
+
+    # kernel windows and weights (same for all rows)
+    kstarts = np.empty(length_new, dtype=np.int32)
+    kstops = np.empty(length_new, dtype=np.int32)
+    starts_v = kstarts
+    stops_v = kstops
+
+    for i in prange(
+            length_new, nogil=True, schedule='guided', num_threads=num_threads
+            ):
+        s, e = _kernel_window(x, x_new[i], width, dx, True, True)
+        starts_v[i] = s
+        stops_v[i] = e
+
+    koffsets = np.zeros(length_new + 1, dtype=np.int64)
+    np.cumsum(kstops - kstarts, out=koffsets[1:])
+    koffsets_v = koffsets
+    weights_v = np.empty(koffsets[length_new], dtype=np.float64)
+    norms_v = np.empty(length_new, dtype=np.float64)
+
+    for i in prange(
+            length_new, nogil=True, schedule='guided', num_threads=num_threads
+            ):
+        this_x = x_new[i]
+        norm = 0.
+        for j in range(starts_v[i], stops_v[i]):
+            k = koffsets_v[i] + j - starts_v[i]
+            weights_v[k] = gauss1d(x[j] - this_x, width)
+            norm = norm + weights_v[k]
+        norms_v[i] = norm
+
+    for n in prange(
+            maxn, nogil=True, schedule='guided', num_threads=num_threads
+            ):
+        for i in range(new_starts[n], new_stops[n]):
+
+            s = starts_v[i] if starts_v[i] > starts[n] else starts[n]
+            e = stops_v[i] if stops_v[i] < stops[n] else stops[n]
+            k = koffsets_v[i] - starts_v[i]
+
+            if s == starts_v[i] and e == stops_v[i]:
+                norm = norms_v[i]
+            else:
+                norm = 0.
+                for j in range(s, e):
+                    norm = norm + weights_v[k + j]
 
-        # print(i, s, e)
+            if fabs(norm) < 1.e-12:
+                y_new[new_offsets[n] + i - new_starts[n]] = 0.
+                continue
 
-        for n in prange(maxn, nogil=True):
-            norm = 0.
             ssum = 0.
             for j in range(s, e):
-                kv = gauss1d(x[j] - this_x, width)
-                # inplace operation leads to an error:
-                # Cannot read reduction variable in loop body
-                # ssum += kv * y[j]
-                # norm += kv
-                ssum = ssum + kv * y[n, j]
-                norm = norm + kv
+                ssum = ssum + weights_v[k + j] * y[offsets[n] + j - starts[n]]
 
-            # print(i, s, e, norm, ssum)
-            if fabs(norm) < 1.e-12:
-                y_new[n, i] = 0.
-            else:
-                y_new[n, i] = ssum / norm
+            y_new[new_offsets[n] + i - new_starts[n]] = ssum / norm
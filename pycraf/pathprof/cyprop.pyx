@@ -12,11 +12,12 @@ from __future__ import unicode_literals
 cimport cython
 from cython.parallel import prange, parallel
 from libc.stdlib cimport abort, malloc, free
+from libc.string cimport memcpy
 cimport numpy as np
 cimport openmp
 from libc.math cimport (
     exp, log, log10, sqrt, fabs, M_PI, floor, pow as cpower,
-    sin, cos, tan, asin, acos, atan, atan2, tanh
+    sin, cos, tan, asin, acos, atan, atan2, tanh, INFINITY
     )
 import numpy as np
 from astropy import units as apu
@@ -30,10 +31,18 @@ from .. import utils
 np.import_array()
 
 
+cdef int _get_num_threads(object nthreads) except -1:
+    # per-call value, global PerformanceConf setting, or OpenMP default
+    cdef int num_threads = utils.get_num_threads(nthreads)
+
+    return num_threads if num_threads > 0 else openmp.omp_get_max_threads()
+
+
 __all__ = [
     'CLUTTER', 'CLUTTER_NAMES', 'CLUTTER_DATA',
+    'LANDSEA', 'LANDSEA_NAMES',
     'PARAMETERS_BASIC', 'PARAMETERS_V14', 'PARAMETERS_V16',
-    'set_num_threads',
+    'set_num_threads', 'JobControl', 'JobCancelledError',
     ]
 
 
@@ -88,6 +97,18 @@ CLUTTER_DATA = np.array(
 
 cdef double[:, ::1] CLUTTER_DATA_V = CLUTTER_DATA
 
+# radio-climatic zones (P.452, Table 3)
+cpdef enum LANDSEA:
+    SEA = 0
+    COASTAL_LAND = 1
+    INLAND = 2
+
+LANDSEA_NAMES = [
+    'SEA',
+    'COASTAL_LAND',
+    'INLAND',
+    ]
+
 PARAMETERS_BASIC = [
     ('version', '12d', '(P.452 version; 14 or 16)', cnv.dimless),
     ('freq', '12.6f', 'GHz', apu.GHz),
@@ -343,6 +364,42 @@ cdef struct ppstruct:
     int i_r50  # dimless
 
 
+# the ray-sweep engine (see _atten_map_fast_block) processes all pixels of a
+# ray in the order of distance and keeps the following state, such that
+# the maxima in the helper functions need not be searched along the full
+# profile for each pixel
+cdef enum:
+    SWEEP_BLOCK = 32  # number of profile positions per block
+
+
+cdef struct raysweep:
+    double nu_1  # smooth-earth sums (see _smooth_earth_heights) up to
+    double nu_2  # the end of the current path
+    double *hmax  # height maxima of the blocks of the profile
+    double *bound  # scratch space for the upper bounds of the blocks
+    double *g  # (h_i - h_ts) / d_i for each profile position
+    int *g_hull  # upper convex hulls of the points (d_i, g_i) and
+    int *h_hull  # (d_i, h_i), respectively (indices); NULL for the
+    int g_hull_size  # zero-height profile
+    int h_hull_size
+
+
+cdef enum SWEEP:
+    SW_S_TIM, SW_S_RIM, SW_NU, SW_THETA_R, SW_H_M
+
+
+# quantity to maximize along the profile, see _sweep_value; the (sub-)path
+# is from (x0, y0) to (x1, y1), with distances in km and heights in m
+cdef struct sweepsearch:
+    int kind
+    double x0, y0, x1, y1
+    double C  # 500 / a_e
+    double a_e  # km
+    double m  # duct slope, m / km
+    double wavelen  # m
+    double zeta  # dimless
+
+
 def set_num_threads(int nthreads):
     '''
     Change maximum number of threads to use.
@@ -356,11 +413,127 @@ def set_num_threads(int nthreads):
     -----
     - This can also be controlled by setting the environment variable
       `OMP_NUM_THREADS`.
+    - The setting affects all OpenMP-parallelized code in the process.
+      To change the number of threads for pycraf only (or temporarily),
+      use `~pycraf.utils.PerformanceConf` or the `nthreads` argument
+      of the individual functions, which take precedence.
     '''
 
     openmp.omp_set_num_threads(nthreads)
 
 
+# The cancellation flag is set from another thread, so the compiler must
+# not keep it in a register while a parallel loop is running
+cdef extern from *:
+    """
+    static CYTHON_INLINE int __pyx_load_flag(int *flag) {
+        return *((volatile int *) flag);
+    }
+    """
+    int _load_flag "__pyx_load_flag" (int *flag) nogil
+
+
+class JobCancelledError(Exception):
+
+    pass
+
+
+cdef class JobControl(object):
+    '''
+    Progress counter and cancellation flag for long-running map jobs.
+
+    An instance can be passed (as the `job` argument) to
+    `~pycraf.pathprof.height_map_data` and
+    `~pycraf.pathprof.atten_map_fast`. The progress can then be queried
+    (e.g., from another thread) while the computation is running, and
+    the computation can be aborted with `cancel`. The cancellation flag
+    is checked for each map row (or ray) in the parallel loops, such that
+    the function returns quickly; it raises a `JobCancelledError` in this
+    case.
+
+    Notes
+    -----
+    - Each thread has its own progress counter, such that no locking
+      is needed. The progress is thus only approximate while the
+      computation is running.
+    - A `JobControl` instance should not be used by several jobs at the
+      same time.
+    '''
+
+    cdef:
+        int _cancelled
+        readonly long long total
+        long long[::1] _done
+
+    def __init__(self):
+
+        self._cancelled = 0
+        self._start(0)
+
+    def _start(self, long long total, int num_threads=0):
+        # (re-)start the progress counting; called by the map functions
+        # with the number of threads they use (one counter per thread)
+
+        if num_threads <= 0:
+            num_threads = openmp.omp_get_max_threads()
+
+        self.total = total
+        self._done = np.zeros(max(num_threads, 1), dtype=np.int64)
+
+    def _advance(self, long long num=1):
+
+        self._done[0] += num
+
+    def _check(self):
+
+        if self._cancelled:
+            raise JobCancelledError('Job was cancelled')
+
+    def cancel(self):
+        '''
+        Request cancellation of the running job.
+
+        This is thread-safe and returns immediately.
+        '''
+
+        self._cancelled = 1
+
+    def reset(self):
+        '''
+        Clear the cancellation flag and the progress counter.
+        '''
+
+        self._cancelled = 0
+        self._start(0)
+
+    @property
+    def cancelled(self):
+        '''True, if `cancel` was called.'''
+
+        return bool(self._cancelled)
+
+    @property
+    def done(self):
+        '''Number of processed work items (e.g., map pixels).'''
+
+        return int(np.sum(self._done))
+
+    @property
+    def fraction(self):
+        '''Fraction of the job that is done (0 to 1).'''
+
+        if self.total <= 0:
+            return 0.
+
+        return min(self.done / self.total, 1.)
+
+    def __repr__(self):
+
+        return 'JobControl<{:.1f}% done{}>'.format(
+            100 * self.fraction, ', cancelled' if self._cancelled else ''
+            )
+
+
 cdef inline double f_max(double a, double b) nogil:
 
     return a if a >= b else b
@@ -529,6 +702,36 @@ cdef class _PathProp(object):
             zheights,
             )
 
+    def _set_params(self):
+        # hook for subclasses, called after unpickling
+
+        pass
+
+    def __reduce__(self):
+        # compact serialization: just the raw ppstruct (no height profile
+        # needs to be stored, as it was fully processed)
+
+        return (
+            _unpickle_pathprop,
+            (type(self), (<char *> &self._pp)[:sizeof(ppstruct)]),
+            )
+
+
+def _unpickle_pathprop(cls, bytes data):
+
+    cdef _PathProp pathprop
+
+    if len(data) != sizeof(ppstruct):
+        raise ValueError(
+            'Pickled PathProp data is incompatible with this pycraf build'
+            )
+
+    pathprop = cls.__new__(cls)
+    memcpy(&pathprop._pp, <char *> data, sizeof(ppstruct))
+    pathprop._set_params()
+
+    return pathprop
+
 
 cdef double _beta_from_DN_N0(
         double lat_mid, double DN, double N0, double d_tm, double d_lm
@@ -606,10 +809,16 @@ cdef void _process_path(
         # double bearing,
         # double back_bearing,
         # double distance,
+        raysweep *rs=NULL,
+        raysweep *rz=NULL,
         ) nogil:
 
     # TODO: write down, which entries "pp" MUST have already
 
+    # If "rs" and "rz" are given (ray-sweep engine), they must hold the
+    # state for the height profile and the zero-height profile,
+    # respectively (see _atten_map_fast_block).
+
     cdef:
 
         int diff_edge_idx
@@ -626,7 +835,7 @@ cdef void _process_path(
 
     # smooth-earth height profile
     pp.h_st, pp.h_sr = _smooth_earth_heights(
-        pp.distance, distances_view, heights_view,
+        pp.distance, distances_view, heights_view, rs,
         )
 
     # print('_smooth_earth_heights', time.time() - _time)
@@ -637,7 +846,7 @@ cdef void _process_path(
         pp.distance,
         distances_view, heights_view,
         pp.h_ts, pp.h_rs,
-        pp.h_st, pp.h_sr
+        pp.h_st, pp.h_sr, rs,
         )
 
     # print('_effective_antenna_heights', time.time() - _time)
@@ -665,7 +874,7 @@ cdef void _process_path(
             pp.a_e_50, pp.distance,
             distances_view, heights_view,
             pp.h_ts, pp.h_rs,
-            pp.wavelen,
+            pp.wavelen, rs,
             )
 
         (
@@ -676,7 +885,7 @@ cdef void _process_path(
             pp.a_e_b0, pp.distance,
             distances_view, heights_view,
             pp.h_ts, pp.h_rs,
-            pp.wavelen,
+            pp.wavelen, rs,
             )
 
         # similarly, we have to repeat the game with heights set to zero
@@ -689,7 +898,7 @@ cdef void _process_path(
             pp.a_e_50, pp.distance,
             distances_view, zheights_view,
             pp.h_ts - pp.h_std, pp.h_rs - pp.h_srd,
-            pp.wavelen,
+            pp.wavelen, rz,
             )
 
         (
@@ -700,7 +909,7 @@ cdef void _process_path(
             pp.a_e_b0, pp.distance,
             distances_view, zheights_view,
             pp.h_ts - pp.h_std, pp.h_rs - pp.h_srd,
-            pp.wavelen,
+            pp.wavelen, rz,
             )
 
     if pp.version == 14:
@@ -719,7 +928,7 @@ cdef void _process_path(
             pp.a_e_50, pp.a_e_b0, pp.distance,
             distances_view, heights_view,
             pp.h_ts, pp.h_rs,
-            pp.wavelen,
+            pp.wavelen, rs,
             )
 
     # print('_diffraction_helpers', time.time() - _time)
@@ -742,7 +951,7 @@ cdef void _process_path(
         pp.a_e_50, pp.distance,
         distances_view, heights_view,
         pp.h_ts, pp.h_rs, pp.h_st,
-        diff_edge_idx, pp.duct_slope,
+        diff_edge_idx, pp.duct_slope, rs,
         )
 
     # print('_path_geometry_helper', time.time() - _time)
@@ -755,6 +964,7 @@ cdef (double, double) _smooth_earth_heights(
         double distance,
         double[::1] d_v,
         double[::1] h_v,
+        raysweep *rs=NULL,
         ) nogil:
 
     cdef:
@@ -766,6 +976,12 @@ cdef (double, double) _smooth_earth_heights(
 
     nu_1 = 0.
     nu_2 = 0.
+    if rs != NULL:
+        # sums were accumulated along the ray
+        nu_1 = rs.nu_1
+        nu_2 = rs.nu_2
+        dsize = 1
+
     for i in range(1, dsize):
 
         nu_1 += (d_v[i] - d_v[i - 1]) * (h_v[i] + h_v[i - 1])
@@ -786,10 +1002,12 @@ cdef (double, double) _effective_antenna_heights(
         double[::1] h_v,
         double h_ts, double h_rs,
         double h_st, double h_sr,
+        raysweep *rs=NULL,
         ) nogil:
 
     cdef:
-        int i, dsize
+        int i, k, dsize, num
+        int cand[3]
         double d = distance, h0, hn
 
         double H_i, h_obs = -1.e31, alpha_obt = -1.e31, alpha_obr = -1.e31
@@ -802,7 +1020,25 @@ cdef (double, double) _effective_antenna_heights(
     h0 = h_v[0]
     hn = h_v[dsize - 1]
 
-    for i in range(1, dsize - 1):
+    num = dsize - 2
+    if rs != NULL:
+        # only visit the positions of the three maxima, which are found on
+        # the upper hulls of the profile and of the g_i
+        cand[0] = _hull_query(
+            rs.h_hull, rs.h_hull_size, &d_v[0], &h_v[0], (h_rs - h_ts) / d
+            )
+        cand[1] = _hull_tangent(
+            rs.h_hull, rs.h_hull_size, &d_v[0], &h_v[0], d, h_rs
+            )
+        cand[2] = _hull_query(rs.g_hull, rs.g_hull_size, &d_v[0], rs.g, 0.)
+        num = 3
+
+    for k in range(num):
+
+        if rs == NULL:
+            i = k + 1
+        else:
+            i = cand[k]
 
         H_i = h_v[i] - (h_ts * (d - d_v[i]) + h_rs * d_v[i]) / d
         tmp_alpha_obt = H_i / d_v[i]
@@ -849,12 +1085,14 @@ cdef (
         double[::1] h_v,
         double h_ts, double h_rs,
         double wavelen,
+        raysweep *rs=NULL,
         ) nogil:
 
     cdef:
-        int i, dsize
+        int i, i_lo, i_hi, dsize
         double d = distance, lam = wavelen, C_e500 = 500. / a_p
         int path_type
+        sweepsearch s
 
         double slope_i, slope_j, S_tim = -1.e31, S_tr, S_rim = -1.e31
 
@@ -865,7 +1103,24 @@ cdef (
 
     dsize = d_v.shape[0]
 
-    for i in range(1, dsize - 1):
+    # with the ray-sweep state, the loops only visit the maximum
+    s.x0, s.y0, s.x1, s.y1 = 0., h_ts, d, h_rs
+    s.C = C_e500
+    s.wavelen = lam
+    s.zeta = 1.
+
+    i_lo, i_hi = 1, dsize - 1
+    if rs != NULL:
+        if rs.g_hull != NULL:
+            i_lo = _hull_query(
+                rs.g_hull, rs.g_hull_size, &d_v[0], rs.g, C_e500
+                )
+        else:
+            s.kind = SW_S_TIM
+            i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], 1, dsize - 1)
+        i_hi = i_lo + 1
+
+    for i in range(i_lo, i_hi):
 
         slope_i = (
             h_v[i] + C_e500 * d_v[i] * (d - d_v[i]) - h_ts
@@ -884,7 +1139,13 @@ cdef (
     if path_type == 1:
         # transhorizon
         # find Bullington point, etc.
-        for i in range(1, dsize - 1):
+        i_lo, i_hi = 1, dsize - 1
+        if rs != NULL:
+            s.kind = SW_S_RIM
+            i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], 1, dsize - 1)
+            i_hi = i_lo + 1
+
+        for i in range(i_lo, i_hi):
             slope_j = (
                 h_v[i] + C_e500 * d_v[i] * (d - d_v[i]) - h_rs
                 ) / (d - d_v[i])
@@ -916,7 +1177,13 @@ cdef (
         S_rim = NAN
 
         # diffraction parameter
-        for i in range(1, dsize - 1):
+        i_lo, i_hi = 1, dsize - 1
+        if rs != NULL:
+            s.kind = SW_NU
+            i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], 1, dsize - 1)
+            i_hi = i_lo + 1
+
+        for i in range(i_lo, i_hi):
             h_eff_i = (
                 h_v[i] +
                 C_e500 * d_v[i] * (d - d_v[i]) -
@@ -950,12 +1217,14 @@ cdef (
         double[::1] h_v,
         double h_ts, double h_rs,
         double wavelen,
+        raysweep *rs=NULL,
         ) nogil:
 
     cdef:
-        int i, dsize
+        int i, i_lo, i_hi, dsize
         double d = distance, lam = wavelen
         double C_e500 = 500. / a_e_50
+        sweepsearch s
         double C_b500 = 500. / a_e_beta
 
         double H_i, nu_i
@@ -988,8 +1257,19 @@ cdef (
     # Eq 14-15
     zeta_m = cos(atan(1.e-3 * (h_rs - h_ts) / d))
 
+    # with the ray-sweep state, the loops only visit the maximum
+    s.kind = SW_NU
+    s.C = C_e500
+    s.wavelen = lam
+
+    i_lo, i_hi = 1, dsize - 1
+    if rs != NULL:
+        s.x0, s.y0, s.x1, s.y1, s.zeta = 0., h_ts, d, h_rs, zeta_m
+        i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], 1, dsize - 1)
+        i_hi = i_lo + 1
+
     nu_m50 = -1.e31
-    for i in range(1, dsize - 1):
+    for i in range(i_lo, i_hi):
 
         H_i = (
             h_v[i] + C_e500 * d_v[i] * (d - d_v[i]) -
@@ -1030,8 +1310,15 @@ cdef (
 
         # Eq 17-18
         zeta_t = cos(atan(1.e-3 * (h50 - h_ts) / d50))
+
+        i_lo, i_hi = 1, i_m50
+        if rs != NULL:
+            s.x0, s.y0, s.x1, s.y1, s.zeta = 0., h_ts, d50, h50, zeta_t
+            i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], 1, i_m50)
+            i_hi = i_lo + 1
+
         nu_t50 = -1.e31
-        for i in range(1, i_m50):
+        for i in range(i_lo, i_hi):
 
             H_i = (
                 h_v[i] + C_e500 * d_v[i] * (d50 - d_v[i]) -
@@ -1067,8 +1354,15 @@ cdef (
 
         # Eq 20-21
         zeta_r = cos(atan(1.e-3 * (h_rs - h50) / (d - d50)))
+
+        i_lo, i_hi = i_m50 + 1, dsize - 1
+        if rs != NULL:
+            s.x0, s.y0, s.x1, s.y1, s.zeta = d50, h50, d, h_rs, zeta_r
+            i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], i_m50 + 1, dsize - 1)
+            i_hi = i_lo + 1
+
         nu_r50 = -1.e31
-        for i in range(i_m50 + 1, dsize - 1):
+        for i in range(i_lo, i_hi):
 
             H_i = (
                 h_v[i] + C_e500 * (d_v[i] - d50) * (d - d_v[i]) -
@@ -1098,11 +1392,11 @@ cdef (
         if nu_r50 < -0.78:
             nu_rbeta = -1.
 
-        return (
-            zeta_m, i_m50, d50, h50, H50, nu_m50, nu_mbeta,
-            zeta_t, i_t50, dr50, hr50, Hr50, nu_t50, nu_tbeta,
-            zeta_r, i_r50, dt50, ht50, Ht50, nu_r50, nu_rbeta,
-            )
+    return (
+        zeta_m, i_m50, d50, h50, H50, nu_m50, nu_mbeta,
+        zeta_t, i_t50, dr50, hr50, Hr50, nu_t50, nu_tbeta,
+        zeta_r, i_r50, dt50, ht50, Ht50, nu_r50, nu_rbeta,
+        )
 
 
 cdef (int, double, double, double, double, double, double, double, double) _path_geometry_helper(
@@ -1112,12 +1406,14 @@ cdef (int, double, double, double, double, double, double, double, double) _path
         double[::1] h_v,
         double h_ts, double h_rs, double h_st,
         int nu_bull_idx, double duct_slope,
+        raysweep *rs=NULL,
         ) nogil:
 
     cdef:
-        int i, dsize
+        int i, i_lo, i_hi, dsize
         double d = distance, m = duct_slope
         int path_type
+        sweepsearch s
 
         double theta_i, theta_j, theta_t, theta_r, theta
         double theta_i_max = -1.e31, theta_j_max = -1.e31, theta_td
@@ -1130,7 +1426,19 @@ cdef (int, double, double, double, double, double, double, double, double) _path
 
     dsize = d_v.shape[0]
 
-    for i in range(1, dsize - 1):
+    # with the ray-sweep state, the loops only visit the maximum
+    s.x0, s.y0, s.x1, s.y1 = 0., h_st, d, h_rs
+    s.a_e = a_e
+    s.m = m
+
+    i_lo, i_hi = 1, dsize - 1
+    if rs != NULL:
+        i_lo = _hull_query(
+            rs.g_hull, rs.g_hull_size, &d_v[0], rs.g, 500. / a_e
+            )
+        i_hi = i_lo + 1
+
+    for i in range(i_lo, i_hi):
 
         theta_i = 1000. * atan(
             (h_v[i] - h_ts) / 1.e3 / d_v[i] - d_v[i] / 2. / a_e
@@ -1154,7 +1462,13 @@ cdef (int, double, double, double, double, double, double, double, double) _path
         theta_t = theta_i_max
         d_lt = d_v[lt_idx]
 
-        for i in range(1, dsize - 1):
+        i_lo, i_hi = 1, dsize - 1
+        if rs != NULL:
+            s.kind = SW_THETA_R
+            i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], 1, dsize - 1)
+            i_hi = i_lo + 1
+
+        for i in range(i_lo, i_hi):
             theta_j = 1000. * atan(
                 (h_v[i] - h_rs) / 1.e3 / (d - d_v[i]) -
                 (d - d_v[i]) / 2. / a_e
@@ -1173,7 +1487,13 @@ cdef (int, double, double, double, double, double, double, double, double) _path
         eps_pr = theta_r * 1.e-3 * 180. / M_PI
 
         # calc h_m
-        for i in range(lt_idx, lr_idx + 1):
+        i_lo, i_hi = lt_idx, lr_idx + 1
+        if rs != NULL and i_lo < i_hi:
+            s.kind = SW_H_M
+            i_lo = _sweep_argmax(rs, &s, &d_v[0], &h_v[0], lt_idx, lr_idx + 1)
+            i_hi = i_lo + 1
+
+        for i in range(i_lo, i_hi):
             h_m_i = h_v[i] - (h_st + m * d_v[i])
 
             if h_m_i > h_m:
@@ -1214,6 +1534,243 @@ cdef (int, double, double, double, double, double, double, double, double) _path
         )
 
 
+cdef inline void _ray_sweep_advance(
+        raysweep *rs, double *d_v, double *h_v, double h_ts, int i,
+        ) nogil:
+
+    # extend the ray-sweep state by profile position i: the smooth-earth
+    # sums (see _smooth_earth_heights), the block maxima and g_i; the
+    # hulls are extended separately, as they must only contain the
+    # interior positions of the path
+
+    cdef int b = i // SWEEP_BLOCK
+
+    rs.nu_1 = rs.nu_1 + (d_v[i] - d_v[i - 1]) * (h_v[i] + h_v[i - 1])
+    rs.nu_2 = rs.nu_2 + (d_v[i] - d_v[i - 1]) * (
+        h_v[i] * (2 * d_v[i] + d_v[i - 1]) +
+        h_v[i - 1] * (d_v[i] + 2 * d_v[i - 1])
+        )
+
+    if i % SWEEP_BLOCK == 0:
+        rs.hmax[b] = -INFINITY
+    if h_v[i] > rs.hmax[b]:
+        rs.hmax[b] = h_v[i]
+
+    rs.g[i] = (h_v[i] - h_ts) / d_v[i]
+
+
+cdef inline void _hull_insert(
+        int *hull, int *hull_size, double *x_v, double *y_v, int i,
+        ) nogil:
+
+    # add point i to the upper convex hull of the points (x_v, y_v);
+    # points have to be added in the order of (strictly) increasing x
+
+    cdef int i1, i2
+
+    while hull_size[0] >= 2:
+
+        i1 = hull[hull_size[0] - 2]
+        i2 = hull[hull_size[0] - 1]
+
+        # i2 is obsolete, if it is not above the line from i1 to i
+        if (
+                (y_v[i] - y_v[i2]) * (x_v[i2] - x_v[i1]) >=
+                (y_v[i2] - y_v[i1]) * (x_v[i] - x_v[i2])
+                ):
+            hull_size[0] -= 1
+        else:
+            break
+
+    hull[hull_size[0]] = i
+    hull_size[0] += 1
+
+
+cdef inline int _hull_query(
+        int *hull, int hull_size, double *x_v, double *y_v, double C,
+        ) nogil:
+
+    # index of the point with the largest value y_i - C * x_i; e.g., for
+    # the g_i, this is the maximum of the transmitter-side Bullington
+    # slope (for C = 500 / a_e, see _diffraction_helper_v16) and of the
+    # horizon angle (see _path_geometry_helper)
+
+    cdef int lo = 0, hi = hull_size - 1, mid, i0, i1
+
+    while lo < hi:
+
+        mid = (lo + hi) // 2
+        i0 = hull[mid]
+        i1 = hull[mid + 1]
+
+        if C * (x_v[i1] - x_v[i0]) >= y_v[i1] - y_v[i0]:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    return hull[lo]
+
+
+cdef inline int _hull_tangent(
+        int *hull, int hull_size, double *x_v, double *y_v,
+        double x, double y,
+        ) nogil:
+
+    # index of the point with the largest value (y_i - y) / (x - x_i),
+    # for x larger than all x_i, i.e., where the tangent from (x, y)
+    # touches the hull
+
+    cdef int lo = 0, hi = hull_size - 1, mid, i0, i1
+
+    while lo < hi:
+
+        mid = (lo + hi) // 2
+        i0 = hull[mid]
+        i1 = hull[mid + 1]
+
+        if (y_v[i1] - y) * (x - x_v[i0]) > (y_v[i0] - y) * (x - x_v[i1]):
+            lo = mid + 1
+        else:
+            hi = mid
+
+    return hull[lo]
+
+
+cdef inline double _sweep_value(sweepsearch *s, double x, double h) nogil:
+
+    # the quantities as in the loops of the helper functions (or a
+    # monotonic function of them), for profile position x and height h
+
+    cdef double H
+
+    if s.kind == SW_S_TIM:
+        return (h + s.C * x * (s.x1 - x) - s.y0) / x
+    elif s.kind == SW_S_RIM:
+        return (h + s.C * x * (s.x1 - x) - s.y1) / (s.x1 - x)
+    elif s.kind == SW_NU:
+        H = (
+            h + s.C * (x - s.x0) * (s.x1 - x) -
+            (s.y0 * (s.x1 - x) + s.y1 * (x - s.x0)) / (s.x1 - s.x0)
+            )
+        return s.zeta * H * sqrt(
+            0.002 * (s.x1 - s.x0) / s.wavelen / (x - s.x0) / (s.x1 - x)
+            )
+    elif s.kind == SW_THETA_R:
+        # as atan is monotonic, it can be omitted for the search
+        return (h - s.y1) / 1.e3 / (s.x1 - x) - (s.x1 - x) / 2. / s.a_e
+    else:  # SW_H_M
+        return h - (s.y0 + s.m * x)
+
+
+cdef inline double _sweep_bound(
+        sweepsearch *s, double hmax, double xa, double xb,
+        ) nogil:
+
+    # upper bound of _sweep_value for heights up to hmax and positions in
+    # [xa, xb]; the terms are bounded separately, using that they are
+    # monotonic (or concave) in x
+
+    cdef double H, L, xm, w, bnd
+
+    if s.kind == SW_S_TIM:
+        bnd = f_max((hmax - s.y0) / xa, (hmax - s.y0) / xb) + s.C * (
+            s.x1 - xa
+            )
+    elif s.kind == SW_S_RIM:
+        bnd = f_max(
+            (hmax - s.y1) / (s.x1 - xa), (hmax - s.y1) / (s.x1 - xb)
+            ) + s.C * xb
+    elif s.kind == SW_NU:
+        L = f_min(
+            (s.y0 * (s.x1 - xa) + s.y1 * (xa - s.x0)) / (s.x1 - s.x0),
+            (s.y0 * (s.x1 - xb) + s.y1 * (xb - s.x0)) / (s.x1 - s.x0),
+            )
+        xm = f_min(f_max(0.5 * (s.x0 + s.x1), xa), xb)
+        H = hmax + s.C * (xm - s.x0) * (s.x1 - xm) - L
+        if H >= 0.:
+            w = f_max(
+                1. / (xa - s.x0) / (s.x1 - xa), 1. / (xb - s.x0) / (s.x1 - xb)
+                )
+        else:
+            w = 1. / (xm - s.x0) / (s.x1 - xm)
+        bnd = s.zeta * H * sqrt(0.002 * (s.x1 - s.x0) / s.wavelen * w)
+    elif s.kind == SW_THETA_R:
+        bnd = f_max(
+            (hmax - s.y1) / 1.e3 / (s.x1 - xa),
+            (hmax - s.y1) / 1.e3 / (s.x1 - xb),
+            ) - (s.x1 - xb) / 2. / s.a_e
+    else:  # SW_H_M
+        bnd = hmax - (s.y0 + f_min(s.m * xa, s.m * xb))
+
+    # allow for round-off errors
+    return bnd + 1.e-9 * (fabs(bnd) + 1.)
+
+
+cdef inline int _sweep_scan(
+        sweepsearch *s, double *d_v, double *h_v,
+        int b, int i_lo, int i_hi, int best_idx, double *best,
+        ) nogil:
+
+    # update the maximum (best, best_idx) with block b of [i_lo, i_hi)
+
+    cdef:
+        int i
+        int j_lo = max(b * SWEEP_BLOCK, i_lo)
+        int j_hi = min((b + 1) * SWEEP_BLOCK, i_hi)
+        double val
+
+    for i in range(j_lo, j_hi):
+        val = _sweep_value(s, d_v[i], h_v[i])
+        if val > best[0] or (val == best[0] and i < best_idx):
+            best[0] = val
+            best_idx = i
+
+    return best_idx
+
+
+cdef int _sweep_argmax(
+        raysweep *rs, sweepsearch *s, double *d_v, double *h_v,
+        int i_lo, int i_hi,
+        ) nogil:
+
+    # index of the (first) maximum of _sweep_value in [i_lo, i_hi); the
+    # block maxima of the heights give an upper bound for each block, and
+    # the blocks are visited in the order of their bounds, until no block
+    # can contain a larger value
+
+    cdef:
+        int b, b_lo, b_hi, b_top, j_lo, j_hi, best_idx = -1
+        double best = -INFINITY
+
+    b_lo = i_lo // SWEEP_BLOCK
+    b_hi = (i_hi - 1) // SWEEP_BLOCK + 1
+
+    for b in range(b_lo, b_hi):
+        j_lo = max(b * SWEEP_BLOCK, i_lo)
+        j_hi = min((b + 1) * SWEEP_BLOCK, i_hi)
+        rs.bound[b] = _sweep_bound(s, rs.hmax[b], d_v[j_lo], d_v[j_hi - 1])
+
+    while True:
+
+        b_top = b_lo
+        for b in range(b_lo + 1, b_hi):
+            if rs.bound[b] > rs.bound[b_top]:
+                b_top = b
+
+        if rs.bound[b_top] == -INFINITY or not rs.bound[b_top] >= best:
+            break
+
+        best_idx = _sweep_scan(
+            s, d_v, h_v, b_top, i_lo, i_hi, best_idx, &best
+            )
+        rs.bound[b_top] = -INFINITY
+
+    if best_idx < 0:
+        best_idx = i_lo
+
+    return best_idx
+
+
 cdef (double, double, double) _free_space_loss_bfsg(
         ppstruct pp,
         ) nogil:
@@ -1995,84 +2552,763 @@ def clutter_correction_cython(
 
 # ############################################################################
 #
-# Attenuation map making (fast)
+# Many paths at once (PathPropArray)
 #
 # ############################################################################
 #
-# Idea: only calculate Geodesics/height profiles to map edges and apply hashes
+# The ppstruct records of all paths are stored in one contiguous numpy
+# (structured) array, such that each parameter can be accessed as an array
+# (e.g., pps['distance']) and the loss functions can loop over all paths in
+# a single nogil, parallel loop. The height profiles are stored in flat
+# arrays (with start/stop indices for each path).
 #
 # ############################################################################
 
 
-# TODO: d_tm, d_lm, d_ct, and d_cr need to be calculated for each pixel!
-# Likewise for clutter zones.
-def height_map_data_cython(
-        double lon_t, double lat_t,
-        double map_size_lon, double map_size_lat,
-        double map_resolution=3. / 3600.,
-        int do_cos_delta=1,
-        int zone_t=CLUTTER.UNKNOWN, int zone_r=CLUTTER.UNKNOWN,
-        d_tm=None, d_lm=None,
-        d_ct=None, d_cr=None,
-        omega=None,
-        ):
-
-    '''
-    Calculate height profiles and auxillary maps needed for atten_map_fast.
+cdef ppstruct _PP_DUMMY
+PPSTRUCT_DTYPE = np.asarray(<ppstruct[:1]> &_PP_DUMMY).dtype
 
-    This can be used to cache height-profile data. Since it is independent
-    of frequency, timepercent, Tx and Rx heights, etc., one can re-use
-    it to save computing time when doing batch jobs.
 
-    Parameters
-    ----------
-    lon_t, lat_t : double
-        Geographic longitude/latitude of transmitter [deg]
-    map_size_lon, map_size_lat : double
-        Map size in longitude/latitude[deg]
-    map_resolution : double, optional
-        Pixel resolution of map [deg] (default: 3 arcsec)
-    do_cos_delta : int, optional
-        If True, divide `map_size_lon` by `cos(lat_t)` to produce a more
-        square-like map. (default: True)
-    zone_t, zone_r : CLUTTER enum, optional
-        Clutter type for transmitter/receiver terminal.
-        (default: CLUTTER.UNKNOWN)
-    d_tm : double, optional
-        longest continuous land (inland + coastal) section of the
-        great-circle path [km]
-        (default: distance between Tx and Rx)
-    d_lm : double, optional
-        longest continuous inland section of the great-circle path [km]
-        (default: distance between Tx and Rx)
-    d_ct, d_cr : double, optional
-        Distance over land from transmitter/receiver antenna to the coast
-        along great circle interference path [km]
-        (default: 50000 km)
-    omega : double, optional
-        Fraction of the path over water [%] (see Table 3)
-        (default: 0%)
+cdef class _PathPropArray(object):
 
-    Returns
-    -------
-    hprof_data : dict
-        Dictionary with height profiles and auxillary data as
-        calculated with `~pycraf.pathprof.height_map_data`.
+    cdef:
+        readonly object _pps, _hprof_start, _hprof_stop
+        readonly object _hprof_dists, _hprof_heights
+        readonly tuple shape
 
-        The dictionary contains the following entities (the map dimension
-        is mx * my):
+        ppstruct[:] _pps_v
 
-        - "lon_t", "lat_t" : float
+    def __init__(
+            self,
+            freq,
+            temperature,
+            pressure,
+            lon_t, lat_t,
+            lon_r, lat_r,
+            h_tg, h_rg,
+            double hprof_step,
+            time_percent,
+            omega,
+            d_tm, d_lm,
+            d_ct, d_cr,
+            zone_t, zone_r,
+            polarization,
+            version,
+            # override if you don't want builtin method:
+            delta_N, N0,
+            # override if you don't want builtin method (sequences of 1D
+            # arrays, one per path):
+            hprof_dists, hprof_heights,
+            hprof_bearing, hprof_backbearing,
+            nthreads=None,
+            ):
 
-          Map center coordinates.
+        cdef:
+            ppstruct[:] pps_v
+            double[::1] dists_v, heights_v, zheights_v
+            long long[::1] start_v, stop_v
+            Py_ssize_t i, num_paths
+            int num_threads = _get_num_threads(nthreads)
 
-        - "map_size_lon", "map_size_lat" : float
+        if d_tm is None:
+            d_tm = np.nan
+        if d_lm is None:
+            d_lm = np.nan
+        if d_ct is None:
+            d_ct = 50000.
+        if d_cr is None:
+            d_cr = 50000.
+        if delta_N is None:
+            delta_N = np.nan
+        if N0 is None:
+            N0 = np.nan
 
-          Map size.
+        (
+            freq, temperature, pressure, lon_t, lat_t, lon_r, lat_r,
+            h_tg, h_rg, time_percent, omega, d_tm, d_lm, d_ct, d_cr,
+            zone_t, zone_r, polarization, version, delta_N, N0,
+            ) = np.broadcast_arrays(
+            freq, temperature, pressure, lon_t, lat_t, lon_r, lat_r,
+            h_tg, h_rg, time_percent, omega, d_tm, d_lm, d_ct, d_cr,
+            zone_t, zone_r, polarization, version, delta_N, N0,
+            )
 
-        - "hprof_step" : float
+        self.shape = freq.shape
+        num_paths = freq.size
 
-          Distance resolution of height profile.
+        assert np.all(time_percent <= 50.)
+        assert np.all((version == 14) | (version == 16))
+        assert np.all((zone_t >= -1) & (zone_t <= 11))
+        assert np.all((zone_r >= -1) & (zone_r <= 11))
+        assert np.all(np.isnan(delta_N) == np.isnan(N0)), (
+            'delta_N and N0 must both be None or both be provided'
+            )
+        assert (
+            (hprof_dists is None) == (hprof_heights is None) ==
+            (hprof_bearing is None) == (hprof_backbearing is None)
+            ), (
+                'hprof_dists, hprof_heights, bearing, and back_bearing '
+                'must all be None or all be provided'
+                )
+
+        pps = np.zeros(num_paths, dtype=PPSTRUCT_DTYPE)
+
+        pps['version'] = version.ravel()
+        pps['freq'] = freq.ravel()
+        pps['wavelen'] = 0.299792458 / pps['freq']
+        pps['temperature'] = temperature.ravel()
+        pps['pressure'] = pressure.ravel()
+        pps['lon_t'] = lon_t.ravel()
+        pps['lat_t'] = lat_t.ravel()
+        pps['lon_r'] = lon_r.ravel()
+        pps['lat_r'] = lat_r.ravel()
+        pps['zone_t'] = zone_t.ravel()
+        pps['zone_r'] = zone_r.ravel()
+        pps['h_tg_in'] = h_tg.ravel()
+        pps['h_rg_in'] = h_rg.ravel()
+        for zone, h_g, h_g_in in [
+                ('zone_t', 'h_tg', 'h_tg_in'), ('zone_r', 'h_rg', 'h_rg_in')
+                ]:
+            pps[h_g] = np.where(
+                pps[zone] == CLUTTER.UNKNOWN,
+                pps[h_g_in],
+                np.maximum(CLUTTER_DATA[pps[zone], 0], pps[h_g_in]),
+                )
+
+        pps['hprof_step'] = hprof_step
+        pps['time_percent'] = time_percent.ravel()
+        pps['polarization'] = polarization.ravel()
+        pps['omega'] = omega.ravel()
+        pps['d_ct'] = d_ct.ravel()
+        pps['d_cr'] = d_cr.ravel()
+
+        # height profiles (flat arrays)
+        if hprof_dists is None:
+            # all paths are sampled in one go (geodesics and SRTM queries)
+            (
+                lons, lats, distance, hprof_dists, hprof_heights,
+                pps['bearing'], pps['back_bearing'], _, sizes,
+                ) = heightprofile._srtm_height_profiles(
+                pps['lon_t'], pps['lat_t'], pps['lon_r'], pps['lat_r'],
+                hprof_step, nthreads=num_threads,
+                )
+            hprof_stop = np.cumsum(sizes)
+            hprof_start = hprof_stop - sizes
+            pps['lon_mid'] = lons[hprof_start + sizes // 2]
+            pps['lat_mid'] = lats[hprof_start + sizes // 2]
+            del lons, lats
+            if np.any(sizes < 5):
+                raise ValueError('Height profile must have at least 5 steps.')
+        else:
+            dists, heights = list(hprof_dists), list(hprof_heights)
+            if len(dists) != num_paths or len(heights) != num_paths:
+                raise ValueError(
+                    'hprof_dists and hprof_heights must contain one '
+                    'profile per path'
+                    )
+            pps['bearing'] = np.broadcast_to(hprof_bearing, self.shape).ravel()
+            pps['back_bearing'] = np.broadcast_to(
+                hprof_backbearing, self.shape
+                ).ravel()
+            pps['lon_mid'] = 0.5 * (pps['lon_t'] + pps['lon_r'])
+            pps['lat_mid'] = 0.5 * (pps['lat_t'] + pps['lat_r'])
+
+            sizes = np.array([len(d) for d in dists], dtype=np.int64)
+            if np.any(sizes < 5) or np.any(
+                    sizes != np.array([len(h) for h in heights])
+                    ):
+                raise ValueError('Height profile must have at least 5 steps.')
+
+            hprof_stop = np.cumsum(sizes)
+            hprof_start = hprof_stop - sizes
+            if num_paths > 0:
+                hprof_dists = np.concatenate(dists).astype(np.float64)
+                hprof_heights = np.concatenate(heights).astype(np.float64)
+            else:
+                hprof_dists = hprof_heights = np.zeros(0, dtype=np.float64)
+
+            distance = hprof_dists[hprof_stop - 1]
+
+        pps['distance'] = distance
+        pps['alpha_tr'] = pps['bearing']
+        pps['alpha_rt'] = pps['back_bearing']
+
+        d_tm, d_lm = d_tm.ravel(), d_lm.ravel()
+        pps['d_tm'] = np.where(np.isnan(d_tm), pps['distance'], d_tm)
+        pps['d_lm'] = np.where(np.isnan(d_lm), pps['distance'], d_lm)
+
+        delta_N, N0 = delta_N.ravel(), N0.ravel()
+        if np.any(np.isnan(delta_N)):
+            _delta_N, _N0 = helper._DN_N0_from_map(
+                pps['lon_mid'], pps['lat_mid']
+                )
+            delta_N = np.where(np.isnan(delta_N), _delta_N, delta_N)
+            N0 = np.where(np.isnan(N0), _N0, N0)
+
+        pps['delta_N'] = delta_N
+        pps['N0'] = N0
+
+        self._pps = pps
+        self._pps_v = pps
+        self._hprof_start = hprof_start
+        self._hprof_stop = hprof_stop
+        self._hprof_dists = hprof_dists
+        self._hprof_heights = hprof_heights
+
+        pps_v = pps
+        dists_v = hprof_dists
+        heights_v = hprof_heights
+        zheights_v = np.zeros(max(sizes.max(initial=0), 1), dtype=np.float64)
+        start_v = hprof_start
+        stop_v = hprof_stop
+
+        for i in prange(
+                num_paths, nogil=True, schedule='guided',
+                num_threads=num_threads
+                ):
+
+            pps_v[i].beta0 = _beta_from_DN_N0(
+                pps_v[i].lat_mid,
+                pps_v[i].delta_N, pps_v[i].N0,
+                pps_v[i].d_tm, pps_v[i].d_lm
+                )
+
+            _process_path(
+                &pps_v[i],
+                dists_v[start_v[i]:stop_v[i]],
+                heights_v[start_v[i]:stop_v[i]],
+                zheights_v[0:stop_v[i] - start_v[i]],
+                )
+
+    def __len__(self):
+
+        return self._pps.shape[0]
+
+    def __reduce__(self):
+
+        return (
+            _unpickle_pathproparray,
+            (
+                type(self), self._pps, self.shape,
+                self._hprof_start, self._hprof_stop,
+                self._hprof_dists, self._hprof_heights,
+                ),
+            )
+
+    def _subset(self, idx):
+        # new instance sharing (if possible) the data with self
+
+        cdef _PathPropArray other = type(self).__new__(type(self))
+
+        if np.ndim(idx) == 0 and not isinstance(idx, slice):
+            raise TypeError('idx must be a slice or an index array')
+
+        pps = self._pps.reshape(self.shape)[idx]
+        other.shape = pps.shape
+        other._pps = pps.reshape(-1)
+        other._pps_v = other._pps
+        other._hprof_start = self._hprof_start.reshape(self.shape)[idx].ravel()
+        other._hprof_stop = self._hprof_stop.reshape(self.shape)[idx].ravel()
+        other._hprof_dists = self._hprof_dists
+        other._hprof_heights = self._hprof_heights
+
+        return other
+
+    def _hprof(self, Py_ssize_t i):
+        # distances [km] and heights [m] of the i-th path
+
+        start, stop = self._hprof_start[i], self._hprof_stop[i]
+        return (
+            self._hprof_dists[start:stop], self._hprof_heights[start:stop]
+            )
+
+
+def _unpickle_pathproparray(
+        cls, pps, shape, hprof_start, hprof_stop, hprof_dists, hprof_heights
+        ):
+
+    cdef _PathPropArray pparr = cls.__new__(cls)
+
+    if pps.dtype != PPSTRUCT_DTYPE:
+        raise ValueError(
+            'Pickled PathPropArray data is incompatible with this pycraf '
+            'build'
+            )
+
+    pparr.shape = shape
+    pparr._pps = pps
+    pparr._pps_v = pps
+    pparr._hprof_start = hprof_start
+    pparr._hprof_stop = hprof_stop
+    pparr._hprof_dists = hprof_dists
+    pparr._hprof_heights = hprof_heights
+
+    return pparr
+
+
+def _pathprop_from_array(
+        _PathProp pathprop, _PathPropArray pparr, Py_ssize_t idx
+        ):
+    # copy the ppstruct of a path (flat index idx) into a _PathProp
+
+    pathprop._pp = pparr._pps_v[idx]
+
+
+def _loss_arrays(_PathPropArray pparr, num, dtype=np.float64):
+
+    return [np.empty(len(pparr), dtype=dtype) for _ in range(num)]
+
+
+def free_space_loss_bfsg_array_cython(_PathPropArray pparr, nthreads=None):
+    '''
+    Like `free_space_loss_bfsg_cython`, but for all paths in `pparr`
+    (computed in parallel).
+    '''
+
+    cdef:
+        Py_ssize_t i
+        ppstruct[:] pps_v = pparr._pps_v
+        int num_threads = _get_num_threads(nthreads)
+        double[::1] L_bfsg_v, E_sp_v, E_sbeta_v
+
+    res = _loss_arrays(pparr, 3)
+    L_bfsg_v, E_sp_v, E_sbeta_v = res
+
+    for i in prange(pps_v.shape[0], nogil=True, num_threads=num_threads):
+        L_bfsg_v[i], E_sp_v[i], E_sbeta_v[i] = _free_space_loss_bfsg(pps_v[i])
+
+    return tuple(r.reshape(pparr.shape) for r in res)
+
+
+def tropospheric_scatter_loss_bs_array_cython(
+        _PathPropArray pparr, G_t=0., G_r=0., nthreads=None
+        ):
+    '''
+    Like `tropospheric_scatter_loss_bs_cython`, but for all paths in `pparr`
+    (computed in parallel). `G_t` and `G_r` are broadcast against the
+    paths.
+    '''
+
+    cdef:
+        Py_ssize_t i
+        ppstruct[:] pps_v = pparr._pps_v
+        int num_threads = _get_num_threads(nthreads)
+        double[::1] L_bs_v, G_t_v, G_r_v
+
+    G_t_v = np.ascontiguousarray(
+        np.broadcast_to(G_t, pparr.shape), dtype=np.float64
+        ).ravel()
+    G_r_v = np.ascontiguousarray(
+        np.broadcast_to(G_r, pparr.shape), dtype=np.float64
+        ).ravel()
+
+    L_bs, = _loss_arrays(pparr, 1)
+    L_bs_v = L_bs
+
+    for i in prange(pps_v.shape[0], nogil=True, num_threads=num_threads):
+        L_bs_v[i] = _tropospheric_scatter_loss_bs(pps_v[i], G_t_v[i], G_r_v[i])
+
+    return L_bs.reshape(pparr.shape)
+
+
+def ducting_loss_ba_array_cython(_PathPropArray pparr, nthreads=None):
+    '''
+    Like `ducting_loss_ba_cython`, but for all paths in `pparr` (computed
+    in parallel).
+    '''
+
+    cdef:
+        Py_ssize_t i
+        ppstruct[:] pps_v = pparr._pps_v
+        int num_threads = _get_num_threads(nthreads)
+        double[::1] L_ba_v
+
+    L_ba, = _loss_arrays(pparr, 1)
+    L_ba_v = L_ba
+
+    for i in prange(pps_v.shape[0], nogil=True, num_threads=num_threads):
+        L_ba_v[i] = _ducting_loss_ba(pps_v[i])
+
+    return L_ba.reshape(pparr.shape)
+
+
+def diffraction_loss_complete_array_cython(_PathPropArray pparr, nthreads=None):
+    '''
+    Like `diffraction_loss_complete_cython`, but for all paths in `pparr`
+    (computed in parallel).
+    '''
+
+    cdef:
+        Py_ssize_t i
+        ppstruct[:] pps_v = pparr._pps_v
+        int num_threads = _get_num_threads(nthreads)
+        double[::1] L_d_50_v, L_dp_v, L_bd_50_v, L_bd_v, L_min_b0p_v
+
+    res = _loss_arrays(pparr, 5)
+    L_d_50_v, L_dp_v, L_bd_50_v, L_bd_v, L_min_b0p_v = res
+
+    for i in prange(pps_v.shape[0], nogil=True, num_threads=num_threads):
+        (
+            L_d_50_v[i], L_dp_v[i], L_bd_50_v[i], L_bd_v[i], L_min_b0p_v[i]
+            ) = _diffraction_loss_complete(pps_v[i])
+
+    return tuple(r.reshape(pparr.shape) for r in res)
+
+
+def path_attenuation_complete_array_cython(
+        _PathPropArray pparr, G_t=0., G_r=0., nthreads=None
+        ):
+    '''
+    Like `path_attenuation_complete_cython`, but for all paths in `pparr`
+    (computed in parallel). `G_t` and `G_r` are broadcast against the
+    paths.
+    '''
+
+    cdef:
+        Py_ssize_t i
+        ppstruct[:] pps_v = pparr._pps_v
+        int num_threads = _get_num_threads(nthreads)
+        double[::1] G_t_v, G_r_v
+        double[::1] L_b0p_v, L_bd_v, L_bs_v, L_ba_v, L_b_v, L_b_corr_v, L_v
+
+    G_t_v = np.ascontiguousarray(
+        np.broadcast_to(G_t, pparr.shape), dtype=np.float64
+        ).ravel()
+    G_r_v = np.ascontiguousarray(
+        np.broadcast_to(G_r, pparr.shape), dtype=np.float64
+        ).ravel()
+
+    res = _loss_arrays(pparr, 7)
+    L_b0p_v, L_bd_v, L_bs_v, L_ba_v, L_b_v, L_b_corr_v, L_v = res
+
+    for i in prange(
+            pps_v.shape[0], nogil=True, schedule='guided',
+            num_threads=num_threads
+            ):
+        (
+            L_b0p_v[i], L_bd_v[i], L_bs_v[i], L_ba_v[i],
+            L_b_v[i], L_b_corr_v[i], L_v[i]
+            ) = _path_attenuation_complete(pps_v[i], G_t_v[i], G_r_v[i])
+
+    return tuple(r.reshape(pparr.shape) for r in res)
+
+
+# ############################################################################
+#
+# Attenuation map making (fast)
+#
+# ############################################################################
+#
+# Idea: only calculate Geodesics/height profiles to map edges and apply hashes
+#
+# ############################################################################
+
+
+def _adaptive_ray_fan(
+        double lon_t, double lat_t,
+        xcoords, ycoords, double margin_x, double margin_y,
+        double min_pa_res, double max_distance, double hprof_step,
+        int num_dists,
+        ):
+    '''
+    Hierarchical ray layout for `height_map_data_cython`.
+
+    The rays are organized in levels, with the angular spacing halved on
+    each level (the finest level has a spacing of at most `min_pa_res`).
+    The lateral tolerance is the ray spacing of the uniform layout at the
+    map corners, i.e., `min_pa_res * max_distance`. A ray is therefore
+    only needed beyond the distance, where its offset to the parent ray
+    (the next ray on a coarser level) exceeds half of the tolerance.
+    Closer to the map center, it shares the positions and heights of its
+    parent. Furthermore, each ray ends (with some margin), where it leaves
+    the map.
+
+    Returns
+    -------
+    bearings : `~numpy.ndarray` 1D (float; (me, ))
+        Start bearings of the rays [rad], sorted.
+    levels : `~numpy.ndarray` 1D (int; (me, ))
+        Level of each ray (zero for the coarsest level).
+    parents : `~numpy.ndarray` 1D (int; (me, ))
+        Index of the parent ray (-1 for rays on the coarsest level).
+    start_idx, end_idx : `~numpy.ndarray` 1D (int; (me, ))
+        First and last distance index, which needs to be calculated for
+        each ray. Before `start_idx`, the profile is shared with the
+        parent ray.
+    '''
+
+    num_base = 16
+    num_levels = max(
+        0, int(np.ceil(np.log2(2 * np.pi / min_pa_res / num_base)))
+        )
+    num_rays = num_base * 2 ** num_levels
+    tolerance = min_pa_res * max_distance  # m
+
+    # on the finest level, ray k has bearing k * 2 pi / num_rays; its
+    # level follows from the lowest set bit of k
+    k = np.arange(num_rays, dtype=np.int64)
+    lowbit = k & -k
+    lowbit[0] = num_rays
+    levels = np.maximum(
+        num_levels - np.round(np.log2(lowbit)).astype(np.int64), 0
+        )
+    bearings = k * (2 * np.pi / num_rays)
+
+    # find out, where the rays leave the map
+    test_dists = np.linspace(0, max_distance, 65)
+    lons_rad, lats_rad, _ = cygeodesics.direct_cython(
+        DEG2RAD * lon_t, DEG2RAD * lat_t,
+        bearings[:, np.newaxis], test_dists[np.newaxis]
+        )
+    lons = (np.degrees(lons_rad) - lon_t + 180.) % 360. - 180. + lon_t
+    lats = np.degrees(lats_rad)
+    outside = (
+        (lons < xcoords[0] - margin_x) |
+        (lons > xcoords[len(xcoords) - 1] + margin_x) |
+        (lats < ycoords[0] - margin_y) |
+        (lats > ycoords[len(ycoords) - 1] + margin_y)
+        )
+    end_dist = test_dists[np.where(
+        np.any(outside, axis=1),
+        np.argmax(outside, axis=1),
+        test_dists.size - 1
+        )]
+
+    # a ray is needed, if it reaches beyond the distance where its parent
+    # ray is too far off
+    parents = np.where(levels == 0, -1, k - lowbit)
+    split_dist = np.where(
+        levels == 0, 0., tolerance / 2 / (bearings - bearings[parents])
+        )
+    keep = (levels == 0) | (end_dist > split_dist)
+
+    # rays, of which the parent is not needed, are attached to the next
+    # ancestor (the distance to share the profile is smaller then)
+    for _ in range(num_levels):
+        orphans = (parents >= 0) & ~keep[np.maximum(parents, 0)]
+        if not np.any(orphans):
+            break
+        parents[orphans] -= lowbit[parents[orphans]]
+
+    split_dist = np.where(
+        levels == 0, 0., tolerance / 2 / (bearings - bearings[parents])
+        )
+    start_idx = np.ceil(split_dist / hprof_step).astype(np.int64)
+    end_idx = np.minimum(
+        np.ceil(end_dist / hprof_step).astype(np.int64), num_dists - 1
+        )
+    has_parent = parents >= 0
+    start_idx[has_parent] = np.minimum(
+        start_idx[has_parent], end_idx[parents[has_parent]] + 1
+        )
+
+    kept = np.nonzero(keep)[0]
+    new_idx = np.full(num_rays, -1, dtype=np.int64)
+    new_idx[kept] = np.arange(kept.size)
+    parents = parents[kept]
+    parents[parents >= 0] = new_idx[parents[parents >= 0]]
+
+    return (
+        bearings[kept], levels[kept], parents,
+        start_idx[kept], end_idx[kept],
+        )
+
+
+def _ray_sections(start_idx, end_idx):
+    '''
+    Ray and distance indices of all positions within [start, end], and
+    the offsets of the rays in the flat (ragged) layout.
+    '''
+
+    counts = end_idx - start_idx + 1
+    ray_idx = np.repeat(np.arange(counts.size), counts)
+    offsets = np.cumsum(counts) - counts
+    dist_idx = np.arange(counts.sum()) - np.repeat(offsets - start_idx, counts)
+
+    return ray_idx, dist_idx, offsets
+
+
+def _adaptive_fan_profiles(
+        double lon_t, double lat_t, double max_distance, double hprof_step,
+        bearings, start_idx, end_idx, JobControl job=None, nthreads=None,
+        ):
+    '''
+    Path positions and height profiles for `_adaptive_ray_fan` layouts.
+
+    Only the sections `start_idx` to `end_idx` of each ray are calculated
+    (and queried from the SRTM data). They are stored in a ragged layout,
+    i.e., in flat arrays, where the section of ray `n` begins at
+    `offsets[n]`. (The leading part of a ray, before `start_idx`, is
+    found in the section of the parent ray.) The rays are processed in
+    chunks; if `job` is given, the progress is reported (in rays).
+    '''
+
+    distances = np.arange(0, max_distance + hprof_step, hprof_step)
+    lon_t_rad, lat_t_rad = DEG2RAD * lon_t, DEG2RAD * lat_t
+
+    counts = end_idx - start_idx + 1
+    offsets = np.cumsum(counts) - counts
+    lons, lats, back_bearings, heights = (
+        np.empty(np.sum(counts), dtype=np.float64) for _ in range(4)
+        )
+
+    do_hres = hprof_step > srtm.SrtmConf.hgt_res / 1.5
+    if do_hres:
+        level, _, width = srtm._pyramid_params(hprof_step)
+        hdistances = np.arange(
+            0, max_distance + hprof_step / 3, hprof_step / 3
+            )
+        # the smoothing kernel needs some samples around each section
+        hstart_idx = np.maximum(3 * start_idx - 9, 0)
+        hend_idx = np.minimum(3 * end_idx + 9, hdistances.size - 1)
+
+    # as in height_map_data_cython, the chunk size is limited by the
+    # memory budget for the temporary arrays (about eight per position)
+    rays_per_chunk = max(1, min(
+        1024,
+        utils.PerformanceConf.memory_budget // (
+            64 * (hdistances.size if do_hres else distances.size)
+            ),
+        ))
+    for i in range(0, bearings.size, rays_per_chunk):
+
+        if job is not None:
+            job._check()
+        rays = slice(i, i + rays_per_chunk)
+        pos = slice(offsets[i], offsets[i] + np.sum(counts[rays]))
+
+        ray_idx, dist_idx, _ = _ray_sections(start_idx[rays], end_idx[rays])
+        lons_rad, lats_rad, back_bearings_rad = cygeodesics.direct_cython(
+            lon_t_rad, lat_t_rad,
+            bearings[rays][ray_idx], distances[dist_idx],
+            nthreads=nthreads,
+            )
+        lons[pos] = np.degrees(lons_rad)
+        lats[pos] = np.degrees(lats_rad)
+        back_bearings[pos] = np.degrees(back_bearings_rad)
+
+        if do_hres:
+            hray_idx, hdist_idx, hoffsets = _ray_sections(
+                hstart_idx[rays], hend_idx[rays]
+                )
+            hlons_rad, hlats_rad, _ = cygeodesics.direct_cython(
+                lon_t_rad, lat_t_rad,
+                bearings[rays][hray_idx], hdistances[hdist_idx],
+                nthreads=nthreads,
+                )
+            hheights = srtm._srtm_height_data(
+                np.degrees(hlons_rad), np.degrees(hlats_rad), level=level
+                ).astype(np.float64)
+
+            # now smooth/interpolate this to the desired step width
+            cygeodesics.regrid_sections_with_x(
+                hdistances, hheights,
+                hoffsets, hstart_idx[rays], hend_idx[rays] + 1,
+                distances, heights[pos],
+                offsets[rays] - offsets[i], start_idx[rays], end_idx[rays] + 1,
+                width, nthreads=nthreads,
+                )
+        else:
+            heights[pos] = srtm._srtm_height_data(lons[pos], lats[pos])
+
+        if job is not None:
+            job._advance(min(rays_per_chunk, bearings.size - i))
+
+    return distances, offsets, lons, lats, back_bearings, heights
+
+
+def height_map_data_cython(
+        double lon_t, double lat_t,
+        double map_size_lon, double map_size_lat,
+        double map_resolution=3. / 3600.,
+        int do_cos_delta=1,
+        int zone_t=CLUTTER.UNKNOWN, int zone_r=CLUTTER.UNKNOWN,
+        d_tm=None, d_lm=None,
+        d_ct=None, d_cr=None,
+        omega=None,
+        landsea_func=None,
+        bint adaptive_fan=False,
+        JobControl job=None,
+        nthreads=None,
+        ):
+
+    '''
+    Calculate height profiles and auxillary maps needed for atten_map_fast.
+
+    This can be used to cache height-profile data. Since it is independent
+    of frequency, timepercent, Tx and Rx heights, etc., one can re-use
+    it to save computing time when doing batch jobs.
+
+    Parameters
+    ----------
+    lon_t, lat_t : double
+        Geographic longitude/latitude of transmitter [deg]
+    map_size_lon, map_size_lat : double
+        Map size in longitude/latitude[deg]
+    map_resolution : double, optional
+        Pixel resolution of map [deg] (default: 3 arcsec)
+    do_cos_delta : int, optional
+        If True, divide `map_size_lon` by `cos(lat_t)` to produce a more
+        square-like map. (default: True)
+    zone_t, zone_r : CLUTTER enum, optional
+        Clutter type for transmitter/receiver terminal. Both are constant
+        over the map; for per-pixel receiver zones derived from landcover
+        data, use `~pycraf.pathprof.height_map_data`.
+        (default: CLUTTER.UNKNOWN)
+    d_tm : double, optional
+        longest continuous land (inland + coastal) section of the
+        great-circle path [km]
+        (default: distance between Tx and Rx)
+    d_lm : double, optional
+        longest continuous inland section of the great-circle path [km]
+        (default: distance between Tx and Rx)
+    d_ct, d_cr : double, optional
+        Distance over land from transmitter/receiver antenna to the coast
+        along great circle interference path [km]
+        (default: 50000 km)
+    omega : double, optional
+        Fraction of the path over water [%] (see Table 3)
+        (default: 0%)
+    landsea_func : callable, optional
+        If given, the `d_tm`, `d_lm`, `d_ct`, `d_cr`, and `omega` values
+        are derived for each pixel from the radio-climatic zones (LANDSEA
+        enum) along the paths. The function is called once with the
+        longitudes and latitudes [deg] of all path positions (2D arrays;
+        1D with `adaptive_fan`) and must return the zone types (same
+        shape). The parameters `d_tm`, `d_lm`, `d_ct`, `d_cr`, and
+        `omega` are ignored in this case. (default: None)
+    adaptive_fan : bool, optional
+        If True, use a hierarchical ray layout, where rays split as the
+        distance grows and end at the map edges (see Notes of
+        `~pycraf.pathprof.height_map_data`). (default: False)
+    job : `~pycraf.pathprof.JobControl`, optional
+        If given, the progress is reported to `job` and the computation
+        can be aborted with `job.cancel()`, in which case a
+        `~pycraf.pathprof.JobCancelledError` is raised. (default: None)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
+
+    Returns
+    -------
+    hprof_data : dict
+        Dictionary with height profiles and auxillary data as
+        calculated with `~pycraf.pathprof.height_map_data`.
+
+        The dictionary contains the following entities (the map dimension
+        is mx * my):
+
+        - "lon_t", "lat_t" : float
+
+          Map center coordinates.
+
+        - "map_size_lon", "map_size_lat" : float
+
+          Map size.
+
+        - "hprof_step" : float
+
+          Distance resolution of height profile.
 
         - "do_cos_delta" : int
 
@@ -2145,6 +3381,17 @@ def height_map_data_cython(
         - "height_profs" : `~numpy.ndarray` 2D (float, (me, mh))
 
           Height profiles to each of the pixels on the map edge, zero padded.
+          With `adaptive_fan`, this is a 1D array with the profile
+          sections of all rays (see below).
+
+        - "hprof_offsets", "hprof_starts", "hprof_lengths", "hprof_parents" :
+          `~numpy.ndarray` 1D (int, (me, ))
+
+          Only with `adaptive_fan`. The section of ray `n` (distance
+          indices `hprof_starts[n]` to `hprof_starts[n] + hprof_lengths[n]
+          - 1`) is stored in `height_profs[hprof_offsets[n]:]`. The
+          leading part of the profile is found on the parent ray
+          `hprof_parents[n]` (-1 for none), or its parents.
 
         - "zheight_prof" : `~numpy.ndarray` 1D (float, (mh, ))
 
@@ -2166,6 +3413,14 @@ def height_map_data_cython(
 
         int xi, yi, i, xidx, yidx, mid_idx
         int bidx, didx
+        int mx, my, band, num_bands, pix
+        np.int64_t k, sidx, num_dists, fidx, ridx
+        np.int32_t[::1] _sample_pix_idx
+        np.float64_t[::1] _sample_pix_dist
+        np.int32_t[::1] _band_of_row
+        np.int64_t[::1] _band_offsets, _sample_order
+        np.int64_t[:, ::1] _ray_band_pos
+        np.int64_t pos
         double refx, refy
         double lon_t_rad, lat_t_rad, lon_r, lat_r
         double pdist
@@ -2173,16 +3428,40 @@ def height_map_data_cython(
         # need views on all relevant numpy arrays for faster access
         np.float64_t[::1] _xcoords, _ycoords
         np.float64_t[::1] _distances, _start_bearings
-        np.float64_t[:, ::1] _lons, _lats, _back_bearings
-        np.float64_t[:, ::1] _heights
+        # the per-ray arrays are flat (see "ray_offset")
+        np.float64_t[::1] _lons, _lats, _back_bearings
+        np.int64_t[::1] _ray_start, _ray_end, _ray_offset, _ray_parent
         np.int32_t[:, ::1] _path_idx_map, _dist_end_idx_map
         np.float64_t[:, ::1] _pix_dist_map
         np.float64_t[:, ::1] _lon_mid_map, _lat_mid_map
         np.float64_t[:, ::1] _dist_map
         np.float64_t[:, ::1] _bearing_map, _backbearing_map
 
+        # running land/sea statistics along each path
+        bint do_landsea = landsea_func is not None
+        np.int8_t[::1] _landsea
+        np.float64_t[:, ::1] _d_tm_map, _d_lm_map, _d_ct_map, _d_cr_map
+        np.float64_t[:, ::1] _omega_map
+        int zone, first_sea, last_sea
+        double half_step, w, w_end, land_run, land_max, inland_run, inland_max
+        double water_len, d_tm_cur, d_lm_cur, d_ct_cur, d_cr_cur, omega_cur
+
+        # progress counters (one per thread) and cancellation flag
+        long long[::1] job_done_v
+        int tid
+        int *cancel_flag
+
+        int num_threads = _get_num_threads(nthreads)
+        int rays_per_chunk
+
     # print('using hprof_step = {:.1f} m'.format(hprof_step))
 
+    if job is None:
+        job = JobControl()
+    # the total work is only known later
+    job._start(0, num_threads)
+    cancel_flag = &job._cancelled
+
     cosdelta = 1. / cos(DEG2RAD * lat_t) if do_cos_delta else 1.
 
     # construction map arrays
@@ -2278,62 +3557,202 @@ def height_map_data_cython(
         )
 
     # obtain all path's height profiles
-    # generate start bearings:
-    _start_bearings = start_bearings = np.arange(0, 2 * np.pi, min_pa_res)
+    if adaptive_fan:
 
-    # calculate path positions
-    _distances = distances = np.arange(
-        0, max_distance + hprof_step, hprof_step
-        )
-
-    lons_rad, lats_rad, back_bearings_rad = cygeodesics.direct_cython(
-        lon_t_rad, lat_t_rad,
-        start_bearings[:, np.newaxis],
-        distances[np.newaxis]
-        )
-    _lons, _lats = lons, lats = np.degrees(lons_rad), np.degrees(lats_rad)
-    _back_bearings = back_bearings = np.degrees(back_bearings_rad)
+        (
+            start_bearings, ray_levels, ray_parents, ray_start, ray_end
+            ) = _adaptive_ray_fan(
+            lon_t, lat_t, xcoords, ycoords,
+            2 * cosdelta * map_resolution, 2 * map_resolution,
+            min_pa_res, max_distance, hprof_step,
+            np.arange(0, max_distance + hprof_step, hprof_step).size,
+            )
 
-    # print(xcoords, ycoords)
-    # print(lons.min(), lons.max(), lats.min(), lats.max())
+        # progress: sampled rays, map rows, (land/sea) rays
+        job._start(
+            (2 if do_landsea else 1) * start_bearings.size + ycoords.size,
+            num_threads,
+            )
+        (
+            distances, ray_offset, lons, lats, back_bearings, heights
+            ) = _adaptive_fan_profiles(
+            lon_t, lat_t, max_distance, hprof_step,
+            start_bearings, ray_start, ray_end,
+            job=job, nthreads=num_threads,
+            )
+        _start_bearings, _distances = start_bearings, distances
 
-    if hprof_step > srtm.SrtmConf.hgt_res / 1.5:
-        hdistances = np.arange(
-            0, max_distance + hprof_step / 3, hprof_step / 3
+    else:
+        # generate start bearings:
+        _start_bearings = start_bearings = np.arange(
+            0, 2 * np.pi, min_pa_res
             )
 
-        hlons_rad, hlats_rad, _ = cygeodesics.direct_cython(
-            lon_t_rad, lat_t_rad,
-            start_bearings[:, np.newaxis],
-            hdistances[np.newaxis]
+        # progress: sampled rays, map rows, (land/sea) rays
+        job._start(
+            (2 if do_landsea else 1) * start_bearings.size + ycoords.size,
+            num_threads,
             )
 
-        hheights = srtm._srtm_height_data(
-            np.degrees(hlons_rad), np.degrees(hlats_rad)
-            ).astype(np.float64)
-        heights = np.empty_like(lons_rad)
-        # now smooth/interpolate this to the desired step width
-        cygeodesics.regrid2d_with_x(
-            hdistances, hheights, distances, heights,
-            hprof_step / 2.35, regular=True
+        # calculate path positions
+        _distances = distances = np.arange(
+            0, max_distance + hprof_step, hprof_step
             )
+        shape = (start_bearings.size, distances.size)
+        lons, lats, back_bearings, heights = (
+            np.empty(shape, dtype=np.float64) for _ in range(4)
+            )
+
+        do_hres = hprof_step > srtm.SrtmConf.hgt_res / 1.5
+        if do_hres:
+            level, _, width = srtm._pyramid_params(hprof_step)
+            hdistances = np.arange(
+                0, max_distance + hprof_step / 3, hprof_step / 3
+                )
+            hheights = np.empty(
+                (start_bearings.size, hdistances.size), dtype=np.float64
+                )
+
+        # the path positions and terrain heights are computed in chunks of
+        # rays, such that the job can be cancelled in between; the chunk
+        # size is limited by the memory budget for the temporary arrays
+        # (about eight per ray position)
+        rays_per_chunk = max(1, min(
+            1024,
+            utils.PerformanceConf.memory_budget // (
+                64 * (hdistances.size if do_hres else distances.size)
+                ),
+            ))
+        for i in range(0, start_bearings.size, rays_per_chunk):
+
+            job._check()
+            rays = slice(i, i + rays_per_chunk)
+
+            lons_rad, lats_rad, back_bearings_rad = cygeodesics.direct_cython(
+                lon_t_rad, lat_t_rad,
+                start_bearings[rays, np.newaxis],
+                distances[np.newaxis],
+                nthreads=num_threads,
+                )
+            lons[rays] = np.degrees(lons_rad)
+            lats[rays] = np.degrees(lats_rad)
+            back_bearings[rays] = np.degrees(back_bearings_rad)
+
+            if do_hres:
+                hlons_rad, hlats_rad, _ = cygeodesics.direct_cython(
+                    lon_t_rad, lat_t_rad,
+                    start_bearings[rays, np.newaxis],
+                    hdistances[np.newaxis],
+                    nthreads=num_threads,
+                    )
+                hheights[rays] = srtm._srtm_height_data(
+                    np.degrees(hlons_rad), np.degrees(hlats_rad), level=level
+                    )
+            else:
+                heights[rays] = srtm._srtm_height_data(lons[rays], lats[rays])
 
+            job._advance(lons_rad.shape[0])
+
+        if do_hres:
+            # now smooth/interpolate this to the desired step width
+            cygeodesics.regrid2d_with_x(
+                hdistances, hheights, distances, heights,
+                width, regular=True, nthreads=num_threads,
+                )
+
+        # all rays have the full length, and none has a parent
+        ray_start = np.zeros(start_bearings.size, dtype=np.int64)
+        ray_end = np.full(
+            start_bearings.size, distances.size - 1, dtype=np.int64
+            )
+        ray_offset = np.arange(start_bearings.size) * distances.size
+        ray_parents = np.full(start_bearings.size, -1, dtype=np.int64)
+
+    # Per-ray arrays are addressed in a flat (ragged) layout: position
+    # didx of ray bidx is at ray_offset[bidx] + didx - ray_start[bidx], if
+    # didx >= ray_start[bidx], otherwise it is found on the parent ray.
+    _lons, _lats = lons.reshape(-1), lats.reshape(-1)
+    _back_bearings = back_bearings.reshape(-1)
+    _ray_start, _ray_end = ray_start, ray_end
+    _ray_offset, _ray_parent = ray_offset, ray_parents
+
+    if do_landsea:
+        # radio-climatic zones are sampled once for all path positions
+        landsea = np.ascontiguousarray(
+            landsea_func(lons, lats), dtype=np.int8
+            )
+        if landsea.shape != lons.shape:
+            raise ValueError(
+                '"landsea_func" must return an array of shape {}'.format(
+                    lons.shape
+                    ))
+        landsea = landsea.reshape(-1)
+        map_shape = (ycoords.size, xcoords.size)
+        d_tm_map = np.zeros(map_shape, dtype=np.float64)
+        d_lm_map = np.zeros(map_shape, dtype=np.float64)
+        d_ct_map = np.zeros(map_shape, dtype=np.float64)
+        d_cr_map = np.zeros(map_shape, dtype=np.float64)
+        omega_map = np.zeros(map_shape, dtype=np.float64)
     else:
+        landsea = np.zeros(1, dtype=np.int8)
+        d_tm_map = d_lm_map = d_ct_map = d_cr_map = omega_map = np.zeros(
+            (1, 1), dtype=np.float64
+            )
 
-        heights = srtm._srtm_height_data(lons, lats).astype(np.float64)
+    _landsea = landsea
+    _d_tm_map, _d_lm_map = d_tm_map, d_lm_map
+    _d_ct_map, _d_cr_map = d_ct_map, d_cr_map
+    _omega_map = omega_map
 
-    _heights = heights
     distances *= 1e-3  # convert to km
     _distances = distances
+    half_step = hprof_step / 2. * 1e-3  # km
 
     refx, refy = _xcoords[0], _ycoords[0]
+    mx, my = _xcoords.shape[0], _ycoords.shape[0]
+
+    # The assignment of path positions to the closest map pixels is done
+    # in three parallel steps: (1) for each path position, find the
+    # closest pixel (per path); (2) for each pixel, find the closest of
+    # these positions (in bands of map rows; the positions are bucketed
+    # by band first, in path order, such that the result is identical to
+    # a serial scan); (3) fill the auxillary maps for each pixel.
+    num_dists = _distances.shape[0]
+    _sample_pix_idx = sample_pix_idx = np.full(
+        _lons.shape[0], -1, dtype=np.int32
+        )
+    _sample_pix_dist = sample_pix_dist = np.empty(
+        _lons.shape[0], dtype=np.float64
+        )
+    num_bands = max(1, min(num_threads, my))
+    _band_of_row = band_of_row = np.empty(my, dtype=np.int32)
+    for band in range(num_bands):
+        band_of_row[band * my // num_bands:(band + 1) * my // num_bands] = band
+    _band_offsets = band_offsets = np.zeros(num_bands + 1, dtype=np.int64)
+    # number of positions per ray and band; later, the write position of
+    # each ray in the band buckets
+    _ray_band_pos = ray_band_pos = np.zeros(
+        (_start_bearings.shape[0], num_bands), dtype=np.int64
+        )
+    _sample_order = sample_order = np.empty(_lons.shape[0], dtype=np.int64)
+
+    job_done_v = job._done
+    job._check()
 
     with nogil:
-        for bidx in range(_start_bearings.shape[0]):
 
-            for didx in range(_distances.shape[0]):
+        for bidx in prange(
+                _start_bearings.shape[0], schedule='guided',
+                num_threads=num_threads
+                ):
+
+            if _load_flag(cancel_flag):
+                continue
 
-                lon_r, lat_r = _lons[bidx, didx], _lats[bidx, didx]
+            for didx in range(_ray_start[bidx], _ray_end[bidx] + 1):
+
+                fidx = _ray_offset[bidx] + didx - _ray_start[bidx]
+                lon_r, lat_r = _lons[fidx], _lats[fidx]
 
                 # need to find closest pixel index in map
                 xidx = int((lon_r - refx) / cosdelta / map_resolution + 0.5)
@@ -2341,62 +3760,263 @@ def height_map_data_cython(
 
                 if xidx < 0:
                     xidx = 0
-                if xidx >= _xcoords.shape[0]:
-                    xidx = _xcoords.shape[0] - 1
+                if xidx >= mx:
+                    xidx = mx - 1
                 if yidx < 0:
                     yidx = 0
-                if yidx >= _ycoords.shape[0]:
-                    yidx = _ycoords.shape[0] - 1
+                if yidx >= my:
+                    yidx = my - 1
 
-                pdist = true_angular_distance(
+                _sample_pix_idx[fidx] = yidx * mx + xidx
+                _sample_pix_dist[fidx] = true_angular_distance(
                     _xcoords[xidx], _ycoords[yidx], lon_r, lat_r
                     )
-
+                band = _band_of_row[yidx]
+                _ray_band_pos[bidx, band] = _ray_band_pos[bidx, band] + 1
+
+        # Counting sort of the path positions by band (stable, i.e., in
+        # path order within each band): the per-ray histograms are turned
+        # into write positions with a prefix sum (over bands, then rays),
+        # and each ray scatters its positions in parallel. Skipped
+        # (cancelled) rays have no pixel assigned and are not counted.
+        pos = 0
+        for band in range(num_bands):
+            _band_offsets[band] = pos
+            for bidx in range(_start_bearings.shape[0]):
+                k = _ray_band_pos[bidx, band]
+                _ray_band_pos[bidx, band] = pos
+                pos = pos + k
+        _band_offsets[num_bands] = pos
+
+        for bidx in prange(
+                _start_bearings.shape[0], schedule='guided',
+                num_threads=num_threads
+                ):
+            for didx in range(_ray_start[bidx], _ray_end[bidx] + 1):
+                pix = _sample_pix_idx[
+                    _ray_offset[bidx] + didx - _ray_start[bidx]
+                    ]
+                if pix >= 0:
+                    band = _band_of_row[pix // mx]
+                    k = _ray_band_pos[bidx, band]
+                    _sample_order[k] = bidx * num_dists + didx
+                    _ray_band_pos[bidx, band] = k + 1
+
+        for band in prange(
+                num_bands, schedule='static', chunksize=1,
+                num_threads=num_threads
+                ):
+
+            for k in range(_band_offsets[band], _band_offsets[band + 1]):
+
+                if k % 65536 == 0 and _load_flag(cancel_flag):
+                    break
+
+                sidx = _sample_order[k]
+                bidx = sidx // num_dists
+                didx = sidx % num_dists
+                fidx = _ray_offset[bidx] + didx - _ray_start[bidx]
+                pix = _sample_pix_idx[fidx]
+                yidx, xidx = pix // mx, pix % mx
+                pdist = _sample_pix_dist[fidx]
                 if pdist < _pix_dist_map[yidx, xidx]:
                     _pix_dist_map[yidx, xidx] = pdist
                     _path_idx_map[yidx, xidx] = bidx
                     _dist_end_idx_map[yidx, xidx] = didx
-                    mid_idx = didx // 2
-                    _lon_mid_map[yidx, xidx] = _lons[bidx, mid_idx]
-                    _lat_mid_map[yidx, xidx] = _lats[bidx, mid_idx]
-                    _dist_map[yidx, xidx] = _distances[didx]
-                    _bearing_map[yidx, xidx] = _start_bearings[bidx]
-                    _backbearing_map[yidx, xidx] = _back_bearings[bidx, didx]
+
+            tid = openmp.omp_get_thread_num()
+            job_done_v[tid] = job_done_v[tid] + (
+                (band + 1) * my // num_bands - band * my // num_bands
+                )
+
+        for yidx in prange(my, schedule='static', num_threads=num_threads):
+
+            if _load_flag(cancel_flag):
+                continue
+
+            for xidx in range(mx):
+
+                # pixels, which were not hit by any path are left at zero
+                if _pix_dist_map[yidx, xidx] >= 1.e30:
+                    continue
+
+                bidx = _path_idx_map[yidx, xidx]
+                didx = _dist_end_idx_map[yidx, xidx]
+                mid_idx = didx // 2
+                # the mid point may be on one of the parent rays
+                ridx = bidx
+                while mid_idx < _ray_start[ridx]:
+                    ridx = _ray_parent[ridx]
+                fidx = _ray_offset[ridx] + mid_idx - _ray_start[ridx]
+                _lon_mid_map[yidx, xidx] = _lons[fidx]
+                _lat_mid_map[yidx, xidx] = _lats[fidx]
+                _dist_map[yidx, xidx] = _distances[didx]
+                _bearing_map[yidx, xidx] = _start_bearings[bidx]
+                _backbearing_map[yidx, xidx] = _back_bearings[
+                    _ray_offset[bidx] + didx - _ray_start[bidx]
+                    ]
+
+    # free the temporaries, which are no longer needed
+    _sample_pix_dist = _sample_order = _ray_band_pos = None
+    del sample_pix_dist, sample_order, ray_band_pos
+
+    job._check()
+
+    if do_landsea:
+
+        with nogil:
+
+            for bidx in prange(
+                    _start_bearings.shape[0], schedule='guided',
+                    num_threads=num_threads
+                    ):
+
+                if _load_flag(cancel_flag):
+                    continue
+
+                tid = openmp.omp_get_thread_num()
+                job_done_v[tid] = job_done_v[tid] + 1
+
+                # Running land/sea statistics; each path position
+                # represents a section of length hprof_step around it
+                # (first and last position only half of that). "*_run" and
+                # "water_len" contain the lengths up to the previous
+                # position, "*_max" the longest of the already closed land
+                # sections. (No in-place operators here, because these
+                # would be interpreted as reductions by prange.)
+                land_run = 0.
+                land_max = 0.
+                inland_run = 0.
+                inland_max = 0.
+                water_len = 0.
+                first_sea = -1
+                last_sea = -1
+
+                for didx in range(_ray_end[bidx] + 1):
+
+                    # with the adaptive layout, the leading part of the
+                    # ray belongs to the parent rays
+                    ridx = bidx
+                    while didx < _ray_start[ridx]:
+                        ridx = _ray_parent[ridx]
+                    zone = _landsea[
+                        _ray_offset[ridx] + didx - _ray_start[ridx]
+                        ]
+                    # length of the current section, if it is the last one
+                    # (i.e., the path ends here) or not
+                    w_end = 0. if didx == 0 else half_step
+                    w = half_step if didx == 0 else 2 * half_step
+
+                    if zone == LANDSEA.SEA:
+                        if land_run > land_max:
+                            land_max = land_run
+                        land_run = 0.
+                        d_tm_cur = land_max
+                        if first_sea < 0:
+                            first_sea = didx
+                        last_sea = didx
+                        d_cr_cur = 0.
+                        if didx == 0:
+                            omega_cur = 100.
+                        else:
+                            omega_cur = (
+                                100. * (water_len + w_end) / _distances[didx]
+                                )
+                        water_len = water_len + w
+                    else:
+                        d_tm_cur = f_max(land_max, land_run + w_end)
+                        if last_sea < 0:
+                            d_cr_cur = 50000.
+                        else:
+                            d_cr_cur = (
+                                _distances[didx] - _distances[last_sea] -
+                                half_step
+                                )
+                        if didx == 0:
+                            omega_cur = 0.
+                        else:
+                            omega_cur = 100. * water_len / _distances[didx]
+                        land_run = land_run + w
+
+                    if zone == LANDSEA.INLAND:
+                        d_lm_cur = f_max(inland_max, inland_run + w_end)
+                        inland_run = inland_run + w
+                    else:
+                        if inland_run > inland_max:
+                            inland_max = inland_run
+                        inland_run = 0.
+                        d_lm_cur = inland_max
+
+                    if first_sea < 0:
+                        d_ct_cur = 50000.
+                    elif first_sea == 0:
+                        d_ct_cur = 0.
+                    else:
+                        d_ct_cur = _distances[first_sea] - half_step
+
+                    # only the ray's own positions are assigned to pixels
+                    if ridx != bidx:
+                        continue
+
+                    # only the closest path position writes to the pixel
+                    # (so there are no write conflicts between threads)
+                    pix = _sample_pix_idx[
+                        _ray_offset[bidx] + didx - _ray_start[bidx]
+                        ]
+                    yidx, xidx = pix // mx, pix % mx
+                    if (
+                            _path_idx_map[yidx, xidx] != bidx or
+                            _dist_end_idx_map[yidx, xidx] != didx
+                            ):
+                        continue
+
+                    _d_tm_map[yidx, xidx] = d_tm_cur
+                    _d_lm_map[yidx, xidx] = d_lm_cur
+                    _d_ct_map[yidx, xidx] = d_ct_cur
+                    _d_cr_map[yidx, xidx] = d_cr_cur
+                    _omega_map[yidx, xidx] = omega_cur
+
+        job._check()
+
+    _sample_pix_idx = None
+    del sample_pix_idx
 
     # store delta_N, beta0, N0
     delta_N_map, beta0_map, N0_map = helper._radiomet_data_for_pathcenter(
         lon_mid_map, lat_mid_map, dist_map, dist_map
         )
 
-    # TODO: derive the following programmatically
+    # constant clutter zones; per-pixel Rx zones are filled in by
+    # height_map_data, if a landcover source is given
     zone_t_map = np.full_like(path_idx_map, zone_t)
     zone_r_map = np.full_like(path_idx_map, zone_r)
 
-    # TODO: derive the following programmatically
-    if d_tm is None:
-        d_tm_map = dist_map
-    else:
-        d_tm_map = np.full_like(dist_map, d_tm)
+    if not do_landsea:
 
-    if d_lm is None:
-        d_lm_map = dist_map
-    else:
-        d_lm_map = np.full_like(dist_map, d_lm)
+        if d_tm is None:
+            d_tm_map = dist_map
+        else:
+            d_tm_map = np.full_like(dist_map, d_tm)
 
-    if d_ct is None:
-        d_ct_map = np.full_like(dist_map, 50000.)
-    else:
-        d_ct_map = np.full_like(dist_map, d_ct)
+        if d_lm is None:
+            d_lm_map = dist_map
+        else:
+            d_lm_map = np.full_like(dist_map, d_lm)
 
-    if d_cr is None:
-        d_cr_map = np.full_like(dist_map, 50000.)
-    else:
-        d_cr_map = np.full_like(dist_map, d_cr)
+        if d_ct is None:
+            d_ct_map = np.full_like(dist_map, 50000.)
+        else:
+            d_ct_map = np.full_like(dist_map, d_ct)
 
-    if omega is None:
-        omega_map = np.full_like(dist_map, 0.)
-    else:
-        omega_map = np.full_like(dist_map, omega)
+        if d_cr is None:
+            d_cr_map = np.full_like(dist_map, 50000.)
+        else:
+            d_cr_map = np.full_like(dist_map, d_cr)
+
+        if omega is None:
+            omega_map = np.full_like(dist_map, 0.)
+        else:
+            omega_map = np.full_like(dist_map, omega)
 
     dist_prof = distances
     height_profs = heights
@@ -2413,33 +4033,348 @@ def height_map_data_cython(
     hprof_data['map_resolution'] = map_resolution
     hprof_data['do_cos_delta'] = do_cos_delta
 
-    hprof_data['path_idx_map'] = path_idx_map
-    hprof_data['pix_dist_map'] = pix_dist_map
-    hprof_data['dist_end_idx_map'] = dist_end_idx_map
-    hprof_data['lon_mid_map'] = lon_mid_map
-    hprof_data['lat_mid_map'] = lat_mid_map
-    hprof_data['dist_map'] = dist_map
-    hprof_data['bearing_map'] = bearing_map
-    hprof_data['back_bearing_map'] = backbearing_map
+    hprof_data['path_idx_map'] = path_idx_map
+    hprof_data['pix_dist_map'] = pix_dist_map
+    hprof_data['dist_end_idx_map'] = dist_end_idx_map
+    hprof_data['lon_mid_map'] = lon_mid_map
+    hprof_data['lat_mid_map'] = lat_mid_map
+    hprof_data['dist_map'] = dist_map
+    hprof_data['bearing_map'] = bearing_map
+    hprof_data['back_bearing_map'] = backbearing_map
+
+    hprof_data['delta_N_map'] = delta_N_map
+    hprof_data['beta0_map'] = beta0_map
+    hprof_data['N0_map'] = N0_map
+
+    hprof_data['zone_t_map'] = zone_t_map
+    hprof_data['zone_r_map'] = zone_r_map
+
+    hprof_data['d_tm_map'] = d_tm_map
+    hprof_data['d_lm_map'] = d_lm_map
+    hprof_data['d_ct_map'] = d_ct_map
+    hprof_data['d_cr_map'] = d_cr_map
+    hprof_data['omega_map'] = omega_map
+
+    hprof_data['dist_prof'] = dist_prof
+    hprof_data['height_profs'] = height_profs
+    hprof_data['zheight_prof'] = zheight_prof
+
+    if adaptive_fan:
+        hprof_data['hprof_offsets'] = ray_offset
+        hprof_data['hprof_starts'] = ray_start
+        hprof_data['hprof_lengths'] = ray_end - ray_start + 1
+        hprof_data['hprof_parents'] = ray_parents
+
+    return hprof_data
+
+
+def height_points_data_cython(
+        double lon_t, double lat_t,
+        object lons_r, object lats_r,
+        double hprof_step,
+        double bearing_res=0.,
+        int zone_t=CLUTTER.UNKNOWN, int zone_r=CLUTTER.UNKNOWN,
+        d_tm=None, d_lm=None,
+        d_ct=None, d_cr=None,
+        omega=None,
+        ):
+    '''
+    Calculate height profiles and auxillary data needed for
+    `atten_points_fast_cython`.
+
+    Parameters
+    ----------
+    lon_t, lat_t : double
+        Geographic longitude/latitude of transmitter [deg]
+    lons_r, lats_r : 1D `~numpy.ndarray` (float; (n, ))
+        Geographic longitudes/latitudes of the receiver points [deg]
+    hprof_step : double
+        Distance resolution of the height profiles [m]
+    bearing_res : double, optional
+        Angular resolution of the ray fan [deg]. If zero, it is chosen
+        such that the lateral offset of the farthest point from the
+        closest ray is at most `hprof_step`. (default: 0)
+    zone_t, zone_r : CLUTTER enum, optional
+        Clutter type for transmitter/receiver terminal.
+        (default: CLUTTER.UNKNOWN)
+    d_tm : double, optional
+        longest continuous land (inland + coastal) section of the
+        great-circle path [km]
+        (default: distance between Tx and Rx)
+    d_lm : double, optional
+        longest continuous inland section of the great-circle path [km]
+        (default: distance between Tx and Rx)
+    d_ct, d_cr : double, optional
+        Distance over land from transmitter/receiver antenna to the coast
+        along great circle interference path [km]
+        (default: 50000 km)
+    omega : double, optional
+        Fraction of the path over water [%] (see Table 3)
+        (default: 0%)
+
+    Returns
+    -------
+    hprof_data : dict
+        Dictionary with height profiles and auxillary data (see
+        `~pycraf.pathprof.height_points_data`).
+    '''
+
+    lons_r = np.array(lons_r, dtype=np.float64, ndmin=1)
+    lats_r = np.array(lats_r, dtype=np.float64, ndmin=1)
+    assert lons_r.ndim == 1 and lons_r.shape == lats_r.shape
+    assert lons_r.size > 0
+
+    lon_t_rad, lat_t_rad = DEG2RAD * lon_t, DEG2RAD * lat_t
+    lons_r_rad, lats_r_rad = np.radians(lons_r), np.radians(lats_r)
+
+    dists, bearings, _ = cygeodesics.inverse_cython(
+        lon_t_rad, lat_t_rad, lons_r_rad, lats_r_rad,
+        )  # m, rad
+
+    if bearing_res > 0:
+        bearing_res *= DEG2RAD
+    else:
+        bearing_res = 2 * hprof_step / max(np.max(dists), hprof_step)
+    num_rays = int(np.ceil(2 * np.pi / bearing_res))
+    bearing_res = 2 * np.pi / num_rays
+
+    # only rays with points are needed, and only as long as necessary
+    ray_bin = np.round(
+        np.mod(bearings, 2 * np.pi) / bearing_res
+        ).astype(np.int64) % num_rays
+    rays, path_idx = np.unique(ray_bin, return_inverse=True)
+    path_idx = path_idx.astype(np.int32)
+    dist_end_idx = np.round(dists / hprof_step).astype(np.int32)
+
+    ray_end = np.zeros(rays.size, dtype=np.int64)
+    np.maximum.at(ray_end, path_idx, dist_end_idx)
+    start_bearings = rays * bearing_res
+
+    ray_start = np.zeros(rays.size, dtype=np.int64)
+    (
+        distances, offsets, lons, lats, back_bearings, heights
+        ) = _adaptive_fan_profiles(
+        lon_t, lat_t, np.max(dist_end_idx) * hprof_step, hprof_step,
+        start_bearings, ray_start, ray_end,
+        )
+    distances *= 1e-3  # convert to km
+
+    # the few rays are stored zero-padded (rays x distances)
+    ray_idx, dist_idx, _ = _ray_sections(ray_start, ray_end)
+    height_profs = np.zeros((rays.size, distances.size), dtype=np.float64)
+    height_profs[ray_idx, dist_idx] = heights
+
+    # points are represented by the closest ray position
+    mid_idx = dist_end_idx // 2
+    end_pos = offsets[path_idx] + dist_end_idx
+    dist = distances[dist_end_idx]
+    lon_mid = lons[offsets[path_idx] + mid_idx]
+    lat_mid = lats[offsets[path_idx] + mid_idx]
+    pos_dist = cygeodesics.inverse_cython(
+        np.radians(lons[end_pos]), np.radians(lats[end_pos]),
+        lons_r_rad, lats_r_rad,
+        )[0]
+
+    delta_N, beta0, N0 = helper._radiomet_data_for_pathcenter(
+        lon_mid, lat_mid, dist, dist
+        )
+
+    hprof_data = {}
+    hprof_data['lon_t'] = lon_t
+    hprof_data['lat_t'] = lat_t
+    hprof_data['lons_r'] = lons_r
+    hprof_data['lats_r'] = lats_r
+    hprof_data['hprof_step'] = hprof_step
+    hprof_data['bearing_res'] = np.degrees(bearing_res)
+
+    hprof_data['path_idx'] = path_idx
+    hprof_data['dist_end_idx'] = dist_end_idx
+    hprof_data['pos_dist'] = pos_dist
+    hprof_data['lon_mid'] = lon_mid
+    hprof_data['lat_mid'] = lat_mid
+    hprof_data['dist'] = dist
+    hprof_data['bearing'] = np.degrees(start_bearings[path_idx])
+    hprof_data['back_bearing'] = back_bearings[end_pos]
+
+    hprof_data['delta_N'] = delta_N
+    hprof_data['beta0'] = beta0
+    hprof_data['N0'] = N0
+
+    hprof_data['zone_t'] = np.full_like(path_idx, zone_t)
+    hprof_data['zone_r'] = np.full_like(path_idx, zone_r)
+
+    hprof_data['d_tm'] = dist.copy() if d_tm is None else np.full_like(
+        dist, d_tm
+        )
+    hprof_data['d_lm'] = dist.copy() if d_lm is None else np.full_like(
+        dist, d_lm
+        )
+    hprof_data['d_ct'] = np.full_like(dist, 50000. if d_ct is None else d_ct)
+    hprof_data['d_cr'] = np.full_like(dist, 50000. if d_cr is None else d_cr)
+    hprof_data['omega'] = np.full_like(dist, 0. if omega is None else omega)
+
+    hprof_data['dist_prof'] = distances
+    hprof_data['height_profs'] = height_profs
+    hprof_data['zheight_prof'] = np.zeros_like(distances)
+
+    return hprof_data
+
+
+def _hprof_map(hprof_data, key, shape, dtype, fallback=None):
+    '''
+    Get map `key` from `hprof_data` as `dtype` array of the given shape.
+
+    Constant maps can be stored as scalars (see
+    `~pycraf.pathprof.compact_hprof_data`), which are broadcasted to the
+    map shape without copying. If `key` is not present, the `fallback`
+    map is used instead.
+    '''
+
+    if key not in hprof_data:
+        key = fallback
+
+    arr = np.asarray(hprof_data[key])
+    if arr.ndim == 0:
+        return np.broadcast_to(arr.astype(dtype), shape)
+
+    return np.asarray(arr, dtype=dtype)
+
+
+def _is_lazy_array(arr):
+    '''
+    Check if `arr` is an array-like that is not held in memory (e.g., a
+    HDF5 dataset), such that it should be read in parts.
+    '''
+
+    return not isinstance(arr, np.ndarray) and getattr(arr, 'ndim', 0) > 0
+
+
+def _read_rows(arr, rows, num_cols):
+    '''
+    Read `arr[rows, :num_cols]` for sorted (unique) `rows`.
+
+    Consecutive rows are read with one slice each, which is supported by
+    all array-likes (e.g., HDF5 datasets), in contrast to fancy indexing.
+    '''
+
+    splits = np.flatnonzero(np.diff(rows) != 1) + 1
+    return np.concatenate([
+        np.asarray(arr[r[0]:r[len(r) - 1] + 1, :num_cols])
+        for r in np.split(rows, splits)
+        ])
+
+
+def _read_sections(arr, starts, stops):
+    '''
+    Read and concatenate `arr[starts[i]:stops[i]]` for sorted sections.
+
+    Adjacent sections are read with one slice (see `_read_rows`).
+    '''
+
+    splits = np.flatnonzero(starts[1:] != stops[:len(stops) - 1]) + 1
+    return np.concatenate([
+        np.asarray(arr[s[0]:e[len(e) - 1]])
+        for s, e in zip(np.split(starts, splits), np.split(stops, splits))
+        ])
+
+
+def _hprof_block(hprof_data, row0, row1):
+    '''
+    Extract map rows `row0:row1` from `hprof_data`.
+
+    Only the height profiles (and positions along them) that are needed
+    for the map rows are read. The path indices are re-mapped accordingly.
+    In the ragged layout of the adaptive ray fan, the parent rays are
+    needed as well, and the whole sections are read.
+    '''
+
+    block = dict(hprof_data)
+    block['ycoords'] = np.asarray(hprof_data['ycoords'])[row0:row1]
+    shape = (row1 - row0, len(hprof_data['xcoords']))
+
+    for key in hprof_data:
+        if key.endswith('_map') and getattr(hprof_data[key], 'ndim', 0) == 2:
+            block[key] = np.asarray(hprof_data[key][row0:row1])
+
+    path_idx = np.broadcast_to(np.asarray(block['path_idx_map']), shape)
+    num_dists = int(np.max(block['dist_end_idx_map'])) + 1
+
+    rays, path_idx = np.unique(path_idx, return_inverse=True)
+
+    if 'hprof_offsets' in hprof_data:
+        offsets, starts, lengths, parents = (
+            np.asarray(hprof_data[key], dtype=np.int64)
+            for key in [
+                'hprof_offsets', 'hprof_starts', 'hprof_lengths',
+                'hprof_parents'
+                ]
+            )
+        needed = np.zeros(offsets.size, dtype=bool)
+        needed[rays] = True
+        ancestors = parents[rays]
+        while ancestors.size > 0:
+            ancestors = ancestors[ancestors >= 0]
+            ancestors = ancestors[~needed[ancestors]]
+            needed[ancestors] = True
+            ancestors = parents[ancestors]
+
+        block_rays = np.flatnonzero(needed)
+        new_idx = np.full(offsets.size, -1, dtype=np.int64)
+        new_idx[block_rays] = np.arange(block_rays.size)
+        path_idx = new_idx[rays][path_idx]
+
+        lengths = lengths[block_rays]
+        block['height_profs'] = _read_sections(
+            hprof_data['height_profs'],
+            offsets[block_rays], offsets[block_rays] + lengths,
+            )
+        block['hprof_offsets'] = np.cumsum(lengths) - lengths
+        block['hprof_starts'] = starts[block_rays]
+        block['hprof_lengths'] = lengths
+        parents = parents[block_rays]
+        block['hprof_parents'] = np.where(
+            parents >= 0, new_idx[parents], -1
+            )
+    else:
+        block['height_profs'] = _read_rows(
+            hprof_data['height_profs'], rays, num_dists
+            )
+
+    block['path_idx_map'] = path_idx.reshape(shape).astype(np.int32)
+    block['dist_prof'] = np.asarray(hprof_data['dist_prof'])[:num_dists]
+    if 'zheight_prof' in hprof_data:
+        block['zheight_prof'] = np.asarray(
+            hprof_data['zheight_prof']
+            )[:num_dists]
 
-    hprof_data['delta_N_map'] = delta_N_map
-    hprof_data['beta0_map'] = beta0_map
-    hprof_data['N0_map'] = N0_map
+    return block
 
-    hprof_data['zone_t_map'] = zone_t_map
-    hprof_data['zone_r_map'] = zone_r_map
 
-    hprof_data['d_tm_map'] = d_tm_map
-    hprof_data['d_lm_map'] = d_lm_map
-    hprof_data['d_ct_map'] = d_ct_map
-    hprof_data['d_cr_map'] = d_cr_map
-    hprof_data['omega_map'] = omega_map
+def _block_rows(hprof_data, xlen):
+    '''
+    Number of map rows per block (see `_hprof_block`), such that the data
+    read for a block approximately fit into the memory budget.
 
-    hprof_data['dist_prof'] = dist_prof
-    hprof_data['height_profs'] = height_profs
-    hprof_data['zheight_prof'] = zheight_prof
+    As an upper limit, each map row is assumed to need its own set of
+    height profiles (at most one per pixel).
+    '''
 
-    return hprof_data
+    height_profs = hprof_data['height_profs']
+    num_dists = len(hprof_data['dist_prof'])
+    if 'hprof_offsets' in hprof_data:
+        num_paths = len(hprof_data['hprof_offsets'])
+    else:
+        num_paths = height_profs.shape[0]
+    num_maps = sum(
+        key.endswith('_map') and getattr(val, 'ndim', 0) == 2
+        for key, val in hprof_data.items()
+        )
+    row_bytes = (
+        8 * xlen * num_maps +
+        min(xlen, num_paths) * num_dists * height_profs.dtype.itemsize
+        )
+
+    return max(1, utils.PerformanceConf.memory_budget // row_bytes)
 
 
 def atten_map_fast_cython(
@@ -2451,6 +4386,10 @@ def atten_map_fast_cython(
         object hprof_data not None,  # dict_like
         int polarization=0,
         int version=16,
+        block_rows=None,
+        bint ray_sweep=False,
+        JobControl job=None,
+        nthreads=None,
         ):
     '''
     Calculate attenuation maps using a fast method.
@@ -2469,12 +4408,34 @@ def atten_map_fast_cython(
         Time percentage [%] (maximal 50%)
     hprof_data : dict, dict-like
         Dictionary with height profiles and auxillary maps as
-        calculated with `~pycraf.pathprof.height_map_data`.
+        calculated with `~pycraf.pathprof.height_map_data`. Constant
+        maps can be scalars and the height profiles can also be `int16`
+        or `float32` arrays (see `~pycraf.pathprof.compact_hprof_data`),
+        or be stored in a ragged layout (see the `adaptive_fan` option of
+        `~pycraf.pathprof.height_map_data`).
     polarization : int, optional
         Polarization (default: 0)
         Allowed values are: 0 - horizontal, 1 - vertical
     version : int, optional
         ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    block_rows : int, optional
+        Number of map rows that are processed at once, if `hprof_data`
+        contains arrays that are not held in memory (e.g., HDF5 data
+        sets). (default: None, i.e., derived from
+        `~pycraf.utils.PerformanceConf.memory_budget`)
+    ray_sweep : bool, optional
+        If True, process the pixels ray by ray (in the order of distance),
+        re-using the work done for the previous pixels on the same ray
+        (see Notes). The results agree with the pixel-wise calculation
+        within numerical precision. (default: False)
+    job : `~pycraf.pathprof.JobControl`, optional
+        If given, the progress (in map pixels) is reported to `job` and
+        the computation can be aborted with `job.cancel()`, in which
+        case a `~pycraf.pathprof.JobCancelledError` is raised.
+        (default: None)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -2514,6 +4475,21 @@ def atten_map_fast_cython(
     - The diffraction-loss algorithm was changed between ITU-R P.452
       version 14 and 15. The former used a Deygout method, the new one
       is based on a Bullington calculation with correction terms.
+    - Arrays in `hprof_data` are used without copying, if possible
+      (this includes read-only arrays, e.g., memory maps). Array-likes,
+      which are not held in memory (e.g., HDF5 data sets), are read block
+      by block, where only the map rows in the block and the associated
+      parts of the height profiles are loaded.
+    - With `ray_sweep`, the smooth-earth sums are accumulated along the
+      ray, and the transmitter-side maxima (Bullington slope, horizon
+      angle) as well as the obstacle heights and angles for the effective
+      antenna heights are taken from upper convex hulls that are extended
+      with the ray. For the other maxima, the height maxima of blocks of
+      32 profile positions give upper bounds, such that only the blocks
+      that can contain the maximum are visited. The cost per pixel is then
+      (roughly) logarithmic in the profile length for the former and
+      proportional to the number of blocks for the latter. The rays are
+      distributed over the threads.
     '''
 
     # TODO: implement map-based clutter handling; currently, only a single
@@ -2521,62 +4497,383 @@ def atten_map_fast_cython(
 
     assert time_percent <= 50.
     assert version == 14 or version == 16
+    assert block_rows is None or block_rows > 0
+
+    # for some dict-likes (e.g., npz files) each item access loads the
+    # data, so we do this only once
+    hprof_data = {k: hprof_data[k] for k in hprof_data}
+
+    xlen = len(hprof_data['xcoords'])
+    ylen = len(hprof_data['ycoords'])
+    nthreads = _get_num_threads(nthreads)
+
+    float_res = np.zeros((10, ylen, xlen), dtype=np.float64)
+    int_res = np.zeros((1, ylen, xlen), dtype=np.int32)
+
+    args = (
+        freq, temperature, pressure, h_tg, h_rg, time_percent,
+        polarization, version,
+        )
+
+    if job is None:
+        job = JobControl()
+    job._start(ylen * xlen, nthreads)
+
+    if any(_is_lazy_array(v) for v in hprof_data.values()):
+        if block_rows is None:
+            block_rows = _block_rows(hprof_data, xlen)
+        for row0 in range(0, ylen, block_rows):
+            job._check()
+            row1 = min(row0 + block_rows, ylen)
+            _atten_map_fast_block(
+                *args,
+                _hprof_block(hprof_data, row0, row1),
+                float_res[:, row0:row1],
+                int_res[:, row0:row1],
+                job=job, ray_sweep=ray_sweep, nthreads=nthreads,
+                )
+    else:
+        _atten_map_fast_block(
+            *args, hprof_data, float_res, int_res,
+            job=job, ray_sweep=ray_sweep, nthreads=nthreads,
+            )
+
+    job._check()
+
+    return float_res, int_res
+
+
+def atten_map_progressive_cython(
+        double freq,
+        double temperature,
+        double pressure,
+        double h_tg, double h_rg,
+        double time_percent,
+        object hprof_data not None,  # dict_like
+        object callback=None,
+        int coarsest_step=0,
+        int polarization=0,
+        int version=16,
+        bint ray_sweep=False,
+        JobControl job=None,
+        nthreads=None,
+        ):
+    '''
+    Calculate attenuation maps in coarse-to-fine passes.
+
+    The first pass computes every `coarsest_step`-th pixel (in both
+    dimensions). Each subsequent pass halves the step size and only
+    computes the pixels that were not done in the previous passes, until
+    the full map is computed.
+
+    Parameters
+    ----------
+    freq, temperature, pressure, h_tg, h_rg, time_percent :
+        See `atten_map_fast_cython`.
+    hprof_data : dict, dict-like
+        See `atten_map_fast_cython`. Array-likes that are not held in
+        memory are loaded once at the start.
+    callback : callable, optional
+        Function that is called after each pass with the arguments
+        `(step, float_results, int_results)`, where `step` is the pixel
+        step of the pass (the last pass has `step == 1`). In the result
+        arrays, pixels that were not computed yet are filled with the
+        value of the closest computed pixel (towards lower indices),
+        such that they can be plotted directly. (default: None)
+    coarsest_step : int, optional
+        Pixel step of the first pass. It is rounded up to a power of
+        two. If zero, the step is chosen such that the first pass
+        computes at most 64 pixels along each map axis. (default: 0)
+    polarization, version, ray_sweep, job, nthreads :
+        See `atten_map_fast_cython`. For `job`, the progress counts all
+        passes.
+
+    Returns
+    -------
+    float_results, int_results : 3D `~numpy.ndarray`
+        As in `atten_map_fast_cython`. The results are identical to the
+        ones of `atten_map_fast_cython`.
+    '''
+
+    assert time_percent <= 50.
+    assert version == 14 or version == 16
+    assert coarsest_step >= 0
+
+    nthreads = _get_num_threads(nthreads)
+
+    # the passes need (almost) all of the data, so it is loaded only once
+    hprof_data = {k: hprof_data[k] for k in hprof_data}
+    hprof_data = {
+        k: np.asarray(v) if _is_lazy_array(v) else v
+        for k, v in hprof_data.items()
+        }
+
+    xlen = len(hprof_data['xcoords'])
+    ylen = len(hprof_data['ycoords'])
+
+    float_res = np.zeros((10, ylen, xlen), dtype=np.float64)
+    int_res = np.zeros((1, ylen, xlen), dtype=np.int32)
+
+    args = (
+        freq, temperature, pressure, h_tg, h_rg, time_percent,
+        polarization, version,
+        )
+
+    if coarsest_step == 0:
+        coarsest_step = (max(xlen, ylen) + 63) // 64
+    step = 1
+    while step < coarsest_step:
+        step *= 2
+
+    if job is None:
+        job = JobControl()
+    job._start(ylen * xlen, nthreads)
+
+    yy, xx = np.indices((ylen, xlen), dtype=np.int32)
+    done = np.zeros((ylen, xlen), dtype=bool)
+
+    while step >= 1:
+
+        job._check()
+
+        todo = (yy % step == 0) & (xx % step == 0) & ~done
+        done |= todo
+
+        _atten_map_fast_block(
+            *args, hprof_data, float_res, int_res, job=job,
+            pixels=np.flatnonzero(todo), ray_sweep=ray_sweep,
+            nthreads=nthreads,
+            )
+        job._check()
+
+        if callback is not None:
+            yfill = np.arange(ylen) // step * step
+            xfill = np.arange(xlen) // step * step
+            callback(
+                step,
+                float_res[:, yfill][:, :, xfill],
+                int_res[:, yfill][:, :, xfill],
+                )
+
+        step //= 2
+
+    return float_res, int_res
+
+
+def _atten_map_fast_block(
+        double freq,
+        double temperature,
+        double pressure,
+        double h_tg, double h_rg,
+        double time_percent,
+        int polarization,
+        int version,
+        object hprof_data not None,
+        double[:, :, :] float_res_v,
+        int[:, :, :] int_res_v,
+        JobControl job=None,
+        object pixels=None,
+        bint ray_sweep=False,
+        nthreads=None,
+        ):
+    '''
+    Process (part of) the map, see `atten_map_fast_cython`.
+
+    If `pixels` (flat map indices) is given, only these pixels are
+    computed. With `ray_sweep`, the pixels are processed ray by ray.
+    '''
+
+    if job is None:
+        job = JobControl()
+        job._start(0, _get_num_threads(nthreads))
 
     cdef:
         # must set gains to zero, because gain is direction dependent
         double G_t = 0., G_r = 0.
         ppstruct *pp
+        raysweep *rs
+        raysweep *rz
         int xi, yi, xlen, ylen
         int eidx, didx
+        int gidx, k, pix, num_groups, num_blocks, next_dist, next_line
+        int hmode, hrow, tid, copied, copied_eidx
+        np.int64_t ridx, hpos, hstop
+        int num_threads = _get_num_threads(nthreads)
 
         double[:, ::1] clutter_data_v = CLUTTER_DATA
 
         double L_b0p, L_bd, L_bs, L_ba, L_b, L_b_corr, L_dummy
 
-    xcoords, ycoords = hprof_data['xcoords'], hprof_data['ycoords']
-
-    float_res = np.zeros((10, len(ycoords), len(xcoords)), dtype=np.float64)
-    int_res = np.zeros((1, len(ycoords), len(xcoords)), dtype=np.int32)
-
     cdef:
-        double[:, :, :] float_res_v = float_res
-        int[:, :, :] int_res_v = int_res
-
-        # since we allow all dict_like objects for hprof_data,
-        # we have to make sure, that arrays are numpy and contiguous
-        # (have in mind, that one might use hdf5 data sets)
+        # since we allow all dict_like objects for hprof_data, we have to
+        # make sure, that arrays are numpy and (where needed) contiguous;
+        # the short 1D arrays are copied if they are read-only
 
         _cf = np.ascontiguousarray
+        _c1d = lambda a: np.require(a, np.float64, ['C', 'W'])
 
-        double[::1] xcoords_v = _cf(hprof_data['xcoords'])
-        double[::1] ycoords_v = _cf(hprof_data['ycoords'])
+        double[::1] xcoords_v = _c1d(hprof_data['xcoords'])
+        double[::1] ycoords_v = _c1d(hprof_data['ycoords'])
         double lon_t = np.double(hprof_data['lon_t'])
         double lat_t = np.double(hprof_data['lat_t'])
         double hprof_step = np.double(hprof_data['hprof_step'])
 
-        int[:, :] path_idx_map_v = _cf(hprof_data['path_idx_map'])
-        int[:, :] dist_end_idx_map_v = _cf(hprof_data['dist_end_idx_map'])
-        double[:, :] dist_map_v = _cf(hprof_data['dist_map'])
-        double[:, :] delta_N_map_v = _cf(hprof_data['delta_N_map'])
-        double[:, :] beta0_map_v = _cf(hprof_data['beta0_map'])
-        double[:, :] N0_map_v = _cf(hprof_data['N0_map'])
+        double[::1] dist_prof_v = _c1d(hprof_data['dist_prof'])
+
+    shape = (ycoords_v.shape[0], xcoords_v.shape[0])
+    _mf, _mi = np.float64, np.int32
+
+    cdef:
+        const int[:, :] path_idx_map_v = _hprof_map(
+            hprof_data, 'path_idx_map', shape, _mi
+            )
+        const int[:, :] dist_end_idx_map_v = _hprof_map(
+            hprof_data, 'dist_end_idx_map', shape, _mi
+            )
+        const double[:, :] dist_map_v = _hprof_map(
+            hprof_data, 'dist_map', shape, _mf
+            )
+        const double[:, :] delta_N_map_v = _hprof_map(
+            hprof_data, 'delta_N_map', shape, _mf
+            )
+        const double[:, :] beta0_map_v = _hprof_map(
+            hprof_data, 'beta0_map', shape, _mf
+            )
+        const double[:, :] N0_map_v = _hprof_map(
+            hprof_data, 'N0_map', shape, _mf
+            )
+
+        const int[:, :] zone_t_map_v = _hprof_map(
+            hprof_data, 'zone_t_map', shape, _mi
+            )
+        const int[:, :] zone_r_map_v = _hprof_map(
+            hprof_data, 'zone_r_map', shape, _mi
+            )
+        const double[:, :] d_tm_map_v = _hprof_map(
+            hprof_data, 'd_tm_map', shape, _mf, fallback='dist_map'
+            )
+        const double[:, :] d_lm_map_v = _hprof_map(
+            hprof_data, 'd_lm_map', shape, _mf, fallback='dist_map'
+            )
+        const double[:, :] d_ct_map_v = _hprof_map(
+            hprof_data, 'd_ct_map', shape, _mf
+            )
+        const double[:, :] d_cr_map_v = _hprof_map(
+            hprof_data, 'd_cr_map', shape, _mf
+            )
+        const double[:, :] omega_map_v = _hprof_map(
+            hprof_data, 'omega_map', shape, _mf
+            )
+
+    if 'zheight_prof' in hprof_data:
+        zheight_prof = _c1d(hprof_data['zheight_prof'])
+    else:
+        zheight_prof = np.zeros_like(np.asarray(dist_prof_v))
+
+    # height profiles may be stored with a compact data type (int16 or
+    # float32) or in the ragged layout of the adaptive ray fan; these (and
+    # read-only arrays) are converted on the fly into a per-thread buffer
+    height_profs = np.asarray(hprof_data['height_profs'])
+    if height_profs.dtype == np.int16:
+        hmode = 3
+    elif height_profs.dtype == np.float32:
+        hmode = 2
+    else:
+        height_profs = _cf(height_profs, dtype=np.float64)
+        hmode = 0 if (
+            height_profs.flags.writeable and height_profs.ndim == 2
+            ) else 1
+
+    # in the buffered modes, the profiles are addressed in the ragged
+    # layout (a dense array is the special case without parent rays)
+    if 'hprof_offsets' in hprof_data:
+        hoffsets, hstarts, hparents = (
+            np.require(hprof_data[key], np.int64, ['C'])
+            for key in ['hprof_offsets', 'hprof_starts', 'hprof_parents']
+            )
+    else:
+        hoffsets = np.arange(
+            height_profs.shape[0], dtype=np.int64
+            ) * height_profs.shape[1]
+        hstarts = np.zeros(height_profs.shape[0], dtype=np.int64)
+        hparents = np.full(height_profs.shape[0], -1, dtype=np.int64)
+
+    _dummy = np.zeros(1)
+    hbuf = np.zeros((1, 1))
+    if hmode != 0:
+        hbuf = np.zeros((num_threads, dist_prof_v.shape[0]))
+    hflat = _cf(height_profs).reshape(-1)
+
+    cdef:
+        double[::1] zheight_prof_v = zheight_prof
+        double[:, ::1] height_profs_v = height_profs if hmode == 0 else hbuf
+        const double[::1] height_profs_d_v = (
+            hflat if hmode == 1 else _dummy
+            )
+        const float[::1] height_profs_f_v = (
+            hflat if hmode == 2 else _dummy.astype(np.float32)
+            )
+        const short[::1] height_profs_s_v = (
+            hflat if hmode == 3 else _dummy.astype(np.int16)
+            )
+        const np.int64_t[::1] hoffsets_v = hoffsets
+        const np.int64_t[::1] hstarts_v = hstarts
+        const np.int64_t[::1] hparents_v = hparents
+
+    xlen = xcoords_v.shape[0]
+    ylen = ycoords_v.shape[0]
+
+    # Pixels are processed in groups: either map rows or (with ray_sweep)
+    # the pixels of a ray, ordered by distance; for the latter, the pixels
+    # of a ray must also share the transmitter height (i.e., zone_t)
+    if pixels is None:
+        pixels = np.arange(ylen * xlen, dtype=np.int32)
+    else:
+        pixels = np.unique(np.asarray(pixels, dtype=np.int32))
+
+    if ray_sweep:
+        pix_yx = (pixels // xlen, pixels % xlen)
+        pix_keys = [
+            _hprof_map(hprof_data, key, shape, _mi)[pix_yx]
+            for key in ['dist_end_idx_map', 'zone_t_map', 'path_idx_map']
+            ]
+        order = np.lexsort(pix_keys)
+        pix_order = pixels[order]
+        new_group = np.zeros(len(pixels), dtype=bool)
+        new_group[:1] = True
+        for key_vals in pix_keys[1:]:
+            key_vals = key_vals[order]
+            new_group[1:] |= key_vals[1:] != key_vals[:-1]
+        group_offsets = np.append(
+            np.flatnonzero(new_group), len(pixels)
+            ).astype(np.int32)
+    else:
+        pix_order = pixels
+        group_offsets = np.searchsorted(
+            pixels, np.arange(0, ylen * xlen + 1, xlen)
+            ).astype(np.int32)
+
+    # block maxima of the zero-height profile for the ray-sweep engine
+    num_blocks = dist_prof_v.shape[0] // SWEEP_BLOCK + 1
+    zheight_max = np.maximum.reduceat(
+        zheight_prof, np.arange(0, len(zheight_prof), SWEEP_BLOCK)
+        )
+
+    cdef:
+        int[::1] pix_order_v = pix_order
+        int[::1] group_offsets_v = group_offsets
+        double[::1] zheight_max_v = zheight_max
 
-        int[:, :] zone_t_map_v = _cf(hprof_data['zone_t_map'])
-        int[:, :] zone_r_map_v = _cf(hprof_data['zone_r_map'])
-        double[:, :] d_tm_map_v = _cf(hprof_data['d_tm_map'])
-        double[:, :] d_lm_map_v = _cf(hprof_data['d_lm_map'])
-        double[:, :] d_ct_map_v = _cf(hprof_data['d_ct_map'])
-        double[:, :] d_cr_map_v = _cf(hprof_data['d_cr_map'])
-        double[:, :] omega_map_v = _cf(hprof_data['omega_map'])
+        # progress counters (one per thread) and cancellation flag
+        long long[::1] job_done_v = job._done
+        int *cancel_flag = &job._cancelled
 
-        double[::1] dist_prof_v = _cf(hprof_data['dist_prof'])
-        double[:, ::1] height_profs_v = _cf(hprof_data['height_profs'])
-        double[::1] zheight_prof_v = _cf(hprof_data['zheight_prof'])
+    # each thread needs its own counter
+    assert job_done_v.shape[0] >= num_threads
 
-    xlen = len(xcoords)
-    ylen = len(ycoords)
+    num_groups = group_offsets_v.shape[0] - 1
 
-    with nogil, parallel():
+    with nogil, parallel(num_threads=num_threads):
 
         pp = <ppstruct *> malloc(sizeof(ppstruct))
         if pp == NULL:
@@ -2600,9 +4897,58 @@ def atten_map_fast_cython(
         # five parameters programmatically (using some kind of Geo-Data)
         pp.polarization = polarization
 
-        for yi in prange(ylen, schedule='guided', chunksize=10):
+        rs = NULL
+        rz = NULL
+        if ray_sweep:
+            rs = <raysweep *> malloc(sizeof(raysweep))
+            rz = <raysweep *> malloc(sizeof(raysweep))
+            if rs == NULL or rz == NULL:
+                abort()
+
+            rs.hmax = <double *> malloc(num_blocks * sizeof(double))
+            rs.bound = <double *> malloc(num_blocks * sizeof(double))
+            rs.g = <double *> malloc(dist_prof_v.shape[0] * sizeof(double))
+            rs.g_hull = <int *> malloc(dist_prof_v.shape[0] * sizeof(int))
+            rs.h_hull = <int *> malloc(dist_prof_v.shape[0] * sizeof(int))
+            if (
+                    rs.hmax == NULL or rs.bound == NULL or rs.g == NULL or
+                    rs.g_hull == NULL or rs.h_hull == NULL
+                    ):
+                abort()
+
+            # zero-height profile: fixed block maxima and no envelope
+            # (the effective transmitter height changes with the path)
+            rz.hmax = &zheight_max_v[0]
+            rz.bound = rs.bound
+            rz.g = NULL
+            rz.g_hull = NULL
+            rz.h_hull = NULL
 
-            for xi in range(xlen):
+        for gidx in prange(num_groups, schedule='guided'):
+
+            # buffered (upcasted) height profile
+            tid = openmp.omp_get_thread_num()
+            copied = 0
+            copied_eidx = -1
+
+            # ray-sweep state, advanced with the pixels of the ray
+            next_dist = 1
+            next_line = 1
+            if ray_sweep:
+                rs.nu_1 = 0.
+                rs.nu_2 = 0.
+                rs.g_hull_size = 0
+                rs.h_hull_size = 0
+
+            # skip the remaining groups, if the job was cancelled
+            if _load_flag(cancel_flag):
+                continue
+
+            for k in range(group_offsets_v[gidx], group_offsets_v[gidx + 1]):
+
+                pix = pix_order_v[k]
+                yi = pix // xlen
+                xi = pix % xlen
 
                 eidx = path_idx_map_v[yi, xi]
                 didx = dist_end_idx_map_v[yi, xi]
@@ -2610,6 +4956,38 @@ def atten_map_fast_cython(
                 if didx < 4:
                     continue
 
+                if hmode == 0:
+                    hrow = eidx
+                else:
+                    hrow = tid
+                    if eidx != copied_eidx:
+                        copied = 0
+                        copied_eidx = eidx
+                    while copied <= didx:
+                        # the next part of the profile (up to hstop) is
+                        # found on ray ridx, i.e., eidx or one of its parents
+                        ridx = eidx
+                        hstop = didx + 1
+                        while copied < hstarts_v[ridx]:
+                            if hstarts_v[ridx] < hstop:
+                                hstop = hstarts_v[ridx]
+                            ridx = hparents_v[ridx]
+                        hpos = hoffsets_v[ridx] - hstarts_v[ridx]
+                        while copied < hstop:
+                            if hmode == 1:
+                                height_profs_v[hrow, copied] = (
+                                    height_profs_d_v[hpos + copied]
+                                    )
+                            elif hmode == 2:
+                                height_profs_v[hrow, copied] = (
+                                    height_profs_f_v[hpos + copied]
+                                    )
+                            else:
+                                height_profs_v[hrow, copied] = (
+                                    height_profs_s_v[hpos + copied]
+                                    )
+                            copied = copied + 1
+
                 pp.lon_r = xcoords_v[xi]
                 pp.lat_r = ycoords_v[yi]
                 pp.zone_t = zone_t_map_v[yi, xi]
@@ -2639,18 +5017,52 @@ def atten_map_fast_cython(
 
                 # assigning not possible in prange, but can use directly below
                 # dists_v = dist_prof_v[0:didx + 1]
-                # heights_v = height_profs_v[eidx, 0:didx + 1]
+                # heights_v = height_profs_v[hrow, 0:didx + 1]
                 # zheights_v = zheight_prof_v[0:didx + 1]
 
-                _process_path(
-                    pp,
-                    # dists_v,
-                    # heights_v,
-                    # zheights_v,
-                    dist_prof_v[0:didx + 1],
-                    height_profs_v[eidx, 0:didx + 1],
-                    zheight_prof_v[0:didx + 1],
-                    )
+                if ray_sweep:
+
+                    # advance the sweep to the end of the path; the
+                    # hulls must only contain the interior positions
+                    if next_dist == 1:
+                        rs.hmax[0] = height_profs_v[hrow, 0]
+                    while next_dist <= didx:
+                        _ray_sweep_advance(
+                            rs, &dist_prof_v[0], &height_profs_v[hrow, 0],
+                            height_profs_v[hrow, 0] + pp.h_tg, next_dist,
+                            )
+                        next_dist = next_dist + 1
+                    while next_line < didx:
+                        _hull_insert(
+                            rs.g_hull, &rs.g_hull_size,
+                            &dist_prof_v[0], rs.g, next_line,
+                            )
+                        _hull_insert(
+                            rs.h_hull, &rs.h_hull_size,
+                            &dist_prof_v[0], &height_profs_v[hrow, 0],
+                            next_line,
+                            )
+                        next_line = next_line + 1
+
+                    _process_path(
+                        pp,
+                        dist_prof_v[0:didx + 1],
+                        height_profs_v[hrow, 0:didx + 1],
+                        zheight_prof_v[0:didx + 1],
+                        rs, rz,
+                        )
+
+                else:
+
+                    _process_path(
+                        pp,
+                        # dists_v,
+                        # heights_v,
+                        # zheights_v,
+                        dist_prof_v[0:didx + 1],
+                        height_profs_v[hrow, 0:didx + 1],
+                        zheight_prof_v[0:didx + 1],
+                        )
 
                 (
                     L_b0p, L_bd, L_bs, L_ba, L_b, L_b_corr, L_dummy
@@ -2669,9 +5081,204 @@ def atten_map_fast_cython(
 
                 int_res_v[0, yi, xi] = pp.path_type
 
+            job_done_v[tid] = (
+                job_done_v[tid] +
+                group_offsets_v[gidx + 1] - group_offsets_v[gidx]
+                )
+
+        if ray_sweep:
+            free(rs.hmax)
+            free(rs.bound)
+            free(rs.g)
+            free(rs.g_hull)
+            free(rs.h_hull)
+            free(rs)
+            free(rz)
         free(pp)
 
-    return float_res, int_res
+
+def power_map_accumulate_cython(
+        double[:, ::1] power_map,
+        double[::1] xcoords, double[::1] ycoords,
+        double[:, ::1] power_db_local,
+        double x0, double dx, double y0, double dy,
+        nthreads=None,
+        ):
+    '''
+    Add a (local) power map to a linear power map on a different grid.
+
+    Parameters
+    ----------
+    power_map : 2D `~numpy.ndarray` (float; (my, mx))
+        Linear power map [W], which is updated in-place.
+    xcoords, ycoords : 1D `~numpy.ndarray` (float; (mx, ) and (my, ))
+        Coordinates of `power_map` [deg].
+    power_db_local : 2D `~numpy.ndarray` (float; (ny, nx))
+        Power map to add [dB_W] on a regular grid with `nx` positions
+        `x0 + dx * i` and `ny` positions `y0 + dy * j`. Pixels with
+        NaN value are ignored.
+    x0, dx, y0, dy : double
+        Definition of the local grid [deg].
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
+
+    Notes
+    -----
+    - The local map is bi-linearly interpolated (in dB). Positions in
+      `power_map`, which have a NaN-valued local pixel with non-zero
+      interpolation weight, or which are outside of the local map, are
+      not changed.
+    '''
+
+    cdef:
+        int mx = xcoords.shape[0], my = ycoords.shape[0]
+        int nx = power_db_local.shape[1], ny = power_db_local.shape[0]
+        int xi, yi, ix, iy
+        double fx, fy, tx, ty, p
+        int num_threads = _get_num_threads(nthreads)
+
+    assert power_map.shape[0] == my and power_map.shape[1] == mx
+    assert nx > 1 and ny > 1
+
+    with nogil:
+
+        for yi in prange(my, schedule='guided', num_threads=num_threads):
+
+            # snap to the local grid, if (numerically) on a grid line
+            fy = (ycoords[yi] - y0) / dy
+            if fabs(fy - floor(fy + 0.5)) < 1.e-6:
+                fy = floor(fy + 0.5)
+            if fy < 0 or fy > ny - 1:
+                continue
+
+            iy = <int> fy
+            if iy > ny - 2:
+                iy = ny - 2
+            ty = fy - iy
+
+            for xi in range(mx):
+
+                fx = (xcoords[xi] - x0) / dx
+                if fabs(fx - floor(fx + 0.5)) < 1.e-6:
+                    fx = floor(fx + 0.5)
+                if fx < 0 or fx > nx - 1:
+                    continue
+
+                ix = <int> fx
+                if ix > nx - 2:
+                    ix = nx - 2
+                tx = fx - ix
+
+                # neighbors with zero weight must not propagate NaNs
+                p = 0.
+                if ty < 1 and tx < 1:
+                    p = p + (1 - ty) * (1 - tx) * power_db_local[iy, ix]
+                if ty < 1 and tx > 0:
+                    p = p + (1 - ty) * tx * power_db_local[iy, ix + 1]
+                if ty > 0 and tx < 1:
+                    p = p + ty * (1 - tx) * power_db_local[iy + 1, ix]
+                if ty > 0 and tx > 0:
+                    p = p + ty * tx * power_db_local[iy + 1, ix + 1]
+                if p != p:
+                    continue
+
+                power_map[yi, xi] += cpower(10., p / 10.)
+
+
+def atten_points_fast_cython(
+        double freq,
+        double temperature,
+        double pressure,
+        double h_tg, double h_rg,
+        double time_percent,
+        object hprof_data not None,  # dict_like
+        int polarization=0,
+        int version=16,
+        bint ray_sweep=False,
+        nthreads=None,
+        ):
+    '''
+    Calculate attenuation for a set of receiver points using a fast method.
+
+    Parameters
+    ----------
+    freq : double
+        Frequency of radiation [GHz]
+    temperature : double
+        Temperature (K)
+    pressure : double
+        Pressure (hPa)
+    h_tg, h_rg : double
+        Transmitter/receiver heights over ground [m]
+    timepercent : double
+        Time percentage [%] (maximal 50%)
+    hprof_data : dict, dict-like
+        Dictionary with height profiles and auxillary data as
+        calculated with `~pycraf.pathprof.height_points_data`.
+    polarization : int, optional
+        Polarization (default: 0)
+        Allowed values are: 0 - horizontal, 1 - vertical
+    version : int, optional
+        ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    ray_sweep : bool, optional
+        If True, process the points ray by ray (see
+        `atten_map_fast_cython`). (default: False)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
+
+    Returns
+    -------
+    float_results : 2D `~numpy.ndarray`
+        As in `atten_map_fast_cython`, but with the points along the
+        second axis.
+    int_results : 2D `~numpy.ndarray`
+        As in `atten_map_fast_cython`, but with the points along the
+        second axis.
+
+    Notes
+    -----
+    - Points with `dist_end_idx < 4`, i.e., closer than about four
+      `hprof_step` to the transmitter, are not calculated. Their
+      `float_results` are NaN and their `int_results` are -1.
+    '''
+
+    assert time_percent <= 50.
+    assert version == 14 or version == 16
+
+    # the points are processed as a map with one column; note, that
+    # the receiver longitude is not needed by the kernel
+    lats_r = np.asarray(hprof_data['lats_r'])
+    map_data = {
+        'xcoords': np.array([NAN]),
+        'ycoords': lats_r,
+        }
+    for key in ['lon_t', 'lat_t', 'hprof_step', 'dist_prof', 'height_profs']:
+        map_data[key] = hprof_data[key]
+    if 'zheight_prof' in hprof_data:
+        map_data['zheight_prof'] = hprof_data['zheight_prof']
+
+    for key in [
+            'path_idx', 'dist_end_idx', 'dist', 'delta_N', 'beta0', 'N0',
+            'zone_t', 'zone_r', 'd_tm', 'd_lm', 'd_ct', 'd_cr', 'omega',
+            ]:
+        val = np.asarray(hprof_data[key])
+        map_data[key + '_map'] = val if val.ndim == 0 else val.reshape(-1, 1)
+
+    # points too close to the transmitter are skipped by the kernel;
+    # mark them as invalid (rather than leaving zeros)
+    float_res = np.full((10, lats_r.size, 1), NAN, dtype=np.float64)
+    int_res = np.full((1, lats_r.size, 1), -1, dtype=np.int32)
+
+    _atten_map_fast_block(
+        freq, temperature, pressure, h_tg, h_rg, time_percent,
+        polarization, version,
+        map_data, float_res, int_res,
+        ray_sweep=ray_sweep, nthreads=nthreads,
+        )
+
+    return float_res[..., 0], int_res[..., 0]
 
 
 def atten_path_fast_cython(
@@ -2683,6 +5290,7 @@ def atten_path_fast_cython(
         object hprof_data not None,  # dict_like
         int polarization=0,
         int version=16,
+        nthreads=None,
         ):
 
     '''
@@ -2708,6 +5316,9 @@ def atten_path_fast_cython(
         Allowed values are: 0 - horizontal, 1 - vertical
     version : int, optional
         ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -2780,6 +5391,7 @@ def atten_path_fast_cython(
         double[::1] beta0_v = _cf(hprof_data['beta0'])
 
         int i, max_path_length = distances_v.size
+        int num_threads = _get_num_threads(nthreads)
 
     float_res = np.zeros((10, max_path_length), dtype=np.float64)
     int_res = np.zeros((1, max_path_length), dtype=np.int32)
@@ -2798,7 +5410,7 @@ def atten_path_fast_cython(
     assert np.all(hprof_data['zone_r'] >= -1)
     assert np.all(hprof_data['zone_r'] <= 11)
 
-    with nogil, parallel():
+    with nogil, parallel(num_threads=num_threads):
 
         pp = <ppstruct *> malloc(sizeof(ppstruct))
         if pp == NULL:
@@ -2898,6 +5510,7 @@ def losses_complete_cython(
         hprof_dists=None,
         hprof_heights=None,
         hprof_bearing=None, hprof_backbearing=None,
+        nthreads=None,
         ):
 
     cdef:
@@ -2929,14 +5542,14 @@ def losses_complete_cython(
 
         double L_dummy
 
-        double *last_freq
-        double *last_h_tg
-        double *last_h_rg
-        int *last_version
-        int *last_zone_t
-        int *last_zone_r
+        # unique path geometries
+        ppstruct *geo_pps
+        double[:, ::1] geo_keys_v
+        np.ndarray[int] _geo_idx
+        int gi, num_geo
 
         int i, size
+        int num_threads = _get_num_threads(nthreads)
 
     assert np.all(time_percent <= 50.)
     assert np.all((version == 14) | (version == 16))
@@ -3025,171 +5638,155 @@ def losses_complete_cython(
         zone_r = np.array([-1])
 
 
-    # in the nditer, we first put all entities that have impact on the
-    # path geometry; this is to avoid unnecessary re-calculations
-
-    # these entities are:
+    # The entities that have impact on the path geometry are:
     # frequency, h_tg, h_rg, version, zone_t, zone_r
+    # To avoid unnecessary re-calculations, find all unique combinations
+    # of these (after broadcasting them among themselves) first, compute the
+    # associated path geometries once, and later only refer to the index
+    # of the unique geometry for each element.
 
-    it = np.nditer(
-        [
-            frequency, h_tg, h_rg, G_t, G_r, version, zone_t, zone_r,
-            temperature, pressure, time_percent, omega,
-            d_tm, d_lm, d_ct, d_cr, polarization,
-            # L_b0p, L_bd, L_bs, L_ba, L_b, L_b_corr,
-            None, None, None, None, None, None,
-            # eps_pt, eps_pr, d_lt, d_lr, path_type
-            None, None, None, None, None,
-            ],
-        flags=['external_loop', 'buffered', 'delay_bufalloc'],
-        op_flags=[['readonly']] * 17 + [['readwrite', 'allocate']] * 11,
-        op_dtypes=(
-            ['float64'] * 5 + ['int32'] * 3 +
-            ['float64'] * 8 + ['int32'] * 1 +
-            ['float64'] * 10 + ['int32'] * 1
-            ),
+    geo_inputs = np.broadcast_arrays(
+        frequency, h_tg, h_rg, version, zone_t, zone_r
         )
+    geo_shape = geo_inputs[0].shape
+    geo_keys, geo_idx = np.unique(
+        np.column_stack([
+            np.asarray(g, dtype=np.float64).ravel() for g in geo_inputs
+            ]),
+        axis=0, return_inverse=True,
+        )
+    geo_idx = geo_idx.reshape(geo_shape).astype(np.int32)
+    geo_keys_v = geo_keys
+    num_geo = geo_keys.shape[0]
+
+    geo_pps = <ppstruct *> malloc(num_geo * sizeof(ppstruct))
+    if geo_pps == NULL:
+        raise MemoryError('Could not allocate path geometry buffer.')
+
+    try:
+
+        for gi in prange(
+                num_geo, nogil=True, schedule='dynamic',
+                num_threads=num_threads
+                ):
+
+            geo_pps[gi].lon_mid = lon_mid
+            geo_pps[gi].lat_mid = lat_mid
+            geo_pps[gi].hprof_step = hprof_step  # dummy
+            geo_pps[gi].distance = distance
+            geo_pps[gi].bearing = bearing
+            geo_pps[gi].back_bearing = back_bearing
+            geo_pps[gi].alpha_tr = bearing
+            geo_pps[gi].alpha_rt = back_bearing
+            geo_pps[gi].delta_N = _delta_N
+            geo_pps[gi].N0 = _N0
+
+            geo_pps[gi].freq = geo_keys_v[gi, 0]
+            geo_pps[gi].wavelen = 0.299792458 / geo_pps[gi].freq
+            geo_pps[gi].version = <int> geo_keys_v[gi, 3]
+            geo_pps[gi].zone_t = <int> geo_keys_v[gi, 4]
+            geo_pps[gi].zone_r = <int> geo_keys_v[gi, 5]
+            geo_pps[gi].h_tg_in = geo_keys_v[gi, 1]
+            geo_pps[gi].h_rg_in = geo_keys_v[gi, 2]
+
+            if geo_pps[gi].zone_t == CLUTTER.UNKNOWN:
+                geo_pps[gi].h_tg = geo_keys_v[gi, 1]
+            else:
+                geo_pps[gi].h_tg = f_max(
+                    _clut_data[geo_pps[gi].zone_t, 0], geo_keys_v[gi, 1]
+                    )
 
-    it.reset()
-    for (
-            _freq, _h_tg, _h_rg, _G_t, _G_r, _version, _zone_t, _zone_r,
-            _temp, _press, _time_percent, _omega,
-            _d_tm, _d_lm, _d_ct, _d_cr, _polarization,
-            _L_b0p, _L_bd, _L_bs, _L_ba, _L_b, _L_b_corr,
-            _eps_pt, _eps_pr, _d_lt, _d_lr, _path_type,
-            ) in it:
-
-        with nogil, parallel():
-
-            # could not find a solution to make last_h_tg a thread-local
-            # variable; using an array does the trick (but is ugly!!!)
-            last_freq = <double *> malloc(sizeof(double))
-            if last_freq == NULL:
-                abort()
-            last_h_tg = <double *> malloc(sizeof(double))
-            if last_h_tg == NULL:
-                abort()
-            last_h_rg = <double *> malloc(sizeof(double))
-            if last_h_rg == NULL:
-                abort()
-            last_version = <int *> malloc(sizeof(int))
-            if last_version == NULL:
-                abort()
-            last_zone_t = <int *> malloc(sizeof(int))
-            if last_zone_t == NULL:
-                abort()
-            last_zone_r = <int *> malloc(sizeof(int))
-            if last_zone_r == NULL:
-                abort()
-
-            last_freq[0] = NAN
-            last_h_tg[0] = NAN
-            last_h_rg[0] = NAN
-            last_version[0] = -1000
-            last_zone_t[0] = -1000
-            last_zone_r[0] = -1000
-
-            pp = <ppstruct *> malloc(sizeof(ppstruct))
-            if pp == NULL:
-                abort()
+            if geo_pps[gi].zone_r == CLUTTER.UNKNOWN:
+                geo_pps[gi].h_rg = geo_keys_v[gi, 2]
+            else:
+                geo_pps[gi].h_rg = f_max(
+                    _clut_data[geo_pps[gi].zone_r, 0], geo_keys_v[gi, 2]
+                    )
 
-            # pp.lon_t = lon_t
-            # pp.lat_t = lat_t
-            # pp.lon_r = lon_r
-            # pp.lat_r = lat_r
-            pp.lon_mid = lon_mid
-            pp.lat_mid = lat_mid
-            pp.hprof_step = hprof_step  # dummy
-            pp.distance = distance
-            pp.bearing = bearing
-            pp.back_bearing = back_bearing
-            pp.alpha_tr = bearing
-            pp.alpha_rt = back_bearing
-            pp.delta_N = _delta_N
-            pp.N0 = _N0
-
-            size = _freq.shape[0]
-
-            for i in prange(size):
-
-                if (
-                        _freq[i] != last_freq[0] or
-                        _h_tg[i] != last_h_tg[0] or
-                        _h_rg[i] != last_h_rg[0] or
-                        _version[i] != last_version[0] or
-                        _zone_t[i] != last_zone_t[0] or
-                        _zone_r[i] != last_zone_r[0]
-                        ):
-                    last_freq[0] = _freq[i]
-                    last_h_tg[0] = _h_tg[i]
-                    last_h_rg[0] = _h_rg[i]
-                    last_version[0] = _version[i]
-                    last_zone_t[0] = _zone_t[i]
-                    last_zone_r[0] = _zone_r[i]
-
-                    # need to re-process path geometry ...
-                    pp.version = _version[i]
-                    pp.freq = _freq[i]
-                    pp.wavelen = 0.299792458 / pp.freq
-                    pp.zone_t = _zone_t[i]
-                    pp.zone_r = _zone_r[i]
-                    if pp.zone_t == CLUTTER.UNKNOWN:
-                        pp.h_tg = _h_tg[i]
-                    else:
-                        pp.h_tg = f_max(_clut_data[pp.zone_t, 0], _h_tg[i])
+            _process_path(
+                &geo_pps[gi],
+                distances_v,
+                heights_v,
+                zheights_v,
+                )
 
-                    if pp.zone_r == CLUTTER.UNKNOWN:
-                        pp.h_rg = _h_rg[i]
-                    else:
-                        pp.h_rg = f_max(_clut_data[pp.zone_r, 0], _h_rg[i])
-                    pp.h_tg_in = _h_tg[i]
-                    pp.h_rg_in = _h_rg[i]
+        it = np.nditer(
+            [
+                geo_idx, G_t, G_r,
+                temperature, pressure, time_percent, omega,
+                d_tm, d_lm, d_ct, d_cr, polarization,
+                # L_b0p, L_bd, L_bs, L_ba, L_b, L_b_corr,
+                None, None, None, None, None, None,
+                # eps_pt, eps_pr, d_lt, d_lr, path_type
+                None, None, None, None, None,
+                ],
+            flags=['external_loop', 'buffered', 'delay_bufalloc'],
+            op_flags=[['readonly']] * 12 + [['readwrite', 'allocate']] * 11,
+            op_dtypes=(
+                ['int32'] * 1 + ['float64'] * 10 + ['int32'] * 1 +
+                ['float64'] * 10 + ['int32'] * 1
+                ),
+            )
 
-                    _process_path(
-                        pp,
-                        distances_v,
-                        heights_v,
-                        zheights_v,
+        it.reset()
+        for (
+                _geo_idx, _G_t, _G_r,
+                _temp, _press, _time_percent, _omega,
+                _d_tm, _d_lm, _d_ct, _d_cr, _polarization,
+                _L_b0p, _L_bd, _L_bs, _L_ba, _L_b, _L_b_corr,
+                _eps_pt, _eps_pr, _d_lt, _d_lr, _path_type,
+                ) in it:
+
+            with nogil, parallel(num_threads=num_threads):
+
+                pp = <ppstruct *> malloc(sizeof(ppstruct))
+                if pp == NULL:
+                    abort()
+
+                size = _geo_idx.shape[0]
+
+                for i in prange(size):
+
+                    # start from the pre-computed path geometry
+                    pp[0] = geo_pps[_geo_idx[i]]
+
+                    pp.temperature = _temp[i]
+                    pp.pressure = _press[i]
+                    pp.d_tm = _d_tm[i]
+                    pp.d_lm = _d_lm[i]
+                    pp.d_ct = _d_ct[i]
+                    pp.d_cr = _d_cr[i]
+                    pp.time_percent = _time_percent[i]
+                    pp.polarization = _polarization[i]
+                    pp.omega = _omega[i]
+                    pp.beta0 = _beta_from_DN_N0(
+                        pp.lat_mid, pp.delta_N, pp.N0, pp.d_tm, pp.d_lm
                         )
 
-                pp.temperature = _temp[i]
-                pp.pressure = _press[i]
-                pp.d_tm = _d_tm[i]
-                pp.d_lm = _d_lm[i]
-                pp.d_ct = _d_ct[i]
-                pp.d_cr = _d_cr[i]
-                pp.time_percent = _time_percent[i]
-                pp.polarization = _polarization[i]
-                pp.omega = _omega[i]
-                pp.beta0 = _beta_from_DN_N0(
-                    pp.lat_mid, pp.delta_N, pp.N0, pp.d_tm, pp.d_lm
-                    )
-
-                (
-                    _L_b0p[i],
-                    _L_bd[i],
-                    _L_bs[i],
-                    _L_ba[i],
-                    _L_b[i],
-                    _L_b_corr[i],
-                    L_dummy,
-                    ) = _path_attenuation_complete(pp[0], _G_t[i], _G_r[i])
-
-                _eps_pt[i] = pp.eps_pt
-                _eps_pr[i] = pp.eps_pr
-                _d_lt[i] = pp.d_lt
-                _d_lr[i] = pp.d_lr
-                _path_type[i] = pp.path_type
-
-            free(last_freq)
-            free(last_h_tg)
-            free(last_h_rg)
-            free(last_version)
-            free(last_zone_t)
-            free(last_zone_r)
-            free(pp)
-
-    out = it.operands[17:]
+                    (
+                        _L_b0p[i],
+                        _L_bd[i],
+                        _L_bs[i],
+                        _L_ba[i],
+                        _L_b[i],
+                        _L_b_corr[i],
+                        L_dummy,
+                        ) = _path_attenuation_complete(
+                            pp[0], _G_t[i], _G_r[i]
+                            )
+
+                    _eps_pt[i] = pp.eps_pt
+                    _eps_pr[i] = pp.eps_pr
+                    _d_lt[i] = pp.d_lt
+                    _d_lr[i] = pp.d_lr
+                    _path_type[i] = pp.path_type
+
+                free(pp)
+
+    finally:
+        free(geo_pps)
+
+    out = it.operands[12:]
     return out
 
 
@@ -27,6 +27,7 @@ def geoid_inverse(
         lon2, lat2,
         eps=1.e-12,  # corresponds to approximately 0.06mm
         maxiter=50,
+        nthreads=None,
         ):
     '''
     Solve inverse Geodesics problem using Vincenty's formulae.
@@ -49,6 +50,9 @@ def geoid_inverse(
         Accuracy of calculation (default: 1.e-12)
     maxiter : int, optional
         Maximum number of iterations to perform (default: 50)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -65,7 +69,9 @@ def geoid_inverse(
     or the number of iterations exceeds `maxiter`.
     '''
 
-    return inverse_cython(lon1, lat1, lon2, lat2, eps=eps, maxiter=maxiter)
+    return inverse_cython(
+        lon1, lat1, lon2, lat2, eps=eps, maxiter=maxiter, nthreads=nthreads
+        )
 
 
 @utils.ranged_quantity_input(
@@ -81,6 +87,7 @@ def geoid_direct(
         bearing1, dist,
         eps=1.e-12,  # corresponds to approximately 0.06mm
         maxiter=50,
+        nthreads=None,
         ):
     '''
     Solve direct Geodesics problem using Vincenty's formulae.
@@ -104,6 +111,9 @@ def geoid_direct(
         Accuracy of calculation (default: 1.e-12)
     maxiter : int, optional
         Maximum number of iterations to perform (default: 50)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -121,7 +131,8 @@ def geoid_direct(
     '''
 
     return direct_cython(
-        lon1, lat1, bearing1, dist, eps=eps, maxiter=maxiter, wrap=True
+        lon1, lat1, bearing1, dist, eps=eps, maxiter=maxiter, wrap=True,
+        nthreads=nthreads,
         )
 
 
@@ -133,7 +144,7 @@ def geoid_direct(
     strip_input_units=True,
     output_unit=(apu.m ** 2)
     )
-def geoid_area(lon1, lon2, lat1, lat2):
+def geoid_area(lon1, lon2, lat1, lat2, nthreads=None):
     '''
     Calculate WGS84 surface area over interval [lon1, lon2] and [lat1, lat2].
 
@@ -147,6 +158,9 @@ def geoid_area(lon1, lon2, lat1, lat2):
         Geographic latitude of lower bound [rad]
     lat2 : `~astropy.units.Quantity`
         Geographic latitude of upper bound [rad]
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -158,7 +172,7 @@ def geoid_area(lon1, lon2, lat1, lat2):
     This was adapted from a thread on `math.stackexchange.com <https://math.stackexchange.com/questions/1379341/how-to-find-the-surface-area-of-revolution-of-an-ellipsoid-from-ellipse-rotating>`__.
     '''
 
-    return area_wgs84_cython(lon1, lon2, lat1, lat2)
+    return area_wgs84_cython(lon1, lon2, lat1, lat2, nthreads=nthreads)
 
 
 if __name__ == '__main__':
@@ -5,9 +5,12 @@ from __future__ import (
     absolute_import, unicode_literals, division, print_function
     )
 
+import os
+import zlib
+import weakref
+from collections import OrderedDict
 from astropy import units as u
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
 from astropy.utils.data import get_pkg_data_filename
 from . import cyprop
 from .. import geospatial
@@ -18,7 +21,8 @@ __all__ = [
     'CORINE_TO_P452_CLASSES', 'IGBP_TO_P452_CLASSES', 'P452_CLUTTER_COLORS',
     'landcover_to_p452_clutter_zones',
     'wgs84_to_geotiff_pixels',
-    'regrid_from_geotiff',
+    'GeoTiffSampler', 'regrid_from_geotiff',
+    'MapWriter', 'write_map',
     ]
 
 
@@ -161,12 +165,72 @@ def landcover_to_p452_clutter_zones(landcover_map, conversion_table):
       | 17 Water bodies
     '''
 
-    clutter_map = np.full(landcover_map.shape, -1, dtype=np.int8)
-    for cor_id, cl_name in conversion_table.items():
-        mask = landcover_map == cor_id
-        clutter_map[mask] = getattr(cyprop.CLUTTER, cl_name)
+    # use a lookup table (LUT) instead of looping over all classes
+    return _apply_lookup_table(landcover_map, conversion_table)
 
-    return clutter_map
+
+def _lookup_table(conversion_table, enum=cyprop.CLUTTER):
+    # LUT for the mapping of IDs to enum values (-1 for unmapped IDs)
+
+    if len(conversion_table) == 0:
+        return 0, np.empty(0, dtype=np.int8)
+
+    ids = np.array(list(conversion_table.keys()), dtype=np.int64)
+    values = np.array([
+        getattr(enum, name) for name in conversion_table.values()
+        ], dtype=np.int8)
+
+    offset = ids.min()
+    lut = np.full(ids.max() - offset + 1, -1, dtype=np.int8)
+    lut[ids - offset] = values
+
+    return offset, lut
+
+
+def _apply_lookup_table(id_map, conversion_table, enum=cyprop.CLUTTER):
+
+    offset, lut = _lookup_table(conversion_table, enum=enum)
+
+    id_map = np.asarray(id_map)
+    lut_idx = id_map.astype(np.int64) - offset
+    valid = (lut_idx >= 0) & (lut_idx < len(lut))
+
+    value_map = np.full(id_map.shape, -1, dtype=np.int8)
+    value_map[valid] = lut[lut_idx[valid]]
+
+    return value_map
+
+
+def _check_geotiff(geotiff):
+
+    try:
+        import rasterio as rio
+    except ImportError as e:
+        print('Python package rasterio is needed for this function.')
+        raise e
+
+    if not isinstance(geotiff, rio.io.DatasetReader):
+        raise TypeError(
+            '"geotiff" parameter must be an instance of '
+            '"rasterio.io.DatasetReader" (a Rasterio geotiff file object)'
+            )
+
+
+def _wgs84_to_geotiff_pixels(geotiff, lons, lats):
+    # angles in deg
+
+    lons, lats = np.broadcast_arrays(
+        lons, lats
+        ) * u.deg
+    wgs84_to_crs_world = geospatial.transform_factory(
+        geospatial.EPSG.WGS84, geotiff.crs.to_proj4()
+        )
+    wx, wy = wgs84_to_crs_world(lons, lats)
+    px, py = (~geotiff.transform) * np.array([
+        wx.value.flatten(), wy.value.flatten()
+        ])
+
+    return px.reshape(lons.shape), py.reshape(lats.shape)
 
 
 @utils.ranged_quantity_input(
@@ -199,30 +263,299 @@ def wgs84_to_geotiff_pixels(geotiff, lons, lats):
         position(s) in the given GeoTiff raster map.
     '''
 
-    try:
-        import rasterio as rio
-    except ImportError as e:
-        print('Python package rasterio is needed for this function.')
-        raise e
+    _check_geotiff(geotiff)
 
-    if not isinstance(geotiff, rio.io.DatasetReader):
-        raise TypeError(
-            '"geotiff" parameter must be an instance of '
-            '"rasterio.io.DatasetReader" (a Rasterio geotiff file object)'
-            )
+    return _wgs84_to_geotiff_pixels(geotiff, lons, lats)
 
-    lons, lats = np.broadcast_arrays(
-        lons, lats
-        ) * u.deg
-    wgs84_to_crs_world = geospatial.transform_factory(
-        geospatial.EPSG.WGS84, geotiff.crs.to_proj4()
+
+class GeoTiffSampler(object):
+    '''
+    Sampler to query GeoTiff raster values for WGS84 coordinates.
+
+    Unlike a naive approach, which would read the full bounding window of
+    all requested positions into memory, the `GeoTiffSampler` only reads
+    the raster blocks that are actually touched by the requested positions.
+    The block layout follows the internal tiling (or striping) of the
+    GeoTiff file. Blocks are kept in a least-recently-used (LRU) cache,
+    such that repeated queries on the same region do not need to access
+    the file again. The raster values are computed via direct index
+    arithmetic, i.e., no interpolator objects need to be constructed.
+
+    Parameters
+    ----------
+    geotiff : `~rasterio.io.DatasetReader` instance
+        A geotiff raster map opened with the Python package `Rasterio
+        <https://rasterio.readthedocs.io/>`_.
+    cache_size : int, optional
+        Maximum number of raster blocks (per band) to keep in the cache.
+        (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.geotiff_cache_size`)
+
+    Returns
+    -------
+    geotiff_sampler : `~pycraf.pathprof.GeoTiffSampler`
+        A `~pycraf.pathprof.GeoTiffSampler` instance.
+
+    Examples
+    --------
+
+    A typical use case would be to query landcover data for a large
+    number of (sparse) positions::
+
+        >>> import rasterio as rio  # doctest: +SKIP
+        >>> from pycraf import pathprof
+        >>> from astropy import units as u
+
+        >>> with rio.open('corine.tif') as geotiff:  # doctest: +SKIP
+        ...     sampler = pathprof.GeoTiffSampler(geotiff)
+        ...     landcover = sampler(lons, lats)
+        ...     # cached blocks are re-used
+        ...     landcover2 = sampler(lons2, lats2)
+
+    Notes
+    -----
+    - The raster values are assumed to be associated with the integer
+      pixel coordinates as returned by
+      `~pycraf.pathprof.wgs84_to_geotiff_pixels`. This is consistent
+      with the behavior of `~pycraf.pathprof.regrid_from_geotiff`.
+    - The `GeoTiffSampler` keeps a reference to the GeoTiff file object.
+      Once the file is closed, blocks which are not yet in the cache can
+      not be read anymore.
+    '''
+
+    def __init__(self, geotiff, cache_size=None):
+
+        _check_geotiff(geotiff)
+
+        if cache_size is None:
+            cache_size = utils.PerformanceConf.geotiff_cache_size
+
+        if cache_size < 1:
+            raise ValueError('"cache_size" must be a positive integer.')
+
+        self._geotiff = geotiff
+        self._width = geotiff.width
+        self._height = geotiff.height
+        self._num_bands = geotiff.count
+        self._block_shapes = list(geotiff.block_shapes)
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def cache_clear(self):
+        '''
+        Remove all raster blocks from the cache.
+        '''
+
+        self._cache.clear()
+
+    def _read_block(self, band, brow, bcol):
+
+        key = (band, brow, bcol)
+
+        try:
+            block = self._cache.pop(key)
+        except KeyError:
+            import rasterio as rio
+
+            bh, bw = self._block_shapes[band - 1]
+            row_off, col_off = brow * bh, bcol * bw
+            window = rio.windows.Window(
+                col_off, row_off,
+                min(bw, self._width - col_off),
+                min(bh, self._height - row_off),
+                )
+            block = self._geotiff.read(band, window=window)
+
+            if len(self._cache) >= self._cache_size * self._num_bands:
+                self._cache.popitem(last=False)
+
+        self._cache[key] = block
+
+        return block
+
+    def _gather(self, band, xidx, yidx, out):
+        # xidx, yidx must be flat and in bounds; out is flat, too
+
+        bh, bw = self._block_shapes[band - 1]
+        num_bcols = (self._width + bw - 1) // bw
+
+        brows, bcols = yidx // bh, xidx // bw
+        block_ids = brows * num_bcols + bcols
+
+        # group all positions by the block in which they reside
+        ublock_ids, inverse = np.unique(block_ids, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        splits = np.cumsum(np.bincount(inverse))[:-1]
+
+        for block_id, idx in zip(ublock_ids, np.split(order, splits)):
+
+            brow, bcol = divmod(int(block_id), num_bcols)
+            block = self._read_block(band, brow, bcol)
+            out[idx] = block[yidx[idx] - brow * bh, xidx[idx] - bcol * bw]
+
+    @utils.ranged_quantity_input(
+        lons=(-180, 180, u.deg),
+        lats=(-90, 90, u.deg),
+        strip_input_units=True,
+        output_unit=None,
         )
-    wx, wy = wgs84_to_crs_world(lons, lats)
-    px, py = (~geotiff.transform) * np.array([
-        wx.value.flatten(), wy.value.flatten()
-        ])
+    def sample(
+            self, lons, lats, bands=1, interp='nearest', fill_value=None
+            ):
+        '''
+        Sample GeoTiff raster values for given WGS84 coordinates.
 
-    return px.reshape(lons.shape), py.reshape(lats.shape)
+        Parameters
+        ----------
+        lons, lats : `~astropy.units.Quantity`
+            Geographic longitudes/latitudes (WGS84) [deg]
+        bands : int or sequence of int, optional
+            The GeoTiff band(s) to use. (default: 1)
+        interp : str, optional
+            Interpolation method, either 'nearest' or 'linear' (bi-linear).
+            (default: 'nearest')
+        fill_value : number, optional
+            If given, positions outside of the GeoTiff raster are assigned
+            this value instead of raising an error. (default: None)
+
+        Returns
+        -------
+        geo_data_sampled : `~numpy.ndarray`
+            Raster values at the given longitude and latitude positions.
+            If `bands` is a sequence, the first axis of the returned
+            array refers to the bands. For nearest-neighbor interpolation
+            the data type of the raster is preserved, for bi-linear
+            interpolation float64 values are returned.
+
+        Raises
+        ------
+        ValueError
+            If any of the positions is outside of the GeoTiff raster (and
+            `fill_value` is None).
+        '''
+
+        if interp not in ['nearest', 'linear']:
+            raise ValueError(
+                'Only the values "nearest" and "linear" are supported for '
+                '"interp" option.'
+                )
+
+        single_band = np.isscalar(bands)
+        bands = [int(b) for b in np.atleast_1d(bands)]
+
+        if any(b < 1 or b > self._num_bands for b in bands):
+            raise ValueError(
+                'Band indices must be between 1 and {}.'.format(
+                    self._num_bands
+                    ))
+
+        px, py = _wgs84_to_geotiff_pixels(self._geotiff, lons, lats)
+        shape = px.shape
+        px, py = px.flatten(), py.flatten()
+
+        # nearest pixel (ties are rounded down, as scipy does)
+        xidx = np.ceil(px - 0.5).astype(np.int64)
+        yidx = np.ceil(py - 0.5).astype(np.int64)
+
+        inside = (
+            (xidx >= 0) & (xidx < self._width) &
+            (yidx >= 0) & (yidx < self._height)
+            )
+        if fill_value is None and not np.all(inside):
+            raise ValueError(
+                'Some of the requested positions are outside of the GeoTiff '
+                'raster.'
+                )
+
+        all_inside = np.all(inside)
+        if not all_inside:
+            px, py = px[inside], py[inside]
+            xidx, yidx = xidx[inside], yidx[inside]
+
+        if interp == 'nearest':
+
+            dtypes = [self._geotiff.dtypes[b - 1] for b in bands]
+            if not all_inside:
+                dtypes.append(np.min_scalar_type(fill_value))
+            geo_data = np.empty(
+                (len(bands), px.size), dtype=np.result_type(*dtypes)
+                )
+            for i, band in enumerate(bands):
+                self._gather(band, xidx, yidx, geo_data[i])
+
+        else:
+
+            x0 = np.clip(np.floor(px).astype(np.int64), 0, self._width - 1)
+            y0 = np.clip(np.floor(py).astype(np.int64), 0, self._height - 1)
+            x1 = np.minimum(x0 + 1, self._width - 1)
+            y1 = np.minimum(y0 + 1, self._height - 1)
+            wx = np.clip(px - x0, 0., 1.)
+            wy = np.clip(py - y0, 0., 1.)
+
+            geo_data = np.zeros((len(bands), px.size), dtype=np.float64)
+            corner = np.empty(px.size, dtype=np.float64)
+            for i, band in enumerate(bands):
+                for xi, yi, w in [
+                        (x0, y0, (1. - wx) * (1. - wy)),
+                        (x1, y0, wx * (1. - wy)),
+                        (x0, y1, (1. - wx) * wy),
+                        (x1, y1, wx * wy),
+                        ]:
+                    self._gather(band, xi, yi, corner)
+                    geo_data[i] += w * corner
+
+        if not all_inside:
+            _geo_data = np.full(
+                (len(bands), inside.size), fill_value, dtype=geo_data.dtype
+                )
+            _geo_data[:, inside] = geo_data
+            geo_data = _geo_data
+
+        geo_data = geo_data.reshape((len(bands),) + shape)
+
+        return geo_data[0] if single_band else geo_data
+
+    def __call__(
+            self, lons, lats, bands=1, interp='nearest', fill_value=None
+            ):
+        '''
+        Convenience method to allow using an *instance* of
+        `~pycraf.pathprof.GeoTiffSampler` like a function::
+
+            sampler = pathprof.GeoTiffSampler(geotiff)
+            sampler(lons, lats)
+
+        Calls `~pycraf.pathprof.GeoTiffSampler.sample` internally.
+        '''
+
+        return self.sample(
+            lons, lats, bands=bands, interp=interp, fill_value=fill_value
+            )
+
+
+# the block cache of a GeoTiffSampler should persist between several calls
+# of regrid_from_geotiff (with the same file object); the cached samplers
+# only hold a weak reference to their file object, such that the entries
+# are dropped together with the file objects
+_GEOTIFF_SAMPLERS = weakref.WeakKeyDictionary()
+
+
+def _get_geotiff_sampler(geotiff):
+
+    # the blocks of closed files are of no use anymore
+    for gt in [gt for gt in list(_GEOTIFF_SAMPLERS) if gt.closed]:
+        _GEOTIFF_SAMPLERS.pop(gt, None)
+
+    try:
+        return _GEOTIFF_SAMPLERS[geotiff]
+    except KeyError:
+        pass
+
+    sampler = GeoTiffSampler(geotiff)
+    sampler._geotiff = weakref.proxy(geotiff)
+    _GEOTIFF_SAMPLERS[geotiff] = sampler
+
+    return sampler
 
 
 @utils.ranged_quantity_input(
@@ -231,7 +564,7 @@ def wgs84_to_geotiff_pixels(geotiff, lons, lats):
     strip_input_units=False,
     output_unit=None,
     )
-def regrid_from_geotiff(geotiff, lons, lats, band=1):
+def regrid_from_geotiff(geotiff, lons, lats, band=1, interp='nearest'):
     '''
     Retrieve interpolated GeoTiff raster values for given WGS84 coordinates
     (longitude, latitude).
@@ -250,57 +583,650 @@ def regrid_from_geotiff(geotiff, lons, lats, band=1):
         <https://rasterio.readthedocs.io/>`_.
     lons, lats : `~astropy.units.Quantity`
         Geographic longitudes/latitudes (WGS84) [deg]
-    band : int, Optional (default: 1)
-        The GeoTiff band to use.
+    band : int or sequence of int, optional (default: 1)
+        The GeoTiff band(s) to use.
+    interp : str, optional
+        Interpolation method, either 'nearest' or 'linear' (bi-linear).
+        (default: 'nearest')
 
     Returns
     -------
     geo_data_regridded : `~numpy.ndarray`
         Regridded values of the input raster map on the given longitude and
-        latitude positions. If the input GeoTiff has more than one band and
-        you need to regrid several of the bands, please run the function
-        repeatedly, specifying the band parameter.
+        latitude positions. If `band` is a sequence of band indices, the
+        first axis of the returned array refers to the bands.
 
     Notes
     -----
-    If requested geo positions are all to close to the edge of the geotiff
-    file, the interpolation can fail (`~scipy.interpolate` will raise a
-    ValueError in such cases).
+    - Only the raster blocks (according to the internal tiling of the
+      GeoTiff file) that contain any of the requested positions are read
+      from disk. These are kept in a cache, which is re-used in subsequent
+      calls with the same file object. If you need more control over the
+      cache, use a `~pycraf.pathprof.GeoTiffSampler` instance directly.
+    - If requested geo positions are outside of the geotiff raster
+      a ValueError is raised.
+    '''
+
+    return _get_geotiff_sampler(geotiff).sample(
+        lons, lats, bands=band, interp=interp
+        )
+
+
+def _clutter_zones_on_map_grid(
+        landcover, conversion_table, xcoords, ycoords, default_zone
+        ):
+    '''
+    Clutter zone types for all pixels of a regular (lon, lat) map grid.
+
+    `landcover` is either a `~rasterio.io.DatasetReader` instance, which is
+    sampled (nearest neighbor) on the map grid, or a 2D array that is
+    already defined on the map grid (shape (len(ycoords), len(xcoords))).
+    If `conversion_table` is None, `landcover` is assumed to contain
+    clutter zone types, already. Pixels without a known clutter type (also
+    those outside of the GeoTiff raster) are set to `default_zone`.
+    Returns an int32 array (as used for the `zone_*_map` entries in
+    `hprof_data`).
     '''
 
+    xcoords, ycoords = np.asarray(xcoords), np.asarray(ycoords)
+    map_shape = (len(ycoords), len(xcoords))
+
     try:
         import rasterio as rio
-    except ImportError as e:
-        print('Python package rasterio is needed for this function.')
-        raise e
+        is_geotiff = isinstance(landcover, rio.io.DatasetReader)
+    except ImportError:
+        is_geotiff = False
 
-    if not isinstance(geotiff, rio.io.DatasetReader):
+    if is_geotiff:
+        # nodata and out-of-bounds pixels will be mapped to UNKNOWN by the
+        # lookup table, if -1 is not a valid landcover ID
+        landcover_map = _get_geotiff_sampler(landcover).sample(
+            xcoords[np.newaxis, :] * u.deg, ycoords[:, np.newaxis] * u.deg,
+            fill_value=-1,
+            )
+    else:
+        landcover_map = np.asarray(landcover)
+        if landcover_map.shape != map_shape:
+            raise ValueError(
+                'Shape of "landcover" array ({}) does not match map shape '
+                '({})'.format(landcover_map.shape, map_shape)
+                )
+
+    if conversion_table is None:
+        zone_map = landcover_map.astype(np.int32)
+    else:
+        zone_map = landcover_to_p452_clutter_zones(
+            landcover_map, conversion_table
+            ).astype(np.int32)
+
+    zone_map[
+        (zone_map <= cyprop.CLUTTER.UNKNOWN) |
+        (zone_map > cyprop.CLUTTER.INDUSTRIAL_ZONE)
+        ] = default_zone
+
+    return zone_map
+
+
+def _landsea_zones_func(landsea, conversion_table):
+    '''
+    Return a function that yields the radio-climatic zones (LANDSEA enum)
+    for given longitudes and latitudes [deg].
+
+    `landsea` is either a `~rasterio.io.DatasetReader` instance (nearest
+    neighbor sampling) or a callable with signature `f(lons, lats)`. If
+    `conversion_table` is given, the returned values are mapped to LANDSEA
+    names with it. Positions with unknown zone type (also those outside of
+    the GeoTiff raster) are considered as `LANDSEA.INLAND`.
+    '''
+
+    try:
+        import rasterio as rio
+        is_geotiff = isinstance(landsea, rio.io.DatasetReader)
+    except ImportError:
+        is_geotiff = False
+
+    if is_geotiff:
+        sampler = _get_geotiff_sampler(landsea)
+        fill_value = (
+            -1 if conversion_table is None else
+            min(conversion_table.keys()) - 1
+            )
+
+        def zone_func(lons, lats):
+            return sampler.sample(
+                lons * u.deg, lats * u.deg, fill_value=fill_value
+                )
+
+    elif callable(landsea):
+        zone_func = landsea
+
+    else:
         raise TypeError(
-            '"geotiff" parameter must be an instance of '
-            '"rasterio.io.DatasetReader" (a Rasterio geotiff file object)'
+            '"landsea" must be a rasterio geotiff file object or a callable'
             )
 
-    geo_x, geo_y = wgs84_to_geotiff_pixels(geotiff, lons, lats)
-
-    xmin, xmax = np.int32([geo_x.min(), geo_x.max()])
-    ymin, ymax = np.int32([geo_y.min(), geo_y.max()])
-    # slightly enlarge box to avoid edge effects
-    col_off, row_off = xmin - 5, ymin - 5
-    col_width, row_width = xmax - xmin + 10, ymax - ymin + 10
-    window = rio.windows.Window(col_off, row_off, col_width, row_width)
-
-    geo_data = geotiff.read(band, window=window)
-
-    # are the world coordinates associated with pixel centers?
-    # is there a shift about half a pixel necessary?
-    # --> according to https://gdal.org/user/raster_data_model.html#affine-geotransform
-    # the (0, 0) is the top left corner of the top left pixel
-    geo_interp = RegularGridInterpolator(
-        (np.arange(col_width), np.arange(row_width)),
-        geo_data.T,
-        method='nearest', bounds_error=True,
-        )
+    def landsea_func(lons, lats):
+
+        zones = zone_func(lons, lats)
+        if conversion_table is not None:
+            zones = _apply_lookup_table(
+                zones, conversion_table, enum=cyprop.LANDSEA
+                )
+
+        zones = np.array(zones, dtype=np.int8)
+        zones[
+            (zones < cyprop.LANDSEA.SEA) | (zones > cyprop.LANDSEA.INLAND)
+            ] = cyprop.LANDSEA.INLAND
+
+        return zones
+
+    return landsea_func
+
+
+_MAP_FORMATS = {
+    '.tif': 'geotiff', '.tiff': 'geotiff',
+    '.h5': 'hdf5', '.hdf5': 'hdf5', '.hdf': 'hdf5',
+    '.zarr': 'zarr',
+    }
+
+
+class _GeoTiffMapFile(object):
+    '''
+    Tiled, deflate-compressed GeoTiff; one band per map plane.
+    '''
+
+    def __init__(
+            self, filename, xcoords, ycoords, planes, chunks, level,
+            num_threads, fill_value
+            ):
+
+        try:
+            import rasterio as rio
+        except ImportError as e:
+            print('Python package rasterio is needed for this function.')
+            raise e
+
+        if chunks[0] % 16 or chunks[1] % 16:
+            raise ValueError(
+                'GeoTiff block sizes ("chunks") must be multiples of 16.'
+                )
+
+        ny, nx = len(ycoords), len(xcoords)
+        dx = (xcoords[-1] - xcoords[0]) / (nx - 1)
+        dy = (ycoords[-1] - ycoords[0]) / (ny - 1)
+        dtype = np.result_type(*planes.values())
+
+        # GeoTiff rows are ordered from north to south
+        self._flip = dy > 0
+        self._height = ny
+        self._bands = {name: i + 1 for i, name in enumerate(planes)}
+        self._dtype = dtype
+
+        # integer bands have no "nodata" value by default, as zero is
+        # usually a valid value
+        if fill_value is None and np.issubdtype(dtype, np.floating):
+            fill_value = np.nan
+
+        self._geotiff = rio.open(
+            filename, 'w',
+            driver='GTiff',
+            width=nx, height=ny, count=len(planes), dtype=dtype,
+            crs='EPSG:4326',
+            transform=rio.transform.from_origin(
+                xcoords[0] - dx / 2, max(ycoords) + abs(dy) / 2,
+                dx, abs(dy),
+                ),
+            nodata=fill_value,
+            tiled=True, blockysize=chunks[0], blockxsize=chunks[1],
+            compress='deflate', zlevel=level,
+            predictor=3 if np.issubdtype(dtype, np.floating) else 2,
+            num_threads=str(num_threads), bigtiff='if_safer',
+            )
+
+        for name, band in self._bands.items():
+            self._geotiff.set_band_description(band, name)
+
+    def write(self, name, data, row0, col0):
+
+        import rasterio as rio
+
+        h, w = data.shape
+        if self._flip:
+            data, row0 = data[::-1], self._height - row0 - h
+
+        self._geotiff.write(
+            np.asarray(data, dtype=self._dtype), self._bands[name],
+            window=rio.windows.Window(col0, row0, w, h),
+            )
+
+    def set_unit(self, name, unit):
+
+        self._geotiff.set_band_unit(self._bands[name], unit)
+
+    def close(self):
+
+        self._geotiff.close()
+
+
+class _HDF5MapFile(object):
+    '''
+    HDF5 file with one chunked, gzip-compressed data set per map plane.
+
+    Chunks that are completely covered by a written block are compressed
+    in parallel (zlib releases the GIL) and stored with direct chunk
+    writes, bypassing the (serial) HDF5 filter pipeline.
+    '''
+
+    def __init__(
+            self, filename, xcoords, ycoords, planes, chunks, level,
+            num_threads, fill_value
+            ):
+
+        import h5py
+
+        self._level = level
+        self._num_threads = num_threads
+        self._file = f = h5py.File(filename, 'w')
+        f.attrs['crs'] = 'EPSG:4326'
+
+        for key, coords in [('xcoords', xcoords), ('ycoords', ycoords)]:
+            f[key] = coords
+            f[key].attrs['unit'] = 'deg'
+            f[key].make_scale(key)
+
+        shape = (len(ycoords), len(xcoords))
+        for name, dtype in planes.items():
+            dset = f.create_dataset(
+                name, shape=shape, dtype=dtype,
+                chunks=(min(chunks[0], shape[0]), min(chunks[1], shape[1])),
+                compression='gzip', compression_opts=level,
+                fillvalue=_fill_value(fill_value, dtype),
+                )
+            dset.dims[0].attach_scale(f['ycoords'])
+            dset.dims[1].attach_scale(f['xcoords'])
+
+    def write(self, name, data, row0, col0):
+
+        dset = self._file[name]
+        data = np.asarray(data, dtype=dset.dtype)
+        (ny, nx), (cy, cx) = dset.shape, dset.chunks
+        row1, col1 = row0 + data.shape[0], col0 + data.shape[1]
+
+        # range of chunks that are completely covered by the block
+        crow0, ccol0 = -(-row0 // cy), -(-col0 // cx)
+        crow1 = -(-ny // cy) if row1 == ny else row1 // cy
+        ccol1 = -(-nx // cx) if col1 == nx else col1 // cx
+
+        if crow1 <= crow0 or ccol1 <= ccol0:
+            dset[row0:row1, col0:col1] = data
+            return
+
+        # the other parts are written with the normal mechanism
+        frow0, frow1 = crow0 * cy, min(crow1 * cy, ny)
+        fcol0, fcol1 = ccol0 * cx, min(ccol1 * cx, nx)
+        for r0, r1, c0, c1 in [
+                (row0, frow0, col0, col1), (frow1, row1, col0, col1),
+                (frow0, frow1, col0, fcol0), (frow0, frow1, fcol1, col1),
+                ]:
+            if r1 > r0 and c1 > c0:
+                dset[r0:r1, c0:c1] = data[
+                    r0 - row0:r1 - row0, c0 - col0:c1 - col0
+                    ]
+
+        offsets = [
+            (i * cy, j * cx)
+            for i in range(crow0, crow1) for j in range(ccol0, ccol1)
+            ]
+        fill = dset.fillvalue
+
+        def _compress(offset):
+            # edge chunks are padded to the full chunk size
+            r0, c0 = offset
+            chunk = np.full((cy, cx), fill, dtype=dset.dtype)
+            block = data[r0 - row0:r0 - row0 + cy, c0 - col0:c0 - col0 + cx]
+            chunk[:block.shape[0], :block.shape[1]] = block
+            return zlib.compress(chunk.tobytes(), self._level)
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=self._num_threads) as executor:
+            for offset, buf in zip(offsets, executor.map(_compress, offsets)):
+                dset.id.write_direct_chunk(offset, buf)
+
+    def set_unit(self, name, unit):
+
+        self._file[name].attrs['unit'] = unit
+
+    def close(self):
+
+        self._file.close()
+
+
+class _ZarrMapFile(object):
+    '''
+    Zarr group with one chunked, Blosc-compressed array per map plane.
+
+    Blosc uses multiple threads for (de-)compression. The coordinates are
+    stored following the xarray conventions.
+    '''
+
+    def __init__(
+            self, filename, xcoords, ycoords, planes, chunks, level,
+            num_threads, fill_value
+            ):
+
+        try:
+            import zarr
+            from numcodecs import blosc, Blosc
+        except ImportError as e:
+            print('Python package zarr is needed for this function.')
+            raise e
+
+        blosc.set_nthreads(num_threads)
+
+        # Zarr (format 2) layout, which is understood by all versions
+        if int(zarr.__version__.split('.')[0]) >= 3:
+            group_kwargs = {'zarr_format': 2}
+        else:
+            group_kwargs = {}
+
+        self._group = g = zarr.open_group(filename, mode='w', **group_kwargs)
+        g.attrs['crs'] = 'EPSG:4326'
+
+        for key, coords in [('xcoords', xcoords), ('ycoords', ycoords)]:
+            g.create_dataset(key, data=coords)
+            g[key].attrs.update({'_ARRAY_DIMENSIONS': [key], 'unit': 'deg'})
+
+        shape = (len(ycoords), len(xcoords))
+        for name, dtype in planes.items():
+            arr = g.create_dataset(
+                name, shape=shape, dtype=dtype, chunks=chunks,
+                compressor=Blosc(
+                    cname='zstd', clevel=level, shuffle=Blosc.SHUFFLE
+                    ),
+                fill_value=_fill_value(fill_value, dtype),
+                )
+            arr.attrs['_ARRAY_DIMENSIONS'] = ['ycoords', 'xcoords']
+
+    def write(self, name, data, row0, col0):
+
+        arr = self._group[name]
+        arr[row0:row0 + data.shape[0], col0:col0 + data.shape[1]] = data
+
+    def set_unit(self, name, unit):
+
+        self._group[name].attrs['unit'] = unit
+
+    def close(self):
+
+        pass
+
+
+_MAP_FILE_CLASSES = {
+    'geotiff': _GeoTiffMapFile,
+    'hdf5': _HDF5MapFile,
+    'zarr': _ZarrMapFile,
+    }
+
+
+def _fill_value(fill_value, dtype):
+
+    if fill_value is None:
+        return np.nan if np.issubdtype(dtype, np.floating) else 0
+
+    return fill_value
+
+
+class MapWriter(object):
+    '''
+    Writer to store map planes (e.g., attenuation maps) block by block.
+
+    The maps are written to a tiled, compressed GeoTiff, an HDF5 file, or
+    a Zarr store, along with the (WGS84) georeferencing. Because the
+    planes can be written in blocks (at arbitrary positions), the full
+    results of large map calculations never need to be held in memory.
+
+    Parameters
+    ----------
+    filename : str
+        Output file name. The format is inferred from the file extension
+        ('.tif', '.tiff', '.h5', '.hdf5', '.hdf', or '.zarr'), unless
+        `fmt` is given.
+    xcoords, ycoords : `~numpy.ndarray` or `~astropy.units.Quantity`, 1D
+        Longitudes and latitudes of the map pixel centers [deg] (as in
+        the output of `~pycraf.pathprof.height_map_data`). Both need to
+        be equally spaced.
+    planes : dict or sequence of str
+        Names of the map planes. If a dict is given, its values define
+        the data types of the planes (default: float32). For GeoTiff
+        files (one band per plane), all bands have a common data type.
+    fmt : str, optional
+        File format; one of 'geotiff', 'hdf5', or 'zarr'. (default: None)
+    chunks : int or tuple of int, optional
+        Chunk (or GeoTiff block) size in pixels, as `(rows, cols)`.
+        For GeoTiff files, the sizes must be multiples of 16.
+        (default: 256)
+    compression_level : int, optional
+        Compression level (deflate for GeoTiff and HDF5, zstd for Zarr).
+        (default: 6)
+    num_threads : int, optional
+        Number of threads used for compression. If None, the number of
+        CPUs is used. (default: None)
+    fill_value : number, optional
+        Value of pixels that are never written (and GeoTiff "nodata"
+        value). If None, this is NaN for float and zero for integer data
+        types. (default: None)
+
+    Examples
+    --------
+
+    Writing the results of a block-wise calculation::
+
+        >>> from pycraf import pathprof
+
+        >>> planes = ['L_b', 'L_b_corr']
+        >>> with pathprof.MapWriter(  # doctest: +SKIP
+        ...         'atten.tif', xcoords, ycoords, planes
+        ...         ) as writer:
+        ...     for row0, results in compute_blocks():
+        ...         writer.write(results, row0=row0)
+
+    Notes
+    -----
+    - GeoTiff files use the (WGS84) EPSG:4326 coordinate system. As
+      usual, the rows are stored from north to south, i.e., flipped
+      w.r.t. the maps produced by pycraf (if `ycoords` is increasing).
+      GDAL compresses the blocks with `num_threads` threads.
+    - HDF5 files contain one data set per plane and the `xcoords` and
+      `ycoords` data sets, which are attached as dimension scales.
+      Chunks that are completely covered by a written block are
+      compressed in parallel. Writing blocks that are aligned with the
+      chunks (e.g., full chunk rows) is therefore most efficient.
+    - Zarr stores contain one array per plane, and the coordinates are
+      stored following the xarray conventions, such that they can be
+      opened with `xarray.open_zarr`.
+    - Units of `~astropy.units.Quantity` inputs are stored as metadata
+      ("unit" attribute, or GeoTiff band unit).
+    '''
+
+    def __init__(
+            self, filename, xcoords, ycoords, planes, fmt=None, chunks=256,
+            compression_level=6, num_threads=None, fill_value=None,
+            ):
+
+        if fmt is None:
+            ext = os.path.splitext(str(filename).rstrip('/'))[1].lower()
+            try:
+                fmt = _MAP_FORMATS[ext]
+            except KeyError:
+                raise ValueError(
+                    'Cannot infer file format from extension "{}"; use '
+                    'the "fmt" parameter.'.format(ext)
+                    )
+
+        if fmt not in _MAP_FILE_CLASSES:
+            raise ValueError(
+                '"fmt" must be one of {}'.format(list(_MAP_FILE_CLASSES))
+                )
+
+        xcoords = u.Quantity(xcoords, u.deg).value
+        ycoords = u.Quantity(ycoords, u.deg).value
+        for coords in [xcoords, ycoords]:
+            if coords.ndim != 1 or len(coords) < 2:
+                raise ValueError(
+                    '"xcoords" and "ycoords" must be 1D with at least two '
+                    'entries.'
+                    )
+            steps = np.diff(coords)
+            if not np.allclose(steps, steps[0], rtol=1.e-6, atol=0):
+                raise ValueError(
+                    '"xcoords" and "ycoords" must be equally spaced.'
+                    )
+
+        if not isinstance(planes, dict):
+            planes = {name: np.float32 for name in planes}
+        planes = {name: np.dtype(dt) for name, dt in planes.items()}
+
+        chunks = tuple(np.broadcast_to(chunks, 2).astype(int))
+
+        if num_threads is None:
+            num_threads = os.cpu_count() or 1
+
+        self.shape = (len(ycoords), len(xcoords))
+        self.fmt = fmt
+        self._units = {}
+        self._file = _MAP_FILE_CLASSES[fmt](
+            filename, xcoords, ycoords, planes, chunks, compression_level,
+            num_threads, fill_value,
+            )
+        self._planes = planes
+
+    def write(self, results, row0=0, col0=0):
+        '''
+        Write a block of (some of) the map planes.
+
+        Parameters
+        ----------
+        results : dict
+            Map planes (2D, all with the same shape) to be written.
+            Entries that are not among the writer's planes are ignored.
+        row0, col0 : int, optional
+            Position of the block in the map. (default: 0)
+        '''
+
+        for name, data in results.items():
+
+            if name not in self._planes:
+                continue
+
+            if isinstance(data, u.Quantity):
+                if name not in self._units:
+                    self._units[name] = data.unit.to_string()
+                    self._file.set_unit(name, self._units[name])
+                data = data.to_value(self._units[name])
+
+            data = np.asarray(data)
+            if (
+                    data.ndim != 2 or
+                    row0 < 0 or row0 + data.shape[0] > self.shape[0] or
+                    col0 < 0 or col0 + data.shape[1] > self.shape[1]
+                    ):
+                raise ValueError(
+                    'Block of "{}" does not fit into the map.'.format(name)
+                    )
+
+            self._file.write(name, data, row0, col0)
+
+    def close(self):
+        '''
+        Close the file.
+        '''
+
+        self._file.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+
+def write_map(filename, xcoords, ycoords, results, planes=None, **kwargs):
+    '''
+    Write map results to a GeoTiff, HDF5, or Zarr file.
+
+    This is a convenience function that uses a `~pycraf.pathprof.MapWriter`
+    to write the results of `~pycraf.pathprof.atten_map_fast` or the
+    maps contained in the output of `~pycraf.pathprof.height_map_data`.
+    The planes are written in blocks of chunk rows, such that array-likes
+    (e.g., HDF5 data sets or memory maps) are not loaded completely.
+
+    Parameters
+    ----------
+    filename : str
+        Output file name (see `~pycraf.pathprof.MapWriter`).
+    xcoords, ycoords : `~numpy.ndarray` or `~astropy.units.Quantity`, 1D
+        Longitudes and latitudes of the map pixel centers [deg].
+    results : dict, dict-like
+        Dictionary with the map planes.
+    planes : sequence of str, optional
+        Names of the planes to write. If None, all entries of `results`
+        that are 2D arrays with the map shape are written. If given,
+        constant (scalar) planes are broadcasted to the map shape.
+        (default: None)
+    kwargs
+        Further keyword arguments are passed to
+        `~pycraf.pathprof.MapWriter`. If `planes` (of the writer) is not
+        given, the planes keep their data types.
+
+    Examples
+    --------
+    ::
+
+        >>> from pycraf import pathprof
+
+        >>> results = pathprof.atten_map_fast(  # doctest: +SKIP
+        ...     freq, temperature, pressure, h_tg, h_rg, timepercent,
+        ...     hprof_data,
+        ...     )
+        >>> pathprof.write_map(  # doctest: +SKIP
+        ...     'atten.tif', hprof_data['xcoords'], hprof_data['ycoords'],
+        ...     results, planes=['L_b', 'L_b_corr'],
+        ...     )
+        >>> pathprof.write_map(  # doctest: +SKIP
+        ...     'hprof.h5', hprof_data['xcoords'], hprof_data['ycoords'],
+        ...     hprof_data,
+        ...     )
+    '''
+
+    shape = (len(ycoords), len(xcoords))
+
+    if planes is None:
+        planes = [
+            k for k in results
+            if getattr(results[k], 'shape', None) == shape
+            ]
+
+    data = {}
+    for name in planes:
+        arr = results[name]
+        if getattr(arr, 'ndim', np.ndim(arr)) == 0:
+            arr = np.broadcast_to(arr, shape, subok=True)
+        data[name] = arr
+
+    kwargs.setdefault('planes', {
+        name: getattr(arr, 'dtype', np.float64)
+        for name, arr in data.items()
+        })
 
-    geo_data_regridded = geo_interp((geo_x - col_off, geo_y - row_off))
+    writer = MapWriter(filename, xcoords, ycoords, **kwargs)
+    step = int(np.broadcast_to(kwargs.get('chunks', 256), 2)[0])
 
-    return geo_data_regridded.astype(geo_data.dtype, copy=False)
+    with writer:
+        for row0 in range(0, shape[0], step):
+            writer.write(
+                {name: arr[row0:row0 + step] for name, arr in data.items()},
+                row0=row0,
+                )
@@ -56,6 +56,8 @@ def _srtm_height_profile(lon_t, lat_t, lon_r, lat_r, step):
 
     hgt_res = srtm.SrtmConf.hgt_res
     if step > hgt_res / 1.5:
+        # coarser (pre-smoothed) terrain data can be used for large steps
+        level, hgt_res, width = srtm._pyramid_params(step)
         hdistances = np.arange(
             0., distance + hgt_res / 3., hgt_res / 3.
             )
@@ -65,12 +67,14 @@ def _srtm_height_profile(lon_t, lat_t, lon_r, lat_r, step):
         hlons = np.degrees(hlons)
         hlats = np.degrees(hlats)
 
-        hheights = srtm._srtm_height_data(hlons, hlats).astype(np.float64)
+        hheights = srtm._srtm_height_data(
+            hlons, hlats, level=level
+            ).astype(np.float64)
         heights = np.empty_like(distances)
         # now smooth/interpolate this to the desired step width
         cygeodesics.regrid1d_with_x(
             hdistances, hheights, distances, heights,
-            step / 2.35, regular=True
+            width, regular=True
             )
 
     else:
@@ -85,6 +89,87 @@ def _srtm_height_profile(lon_t, lat_t, lon_r, lat_r, step):
         )
 
 
+def _ragged_positions(sizes):
+    # for a ragged (flat) layout, return the index of the profile and the
+    # index within the profile of each element, as well as the start
+    # index of each profile
+
+    starts = np.cumsum(sizes) - sizes
+    prof_idx = np.repeat(np.arange(sizes.size), sizes)
+    pos_idx = np.arange(np.sum(sizes)) - starts[prof_idx]
+
+    return prof_idx, pos_idx, starts
+
+
+def _srtm_height_profiles(lon_t, lat_t, lon_r, lat_r, step, nthreads=None):
+    # angles in deg; lengths in m; lon_t, lat_t, lon_r, lat_r are 1D arrays
+
+    # Batched version of _srtm_height_profile, which gives identical
+    # results; the profiles are returned as flat (concatenated) arrays,
+    # together with the number of elements per profile. The geodesics
+    # and SRTM queries are done in one go for all paths.
+
+    lon_t_rad, lat_t_rad = np.radians(lon_t), np.radians(lat_t)
+    lon_r_rad, lat_r_rad = np.radians(lon_r), np.radians(lat_r)
+    distance, bearing_1_rad, bearing_2_rad = cygeodesics.inverse_cython(
+        lon_t_rad, lat_t_rad, lon_r_rad, lat_r_rad, nthreads=nthreads,
+        )
+    bearing_1 = np.degrees(bearing_1_rad)
+    bearing_2 = np.degrees(bearing_2_rad)
+    back_bearing = bearing_2 % 360 - 180
+
+    # same sizes and values as np.arange(0., distance + step, step)
+    sizes = np.ceil((distance + step) / step).astype(np.int64)
+    prof_idx, pos_idx, starts = _ragged_positions(sizes)
+    distances = pos_idx * step  # [m]
+
+    lons_rad, lats_rad, bearing_2s_rad = cygeodesics.direct_cython(
+        lon_t_rad[prof_idx], lat_t_rad[prof_idx], bearing_1_rad[prof_idx],
+        distances, nthreads=nthreads,
+        )
+    lons = np.degrees(lons_rad)
+    lats = np.degrees(lats_rad)
+    bearing_2s = np.degrees(bearing_2s_rad)
+
+    back_bearings = bearing_2s % 360 - 180
+
+    hgt_res = srtm.SrtmConf.hgt_res
+    if step > hgt_res / 1.5:
+        level, hgt_res, width = srtm._pyramid_params(step)
+        hstep = hgt_res / 3.
+        hsizes = np.ceil((distance + hstep) / hstep).astype(np.int64)
+        hprof_idx, hpos_idx, hstarts = _ragged_positions(hsizes)
+        hdistances = hpos_idx * hstep
+        hlons, hlats, _ = cygeodesics.direct_cython(
+            lon_t_rad[hprof_idx], lat_t_rad[hprof_idx],
+            bearing_1_rad[hprof_idx], hdistances, nthreads=nthreads,
+            )
+        hheights = srtm._srtm_height_data(
+            np.degrees(hlons), np.degrees(hlats), level=level
+            ).astype(np.float64)
+
+        heights = np.empty_like(distances)
+        for i in range(sizes.size):
+            hsl = slice(hstarts[i], hstarts[i] + hsizes[i])
+            sl = slice(starts[i], starts[i] + sizes[i])
+            cygeodesics.regrid1d_with_x(
+                hdistances[hsl], hheights[hsl], distances[sl], heights[sl],
+                width, regular=True, nthreads=nthreads,
+                )
+
+    else:
+
+        heights = srtm._srtm_height_data(lons, lats).astype(np.float64)
+
+    return (
+        lons, lats,
+        distance * 1.e-3,
+        distances * 1.e-3, heights,
+        bearing_1, back_bearing, back_bearings,
+        sizes,
+        )
+
+
 @utils.ranged_quantity_input(
     lon_t=(-180, 180, apu.deg),
     lat_t=(-90, 90, apu.deg),
@@ -223,14 +308,10 @@ def srtm_height_map(
         lat_c + map_size_lat / 2 + 1.e-6,
         map_resolution,
         )
-    xcoords2d, ycoords2d = np.meshgrid(xcoords, ycoords)
-
-    heightmap = srtm._srtm_height_data(
-        xcoords2d.flatten(), ycoords2d.flatten()
-        ).reshape(xcoords2d.shape)
+    heightmap = srtm._srtm_height_grid(xcoords, ycoords)
 
     if do_coords_2d:
-        xcoords, ycoords = xcoords2d, ycoords2d
+        xcoords, ycoords = np.meshgrid(xcoords, ycoords)
 
     return xcoords, ycoords, heightmap
 
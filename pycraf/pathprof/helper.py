@@ -7,6 +7,7 @@ from __future__ import (
 
 # from functools import partial, lru_cache
 import os
+from collections import deque
 from astropy import units as apu
 import numpy as np
 from scipy.interpolate import RegularGridInterpolator
@@ -38,7 +39,7 @@ __all__ = [
     'eff_earth_radius_factor_median',
     'eff_earth_radius_factor_beta',
     'eff_earth_radius_median', 'eff_earth_radius_beta',
-    'make_kmz', 'terrain_cmap_factory',
+    'make_kmz', 'make_kmz_tiles', 'make_xyz_tiles', 'terrain_cmap_factory',
     ]
 
 
@@ -76,6 +77,56 @@ KML_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
 </kml>
 '''
 
+KML_TILE_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+    <Document>
+    <name>{name}</name>
+    {region}
+    <GroundOverlay>
+        <drawOrder>{level:d}</drawOrder>
+        <color>aaffffff</color>
+        <Icon><href>{href}</href></Icon>
+        {latlonbox}
+    </GroundOverlay>
+{links}    </Document>
+</kml>
+'''
+
+KML_ROOT_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+    <Document>
+    <name>Attenuation map</name>
+    <description>Results from pycraf package</description>
+{links}    </Document>
+</kml>
+'''
+
+KML_LINK_TEMPLATE = '''    <NetworkLink>
+        <name>{name}</name>
+        {region}
+        <Link>
+            <href>{href}</href>
+            <viewRefreshMode>onRegion</viewRefreshMode>
+        </Link>
+    </NetworkLink>
+'''
+
+KML_REGION_TEMPLATE = (
+    '<Region><LatLonAltBox>'
+    '<north>{3:.6f}</north><south>{1:.6f}</south>'
+    '<east>{0:.6f}</east><west>{2:.6f}</west>'
+    '</LatLonAltBox>'
+    '<Lod><minLodPixels>{4:d}</minLodPixels>'
+    '<maxLodPixels>-1</maxLodPixels></Lod></Region>'
+    )
+
+KML_LATLONBOX_TEMPLATE = (
+    '<LatLonBox>'
+    '<north>{3:.6f}</north><south>{1:.6f}</south>'
+    '<east>{0:.6f}</east><west>{2:.6f}</west>'
+    '</LatLonBox>'
+    )
+
 _refract_data = np.load(get_pkg_data_filename(
     '../itudata/p.452-16/refract_map.npz'
     ))
@@ -395,6 +446,12 @@ def make_kmz(
         (default: None)
     cmap : matplotlib.colormap
         (default: 'inferno_r')
+
+    Notes
+    -----
+    The map is rendered into a single image. For large maps, which
+    exceed the texture size limits of viewers, use
+    `~pycraf.pathprof.make_kmz_tiles` or `~pycraf.pathprof.make_xyz_tiles`.
     '''
 
     # descriptive xml
@@ -440,6 +497,367 @@ def make_kmz(
         myzip.writestr('doc.kml', kml)
 
 
+def _map_limits(atten_map, vmin, vmax, max_samples=2 ** 20):
+    '''
+    Default color limits (2.5% and 97.5% percentiles) of a map.
+
+    For large maps, the percentiles are calculated from a regular
+    sub-sample, such that the map never needs to be loaded completely.
+    '''
+
+    if vmin is not None and vmax is not None:
+        return vmin, vmax
+
+    ny, nx = atten_map.shape
+    step = max(1, int(np.ceil(np.sqrt(ny * nx / max_samples))))
+    sample = np.asarray(atten_map[::step, ::step], dtype=np.float64)
+
+    if vmin is None:
+        vmin = np.nanpercentile(sample, 2.5)
+
+    if vmax is None:
+        vmax = np.nanpercentile(sample, 97.5)
+
+    return vmin, vmax
+
+
+def _render_tile(data, vmin, vmax, cmap, origin):
+    '''
+    Render a map tile as PNG (NaNs are transparent); returns the bytes.
+    '''
+
+    from matplotlib.image import imsave
+    from io import BytesIO
+
+    png_buf = BytesIO()
+    imsave(
+        png_buf, data, vmin=vmin, vmax=vmax, cmap=cmap, origin=origin,
+        format='png',
+        )
+
+    return png_buf.getvalue()
+
+
+def _render_tiles(tiles, max_workers, **kwargs):
+    '''
+    Render the `(key, data)` tiles from the iterable `tiles`.
+
+    Yields `(key, png_bytes)` in the order of `tiles`. The tiles are
+    rendered by a pool of `max_workers` processes (or in the calling
+    process, if `max_workers` is zero). Only a few tiles per worker are
+    in flight at any time, so `tiles` can be a generator that reads the
+    map data lazily.
+    '''
+
+    if max_workers == 0:
+        for key, data in tiles:
+            yield key, _render_tile(data, **kwargs)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for key, data in tiles:
+            pending.append(
+                (key, executor.submit(_render_tile, data, **kwargs))
+                )
+            if len(pending) >= 2 * max_workers:
+                key, future = pending.popleft()
+                yield key, future.result()
+
+        while pending:
+            key, future = pending.popleft()
+            yield key, future.result()
+
+
+def make_kmz_tiles(
+        kmz_filename, atten_map, bbox, vmin=None, vmax=None,
+        cmap='inferno_r', tile_size=256, max_workers=None,
+        ):
+    '''
+    Produce a tiled kmz file (KML super-overlay) for use in GIS software.
+
+    In contrast to `~pycraf.pathprof.make_kmz`, which renders the map
+    into a single image, the map is split into tiles of `tile_size`
+    pixels on several zoom levels. Viewers (e.g., Google Earth) only load
+    the tiles that are needed for the current view, such that maps of
+    (nearly) arbitrary size can be displayed.
+
+    Parameters
+    ----------
+    kmz_filename : str
+        Output file name for .kmz-file
+    atten_map : 2D `~numpy.ndarray` of floats, or array-like
+        2D array with path attenuation values. Array-likes that support
+        (strided) slicing, such as memory maps or HDF5 data sets, are
+        read tile by tile, such that the map is never held in memory
+        completely.
+    bbox : tuple of 4 floats
+        (east, south, west, north) edges of map [deg]
+    vmin, vmax : float
+        Lower and upper colorbar bounds.
+        If None, 2.5% and 97.5% percentiles of atten_map are used
+        (default: None)
+    cmap : matplotlib.colormap
+        (default: 'inferno_r')
+    tile_size : int, optional
+        Size of the (square) tiles in pixels (default: 256)
+    max_workers : int, optional
+        Number of worker processes, which render the tiles. If None,
+        the number of CPUs is used; if zero, the tiles are rendered in
+        the calling process. (default: None)
+
+    Notes
+    -----
+    - The highest zoom level has the full map resolution. On each lower
+      level, the resolution is halved (by using every other pixel of
+      the next higher level), until the full map fits into a single
+      tile.
+    - NaN values in the map are transparent.
+    - For large maps, the default color limits are determined from a
+      sub-sample of the map.
+    '''
+
+    import zipfile
+
+    ny, nx = atten_map.shape
+    east, south, west, north = bbox
+    dx = (east - west) / nx
+    dy = (north - south) / ny
+
+    vmin, vmax = _map_limits(atten_map, vmin, vmax)
+
+    # number of levels, such that lowest level has a single tile
+    max_level = max(0, int(np.ceil(np.log2(max(ny, nx) / tile_size))))
+
+    def _num_tiles(level):
+        span = tile_size * 2 ** (max_level - level)
+        return (ny + span - 1) // span, (nx + span - 1) // span
+
+    def _tile_bbox(level, i, j):
+        span = tile_size * 2 ** (max_level - level)
+        return (
+            west + min((j + 1) * span, nx) * dx,
+            south + i * span * dy,
+            west + j * span * dx,
+            south + min((i + 1) * span, ny) * dy,
+            )
+
+    def _min_lod(level):
+        # the lowest level is always shown
+        return 0 if level == 0 else tile_size // 2
+
+    def _tile_link(level, i, j, prefix):
+        return KML_LINK_TEMPLATE.format(
+            name='{:d}/{:d}/{:d}'.format(level, i, j),
+            region=KML_REGION_TEMPLATE.format(
+                *_tile_bbox(level, i, j), _min_lod(level)
+                ),
+            href='{}{:d}/{:d}/{:d}.kml'.format(prefix, level, i, j),
+            )
+
+    def _tiles():
+        for level in range(max_level + 1):
+            step = 2 ** (max_level - level)
+            span = tile_size * step
+            mi, mj = _num_tiles(level)
+            for i in range(mi):
+                for j in range(mj):
+                    data = np.asarray(
+                        atten_map[
+                            i * span:(i + 1) * span:step,
+                            j * span:(j + 1) * span:step,
+                            ],
+                        dtype=np.float32,
+                        )
+                    yield (level, i, j), data
+
+    with zipfile.ZipFile(
+            kmz_filename, 'w', compression=zipfile.ZIP_STORED,
+            allowZip64=True,
+            ) as myzip:
+
+        myzip.writestr(
+            'doc.kml',
+            KML_ROOT_TEMPLATE.format(links=_tile_link(0, 0, 0, '')),
+            )
+
+        for (level, i, j), png in _render_tiles(
+                _tiles(), max_workers,
+                vmin=vmin, vmax=vmax, cmap=cmap, origin='lower',
+                ):
+
+            links = ''
+            if level < max_level:
+                mi, mj = _num_tiles(level + 1)
+                for ci in range(2 * i, min(2 * i + 2, mi)):
+                    for cj in range(2 * j, min(2 * j + 2, mj)):
+                        links += _tile_link(level + 1, ci, cj, '../../')
+
+            tbbox = _tile_bbox(level, i, j)
+            kml = KML_TILE_TEMPLATE.format(
+                name='{:d}/{:d}/{:d}'.format(level, i, j),
+                region=KML_REGION_TEMPLATE.format(*tbbox, _min_lod(level)),
+                level=level,
+                href='{:d}.png'.format(j),
+                latlonbox=KML_LATLONBOX_TEMPLATE.format(*tbbox),
+                links=links,
+                )
+
+            # PNGs are already compressed
+            myzip.writestr('{:d}/{:d}/{:d}.png'.format(level, i, j), png)
+            myzip.writestr(
+                '{:d}/{:d}/{:d}.kml'.format(level, i, j), kml,
+                compress_type=zipfile.ZIP_DEFLATED,
+                )
+
+
+def _sample_map(atten_map, rows, cols, max_block=2 ** 20):
+    '''
+    Get `atten_map[rows[:, None], cols[None]]` for sorted index arrays.
+
+    Negative indices mark positions outside of the map, which are set to
+    NaN. The data is read as a single block if it is not too large;
+    otherwise row by row.
+    '''
+
+    data = np.full((len(rows), len(cols)), np.nan, dtype=np.float32)
+    rmask, cmask = rows >= 0, cols >= 0
+    if not np.any(rmask) or not np.any(cmask):
+        return data
+
+    _rows, _cols = rows[rmask], cols[cmask]
+    r0, r1 = _rows[0], _rows[-1] + 1
+    c0, c1 = _cols[0], _cols[-1] + 1
+
+    if (r1 - r0) * (c1 - c0) <= max_block:
+        block = np.asarray(atten_map[r0:r1, c0:c1])
+        vals = block[_rows - r0][:, _cols - c0]
+    else:
+        urows, inv = np.unique(_rows, return_inverse=True)
+        vals = np.array([
+            np.asarray(atten_map[r, c0:c1])[_cols - c0] for r in urows
+            ])[inv]
+
+    data[np.ix_(rmask, cmask)] = vals
+
+    return data
+
+
+def make_xyz_tiles(
+        tile_dir, atten_map, bbox, vmin=None, vmax=None, cmap='inferno_r',
+        min_zoom=None, max_zoom=None, tile_size=256, max_workers=None,
+        ):
+    '''
+    Produce web map tiles (XYZ/"slippy map" scheme) of a map.
+
+    The tiles are written as `{tile_dir}/{z}/{x}/{y}.png`, where `z`
+    is the zoom level and `x` and `y` are the tile indices in the Web
+    Mercator projection (EPSG:3857), as used by OpenStreetMap, Leaflet,
+    OpenLayers, etc. Only tiles that overlap with the map are produced.
+
+    Parameters
+    ----------
+    tile_dir : str
+        Output directory
+    atten_map : 2D `~numpy.ndarray` of floats, or array-like
+        2D array with path attenuation values. Array-likes that support
+        slicing, such as memory maps or HDF5 data sets, are read tile by
+        tile, such that the map is never held in memory completely.
+    bbox : tuple of 4 floats
+        (east, south, west, north) edges of map [deg]
+    vmin, vmax : float
+        Lower and upper colorbar bounds.
+        If None, 2.5% and 97.5% percentiles of atten_map are used
+        (default: None)
+    cmap : matplotlib.colormap
+        (default: 'inferno_r')
+    min_zoom, max_zoom : int, optional
+        Lowest and highest zoom level. If None, `max_zoom` is chosen
+        such that the tile pixels are not larger than the map pixels
+        and `min_zoom` such that the map fits into a single tile.
+        (default: None)
+    tile_size : int, optional
+        Size of the (square) tiles in pixels (default: 256)
+    max_workers : int, optional
+        Number of worker processes, which render the tiles. If None,
+        the number of CPUs is used; if zero, the tiles are rendered in
+        the calling process. (default: None)
+
+    Returns
+    -------
+    zoom_levels : tuple of int
+        `(min_zoom, max_zoom)`
+
+    Notes
+    -----
+    - The map is resampled to the tiles with nearest-neighbor
+      interpolation.
+    - NaN values in the map (and tile pixels outside of the map) are
+      transparent.
+    '''
+
+    ny, nx = atten_map.shape
+    east, south, west, north = bbox
+    dx = (east - west) / nx
+    dy = (north - south) / ny
+
+    vmin, vmax = _map_limits(atten_map, vmin, vmax)
+
+    if max_zoom is None:
+        max_zoom = int(np.ceil(np.log2(360. / tile_size / min(dx, dy))))
+        max_zoom = max(0, max_zoom)
+
+    if min_zoom is None:
+        min_zoom = int(np.floor(np.log2(
+            360. / max(east - west, north - south)
+            )))
+        min_zoom = min(max(0, min_zoom), max_zoom)
+
+    def _merc_y(lat):
+        # normalized Web Mercator y (0 at north, 1 at south edge)
+        lat = np.radians(np.clip(lat, -85.0511287798, 85.0511287798))
+        return (1. - np.arcsinh(np.tan(lat)) / np.pi) / 2.
+
+    def _tiles():
+        pix = np.arange(tile_size) + 0.5
+        for zoom in range(min_zoom, max_zoom + 1):
+            n = 2 ** zoom
+            x0 = int((west + 180.) / 360. * n)
+            x1 = min(int((east + 180.) / 360. * n), n - 1)
+            y0 = int(_merc_y(north) * n)
+            y1 = min(int(_merc_y(south) * n), n - 1)
+            for x in range(x0, x1 + 1):
+                lons = ((x + pix / tile_size) / n) * 360. - 180.
+                cols = np.floor((lons - west) / dx).astype(np.int64)
+                cols[(cols < 0) | (cols >= nx)] = -1
+                for y in range(y0, y1 + 1):
+                    lats = np.degrees(np.arctan(np.sinh(
+                        np.pi * (1. - 2. * (y + pix / tile_size) / n)
+                        )))
+                    rows = np.floor((lats - south) / dy).astype(np.int64)
+                    rows[(rows < 0) | (rows >= ny)] = -1
+                    # rows must be sorted for _sample_map (from south)
+                    data = _sample_map(atten_map, rows[::-1], cols)[::-1]
+                    yield (zoom, x, y), data
+
+    for (zoom, x, y), png in _render_tiles(
+            _tiles(), max_workers,
+            vmin=vmin, vmax=vmax, cmap=cmap, origin='upper',
+            ):
+
+        path = os.path.join(tile_dir, str(zoom), str(x))
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, '{:d}.png'.format(y)), 'wb') as f:
+            f.write(png)
+
+    return min_zoom, max_zoom
+
+
 class FixPointNormalize(Normalize):
     '''
     From http://stackoverflow.com/questions/40895021/python-equivalent-for-matlabs-demcmap-elevation-appropriate-colormap
@@ -6,10 +6,13 @@ from __future__ import (
     )
 
 # from functools import partial, lru_cache
+import os
+from collections.abc import Mapping
 from astropy import units as apu
 import numpy as np
 
 from . import cyprop
+from . import gis
 from . import heightprofile
 from . import helper
 from .. import conversions as cnv
@@ -18,11 +21,13 @@ from .. import utils
 
 
 __all__ = [
-    'PathProp',
+    'PathProp', 'PathPropArray',
     'loss_freespace', 'loss_troposcatter', 'loss_ducting',
     'loss_diffraction', 'loss_complete',
     'clutter_correction', 'clutter_imt',
-    'height_map_data', 'atten_map_fast',
+    'height_map_data', 'compact_hprof_data', 'SharedHprofData',
+    'atten_map_fast', 'atten_map_progressive',
+    'power_map_aggregate', 'height_points_data', 'atten_points_fast',
     'height_path_data', 'height_path_data_generic', 'atten_path_fast',
     'losses_complete',
     ]
@@ -214,6 +219,10 @@ class PathProp(cyprop._PathProp):
             hprof_backbearing=hprof_backbearing,
             )
 
+        self._set_params()
+
+    def _set_params(self):
+
         self.__params = list(cyprop.PARAMETERS_BASIC)  # make a copy
         if self._pp['version'] == 14:
             self.__params += cyprop.PARAMETERS_V14
@@ -248,10 +257,195 @@ class PathProp(cyprop._PathProp):
             )
 
 
+class PathPropArray(cyprop._PathPropArray):
+    '''
+    Container class that holds the path profile properties of many paths.
+
+    This is the vectorized version of `~pycraf.pathprof.PathProp`. All
+    parameters (except `hprof_step`) can be arrays, which are broadcast
+    against each other; the result has the broadcast shape. The
+    properties of all paths are stored in one contiguous (structured)
+    array, such that the path parameters are available as arrays (e.g.,
+    ``pparr.distance``) and the `loss_*` functions (e.g.,
+    `~pycraf.pathprof.loss_complete`) compute the losses of all paths
+    in one (parallelized) call.
+
+    Parameters
+    ----------
+    freq : `~astropy.units.Quantity`
+        Frequency of radiation [GHz]
+    temperature : `~astropy.units.Quantity`
+        Ambient temperature at path midpoint [K]
+    pressure : `~astropy.units.Quantity`
+        Ambient pressure at path midpoint  [hPa]
+    lon_t, lat_t : `~astropy.units.Quantity`
+        Geographic longitude/latitude of transmitter [deg]
+    lon_r, lat_r : `~astropy.units.Quantity`
+        Geographic longitude/latitude of receiver [deg]
+    h_tg, h_rg : `~astropy.units.Quantity`
+        Transmitter/receiver height over ground [m]
+    hprof_step : `~astropy.units.Quantity`, scalar
+        Distance resolution of height profile along path [m]
+    timepercent : `~astropy.units.Quantity`
+        Time percentage [%] (maximal 50%)
+    omega, d_tm, d_lm, d_ct, d_cr : `~astropy.units.Quantity`, optional
+        See `~pycraf.pathprof.PathProp`.
+    zone_t, zone_r : CLUTTER enum (or int array), optional
+        Clutter type for transmitter/receiver terminal.
+        (default: CLUTTER.UNKNOWN)
+    polarization : int (or int array), optional
+        Polarization (default: 0)
+        Allowed values are: 0 - horizontal, 1 - vertical
+    version : int (or int array), optional
+        ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    delta_N, N_0 : `~astropy.units.Quantity`, optional
+        See `~pycraf.pathprof.PathProp`.
+    hprof_dists : sequence of `~astropy.units.Quantity`, optional
+        Distance vectors associated with the height profiles
+        `hprof_heights`; one per path (in flattened order). The profiles
+        can have different lengths.
+        (default: query `~pycraf.pathprof.srtm_height_profile`)
+    hprof_heights : sequence of `~astropy.units.Quantity`, optional
+        Terrain heights profiles for the distances in `hprof_dists`.
+        (default: query `~pycraf.pathprof.srtm_height_profile`)
+    hprof_bearing, hprof_backbearing : `~astropy.units.Quantity`, optional
+        (Back-)bearings of the height profile paths.
+        (default: query `~pycraf.pathprof.srtm_height_profile`)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
+
+    Returns
+    -------
+    pparr : PathPropArray instance
+
+    Notes
+    -----
+    - Indexing with an integer returns a `~pycraf.pathprof.PathProp`
+      instance for that path (in flattened order); indexing with a slice
+      or index array returns a new `~pycraf.pathprof.PathPropArray`.
+    - For the remaining notes, see `~pycraf.pathprof.PathProp`.
+    '''
+
+    @utils.ranged_quantity_input(
+        freq=(0.1, 100, apu.GHz),
+        temperature=(None, None, apu.K),
+        pressure=(None, None, apu.hPa),
+        lon_t=(-180, 180, apu.deg),
+        lat_t=(-90, 90, apu.deg),
+        lon_r=(-180, 180, apu.deg),
+        lat_r=(-90, 90, apu.deg),
+        h_tg=(None, None, apu.m),
+        h_rg=(None, None, apu.m),
+        hprof_step=(None, None, apu.m),
+        timepercent=(0, 50, apu.percent),
+        omega=(0, 100, apu.percent),
+        d_tm=(None, None, apu.m),
+        d_lm=(None, None, apu.m),
+        d_ct=(None, None, apu.m),
+        d_cr=(None, None, apu.m),
+        delta_N=(None, None, cnv.dimless / apu.km),
+        N0=(None, None, cnv.dimless),
+        hprof_bearing=(None, None, apu.deg),
+        hprof_backbearing=(None, None, apu.deg),
+        strip_input_units=True, allow_none=True, output_unit=None
+        )
+    def __init__(
+            self,
+            freq,
+            temperature,
+            pressure,
+            lon_t, lat_t,
+            lon_r, lat_r,
+            h_tg, h_rg,
+            hprof_step,
+            timepercent,
+            omega=0 * apu.percent,
+            d_tm=None, d_lm=None,
+            d_ct=None, d_cr=None,
+            zone_t=cyprop.CLUTTER.UNKNOWN, zone_r=cyprop.CLUTTER.UNKNOWN,
+            polarization=0,
+            version=16,
+            # override if you don't want builtin method:
+            delta_N=None, N0=None,
+            # override if you don't want builtin method:
+            hprof_dists=None, hprof_heights=None,
+            hprof_bearing=None, hprof_backbearing=None,
+            nthreads=None,
+            ):
+
+        # ragged sequences, cannot be handled by the decorator
+        if hprof_dists is not None:
+            hprof_dists = [d.to_value(apu.km) for d in hprof_dists]
+        if hprof_heights is not None:
+            hprof_heights = [h.to_value(apu.m) for h in hprof_heights]
+
+        super().__init__(
+            freq,
+            temperature,
+            pressure,
+            lon_t, lat_t,
+            lon_r, lat_r,
+            h_tg, h_rg,
+            hprof_step,
+            timepercent,
+            omega=omega,
+            d_tm=d_tm, d_lm=d_lm,
+            d_ct=d_ct, d_cr=d_cr,
+            zone_t=zone_t, zone_r=zone_r,
+            polarization=polarization,
+            version=version,
+            delta_N=delta_N, N0=N0,
+            hprof_dists=hprof_dists,
+            hprof_heights=hprof_heights,
+            hprof_bearing=hprof_bearing,
+            hprof_backbearing=hprof_backbearing,
+            nthreads=nthreads,
+            )
+
+    _units = {
+        p[0]: p[3]
+        for p in (
+            cyprop.PARAMETERS_BASIC +
+            cyprop.PARAMETERS_V14 +
+            cyprop.PARAMETERS_V16
+            )
+        }
+
+    def __getattr__(self, name):
+
+        # only called, if normal attribute lookup fails
+        try:
+            unit = PathPropArray._units[name]
+        except KeyError:
+            raise AttributeError(name)
+
+        return self._pps[name].reshape(self.shape) * unit
+
+    def __getitem__(self, idx):
+
+        if isinstance(idx, (int, np.integer)):
+            if idx < 0:
+                idx += len(self)
+            if not 0 <= idx < len(self):
+                raise IndexError('PathPropArray index out of range')
+
+            pathprop = PathProp.__new__(PathProp)
+            cyprop._pathprop_from_array(pathprop, self, idx)
+            pathprop._set_params()
+            return pathprop
+
+        return self._subset(idx)
+
+    def __repr__(self):
+
+        return 'PathPropArray<shape: {}>'.format(self.shape)
+
+
 @utils.ranged_quantity_input(
     output_unit=(cnv.dB, cnv.dB, cnv.dB)
     )
-def loss_freespace(pathprop):
+def loss_freespace(pathprop, nthreads=None):
     '''
     Calculate the free-space loss, L_bfsg, of a propagating radio wave
     according to ITU-R P.452-16 Eq (8-12).
@@ -260,7 +454,12 @@ def loss_freespace(pathprop):
     ----------
     pathprop : `~pycraf.pathprof.PathProp` instance
         This helper class works as a container to hold various properties
-        of the path (e.g., geometry).
+        of the path (e.g., geometry). Can also be a
+        `~pycraf.pathprof.PathPropArray` instance, in which case the
+        losses of all paths are returned as arrays.
+    nthreads : int, optional
+        Number of threads to use for a `~pycraf.pathprof.PathPropArray`.
+        (default: None, i.e., use `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -285,6 +484,11 @@ def loss_freespace(pathprop):
       which is necessary for some steps in the ITU-R P.452 algorithms.
     '''
 
+    if isinstance(pathprop, PathPropArray):
+        return cyprop.free_space_loss_bfsg_array_cython(
+            pathprop, nthreads=nthreads
+            )
+
     return cyprop.free_space_loss_bfsg_cython(pathprop)
 
 
@@ -294,7 +498,7 @@ def loss_freespace(pathprop):
     strip_input_units=True, output_unit=cnv.dB
     )
 def loss_troposcatter(
-        pathprop, G_t=0. * cnv.dBi, G_r=0. * cnv.dBi,
+        pathprop, G_t=0. * cnv.dBi, G_r=0. * cnv.dBi, nthreads=None,
         ):
     '''
     Calculate the tropospheric scatter loss, L_bs, of a propagating radio wave
@@ -304,10 +508,15 @@ def loss_troposcatter(
     ----------
     pathprop : `~pycraf.pathprof.PathProp` instance
         This helper class works as a container to hold various properties
-        of the path (e.g., geometry).
+        of the path (e.g., geometry). Can also be a
+        `~pycraf.pathprof.PathPropArray` instance, in which case the
+        losses of all paths are returned as arrays.
     G_t, G_r  : `~astropy.units.Quantity`
         Antenna gain (transmitter, receiver) in the direction of the
         horizon(!) along the great-circle interference path [dBi]
+    nthreads : int, optional
+        Number of threads to use for a `~pycraf.pathprof.PathPropArray`.
+        (default: None, i.e., use `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -315,11 +524,16 @@ def loss_troposcatter(
         Tropospheric scatter loss [dB]
     '''
 
+    if isinstance(pathprop, PathPropArray):
+        return cyprop.tropospheric_scatter_loss_bs_array_cython(
+            pathprop, G_t, G_r, nthreads=nthreads
+            )
+
     return cyprop.tropospheric_scatter_loss_bs_cython(pathprop, G_t, G_r)
 
 
 @utils.ranged_quantity_input(output_unit=cnv.dB)
-def loss_ducting(pathprop):
+def loss_ducting(pathprop, nthreads=None):
     '''
     Calculate the ducting/layer reflection loss, L_ba, of a propagating radio
     wave according to ITU-R P.452-16 Eq (46-56).
@@ -328,7 +542,12 @@ def loss_ducting(pathprop):
     ----------
     pathprop : `~pycraf.pathprof.PathProp` instance
         This helper class works as a container to hold various properties
-        of the path (e.g., geometry).
+        of the path (e.g., geometry). Can also be a
+        `~pycraf.pathprof.PathPropArray` instance, in which case the
+        losses of all paths are returned as arrays.
+    nthreads : int, optional
+        Number of threads to use for a `~pycraf.pathprof.PathPropArray`.
+        (default: None, i.e., use `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -336,13 +555,18 @@ def loss_ducting(pathprop):
         Ducting/layer reflection loss [dB]
     '''
 
+    if isinstance(pathprop, PathPropArray):
+        return cyprop.ducting_loss_ba_array_cython(
+            pathprop, nthreads=nthreads
+            )
+
     return cyprop.ducting_loss_ba_cython(pathprop)
 
 
 @utils.ranged_quantity_input(
     output_unit=(cnv.dB, cnv.dB, cnv.dB, cnv.dB, cnv.dB)
     )
-def loss_diffraction(pathprop):
+def loss_diffraction(pathprop, nthreads=None):
     '''
     Calculate the Diffraction loss of a propagating radio
     wave according to ITU-R P.452-16 Eq (14-44).
@@ -351,7 +575,12 @@ def loss_diffraction(pathprop):
     ----------
     pathprop : `~pycraf.pathprof.PathProp` instance
         This helper class works as a container to hold various properties
-        of the path (e.g., geometry).
+        of the path (e.g., geometry). Can also be a
+        `~pycraf.pathprof.PathPropArray` instance, in which case the
+        losses of all paths are returned as arrays.
+    nthreads : int, optional
+        Number of threads to use for a `~pycraf.pathprof.PathPropArray`.
+        (default: None, i.e., use `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -382,6 +611,11 @@ def loss_diffraction(pathprop):
       account a free-space loss component for the diffraction path)
     '''
 
+    if isinstance(pathprop, PathPropArray):
+        return cyprop.diffraction_loss_complete_array_cython(
+            pathprop, nthreads=nthreads
+            )
+
     return cyprop.diffraction_loss_complete_cython(pathprop)
 
 
@@ -392,7 +626,7 @@ def loss_diffraction(pathprop):
     output_unit=(cnv.dB, cnv.dB, cnv.dB, cnv.dB, cnv.dB, cnv.dB, cnv.dB)
     )
 def loss_complete(
-        pathprop, G_t=0. * cnv.dBi, G_r=0. * cnv.dBi,
+        pathprop, G_t=0. * cnv.dBi, G_r=0. * cnv.dBi, nthreads=None,
         ):
     '''
     Calculate the total loss of a propagating radio
@@ -402,10 +636,15 @@ def loss_complete(
     ----------
     pathprop : `~pycraf.pathprof.PathProp` instance
         This helper class works as a container to hold various properties
-        of the path (e.g., geometry).
+        of the path (e.g., geometry). Can also be a
+        `~pycraf.pathprof.PathPropArray` instance, in which case the
+        losses of all paths are returned as arrays.
     G_t, G_r  : `~astropy.units.Quantity`
         Antenna gain (transmitter, receiver) in the direction of the
         horizon(!) along the great-circle interference path [dBi]
+    nthreads : int, optional
+        Number of threads to use for a `~pycraf.pathprof.PathPropArray`.
+        (default: None, i.e., use `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -429,6 +668,11 @@ def loss_complete(
         As L_b_corr but with gain and clutter correction [dB]
     '''
 
+    if isinstance(pathprop, PathPropArray):
+        return cyprop.path_attenuation_complete_array_cython(
+            pathprop, G_t, G_r, nthreads=nthreads
+            )
+
     return cyprop.path_attenuation_complete_cython(pathprop, G_t, G_r)
 
 
@@ -610,6 +854,12 @@ def height_map_data(
         d_tm=None, d_lm=None,
         d_ct=None, d_cr=None,
         omega_percent=0 * apu.percent,
+        landcover=None, conversion_table=None,
+        landsea=None, landsea_table=None,
+        adaptive_fan=False,
+        compact=False,
+        job=None,
+        nthreads=None,
         ):
 
     '''
@@ -668,6 +918,49 @@ def height_map_data(
     omega_percent : `~astropy.units.Quantity`, optional
         Fraction of the path over water [%] (see Table 3)
         (default: 0%)
+    landcover : `~rasterio.io.DatasetReader` or 2D `~numpy.ndarray`, optional
+        If given, the receiver clutter zone type, `zone_r`, is derived
+        for each pixel in the map from this landcover data. It can
+        either be a GeoTiff file (opened with `Rasterio
+        <https://rasterio.readthedocs.io/>`_), which is sampled at the
+        pixel positions, or an array of landcover class IDs that is already
+        defined on the map grid (i.e., it has shape (my, mx)). Pixels
+        without a known clutter type are assigned `zone_r`.
+        (default: None)
+    conversion_table : `dict`, optional
+        Mapping from landcover class IDs to P.452 clutter zone types (see
+        `~pycraf.pathprof.landcover_to_p452_clutter_zones`). If None,
+        `landcover` is assumed to contain clutter zone types already.
+        (default: None)
+    landsea : `~rasterio.io.DatasetReader` or callable, optional
+        If given, `d_tm`, `d_lm`, `d_ct`, `d_cr`, and `omega_percent` are
+        derived for each pixel from the radio-climatic zones (see
+        `~pycraf.pathprof.LANDSEA`) along the paths, and the associated
+        parameters are ignored. It can either be a GeoTiff file (opened
+        with `Rasterio <https://rasterio.readthedocs.io/>`_), or a function
+        `f(lons, lats)` that returns the zones for arrays of longitudes and
+        latitudes [deg]. Positions with unknown zone are considered as
+        `LANDSEA.INLAND`. (default: None)
+    landsea_table : `dict`, optional
+        Mapping from the values in `landsea` (e.g., of a land/sea/inland
+        water mask) to `~pycraf.pathprof.LANDSEA` names, e.g.,
+        ``{0: 'INLAND', 1: 'SEA', 2: 'SEA'}``. If None, `landsea` is
+        assumed to provide LANDSEA values already. (default: None)
+    adaptive_fan : bool, optional
+        If True, a distance-adaptive ray layout is used to compute the
+        height profiles, which needs fewer SRTM queries and less memory
+        (see Notes). (default: False)
+    compact : bool, optional
+        If True, return a compact representation of the data, see
+        `~pycraf.pathprof.compact_hprof_data`. (default: False)
+    job : `~pycraf.pathprof.JobControl`, optional
+        If given, the progress of the computation can be queried from
+        `job` (e.g., from another thread), and the computation can be
+        aborted with `job.cancel()`. A `~pycraf.pathprof.JobCancelledError`
+        is raised in this case. (default: None)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -761,6 +1054,14 @@ def height_map_data(
         - "height_profs" : `~numpy.ndarray` 2D (float, (me, mh))
 
           Height profiles to each of the pixels on the map edge, zero padded.
+          With `adaptive_fan`, this is a 1D array with the profile
+          sections of all rays (see Notes).
+
+        - "hprof_offsets", "hprof_starts", "hprof_lengths", "hprof_parents" :
+          `~numpy.ndarray` 1D (int, (me, ))
+
+          Only with `adaptive_fan`; the ragged layout of `height_profs`
+          (see Notes).
 
         - "zheight_prof" : `~numpy.ndarray` 1D (float, (mh, ))
 
@@ -781,9 +1082,37 @@ def height_map_data(
       additional features such as automatic downloading of missing
       tiles or applying different interpolation methods (e.g., splines).
       For details see :ref:`working_with_srtm`.
+    - The land/sea statistics are computed with a single scan along each
+      of the paths (with `hprof_step` resolution), which is used for all
+      pixels that are associated with the path. Each path position
+      represents a section of length `hprof_step` around it.
+    - With `adaptive_fan`, the angular ray spacing adapts to the distance.
+      The rays are organized in levels (the spacing halves from level to
+      level) and a ray only gets its own positions beyond the distance,
+      where its (lateral) offset from the parent ray exceeds half of the
+      lateral ray spacing at the map corners. Before that, it shares the
+      height profile with the parent. In addition, each ray ends where it
+      leaves the map. Compared to the default layout, every pixel is
+      still reached by a path within the same tolerance, but the number
+      of SRTM queries is reduced by about a factor of two. The layout is
+      not used by default, to keep the results identical to previous
+      versions.
+    - With `adaptive_fan`, only the own section of each ray is stored
+      (ragged layout): ray `n` has the heights for the distance indices
+      `hprof_starts[n]` to `hprof_starts[n] + hprof_lengths[n] - 1` in
+      `height_profs[hprof_offsets[n]:]`; the leading part of its profile
+      is found on the parent ray, `hprof_parents[n]` (-1 for none), or on
+      its parents. This about halves the size of `height_profs` (and the
+      peak memory usage). `~pycraf.pathprof.atten_map_fast` and
+      `~pycraf.pathprof.compact_hprof_data` read this layout directly.
     '''
 
-    return cyprop.height_map_data_cython(
+    if landsea is not None:
+        landsea_func = gis._landsea_zones_func(landsea, landsea_table)
+    else:
+        landsea_func = None
+
+    hprof_data = cyprop.height_map_data_cython(
         lon_t, lat_t,
         map_size_lon, map_size_lat,
         map_resolution=map_resolution,
@@ -792,8 +1121,323 @@ def height_map_data(
         d_tm=d_tm, d_lm=d_lm,
         d_ct=d_ct, d_cr=d_cr,
         omega=omega_percent,
+        landsea_func=landsea_func,
+        adaptive_fan=adaptive_fan,
+        job=job,
+        nthreads=nthreads,
         )
 
+    if landcover is not None:
+        hprof_data['zone_r_map'] = gis._clutter_zones_on_map_grid(
+            landcover, conversion_table,
+            hprof_data['xcoords'], hprof_data['ycoords'],
+            zone_r,
+            )
+
+    if compact:
+        hprof_data = compact_hprof_data(hprof_data)
+
+    return hprof_data
+
+
+# maps that are only provided for information and debugging purposes
+# (i.e., not used by atten_map_fast)
+_HPROF_INFO_MAPS = (
+    'pix_dist_map', 'lon_mid_map', 'lat_mid_map',
+    'bearing_map', 'back_bearing_map',
+    )
+
+
+def compact_hprof_data(hprof_data, drop_info_maps=False):
+    '''
+    Convert height-profile data into a compact representation.
+
+    The output of `~pycraf.pathprof.height_map_data` is rather large, as it
+    contains the height profiles and many auxillary maps with double
+    precision. This function produces an equivalent dictionary, which can
+    be used with `~pycraf.pathprof.atten_map_fast` just like the original
+    one (e.g., to keep more of it in memory or on disk), where
+
+    - the height profiles are stored as `int16`, if all heights are
+      integers (e.g., if SRTM data is used without interpolation), or as
+      `float32` otherwise (the ragged layout of the `adaptive_fan` option
+      is kept),
+    - maps with a constant value are stored as scalars (0D arrays),
+    - "d_tm_map" and "d_lm_map" are omitted if they are identical to
+      "dist_map" (which is the default) and "zheight_prof" is omitted,
+      as it is zero-valued anyway.
+
+    Parameters
+    ----------
+    hprof_data : dict, dict-like
+        Dictionary with height profiles and auxillary maps as
+        calculated with `~pycraf.pathprof.height_map_data`.
+    drop_info_maps : bool, optional
+        If True, omit the maps that are not needed for
+        `~pycraf.pathprof.atten_map_fast`, i.e., "pix_dist_map",
+        "lon_mid_map", "lat_mid_map", "bearing_map", and
+        "back_bearing_map". (default: False)
+
+    Returns
+    -------
+    hprof_data : dict
+        Dictionary with the compact height profiles and auxillary maps.
+
+    Notes
+    -----
+    - With `float32` storage, heights are rounded to about 0.1 mm (for
+      heights of a few km), which is negligible for the path attenuation.
+    - Other users of the data should broadcast scalar maps to the map
+      shape, e.g., with `~numpy.broadcast_to`.
+    '''
+
+    dist_map = np.asarray(hprof_data['dist_map'])
+
+    compact_data = {}
+    for key in hprof_data:
+
+        if key == 'zheight_prof':
+            continue
+
+        if drop_info_maps and key in _HPROF_INFO_MAPS:
+            continue
+
+        val = hprof_data[key]
+
+        if key == 'height_profs':
+            heights = np.asarray(val)
+            if (
+                    heights.size > 0 and
+                    np.all(heights == np.round(heights)) and
+                    np.all(np.abs(heights) <= np.iinfo(np.int16).max)
+                    ):
+                compact_data[key] = heights.astype(np.int16)
+            else:
+                compact_data[key] = heights.astype(np.float32)
+
+        elif key.endswith('_map'):
+            arr = np.asarray(val)
+            if (
+                    key in ('d_tm_map', 'd_lm_map') and
+                    np.array_equal(arr, dist_map)
+                    ):
+                continue
+
+            if arr.ndim == 2 and arr.size > 0 and np.all(arr == arr.flat[0]):
+                compact_data[key] = np.array(arr.flat[0])
+            else:
+                compact_data[key] = arr
+
+        else:
+            compact_data[key] = val
+
+    return compact_data
+
+
+# alignment of the arrays in the shared-memory block (bytes)
+_SHM_ALIGN = 64
+
+
+class SharedHprofData(Mapping):
+    '''
+    Height-profile data held in a shared-memory block.
+
+    Sending the output of `~pycraf.pathprof.height_map_data` to worker
+    processes (e.g., with `multiprocessing` or `concurrent.futures`)
+    normally pickles all arrays. A `SharedHprofData` instance instead
+    copies the arrays once into a single
+    `~multiprocessing.shared_memory.SharedMemory` block. When pickled,
+    only the name of the block and the array layout are stored, and the
+    unpickled instance (e.g., in a worker process) provides zero-copy,
+    read-only views into the block.
+
+    The instance behaves like a (read-only) dictionary and can be passed
+    to `~pycraf.pathprof.atten_map_fast` (and all other functions that
+    accept `hprof_data`) instead of the original dictionary.
+
+    Parameters
+    ----------
+    hprof_data : dict, dict-like
+        Dictionary with height profiles and auxillary maps as
+        calculated with `~pycraf.pathprof.height_map_data` (or
+        `~pycraf.pathprof.compact_hprof_data`).
+
+    Notes
+    -----
+    - Only the creating instance owns the shared-memory block. Call
+      `unlink` (or use the instance as a context manager) in the creating
+      process to free it, once all workers are done. Unpickled instances
+      only detach in `close`.
+    - Entries that are not arrays (e.g., scalars) are pickled as usual.
+    - Requires Python 3.8 or newer.
+
+    Examples
+    --------
+    A typical use case is to compute attenuation maps for many
+    frequencies in a process pool::
+
+        >>> from concurrent.futures import ProcessPoolExecutor
+        >>> from pycraf import pathprof
+        >>> from astropy import units as u
+
+        >>> def worker(freq, hprof_data):  # doctest: +SKIP
+        ...     return pathprof.atten_map_fast(
+        ...         freq, 290 * u.K, 1013 * u.hPa, 20 * u.m, 10 * u.m,
+        ...         2 * u.percent, hprof_data,
+        ...         )['L_b']
+
+        >>> shm_data = pathprof.SharedHprofData(hprof_data)  # doctest: +SKIP
+        >>> with shm_data, ProcessPoolExecutor() as pool:  # doctest: +SKIP
+        ...     results = list(pool.map(
+        ...         worker, [1, 2, 5] * u.GHz, [shm_data] * 3
+        ...         ))
+    '''
+
+    def __init__(self, hprof_data):
+
+        from multiprocessing import shared_memory
+
+        layout, extra = {}, {}
+        nbytes = 0
+        for key in hprof_data:
+            val = hprof_data[key]
+            if not isinstance(val, np.ndarray) and not hasattr(val, 'dtype'):
+                extra[key] = val
+                continue
+
+            arr = np.asarray(val)
+            if arr.dtype.hasobject:
+                extra[key] = arr
+                continue
+
+            layout[key] = (nbytes, arr.shape, arr.dtype.str)
+            nbytes += -(-arr.nbytes // _SHM_ALIGN) * _SHM_ALIGN
+
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(nbytes, 1)
+            )
+        self._owner = True
+        self._pid = os.getpid()
+        self._layout = layout
+        self._extra = extra
+
+        # no reference to the buffer must be kept here; otherwise, the
+        # block could not be closed
+        try:
+            for key, (offset, shape, dtype) in layout.items():
+                np.ndarray(
+                    shape, dtype, buffer=self._shm.buf, offset=offset
+                    )[...] = hprof_data[key]
+        except BaseException:
+            self.unlink()
+            raise
+
+        self._make_views()
+
+    def _make_views(self):
+
+        self._data = dict(self._extra)
+        for key, (offset, shape, dtype) in self._layout.items():
+            view = np.ndarray(
+                shape, dtype, buffer=self._shm.buf, offset=offset
+                )
+            view.flags.writeable = False
+            self._data[key] = view
+
+    def __getstate__(self):
+
+        return {
+            'name': self._shm.name,
+            'pid': self._pid,
+            'layout': self._layout,
+            'extra': self._extra,
+            }
+
+    def __setstate__(self, state):
+
+        import multiprocessing
+        from multiprocessing import shared_memory, resource_tracker
+
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        # only the owner must unlink the block; an unrelated process
+        # (i.e., not a child of the owner) has its own resource tracker,
+        # which would remove the block on exit (Python < 3.13)
+        if (
+                state['pid'] != os.getpid() and
+                multiprocessing.parent_process() is None
+                ):
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+
+        self._owner = False
+        self._pid = state['pid']
+        self._layout = state['layout']
+        self._extra = state['extra']
+        self._make_views()
+
+    @property
+    def name(self):
+        '''Name of the shared-memory block.'''
+
+        return self._shm.name
+
+    @property
+    def nbytes(self):
+        '''Size of the shared-memory block [bytes].'''
+
+        return self._shm.size
+
+    def __getitem__(self, key):
+
+        return self._data[key]
+
+    def __iter__(self):
+
+        return iter(self._data)
+
+    def __len__(self):
+
+        return len(self._data)
+
+    def __repr__(self):
+
+        return 'SharedHprofData<name: {}, {} bytes>'.format(
+            self.name, self.nbytes
+            )
+
+    def close(self):
+        '''
+        Detach from the shared-memory block.
+
+        The array views become invalid.
+        '''
+
+        self._data = {}
+        self._shm.close()
+
+    def unlink(self):
+        '''
+        Detach from and free the shared-memory block.
+
+        Must only be called once (by the creating process), after all
+        other processes are done with the data.
+        '''
+
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+        self.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
+
 
 @utils.ranged_quantity_input(
     freq=(0.1, 100, apu.GHz),
@@ -813,6 +1457,9 @@ def atten_map_fast(
         hprof_data,  # dict_like
         polarization=0,
         version=16,
+        ray_sweep=False,
+        job=None,
+        nthreads=None,
         ):
     '''
     Calculate attenuation maps using a fast method.
@@ -832,12 +1479,26 @@ def atten_map_fast(
     hprof_data : dict, dict-like
         Dictionary with height profiles and auxillary maps
         of dimension `(my, mx)` as calculated with
-        `~pycraf.pathprof.height_map_data`.
+        `~pycraf.pathprof.height_map_data`. The compact representation
+        (see `~pycraf.pathprof.compact_hprof_data`) is also accepted.
     polarization : int, optional
         Polarization (default: 0)
         Allowed values are: 0 - horizontal, 1 - vertical
     version : int, optional
         ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    ray_sweep : bool, optional
+        If True, use the ray-sweep engine, which processes all pixels
+        associated with the same height profile in one pass (see Notes).
+        (default: False)
+    job : `~pycraf.pathprof.JobControl`, optional
+        If given, the progress of the computation (in map pixels) can be
+        queried from `job` (e.g., from another thread), and the
+        computation can be aborted with `job.cancel()`. A
+        `~pycraf.pathprof.JobCancelledError` is raised in this case.
+        (default: None)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -878,6 +1539,22 @@ def atten_map_fast(
       is based on a Bullington calculation with correction terms.
     - In future versions, more entries may be added to the results
       dictionary.
+    - With `ray_sweep`, the pixels are processed ray by ray, in the order
+      of their distance to the map center, and the rays are distributed
+      over the threads. The smooth-earth sums are accumulated along the
+      ray, the transmitter-side maxima and the effective antenna heights
+      are found on upper convex hulls of the profile, and the remaining
+      maxima (e.g., the receiver-side Bullington slope) are searched only
+      in the profile blocks whose height maxima allow for them. This
+      avoids the full passes over the profile for each pixel and makes
+      the map calculation about twice as fast. Results agree with the
+      default engine within numerical precision.
+    - The arrays in `hprof_data` are used without copying where possible,
+      e.g., memory-mapped `npy` files. HDF5 data sets (or similar) are
+      read in blocks of map rows, loading only the needed parts of the
+      height profiles. This allows to keep large map caches on disk.
+      The block size is chosen such that the data of a block fit into
+      `~pycraf.utils.PerformanceConf.memory_budget`.
     '''
 
     float_res, int_res = cyprop.atten_map_fast_cython(
@@ -889,8 +1566,19 @@ def atten_map_fast(
         hprof_data,  # dict_like
         polarization=polarization,
         version=version,
+        ray_sweep=ray_sweep,
+        job=job,
+        nthreads=nthreads,
         )
 
+    return _atten_map_results(float_res, int_res)
+
+
+def _atten_map_results(float_res, int_res):
+    '''
+    Convert the output of the atten_map Cython functions to a dictionary.
+    '''
+
     return {
         'L_b0p': float_res[0] * cnv.dB,
         'L_bd': float_res[1] * cnv.dB,
@@ -906,6 +1594,567 @@ def atten_map_fast(
         }
 
 
+@utils.ranged_quantity_input(
+    freq=(0.1, 100, apu.GHz),
+    temperature=(None, None, apu.K),
+    pressure=(None, None, apu.hPa),
+    h_tg=(None, None, apu.m),
+    h_rg=(None, None, apu.m),
+    timepercent=(0, 50, apu.percent),
+    strip_input_units=True,
+    )
+def atten_map_progressive(
+        freq,
+        temperature,
+        pressure,
+        h_tg, h_rg,
+        timepercent,
+        hprof_data,  # dict_like
+        callback=None,
+        coarsest_step=None,
+        polarization=0,
+        version=16,
+        ray_sweep=False,
+        job=None,
+        nthreads=None,
+        ):
+    '''
+    Calculate attenuation maps progressively, from coarse to fine.
+
+    This produces the same results as `~pycraf.pathprof.atten_map_fast`,
+    but computes the map in several passes. The first pass only
+    computes a coarse sub-grid of the map (every `coarsest_step`-th
+    pixel along both axes), which is usually done in a small fraction
+    of the total run time. Every following pass halves the step size,
+    computing only the pixels that are new on the finer grid. After each
+    pass, `callback` is invoked with the intermediate map, e.g., to
+    update a plot.
+
+    Parameters
+    ----------
+    freq : `~astropy.units.Quantity`
+        Frequency of radiation [GHz]
+    temperature : `~astropy.units.Quantity`
+        Temperature (K)
+    pressure : `~astropy.units.Quantity`
+        Pressure (hPa)
+    h_tg, h_rg : `~astropy.units.Quantity`
+        Transmitter/receiver heights over ground [m]
+    timepercent : `~astropy.units.Quantity`
+        Time percentage [%] (maximal 50%)
+    hprof_data : dict, dict-like
+        Dictionary with height profiles and auxillary maps
+        of dimension `(my, mx)` as calculated with
+        `~pycraf.pathprof.height_map_data`. The compact representation
+        (see `~pycraf.pathprof.compact_hprof_data`) is also accepted.
+    callback : callable, optional
+        Function, which is called after each pass as
+        `callback(step, results)`. `step` is the pixel step of the pass
+        (it is 1 for the last pass) and `results` is a dictionary as
+        returned by `~pycraf.pathprof.atten_map_fast`. Pixels that were
+        not computed yet are filled with the value of the closest
+        computed pixel towards lower indices (i.e., the
+        coarse map is shown as blocks of `step x step` pixels).
+        (default: None)
+    coarsest_step : int, optional
+        Pixel step of the first pass; it is rounded up to a power of two.
+        If None, it is chosen such that the first pass computes at most
+        64 pixels along each map axis. (default: None)
+    polarization : int, optional
+        Polarization (default: 0)
+        Allowed values are: 0 - horizontal, 1 - vertical
+    version : int, optional
+        ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    ray_sweep : bool, optional
+        If True, use the ray-sweep engine (see
+        `~pycraf.pathprof.atten_map_fast`). (default: False)
+    job : `~pycraf.pathprof.JobControl`, optional
+        If given, the progress of the computation (in map pixels, over
+        all passes) can be queried from `job`, and the computation can be
+        aborted with `job.cancel()`. A `~pycraf.pathprof.JobCancelledError`
+        is raised in this case. (default: None)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
+
+    Returns
+    -------
+    results : dict
+        Results of the path attenuation calculation (see
+        `~pycraf.pathprof.atten_map_fast`). These are identical to the
+        output of `~pycraf.pathprof.atten_map_fast`.
+
+    Notes
+    -----
+    - Each pixel is computed exactly once, such that the total run time
+      is about the same as for `~pycraf.pathprof.atten_map_fast`.
+    - Arrays in `hprof_data` that are not held in memory (e.g., HDF5
+      data sets) are loaded completely before the first pass.
+    - The callback is invoked from the thread that runs the
+      computation. In GUI applications, the computation should thus be
+      done in a worker thread and the callback should only hand the
+      results over to the GUI thread (e.g., via a Qt signal).
+    '''
+
+    if callback is None:
+        _callback = None
+    else:
+        def _callback(step, float_res, int_res):
+            callback(step, _atten_map_results(float_res, int_res))
+
+    float_res, int_res = cyprop.atten_map_progressive_cython(
+        freq,
+        temperature,
+        pressure,
+        h_tg, h_rg,
+        timepercent,
+        hprof_data,  # dict_like
+        callback=_callback,
+        coarsest_step=0 if coarsest_step is None else coarsest_step,
+        polarization=polarization,
+        version=version,
+        ray_sweep=ray_sweep,
+        job=job,
+        nthreads=nthreads,
+        )
+
+    return _atten_map_results(float_res, int_res)
+
+
+@utils.ranged_quantity_input(
+    lon_t=(-180, 180, apu.deg),
+    lat_t=(-90, 90, apu.deg),
+    lons_r=(-180, 180, apu.deg),
+    lats_r=(-90, 90, apu.deg),
+    hprof_step=(1., 1.e5, apu.m),
+    bearing_res=(0, 10, apu.deg),
+    d_tm=(None, None, apu.km),
+    d_lm=(None, None, apu.km),
+    d_ct=(None, None, apu.km),
+    d_cr=(None, None, apu.km),
+    omega_percent=(0, 100, apu.percent),
+    strip_input_units=True, allow_none=True, output_unit=None
+    )
+def height_points_data(
+        lon_t, lat_t,
+        lons_r, lats_r,
+        hprof_step=30. * apu.m,
+        bearing_res=None,
+        zone_t=cyprop.CLUTTER.UNKNOWN, zone_r=cyprop.CLUTTER.UNKNOWN,
+        d_tm=None, d_lm=None,
+        d_ct=None, d_cr=None,
+        omega_percent=0 * apu.percent,
+        ):
+    '''
+    Calculate height profiles and auxillary data needed for
+    `~pycraf.pathprof.atten_points_fast`.
+
+    This is the equivalent of `~pycraf.pathprof.height_map_data` for
+    arbitrary sets of receiver points (e.g., building positions). As for
+    the maps, height profiles are calculated for a radial fan of rays
+    around the transmitter, and each point is assigned to the closest
+    position on one of the rays. However, only the rays that have points
+    assigned are computed (and only up to the farthest of their points).
+
+    Parameters
+    ----------
+    lon_t, lat_t : `~astropy.units.Quantity`
+        Geographic longitude/latitude of transmitter [deg]
+    lons_r, lats_r : `~astropy.units.Quantity`, 1D
+        Geographic longitudes/latitudes of the receiver points [deg]
+    hprof_step : `~astropy.units.Quantity`, optional
+        Distance resolution of the height profiles [m] (default: 30 m)
+    bearing_res : `~astropy.units.Quantity`, optional
+        Angular resolution of the ray fan [deg]. If None, it is chosen
+        such that the lateral offset of the farthest point from the
+        closest ray is at most `hprof_step`. (default: None)
+    zone_t, zone_r : CLUTTER enum, optional
+        Clutter type for transmitter/receiver terminal.
+        (default: CLUTTER.UNKNOWN)
+    d_tm : `~astropy.units.Quantity`, optional
+        longest continuous land (inland + coastal) section of the
+        great-circle path [km]
+        (default: distance between Tx and Rx)
+    d_lm : `~astropy.units.Quantity`, optional
+        longest continuous inland section of the great-circle path [km]
+        (default: distance between Tx and Rx)
+    d_ct, d_cr : `~astropy.units.Quantity`, optional
+        Distance over land from transmitter/receiver antenna to the coast
+        along great circle interference path [km]
+        (default: 50000 km)
+    omega_percent : `~astropy.units.Quantity`, optional
+        Fraction of the path over water [%] (see Table 3)
+        (default: 0%)
+
+    Returns
+    -------
+    hprof_data : dict
+        Dictionary with height profiles and auxillary data. It contains
+        the following entities (for `n` points, `me` rays, and `mh`
+        positions per ray):
+
+        - "lon_t", "lat_t", "hprof_step" : float
+
+          Transmitter coordinates and profile resolution.
+
+        - "bearing_res" : float
+
+          Angular resolution of the ray fan [deg].
+
+        - "lons_r", "lats_r" : `~numpy.ndarray` 1D (float; (n, ))
+
+          Receiver point coordinates.
+
+        - "path_idx", "dist_end_idx" : `~numpy.ndarray` 1D (int; (n, ))
+
+          Index of the ray and of the position along the ray that is
+          closest to each point.
+
+        - "pos_dist" : `~numpy.ndarray` 1D (float; (n, ))
+
+          Distance between each point and its ray position [m]. This is
+          returned for information, only.
+
+        - "dist", "lon_mid", "lat_mid", "bearing", "back_bearing" :
+          `~numpy.ndarray` 1D (float; (n, ))
+
+          Path distance [km], path center coordinates, and bearings [deg]
+          of the paths to the (ray positions of the) points.
+
+        - "delta_N", "beta0", "N0" : `~numpy.ndarray` 1D (float; (n, ))
+
+          Radiometeorological data for each path.
+
+        - "zone_t", "zone_r" : `~numpy.ndarray` 1D (CLUTTER enum; (n, ))
+
+          Transmitter and receiver clutter zones.
+
+        - "d_tm", "d_lm", "d_ct", "d_cr", "omega" :
+          `~numpy.ndarray` 1D (float; (n, ))
+
+          Land/sea parameters for each path.
+
+        - "dist_prof", "height_profs", "zheight_prof" : `~numpy.ndarray`
+          (float; (mh, ), (me, mh), and (mh, ))
+
+          Distances [km] and heights [m] of the ray positions, as well as
+          a zero-valued array (see `~pycraf.pathprof.height_map_data`).
+
+    Notes
+    -----
+    - Points closer to the transmitter than about four times `hprof_step`
+      are not handled by `~pycraf.pathprof.atten_points_fast` (the
+      results are NaN for these).
+    - The same SRTM-related considerations apply as for
+      `~pycraf.pathprof.height_map_data`.
+    '''
+
+    return cyprop.height_points_data_cython(
+        lon_t, lat_t,
+        lons_r, lats_r,
+        hprof_step,
+        bearing_res=0. if bearing_res is None else bearing_res,
+        zone_t=zone_t, zone_r=zone_r,
+        d_tm=d_tm, d_lm=d_lm,
+        d_ct=d_ct, d_cr=d_cr,
+        omega=omega_percent,
+        )
+
+
+@utils.ranged_quantity_input(
+    freq=(0.1, 100, apu.GHz),
+    temperature=(None, None, apu.K),
+    pressure=(None, None, apu.hPa),
+    h_tg=(None, None, apu.m),
+    h_rg=(None, None, apu.m),
+    timepercent=(0, 50, apu.percent),
+    strip_input_units=True,
+    )
+def atten_points_fast(
+        freq,
+        temperature,
+        pressure,
+        h_tg, h_rg,
+        timepercent,
+        hprof_data,  # dict_like
+        polarization=0,
+        version=16,
+        ray_sweep=False,
+        nthreads=None,
+        ):
+    '''
+    Calculate attenuation for a set of receiver points using a fast method.
+
+    Parameters
+    ----------
+    freq : `~astropy.units.Quantity`
+        Frequency of radiation [GHz]
+    temperature : `~astropy.units.Quantity`
+        Temperature (K)
+    pressure : `~astropy.units.Quantity`
+        Pressure (hPa)
+    h_tg, h_rg : `~astropy.units.Quantity`
+        Transmitter/receiver heights over ground [m]
+    timepercent : `~astropy.units.Quantity`
+        Time percentage [%] (maximal 50%)
+    hprof_data : dict, dict-like
+        Dictionary with height profiles and auxillary data as calculated
+        with `~pycraf.pathprof.height_points_data`.
+    polarization : int, optional
+        Polarization (default: 0)
+        Allowed values are: 0 - horizontal, 1 - vertical
+    version : int, optional
+        ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    ray_sweep : bool, optional
+        If True, use the ray-sweep engine, which processes all points
+        associated with the same height profile in one pass (see
+        `~pycraf.pathprof.atten_map_fast`). (default: False)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
+
+    Returns
+    -------
+    results : dict
+        Results of the path attenuation calculation. Each entry
+        in the dictionary is a 1D `~numpy.ndarray` containing
+        the associated value for the points. The entries are the same as
+        for `~pycraf.pathprof.atten_map_fast`.
+
+    Notes
+    -----
+    - Points closer than about four `hprof_step` to the transmitter
+      (i.e., with `dist_end_idx < 4`) cannot be calculated. For these,
+      all float-valued entries are NaN and `path_type` is -1.
+    - The points are computed in parallel. With `ray_sweep`, this is
+      done ray by ray, which is typically faster if there are many
+      points per ray.
+    '''
+
+    float_res, int_res = cyprop.atten_points_fast_cython(
+        freq,
+        temperature,
+        pressure,
+        h_tg, h_rg,
+        timepercent,
+        hprof_data,  # dict_like
+        polarization=polarization,
+        version=version,
+        ray_sweep=ray_sweep,
+        nthreads=nthreads,
+        )
+
+    return {
+        'L_b0p': float_res[0] * cnv.dB,
+        'L_bd': float_res[1] * cnv.dB,
+        'L_bs': float_res[2] * cnv.dB,
+        'L_ba': float_res[3] * cnv.dB,
+        'L_b': float_res[4] * cnv.dB,
+        'L_b_corr': float_res[5] * cnv.dB,
+        'eps_pt': float_res[6] * apu.deg,
+        'eps_pr': float_res[7] * apu.deg,
+        'd_lt': float_res[8] * apu.km,
+        'd_lr': float_res[9] * apu.km,
+        'path_type': int_res[0],
+        }
+
+
+@utils.ranged_quantity_input(
+    freq=(0.1, 100, apu.GHz),
+    temperature=(None, None, apu.K),
+    pressure=(None, None, apu.hPa),
+    lons_t=(-180, 180, apu.deg),
+    lats_t=(-90, 90, apu.deg),
+    h_tg=(None, None, apu.m),
+    eirp=(None, None, cnv.dB_W),
+    h_rg=(None, None, apu.m),
+    timepercent=(0, 50, apu.percent),
+    xcoords=(-180, 180, apu.deg),
+    ycoords=(-90, 90, apu.deg),
+    max_distance=(0, None, apu.km),
+    G_r=(None, None, cnv.dBi),
+    strip_input_units=True, output_unit=cnv.dB_W,
+    )
+def power_map_aggregate(
+        freq,
+        temperature,
+        pressure,
+        lons_t, lats_t,
+        h_tg, eirp,
+        h_rg,
+        timepercent,
+        xcoords, ycoords,
+        max_distance,
+        G_r=0. * cnv.dBi,
+        antenna_patterns=None,
+        zone_t=cyprop.CLUTTER.UNKNOWN, zone_r=cyprop.CLUTTER.UNKNOWN,
+        polarization=0,
+        version=16,
+        nthreads=None,
+        ):
+    '''
+    Calculate the aggregated received power of many transmitters on a map.
+
+    For each transmitter, the path attenuation is calculated with
+    `~pycraf.pathprof.atten_map_fast` on a map that covers the pixels
+    within `max_distance` only. The received powers are interpolated onto
+    the common map grid and summed up (in linear units).
+
+    Parameters
+    ----------
+    freq : `~astropy.units.Quantity`
+        Frequency of radiation [GHz]
+    temperature : `~astropy.units.Quantity`
+        Temperature (K)
+    pressure : `~astropy.units.Quantity`
+        Pressure (hPa)
+    lons_t, lats_t : `~astropy.units.Quantity`, 1D
+        Geographic longitudes/latitudes of the transmitters [deg]
+    h_tg : `~astropy.units.Quantity`, scalar or 1D
+        Transmitter heights over ground [m]
+    eirp : `~astropy.units.Quantity`, scalar or 1D
+        Equivalent isotropically radiated power of the transmitters [dB_W]
+    h_rg : `~astropy.units.Quantity`
+        Receiver height over ground [m]
+    timepercent : `~astropy.units.Quantity`
+        Time percentage [%] (maximal 50%)
+    xcoords, ycoords : `~astropy.units.Quantity`, 1D
+        Longitudes/latitudes of the (receiver) map grid [deg]; must be
+        equally spaced and increasing. The spacing of `ycoords` is used as
+        map resolution for the calculations.
+    max_distance : `~astropy.units.Quantity`
+        Maximal distance of the receivers from a transmitter, for which
+        its contribution is taken into account [km]
+    G_r : `~astropy.units.Quantity`, optional
+        Receiver antenna gain [dBi] (default: 0 dBi)
+    antenna_patterns : list of callables (or None), optional
+        Transmitter antenna patterns. If given, for each transmitter, a
+        function `f(azimuth, elevation)` (or None, for isotropic antennas),
+        which returns the gain relative to the `eirp` [dB] for the given
+        path direction at the transmitter, i.e., azimuth (bearing) and
+        elevation [deg] as `~astropy.units.Quantity`. (default: None)
+    zone_t : CLUTTER enum, scalar or 1D, optional
+        Clutter type for the transmitters. (default: CLUTTER.UNKNOWN)
+    zone_r : CLUTTER enum, optional
+        Clutter type for the receivers. (default: CLUTTER.UNKNOWN)
+    polarization : int, optional
+        Polarization (default: 0)
+        Allowed values are: 0 - horizontal, 1 - vertical
+    version : int, optional
+        ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
+
+    Returns
+    -------
+    power : `~astropy.units.Quantity` 2D (my, mx)
+        Aggregated received power [dB_W]. Pixels without any contribution
+        have a value of `-inf`.
+
+    Notes
+    -----
+    - The received power of each transmitter is `eirp + G_t - L_b_corr +
+      G_r`, where `G_t` is given by the antenna pattern (if any) and
+      `L_b_corr` is the complete path propagation loss (including clutter
+      correction) as returned by `~pycraf.pathprof.atten_map_fast`.
+    - Only the height profiles and attenuation map of a single transmitter
+      are kept in memory at a time. The transmitters are processed in the
+      order of the SRTM tiles that they are located in, such that
+      consecutive transmitters mostly need the same (cached) tiles.
+      Transmitters too far away from the map are skipped.
+    - The received powers are bi-linearly interpolated (in dB) onto the
+      map grid and accumulated in parallel. Pixels very close to a
+      transmitter (within a few `hprof_step`, see
+      `~pycraf.pathprof.height_map_data`) are not handled by
+      `~pycraf.pathprof.atten_map_fast` and receive no contribution
+      from that transmitter.
+    '''
+
+    lons_t, lats_t, h_tg, eirp, zone_t = np.broadcast_arrays(
+        np.atleast_1d(lons_t), lats_t, h_tg, eirp, zone_t
+        )
+    assert lons_t.ndim == 1, 'Transmitter arrays must be 1D'
+    num_tx = lons_t.size
+
+    if antenna_patterns is None:
+        antenna_patterns = [None] * num_tx
+    assert len(antenna_patterns) == num_tx
+
+    xcoords = np.asarray(xcoords, dtype=np.float64)
+    ycoords = np.asarray(ycoords, dtype=np.float64)
+    assert xcoords.ndim == 1 and ycoords.ndim == 1
+    assert len(xcoords) > 1 and len(ycoords) > 1
+    assert np.all(np.diff(xcoords) > 0) and np.all(np.diff(ycoords) > 0)
+
+    map_resolution = ycoords[1] - ycoords[0]
+    # Tx maps must (just) cover a circle with radius max_distance
+    map_size = 2 * np.degrees(max_distance / 6371.) + 2 * map_resolution
+
+    power_map = np.zeros((len(ycoords), len(xcoords)), dtype=np.float64)
+
+    # serpentine order of SRTM tiles
+    ilons, ilats = np.floor(lons_t), np.floor(lats_t)
+    tx_order = np.lexsort((np.where(ilats % 2 == 0, ilons, -ilons), ilats))
+
+    for i in tx_order:
+
+        half_size_lon = map_size / 2 / np.cos(np.radians(lats_t[i]))
+        if (
+                lons_t[i] + half_size_lon < xcoords[0] or
+                lons_t[i] - half_size_lon > xcoords[-1] or
+                lats_t[i] + map_size / 2 < ycoords[0] or
+                lats_t[i] - map_size / 2 > ycoords[-1]
+                ):
+            continue
+
+        hprof_data = height_map_data(
+            lons_t[i] * apu.deg, lats_t[i] * apu.deg,
+            map_size * apu.deg, map_size * apu.deg,
+            map_resolution=map_resolution * apu.deg,
+            zone_t=int(zone_t[i]), zone_r=zone_r,
+            nthreads=nthreads,
+            )
+        results = atten_map_fast(
+            freq * apu.GHz,
+            temperature * apu.K,
+            pressure * apu.hPa,
+            h_tg[i] * apu.m, h_rg * apu.m,
+            timepercent * apu.percent,
+            hprof_data,
+            polarization=polarization,
+            version=version,
+            nthreads=nthreads,
+            )
+
+        power_db = eirp[i] + G_r - results['L_b_corr'].to_value(cnv.dB)
+        if antenna_patterns[i] is not None:
+            # bearing_map is in radians
+            G_t = antenna_patterns[i](
+                np.degrees(hprof_data['bearing_map']) * apu.deg,
+                results['eps_pt'],
+                )
+            power_db += getattr(G_t, 'value', G_t)
+
+        power_db[
+            (hprof_data['dist_map'] > max_distance) |
+            (hprof_data['dist_end_idx_map'] < 4)
+            ] = np.nan
+
+        hx, hy = hprof_data['xcoords'], hprof_data['ycoords']
+        cyprop.power_map_accumulate_cython(
+            power_map, xcoords, ycoords,
+            np.ascontiguousarray(power_db, dtype=np.float64),
+            hx[0], hx[1] - hx[0], hy[0], hy[1] - hy[0],
+            nthreads=nthreads,
+            )
+
+        del hprof_data, results, power_db
+
+    with np.errstate(divide='ignore'):
+        return 10 * np.log10(power_map)
+
+
 @utils.ranged_quantity_input(
     lon_t=(-180, 180, apu.deg),
     lat_t=(-90, 90, apu.deg),
@@ -1245,6 +2494,7 @@ def atten_path_fast(
         hprof_data,  # dict_like
         polarization=0,
         version=16,
+        nthreads=None,
         ):
     '''
     Calculate attenuation along a path using a parallelized method.
@@ -1270,6 +2520,9 @@ def atten_path_fast(
         Allowed values are: 0 - horizontal, 1 - vertical
     version : int, optional
         ITU-R Rec. P.452 version. Allowed values are: 14, 16
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -1373,6 +2626,7 @@ def atten_path_fast(
         hprof_data,  # dict_like
         polarization=polarization,
         version=version,
+        nthreads=nthreads,
         )
 
     return {
@@ -1438,6 +2692,7 @@ def losses_complete(
         # override if you don't want builtin method:
         hprof_dists=None, hprof_heights=None,
         hprof_bearing=None, hprof_backbearing=None,
+        nthreads=None,
         ):
     '''
     Calculate propagation losses for a fixed path using a parallelized method.
@@ -1512,6 +2767,9 @@ def losses_complete(
     hprof_backbearing : `~astropy.units.Quantity`, optional
         Back-bearing of the height profile path.
         (default: query `~pycraf.pathprof.srtm_height_profile`)
+    nthreads : int, optional
+        Number of threads to use. (default: None, i.e., use
+        `~pycraf.utils.PerformanceConf.num_threads`)
 
     Returns
     -------
@@ -1586,15 +2844,13 @@ def losses_complete(
 
     Notes
     -----
-    - It is extremely important how the broadcasting axes are chosen! There
-      are six entities - `freq`, `h_tg`, `h_rg`, `version`, `zone_t`, `zone_r`
-      - that have influence on the propagation path geometry. In the
-      broadcasted arrays, the associated axes should vary as slow as
-      possible. The internal Cython routine will trigger a re-computation of
-      the path geometry if one of these parameters changes. Therefore, if the
-      axes for `frequency` and `time_percent` would have been chosen in the
-      opposite manner, the function would run about an order of magnitude
-      slower!
+    - There are six entities - `freq`, `h_tg`, `h_rg`, `version`, `zone_t`,
+      `zone_r` - that have influence on the propagation path geometry. The
+      internal Cython routine first identifies all unique combinations of
+      these and computes the associated path geometries only once (in
+      parallel). Therefore, the computing time scales with the number of
+      unique geometries (plus a small effort per array element) and it
+      doesn't matter how the broadcasting axes are chosen.
     - The diffraction-loss algorithm was changed between ITU-R P.452
       version 14 and 15. The former used a Deygout method, the new one
       is based on a Bullington calculation with correction terms.
@@ -1627,6 +2883,7 @@ def losses_complete(
         hprof_heights=hprof_heights,
         hprof_bearing=hprof_bearing,
         hprof_backbearing=hprof_backbearing,
+        nthreads=nthreads,
         )
     return {
         'L_b0p': res[0] * cnv.dB,
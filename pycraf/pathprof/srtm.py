@@ -29,14 +29,21 @@ from __future__ import (
 import os
 import warnings
 import shutil
-from zipfile import ZipFile
+from zipfile import ZipFile, BadZipFile
 import re
 import json
 import glob
-from functools import lru_cache
+import zlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
 import numpy as np
 from scipy.interpolate import RegularGridInterpolator, RectBivariateSpline
-from astropy.utils.data import get_pkg_data_filename, download_file
+from astropy.utils.data import get_pkg_data_filename
 from astropy import units as apu
 from .. import utils
 
@@ -46,7 +53,8 @@ __all__ = [
     'TileNotAvailableOnDiskError',
     'TileNotAvailableOnDiskWarning',
     'TilesSizeError',
-    'SrtmConf', 'srtm_height_data'
+    'SrtmConf', 'srtm_height_data', 'pack_srtm_tiles',
+    'download_srtm_tiles',
     ]
 
 
@@ -58,6 +66,12 @@ with open(_NASA_JSON_NAME, 'r') as f:
 
 VIEWPANO_TILES = np.load(_VIEWPANO_NAME)
 
+_SERVER_URLS = {
+    'nasa_v1.0': 'https://dds.cr.usgs.gov/srtm/version1/',
+    'nasa_v2.1': 'https://dds.cr.usgs.gov/srtm/version2_1/SRTM3/',
+    'viewpano': 'http://viewfinderpanoramas.org/dem3/',
+    }
+
 
 class TileNotAvailableOnServerError(Exception):
 
@@ -137,6 +151,29 @@ class SrtmConf(utils.MultiState):
     We refer to `~scipy.interpolate.RectBivariateSpline` description for
     further information.
 
+    For height profiles with coarse steps (larger than about 1.5 times the
+    SRTM resolution), the terrain data is smoothed to the step size. By
+    default, this is done by sampling the tiles at full resolution. With
+    `pyramid=True`, pre-smoothed versions of the tiles with 2, 4, 8, ...
+    times coarser resolution are used instead, which are sampled at
+    a resolution appropriate for the step size (and smoothed further to
+    the step size along the profile)::
+
+        SrtmConf.set(pyramid=True)
+
+    The pre-smoothed tiles are computed on first use and stored (as '.npy'
+    files) in `pyramid_dir`, which is the sub-directory 'pyramid' of
+    `srtm_dir` by default. If the '.hgt' files change, the pyramid
+    directory must be deleted.
+
+    Many small '.hgt' files can be slow to access, e.g., on network file
+    systems. With `pack_srtm_tiles`, they can be stored in a single file,
+    which is then used via::
+
+        SrtmConf.set(srtm_pack='/path/to/tiles.srtmpack')
+
+    Tiles that are not in the pack file are still searched in `srtm_dir`.
+
     Two read-only attributes are present, `tile_size` (pixels) and
     `hgt_res` (m), which are automatically inferred from the tile data.
 
@@ -149,7 +186,7 @@ class SrtmConf(utils.MultiState):
 
     _attributes = (
         'srtm_dir', 'download', 'server', 'interp', 'spline_opts',
-        'tile_size', 'hgt_res'
+        'pyramid', 'pyramid_dir', 'srtm_pack', 'tile_size', 'hgt_res'
         )
 
     srtm_dir = os.environ.get('SRTMDATA', '.')
@@ -157,6 +194,9 @@ class SrtmConf(utils.MultiState):
     server = 'nasa_v2.1'
     interp = 'linear'
     spline_opts = (3, 0)
+    pyramid = False
+    pyramid_dir = ''  # empty: use srtm_dir/pyramid
+    srtm_pack = ''  # empty: no pack file
     tile_size = 1201
     hgt_res = 90.  # m; basic SRTM resolution (refers to 3 arcsec resolution)
 
@@ -170,6 +210,9 @@ class SrtmConf(utils.MultiState):
         - `server`:  'nasa_v2.1', 'nasa_v1.0', 'viewpano'
         - `interp`:  'nearest', 'linear', 'spline'
         - `spline_opts`:  tuple(k, s) (k = degree, s = smoothing factor)
+        - `pyramid`:  bool
+        - `pyramid_dir`:  str
+        - `srtm_pack`:  str
 
         '''
 
@@ -221,6 +264,25 @@ class SrtmConf(utils.MultiState):
                     raise ValueError(
                         '"spline_opts" s-value must be a float.'
                         )
+
+            if k == 'pyramid':
+                if not isinstance(v, bool):
+                    raise ValueError(
+                        '"pyramid" option must be a bool.'
+                        )
+
+            if k == 'pyramid_dir':
+                if not isinstance(v, str):
+                    raise ValueError(
+                        '"pyramid_dir" option must be a string.'
+                        )
+
+            if k == 'srtm_pack':
+                if not isinstance(v, str):
+                    raise ValueError(
+                        '"srtm_pack" option must be a string.'
+                        )
+
             if k in ['tile_size', 'hgt_res']:
 
                 raise KeyError(
@@ -252,22 +314,33 @@ class SrtmConf(utils.MultiState):
             if kwargs['server'] != cls.server:
                 get_tile_interpolator.cache_clear()
 
+        if 'pyramid_dir' in kwargs:
+            # dito
+            if kwargs['pyramid_dir'] != cls.pyramid_dir:
+                get_tile_interpolator.cache_clear()
+
+        if 'srtm_pack' in kwargs:
+            # dito
+            if kwargs['srtm_pack'] != cls.srtm_pack:
+                get_tile_interpolator.cache_clear()
+                _open_tile_pack.cache_clear()
+
     @classmethod
     def __repr__(cls):
         return (
             '<SrtmConf dir: {}, download: {}, server: {}, '
-            'interp: {}, spline_opts: {}>'.format(
+            'interp: {}, spline_opts: {}, pyramid: {}>'.format(
                 cls.srtm_dir, cls.download, cls.server,
-                cls.interp, cls.spline_opts
+                cls.interp, cls.spline_opts, cls.pyramid
                 ))
 
     @classmethod
     def __str__(cls):
         return (
             'SrtmConf\n  directory: {}\n  download: {}\n  server: {}\n'
-            '  interp: {}\n  spline_opts: {}'.format(
+            '  interp: {}\n  spline_opts: {}\n  pyramid: {}'.format(
                 cls.srtm_dir, cls.download, cls.server,
-                cls.interp, cls.spline_opts
+                cls.interp, cls.spline_opts, cls.pyramid
                 ))
 
 
@@ -341,14 +414,8 @@ def _check_consistent_tile_sizes(srtm_dir):
     return tile_size
 
 
-def _download(ilon, ilat):
-    # download the tile to path
-
-    srtm_dir = SrtmConf.srtm_dir
-    server = SrtmConf.server
-
-    tile_name = _hgt_filename(ilon, ilat)
-    tile_path = os.path.join(srtm_dir, tile_name)
+def _archive_url(ilon, ilat):
+    # URL and file name of the (zip) archive containing a tile
 
     # Unfortunately, each server has a different structure.
     # NASA stores them in sub-directories (by continents)
@@ -361,55 +428,214 @@ def _download(ilon, ilat):
     # for downloading). However, we have to figure out, in which
     # subdirectory/zip-file a tile is located.
 
+    server = SrtmConf.server
+    base_url = _SERVER_URLS[server]
+
     if server.startswith('nasa_v'):
+        continent = _check_availability(ilon, ilat)
+        archive_name = _hgt_filename(ilon, ilat) + '.zip'
+        return base_url + continent + '/' + archive_name, archive_name
 
-        if server == 'nasa_v1.0':
-            base_url = 'https://dds.cr.usgs.gov/srtm/version1/'
-        elif server == 'nasa_v2.1':
-            base_url = 'https://dds.cr.usgs.gov/srtm/version2_1/SRTM3/'
+    elif server == 'viewpano':
+        archive_name = _check_availability(ilon, ilat)
+        return base_url + archive_name, archive_name
 
-        continent = _check_availability(ilon, ilat)
 
-        # downloading
-        full_url = base_url + continent + '/' + tile_name + '.zip'
-        tmp_path = download_file(full_url)
+@contextmanager
+def _file_lock(lock_path):
+    # advisory lock (across processes and threads) for the duration of the
+    # context; the lock file is not removed, as this would be racy
 
-        # move to srtm_dir
-        shutil.move(tmp_path, tile_path + '.zip')
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+        import msvcrt
 
-        # unpacking
-        with ZipFile(tile_path + '.zip', 'r') as zf:
-            zf.extractall(srtm_dir)
+    with open(lock_path, 'a+') as f:
+
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
 
         try:
-            os.remove(tile_path + '.zip')
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _fetch_url(url, path, timeout=60):
+    # download to path; the data is first stored in a ".part" file, such
+    # that interrupted downloads can be resumed (if the server supports
+    # HTTP range requests)
+
+    part_path = path + '.part'
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    request = Request(url)
+    if offset > 0:
+        request.add_header('Range', 'bytes={:d}-'.format(offset))
+
+    try:
+        response = urlopen(request, timeout=timeout)
+    except HTTPError as e:
+        if e.code != 416 or offset == 0:
+            raise
+        # range not satisfiable: the part file is already complete
+        response = None
+
+    if response is not None:
+        with response:
+            # servers may ignore the range request
+            mode = 'ab' if response.status == 206 else 'wb'
+            with open(part_path, mode) as f:
+                shutil.copyfileobj(response, f, 2 ** 20)
+
+    os.replace(part_path, path)
+
+
+def _download_archive(url, archive_name, tile_names, srtm_dir, force=True):
+    # download and extract an archive, unless (force=False) all tiles in
+    # tile_names are already on disk
+
+    def _on_disk(tile_name):
+        return bool(glob.glob(
+            os.path.join(srtm_dir, '**', tile_name), recursive=True
+            ))
+
+    archive_path = os.path.join(srtm_dir, archive_name)
+    lock_path = os.path.join(srtm_dir, '.' + archive_name + '.lock')
+
+    with _file_lock(lock_path):
+
+        # another process may have been faster
+        if not force and all(_on_disk(t) for t in tile_names):
+            return False
+
+        for attempt in range(2):
+
+            _fetch_url(url, archive_path)
+
+            # check the CRC-32 checksums of all members; a corrupt (e.g.,
+            # wrongly resumed) archive is downloaded again from scratch
+            try:
+                with ZipFile(archive_path, 'r') as zf:
+                    if zf.testzip() is not None:
+                        raise BadZipFile(
+                            'CRC check failed for {}'.format(url)
+                            )
+                    zf.extractall(srtm_dir)
+                break
+            except BadZipFile:
+                os.remove(archive_path)
+                if attempt == 1:
+                    raise
+
+        try:
+            os.remove(archive_path)
         except (FileNotFoundError, PermissionError):
             # someone else was faster to delete or still accessing?
             pass
 
-    elif server == 'viewpano':
+    return True
+
+
+def _download(ilon, ilat, force=True):
+    # download the tile to path
 
-        base_url = 'http://viewfinderpanoramas.org/dem3/'
+    url, archive_name = _archive_url(ilon, ilat)
+    _download_archive(
+        url, archive_name, [_hgt_filename(ilon, ilat)],
+        SrtmConf.srtm_dir, force=force,
+        )
 
-        zipfile_name = _check_availability(ilon, ilat)
-        super_tile_path = os.path.join(srtm_dir, zipfile_name)
 
-        # downloading
-        full_url = base_url + zipfile_name
-        tmp_path = download_file(full_url)
+def download_srtm_tiles(tiles=None, bbox=None, max_workers=4, force=False):
+    '''
+    Download SRTM tiles concurrently.
 
-        # move to srtm_dir
-        shutil.move(tmp_path, super_tile_path)
+    Tiles are downloaded from the server set in
+    `~pycraf.pathprof.SrtmConf` and stored in its `srtm_dir`. Each archive
+    is only downloaded once, even if it contains several of the requested
+    tiles (e.g., for the "viewpano" server). Interrupted downloads are
+    resumed, archives are verified with their CRC checksums, and
+    concurrent downloads of the same archive (e.g., by other processes)
+    are prevented with lock files.
 
-        # unpacking
-        with ZipFile(super_tile_path, 'r') as zf:
-            zf.extractall(srtm_dir)
+    Parameters
+    ----------
+    tiles : list of (int, int), optional
+        Tiles to download, given by the (integer) longitude and latitude
+        of their lower left corners.
+    bbox : tuple of float, optional
+        Alternatively, a bounding box (lon_min, lon_max, lat_min, lat_max)
+        in degrees, for which all tiles are downloaded.
+    max_workers : int, optional
+        Number of concurrent downloads. (default: 4)
+    force : bool, optional
+        If False (default), only tiles that are not on disk are
+        downloaded.
 
+    Returns
+    -------
+    num_archives : int
+        Number of downloaded archives.
+
+    Notes
+    -----
+    Tiles that are not available on the server (e.g., ocean tiles) are
+    silently skipped.
+    '''
+
+    if (tiles is None) == (bbox is None):
+        raise ValueError('Exactly one of "tiles" or "bbox" must be given')
+
+    if bbox is not None:
+        lon_min, lon_max, lat_min, lat_max = bbox
+        tiles = [
+            (ilon, ilat)
+            for ilon in range(
+                int(np.floor(lon_min)), int(np.ceil(lon_max))
+                )
+            for ilat in range(
+                int(np.floor(lat_min)), int(np.ceil(lat_max))
+                )
+            ]
+
+    srtm_dir = SrtmConf.srtm_dir
+
+    # group the tiles by archive
+    archives = {}
+    for ilon, ilat in tiles:
+
+        tile_name = _hgt_filename(ilon, ilat)
         try:
-            os.remove(super_tile_path)
-        except (FileNotFoundError, PermissionError):
-            # someone else was faster to delete or still accessing?
-            pass
+            url, archive_name = _archive_url(ilon, ilat)
+        except TileNotAvailableOnServerError:
+            continue
+
+        if not force and _get_hgt_diskpath(tile_name) is not None:
+            continue
+
+        archives.setdefault((url, archive_name), []).append(tile_name)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _download_archive, url, archive_name, tile_names,
+                srtm_dir, force,
+                )
+            for (url, archive_name), tile_names in archives.items()
+            ]
+        num_archives = sum(f.result() for f in futures)
+
+    return num_archives
 
 
 def _extract_hgt_coords(hgt_name):
@@ -456,7 +682,7 @@ def get_hgt_file(ilon, ilat):
     download = SrtmConf.download
     if download == 'always' or (hgt_file is None and download == 'missing'):
 
-        _download(ilon, ilat)
+        _download(ilon, ilat, force=download == 'always')
 
     hgt_file = _get_hgt_diskpath(tile_name)
     if hgt_file is None:
@@ -469,14 +695,227 @@ def get_hgt_file(ilon, ilat):
     return hgt_file
 
 
-def get_tile_data(ilon, ilat):
+# Pack file layout (all little-endian):
+# - header: magic (16 bytes), version (uint32), number of tiles (uint32),
+#   8 reserved bytes
+# - index: one _PACK_INDEX_DTYPE record per tile
+# - tile blocks (aligned to _PACK_ALIGN bytes): int16 heights in the
+#   '.hgt' row order (north to south), optionally zlib-compressed
+_PACK_MAGIC = b'PYCRAF-SRTMPACK\x00'
+_PACK_VERSION = 1
+_PACK_ALIGN = 4096
+_PACK_INDEX_DTYPE = np.dtype([
+    ('ilon', '<i2'), ('ilat', '<i2'),
+    ('tile_size', '<u4'), ('compression', '<u4'),
+    ('offset', '<u8'), ('nbytes', '<u8'),
+    ])
+
+
+class _TilePack(object):
+    '''
+    Random access to the tiles in a pack file (see `pack_srtm_tiles`).
+
+    The file is memory-mapped; uncompressed tiles are returned as
+    (read-only) views into the map.
+    '''
+
+    def __init__(self, pack_file):
+
+        with open(pack_file, 'rb') as f:
+            header = f.read(32)
+            if len(header) < 32 or header[:16] != _PACK_MAGIC:
+                raise OSError(
+                    '{} is not an SRTM pack file'.format(pack_file)
+                    )
+            version, num_tiles = np.frombuffer(header[16:24], dtype='<u4')
+            if version != _PACK_VERSION:
+                raise OSError(
+                    'Unsupported SRTM pack file version {}'.format(version)
+                    )
+            index = np.frombuffer(
+                f.read(num_tiles * _PACK_INDEX_DTYPE.itemsize),
+                dtype=_PACK_INDEX_DTYPE,
+                )
+
+        self.pack_file = pack_file
+        self._data = np.memmap(pack_file, dtype=np.uint8, mode='r')
+        self._index = {
+            (int(rec['ilon']), int(rec['ilat'])): rec for rec in index
+            }
+
+    def __contains__(self, ilon_ilat):
+
+        return ilon_ilat in self._index
+
+    def __len__(self):
+
+        return len(self._index)
+
+    def tile(self, ilon, ilat):
+        # int16 heights in '.hgt' order
+
+        rec = self._index[(ilon, ilat)]
+        tile_size = int(rec['tile_size'])
+        offset, nbytes = int(rec['offset']), int(rec['nbytes'])
+        buf = self._data[offset:offset + nbytes]
+
+        if rec['compression'] == 1:
+            buf = np.frombuffer(zlib.decompress(buf), dtype=np.uint8)
+
+        return buf.view('<i2').reshape((tile_size, tile_size))
+
+
+@lru_cache(maxsize=4, typed=False)
+def _open_tile_pack(pack_file):
+
+    return _TilePack(pack_file)
+
+
+def _get_packed_tile(ilon, ilat):
+    # returns None, if no pack file is used or the tile is not in it
+
+    if not SrtmConf.srtm_pack:
+        return None
+
+    pack = _open_tile_pack(SrtmConf.srtm_pack)
+    if (ilon, ilat) not in pack:
+        return None
+
+    return pack.tile(ilon, ilat)
+
+
+def _tile_on_disk(ilon, ilat):
+
+    if _get_packed_tile(ilon, ilat) is not None:
+        return True
+
+    return _get_hgt_diskpath(_hgt_filename(ilon, ilat)) is not None
+
+
+def pack_srtm_tiles(pack_file, tiles=None, compress=False):
+    '''
+    Store SRTM tiles in a single (indexed) pack file.
+
+    The pack file can be used via `~pycraf.pathprof.SrtmConf` (option
+    `srtm_pack`), which avoids searching and opening many small files.
+
+    Parameters
+    ----------
+    pack_file : str
+        Name of the pack file (will be overwritten).
+    tiles : list of (int, int), optional
+        Tiles to pack, given by the (integer) longitude and latitude of
+        their lower left corners. The tiles are searched in the
+        `srtm_dir` (and downloaded, if this is enabled in
+        `~pycraf.pathprof.SrtmConf`). Tiles that are not available on the
+        server are silently skipped. If None (default), all '.hgt' files
+        in `srtm_dir` (and its sub-directories) are packed.
+    compress : bool, optional
+        If True, compress each tile with zlib. This saves about half of
+        the disk space, but tiles have to be decompressed when loaded.
+        (default: False)
+
+    Returns
+    -------
+    num_tiles : int
+        Number of tiles in the pack file.
+
+    Raises
+    ------
+    TilesSizeError
+        If the tiles don't have equal sizes.
+    '''
+
+    if tiles is None:
+        hgt_files = glob.glob(
+            os.path.join(SrtmConf.srtm_dir, '**', '*.hgt'), recursive=True
+            )
+        tiles = [_extract_hgt_coords(os.path.basename(f)) for f in hgt_files]
+
+    else:
+        hgt_files, _tiles = [], []
+        for ilon, ilat in tiles:
+            try:
+                hgt_files.append(get_hgt_file(ilon, ilat))
+                _tiles.append((ilon, ilat))
+            except TileNotAvailableOnServerError:
+                pass
+        tiles = _tiles
+
+    index = np.zeros(len(tiles), dtype=_PACK_INDEX_DTYPE)
+    offset = 32 + index.nbytes
+
+    tmp_name = '{}.{}.tmp'.format(pack_file, os.getpid())
+    try:
+        with open(tmp_name, 'wb') as f:
+
+            f.write(b'\x00' * offset)  # header and index are written last
+
+            for idx, (ilon, ilat) in enumerate(tiles):
+
+                tile = np.fromfile(hgt_files[idx], dtype='>i2')
+                tile = tile.astype('<i2')
+                tile_size = int(np.sqrt(tile.size) + 0.5)
+                if idx > 0 and tile_size != index['tile_size'][0]:
+                    raise TilesSizeError(
+                        'Inconsistent tile sizes found. '
+                        'All tiles must be the same size!'
+                        )
+
+                buf = tile.tobytes()
+                if compress:
+                    buf = zlib.compress(buf)
+
+                offset += -offset % _PACK_ALIGN
+                f.seek(offset)
+                f.write(buf)
+
+                index[idx] = (
+                    ilon, ilat, tile_size, int(compress), offset, len(buf)
+                    )
+                offset += len(buf)
+
+            f.seek(0)
+            f.write(_PACK_MAGIC)
+            f.write(
+                np.array([_PACK_VERSION, len(tiles)], dtype='<u4').tobytes()
+                )
+            f.write(b'\x00' * 8)
+            f.write(index.tobytes())
+
+    except BaseException:
+        os.remove(tmp_name)
+        raise
+
+    os.replace(tmp_name, pack_file)
+    _open_tile_pack.cache_clear()
+
+    return len(tiles)
+
+
+def _tile_coords(ilon, ilat, tile_size):
+
+    dx = dy = 1. / (tile_size - 1)
+    x, y = np.ogrid[0:tile_size, 0:tile_size]
+    lons, lats = x * dx + ilon, y * dy + ilat
+    return lons, lats
+
+
+def get_tile_data(ilon, ilat, level=0):
     # angles in deg
+    # level > 0: pre-smoothed tile with 2 ** level coarser resolution
+
+    if level > 0:
+        return _get_pyramid_tile_data(ilon, ilat, level)
 
     try:
-        hgt_file = get_hgt_file(ilon, ilat)
-        # need to run check after get_hgt_file, because download could happen
-        _check_consistent_tile_sizes(SrtmConf.srtm_dir)
-        tile = np.fromfile(hgt_file, dtype='>i2')
+        tile = _get_packed_tile(ilon, ilat)
+        if tile is None:
+            hgt_file = get_hgt_file(ilon, ilat)
+            # need to run check after get_hgt_file, because download could
+            # happen
+            _check_consistent_tile_sizes(SrtmConf.srtm_dir)
+            tile = np.fromfile(hgt_file, dtype='>i2')
         tile_size = int(np.sqrt(tile.size) + 0.5)
         hgt_res = 90. * 1200 / (tile_size - 1)
         SrtmConf.set(tile_size=tile_size, _do_validate=False)
@@ -511,19 +950,184 @@ download missing tiles automatically - just use "pycraf.pathprof.SrtmConf"
             stacklevel=1,
             )
 
-    dx = dy = 1. / (tile_size - 1)
-    x, y = np.ogrid[0:tile_size, 0:tile_size]
-    lons, lats = x * dx + ilon, y * dy + ilat
+    lons, lats = _tile_coords(ilon, ilat, tile_size)
     return lons, lats, tile
 
 
+def _pyramid_max_level():
+    # tile sizes must be divisible by 2 ** level (and not too small)
+
+    size = SrtmConf.tile_size - 1
+    level = 0
+    while size % 2 ** (level + 1) == 0 and size // 2 ** (level + 1) >= 4:
+        level += 1
+
+    return level
+
+
+def _pyramid_params(step):
+    '''
+    Pyramid level, its resolution [m], and the remaining smoothing width
+    [m] (along the profile) for height profiles with a given `step` [m].
+
+    Pyramid tiles of level k are smoothed with a Gaussian of width
+    `hgt_res * 2 ** k / 2.35`. A level is used if `step` exceeds 1.5 times
+    its resolution. Profiles are smoothed to a total width of
+    `step / 2.35`.
+    '''
+
+    hgt_res = SrtmConf.hgt_res
+    width = step / 2.35
+
+    level = 0
+    if SrtmConf.pyramid:
+        max_level = _pyramid_max_level()
+        while (
+                level < max_level and
+                step > 1.5 * hgt_res * 2 ** (level + 1)
+                ):
+            level += 1
+
+    if level == 0:
+        return 0, hgt_res, width
+
+    level_res = hgt_res * 2 ** level
+    return level, level_res, np.sqrt(width ** 2 - (level_res / 2.35) ** 2)
+
+
+def _smoothed_tile(ilon, ilat, tile, sigma):
+    # Gaussian smoothing (sigma in pixels); tile borders are padded with
+    # data from the neighboring tiles (if available on disk)
+
+    from scipy.ndimage import gaussian_filter
+
+    n = tile.shape[0]
+    m = min(int(np.ceil(4 * sigma)), n - 2)
+    padded = np.pad(np.nan_to_num(tile), m, mode='edge')
+
+    # (padded slice, neighbor slice) for offsets -1, 0, 1; note that
+    # neighboring tiles share their edge pixels
+    slices = {
+        -1: (slice(0, m), slice(n - 1 - m, n - 1)),
+        0: (slice(m, m + n), slice(0, n)),
+        1: (slice(m + n, 2 * m + n), slice(1, m + 1)),
+        }
+
+    for dlat in [-1, 0, 1]:
+        for dlon in [-1, 0, 1]:
+
+            if dlat == 0 and dlon == 0:
+                continue
+
+            nlon, nlat = ilon + dlon, ilat + dlat
+            if not _tile_on_disk(nlon, nlat):
+                continue
+
+            _, _, ntile = get_tile_data(nlon, nlat)
+            if ntile.shape != tile.shape:
+                continue
+
+            padded[slices[dlat][0], slices[dlon][0]] = np.nan_to_num(
+                ntile[slices[dlat][1], slices[dlon][1]]
+                )
+
+    return gaussian_filter(padded, sigma, mode='nearest')[m:m + n, m:m + n]
+
+
+def _get_pyramid_tile_data(ilon, ilat, level):
+
+    factor = 2 ** level
+    lons, lats, tile = get_tile_data(ilon, ilat)
+    tile_size = tile.shape[0]
+
+    if (tile_size - 1) % factor != 0 or (tile_size - 1) // factor < 4:
+        # e.g., zero-valued tiles
+        return lons, lats, tile
+
+    pyramid_dir = SrtmConf.pyramid_dir or os.path.join(
+        SrtmConf.srtm_dir, 'pyramid'
+        )
+    ptile_name = os.path.join(
+        pyramid_dir,
+        '{:s}_L{:d}.npy'.format(_hgt_filename(ilon, ilat)[:-4], level)
+        )
+    ptile_size = (tile_size - 1) // factor + 1
+
+    try:
+        ptile = np.load(ptile_name)
+    except (OSError, ValueError):
+        ptile = None
+
+    if ptile is None or ptile.shape != (ptile_size, ptile_size):
+
+        ptile = _smoothed_tile(
+            ilon, ilat, tile, factor / 2.35
+            )[::factor, ::factor].astype(np.float32)
+
+        # write to a temporary file first, such that other processes
+        # never see incomplete files
+        try:
+            os.makedirs(pyramid_dir, exist_ok=True)
+            tmp_name = '{}.{}.tmp'.format(ptile_name, os.getpid())
+            with open(tmp_name, 'wb') as f:
+                np.save(f, ptile)
+            os.replace(tmp_name, ptile_name)
+        except OSError:
+            # e.g., read-only directory; just don't store it
+            pass
+
+    lons, lats = _tile_coords(ilon, ilat, ptile_size)
+    return lons, lats, ptile
+
+
+def _conf_lru_cache(get_maxsize):
+    '''
+    Like `functools.lru_cache`, but the maximum cache size is obtained
+    from `get_maxsize()` on each call, such that it can be changed at run
+    time (e.g., via `~pycraf.utils.PerformanceConf`).
+    '''
+
+    def decorator(func):
+
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+
+            key = args + tuple(sorted(kwargs.items()))
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+
+            result = func(*args, **kwargs)
+
+            with lock:
+                cache[key] = result
+                while len(cache) > get_maxsize():
+                    cache.popitem(last=False)
+
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+
+        return wrapper
+
+    return decorator
+
+
 # cannot use SrtmConf inside to query interp and spline_opts, because
 # caching might cause problems
-@lru_cache(maxsize=36, typed=False)
-def get_tile_interpolator(ilon, ilat, interp, spline_opts):
+@_conf_lru_cache(lambda: utils.PerformanceConf.srtm_cache_size)
+def get_tile_interpolator(ilon, ilat, interp, spline_opts, level=0):
     # angles in deg
 
-    lons, lats, tile = get_tile_data(ilon, ilat)
+    lons, lats, tile = get_tile_data(ilon, ilat, level)
     # have to treat NaNs in some way; set to zero for now
     tile = np.nan_to_num(tile)
 
@@ -541,8 +1145,9 @@ def get_tile_interpolator(ilon, ilat, interp, spline_opts):
     return _tile_interpolator
 
 
-def _srtm_height_data(lons, lats):
+def _srtm_height_data(lons, lats, level=0):
     # angles in deg
+    # level > 0: use pre-smoothed tiles (see _pyramid_params)
 
     # is there no way around constructing the full lon/lat grid?
     lons_g, lats_g = np.broadcast_arrays(lons, lats)
@@ -560,15 +1165,103 @@ def _srtm_height_data(lons, lats):
             mask = (ilons == uilon) & (ilats == uilat)
 
             if interp in ['nearest', 'linear']:
-                ifunc = get_tile_interpolator(uilon, uilat, interp, None)
+                ifunc = get_tile_interpolator(
+                    uilon, uilat, interp, None, level
+                    )
                 heights[mask] = ifunc((lons_g[mask], lats_g[mask]))
             elif interp == 'spline':
-                ifunc = get_tile_interpolator(uilon, uilat, interp, spl_opts)
+                ifunc = get_tile_interpolator(
+                    uilon, uilat, interp, spl_opts, level
+                    )
                 heights[mask] = ifunc(lons_g[mask], lats_g[mask], grid=False)
 
     return heights
 
 
+def _axis_weights(grid, x):
+    # linear interpolation indices/weights along one axis (as used by
+    # RegularGridInterpolator)
+
+    idx = np.searchsorted(grid, x) - 1
+    idx[idx < 0] = 0
+    idx[idx > grid.size - 2] = grid.size - 2
+    frac = (x - grid[idx]) / (grid[idx + 1] - grid[idx])
+
+    return idx, frac
+
+
+def _tile_grid_block(ilon, ilat, lons, lats, level=0):
+    # interpolate a tile on the grid spanned by 1D lons and lats;
+    # returns array of shape (len(lats), len(lons))
+
+    interp = SrtmConf.interp
+
+    if interp == 'spline':
+        ifunc = get_tile_interpolator(
+            ilon, ilat, interp, SrtmConf.spline_opts, level
+            )
+        # grid evaluation needs increasing coordinates
+        lon_order, lat_order = np.argsort(lons), np.argsort(lats)
+        block = np.empty((lats.size, lons.size), dtype=np.float64)
+        block[np.ix_(lat_order, lon_order)] = ifunc(
+            lons[lon_order], lats[lat_order], grid=True
+            ).T
+        return block
+
+    ifunc = get_tile_interpolator(ilon, ilat, interp, None, level)
+    values = ifunc.values  # indexed (lon, lat)
+    lon_idx, lon_frac = _axis_weights(ifunc.grid[0], lons)
+    lat_idx, lat_frac = _axis_weights(ifunc.grid[1], lats)
+
+    if interp == 'nearest':
+        lon_idx += lon_frac > 0.5
+        lat_idx += lat_frac > 0.5
+        return values[np.ix_(lon_idx, lat_idx)].T
+
+    wx = lon_frac[:, np.newaxis]
+    wy = lat_frac[np.newaxis]
+    block = (
+        values[np.ix_(lon_idx, lat_idx)] * (1. - wx) +
+        values[np.ix_(lon_idx + 1, lat_idx)] * wx
+        ) * (1. - wy)
+    block += (
+        values[np.ix_(lon_idx, lat_idx + 1)] * (1. - wx) +
+        values[np.ix_(lon_idx + 1, lat_idx + 1)] * wx
+        ) * wy
+
+    return block.T
+
+
+def _srtm_height_grid(lons, lats, level=0):
+    # angles in deg
+    # like _srtm_height_data, but for the regular grid spanned by the 1D
+    # arrays lons and lats; returns array of shape (len(lats), len(lons))
+    # tiles and interpolation weights are separable, such that the full
+    # lon/lat grid never needs to be constructed
+
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    heights = np.empty((lats.size, lons.size), dtype=np.float32)
+
+    ilons = np.floor(lons).astype(np.int32)
+    ilats = np.floor(lats).astype(np.int32)
+
+    for uilon in np.unique(ilons):
+        col_idx = np.nonzero(ilons == uilon)[0]
+        for uilat in np.unique(ilats):
+            # process in chunks of rows to limit the size of temporaries
+            for row_idx in np.array_split(
+                    np.nonzero(ilats == uilat)[0],
+                    max(1, col_idx.size * np.sum(ilats == uilat) // 2 ** 18)
+                    ):
+
+                heights[np.ix_(row_idx, col_idx)] = _tile_grid_block(
+                    uilon, uilat, lons[col_idx], lats[row_idx], level
+                    )
+
+    return heights
+
+
 @utils.ranged_quantity_input(
     lons=(-180, 180, apu.deg),
     lats=(-90, 90, apu.deg),
@@ -379,3 +379,105 @@ def test_geoid_area():
              1239045.92382274, 1239045.92382274]
             ])
         )
+
+
+def test_regrid_with_x():
+
+    regrid1d_with_x = pathprof.cygeodesics.regrid1d_with_x
+    regrid2d_with_x = pathprof.cygeodesics.regrid2d_with_x
+
+    x = np.arange(0., 2000., 10.)
+    x_new = np.arange(0., 2000., 30.)
+    width = 30. / 2.35
+
+    with NumpyRNGContext(1):
+        y = np.cumsum(np.random.normal(0., 10., (20, x.size)), axis=1)
+
+    # brute-force reference
+    kv = np.exp(-0.5 * ((x[np.newaxis] - x_new[:, np.newaxis]) / width) ** 2)
+    kv[np.abs(x[np.newaxis] - x_new[:, np.newaxis]) > 5 * width] = 0.
+    y_ref = np.dot(y, kv.T) / kv.sum(axis=1)
+
+    for kwargs in [{}, {'regular': True}, {'ordered': False}]:
+
+        y_new = np.empty((y.shape[0], x_new.size))
+        regrid2d_with_x(x, y, x_new, y_new, width, **kwargs)
+        # windows differ slightly in the kernel wings (at 5 widths)
+        assert_allclose(y_new, y_ref, atol=1.e-3)
+
+        y_new1 = np.empty(x_new.size)
+        regrid1d_with_x(x, y[3], x_new, y_new1, width, **kwargs)
+        assert_allclose(y_new1, y_new[3], atol=1.e-10)
+
+    # repeated box filters approximate the Gaussian; for a wide kernel
+    # compare away from the edges
+    width = 300. / 2.35
+    kv = np.exp(-0.5 * ((x[np.newaxis] - x_new[:, np.newaxis]) / width) ** 2)
+    y_ref = np.dot(y, kv.T) / kv.sum(axis=1)
+
+    y_new = np.empty((y.shape[0], x_new.size))
+    regrid2d_with_x(x, y, x_new, y_new, width, method='boxes')
+    inner = slice(30, -30)
+    assert np.all(
+        np.abs(y_new - y_ref)[:, inner] < 0.1 * np.std(y_ref[:, inner])
+        )
+
+    y_new1 = np.empty(x_new.size)
+    regrid1d_with_x(x, y[3], x_new, y_new1, width, method='boxes')
+    assert_allclose(y_new1, y_new[3], atol=1.e-10)
+
+    # constant data must be preserved (also at the edges)
+    y_new[...] = 0.
+    regrid2d_with_x(x, np.ones_like(y), x_new, y_new, width, method='boxes')
+    assert_allclose(y_new, 1.)
+
+    with pytest.raises(ValueError):
+        regrid2d_with_x(x, y, x_new, y_new, width, method='foo')
+
+
+def test_regrid_sections_with_x():
+
+    regrid2d_with_x = pathprof.cygeodesics.regrid2d_with_x
+    regrid_sections_with_x = pathprof.cygeodesics.regrid_sections_with_x
+
+    x = np.arange(0., 2000., 10.)
+    x_new = np.arange(0., 2000., 30.)
+    width = 30. / 2.35
+
+    with NumpyRNGContext(1):
+        y = np.cumsum(np.random.normal(0., 10., (20, x.size)), axis=1)
+        new_starts = np.random.randint(0, 30, y.shape[0]).astype(np.int64)
+        new_stops = np.random.randint(35, 66, y.shape[0]).astype(np.int64)
+
+    y_new = np.empty((y.shape[0], x_new.size))
+    regrid2d_with_x(x, y, x_new, y_new, width, regular=True)
+
+    # input sections with some margin for the kernel (and one without)
+    starts = np.maximum(3 * new_starts - 9, 0)
+    stops = np.minimum(3 * new_stops + 9, x.size)
+    starts[0], stops[0] = 3 * new_starts[0], 3 * new_stops[0] - 2
+    y_flat = np.concatenate([y[n, s:e] for n, (s, e) in enumerate(
+        zip(starts, stops)
+        )])
+    offsets = np.cumsum(stops - starts) - (stops - starts)
+    new_offsets = np.cumsum(new_stops - new_starts) - (new_stops - new_starts)
+    y_new_flat = np.empty(np.sum(new_stops - new_starts))
+    regrid_sections_with_x(
+        x, y_flat, offsets, starts, stops,
+        x_new, y_new_flat, new_offsets, new_starts, new_stops,
+        width,
+        )
+
+    for n in range(1, y.shape[0]):
+        y_sec = y_new_flat[new_offsets[n]:new_offsets[n] + (
+            new_stops[n] - new_starts[n]
+            )]
+        assert_equal(y_sec, y_new[n, new_starts[n]:new_stops[n]])
+
+    # clipped kernel windows (first row) are normalized accordingly
+    regrid_sections_with_x(
+        x, np.ones_like(y_flat), offsets, starts, stops,
+        x_new, y_new_flat, new_offsets, new_starts, new_stops,
+        width,
+        )
+    assert_allclose(y_new_flat, 1.)
@@ -183,3 +183,263 @@ def test_regrid_from_geotiff_degenerated():
         np.testing.assert_equal(
             geodata_regridded, np.array([211, 211], dtype=np.int16),
             )
+
+
+@skip_rio
+class TestGeoTiffSampler:
+
+    def setup(self):
+
+        self.corine_test_file = get_pkg_data_filename(
+            'corine/CLC2018_CLC2018_V2018_20_cut.tif'
+            )
+
+        with NumpyRNGContext(1):
+
+            self.lons = np.random.uniform(6.64, 7.13, (5, 5)) * u.deg
+            self.lats = np.random.uniform(50.40, 50.64, (5, 5)) * u.deg
+
+    def test_nearest(self):
+
+        import rasterio as rio
+
+        with rio.open(self.corine_test_file) as geotiff:
+
+            sampler = pathprof.GeoTiffSampler(geotiff)
+            geodata = sampler(self.lons, self.lats)
+            geodata_regridded = pathprof.regrid_from_geotiff(
+                geotiff, self.lons, self.lats
+                )
+
+            assert geodata.dtype == np.int16
+            assert_equal(geodata, geodata_regridded)
+
+            # compare with brute-force indexing of the full raster
+            px, py = pathprof.wgs84_to_geotiff_pixels(
+                geotiff, self.lons, self.lats
+                )
+            full = geotiff.read(1)
+            assert_equal(
+                geodata,
+                full[np.round(py).astype(int), np.round(px).astype(int)]
+                )
+
+    def test_multiple_bands(self):
+
+        import rasterio as rio
+
+        with rio.open(self.corine_test_file) as geotiff:
+
+            sampler = pathprof.GeoTiffSampler(geotiff)
+            geodata = sampler(self.lons, self.lats, bands=[1, 1])
+
+            assert geodata.shape == (2, 5, 5)
+            assert_equal(geodata[0], sampler(self.lons, self.lats))
+            assert_equal(geodata[0], geodata[1])
+
+            with pytest.raises(ValueError):
+                sampler(self.lons, self.lats, bands=2)
+
+    def test_linear(self):
+
+        import rasterio as rio
+
+        with rio.open(self.corine_test_file) as geotiff:
+
+            sampler = pathprof.GeoTiffSampler(geotiff)
+            geodata = sampler(self.lons, self.lats, interp='linear')
+
+            px, py = pathprof.wgs84_to_geotiff_pixels(
+                geotiff, self.lons, self.lats
+                )
+            full = geotiff.read(1).astype(np.float64)
+            x0, y0 = np.floor(px).astype(int), np.floor(py).astype(int)
+            wx, wy = px - x0, py - y0
+            expected = (
+                full[y0, x0] * (1 - wx) * (1 - wy) +
+                full[y0, x0 + 1] * wx * (1 - wy) +
+                full[y0 + 1, x0] * (1 - wx) * wy +
+                full[y0 + 1, x0 + 1] * wx * wy
+                )
+
+            assert geodata.dtype == np.float64
+            assert_allclose(geodata, expected)
+
+            with pytest.raises(ValueError):
+                sampler(self.lons, self.lats, interp='cubic')
+
+    def test_out_of_bounds(self):
+
+        import rasterio as rio
+
+        with rio.open(self.corine_test_file) as geotiff:
+
+            sampler = pathprof.GeoTiffSampler(geotiff)
+
+            with pytest.raises(ValueError):
+                sampler([6.7, 8.] * u.deg, [50.5, 50.5] * u.deg)
+
+            geodata = sampler(
+                [6.7, 8.] * u.deg, [50.5, 50.5] * u.deg, fill_value=-1
+                )
+            assert geodata.dtype == np.int16
+            assert_equal(geodata, np.array([211, -1], dtype=np.int16))
+
+            geodata = sampler(
+                [6.7, 8.] * u.deg, [50.5, 50.5] * u.deg,
+                interp='linear', fill_value=np.nan,
+                )
+            assert np.isfinite(geodata[0]) and np.isnan(geodata[1])
+
+    def test_cache(self):
+
+        import rasterio as rio
+
+        with rio.open(self.corine_test_file) as geotiff:
+
+            sampler = pathprof.GeoTiffSampler(geotiff, cache_size=2)
+            geodata = sampler(self.lons, self.lats)
+
+            assert len(sampler._cache) == 2
+
+            # results must not depend on cache state
+            assert_equal(sampler(self.lons, self.lats), geodata)
+            sampler.cache_clear()
+            assert len(sampler._cache) == 0
+            assert_equal(sampler(self.lons, self.lats), geodata)
+
+            with pytest.raises(ValueError):
+                pathprof.GeoTiffSampler(geotiff, cache_size=0)
+
+    def test_regrid_sampler_cache(self):
+
+        import gc
+        import rasterio as rio
+        from ...pathprof import gis
+
+        with rio.open(self.corine_test_file) as geotiff:
+            geodata = pathprof.regrid_from_geotiff(
+                geotiff, self.lons, self.lats
+                )
+            # the sampler (and its block cache) is re-used
+            sampler = gis._get_geotiff_sampler(geotiff)
+            assert gis._get_geotiff_sampler(geotiff) is sampler
+            assert len(sampler._cache) > 0
+
+        # samplers of closed files are dropped
+        with rio.open(self.corine_test_file) as geotiff2:
+            assert_equal(
+                pathprof.regrid_from_geotiff(geotiff2, self.lons, self.lats),
+                geodata,
+                )
+            assert geotiff not in gis._GEOTIFF_SAMPLERS
+            assert geotiff2 in gis._GEOTIFF_SAMPLERS
+
+        # and the cache does not keep the file objects alive
+        del geotiff, geotiff2, sampler
+        gc.collect()
+        assert len(gis._GEOTIFF_SAMPLERS) == 0
+
+
+def _map_results(ny=100, nx=150):
+
+    xcoords = np.linspace(6., 7., nx)
+    ycoords = np.linspace(50., 50.5, ny)
+    with NumpyRNGContext(1):
+        results = {
+            'L_b': np.random.uniform(100, 200, (ny, nx)) * cnv.dB,
+            'path_type': np.random.randint(0, 2, (ny, nx)).astype(np.int32),
+            'dist_prof': np.arange(10.),
+            }
+
+    return xcoords, ycoords, results
+
+
+@skip_rio
+def test_write_map_geotiff(tmpdir_factory):
+
+    import rasterio as rio
+
+    fname = str(tmpdir_factory.mktemp('maps').join('atten.tif'))
+    xcoords, ycoords, results = _map_results()
+    pathprof.write_map(fname, xcoords, ycoords, results, chunks=32)
+
+    with rio.open(fname) as geotiff:
+
+        assert geotiff.count == 2
+        assert geotiff.descriptions == ('L_b', 'path_type')
+        assert u.Unit(geotiff.units[0]) == cnv.dB
+        assert geotiff.block_shapes[0] == (32, 32)
+        assert geotiff.crs.to_epsg() == 4326
+        # rows are stored from north to south
+        assert_allclose(geotiff.xy(99, 0), (6., 50.))
+        assert_allclose(geotiff.xy(0, 149), (7., 50.5))
+        assert_equal(geotiff.read(1)[::-1], results['L_b'].value)
+        assert_equal(geotiff.read(2)[::-1], results['path_type'])
+
+    with pytest.raises(ValueError):
+        pathprof.write_map(fname, xcoords, ycoords, results, chunks=30)
+
+    with pytest.raises(ValueError):
+        pathprof.write_map(fname, xcoords ** 2, ycoords, results)
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec('h5py') is None,
+    reason='"h5py" package not installed'
+    )
+def test_map_writer_hdf5(tmpdir_factory):
+
+    import h5py
+
+    fname = str(tmpdir_factory.mktemp('maps').join('atten.h5'))
+    xcoords, ycoords, results = _map_results()
+
+    # blocks are not aligned with the chunks
+    with pathprof.MapWriter(
+            fname, xcoords, ycoords, {'L_b': np.float64, 'path_type': 'i4'},
+            chunks=(32, 40),
+            ) as writer:
+        for row0 in range(0, 100, 30):
+            for col0 in range(0, 150, 70):
+                block = {
+                    k: results[k][row0:row0 + 30, col0:col0 + 70]
+                    for k in ['L_b', 'path_type']
+                    }
+                # other entries are ignored
+                block['dist_prof'] = results['dist_prof']
+                writer.write(block, row0=row0, col0=col0)
+
+        with pytest.raises(ValueError):
+            writer.write({'L_b': results['L_b']}, row0=1)
+
+    with h5py.File(fname, 'r') as h5f:
+
+        assert h5f['L_b'].chunks == (32, 40)
+        assert h5f['L_b'].compression == 'gzip'
+        assert u.Unit(h5f['L_b'].attrs['unit']) == cnv.dB
+        assert 'dist_prof' not in h5f
+        assert_equal(h5f['xcoords'][:], xcoords)
+        assert_equal(h5f['L_b'].dims[0][0][:], ycoords)
+        assert_equal(h5f['L_b'][:], results['L_b'].value)
+        assert_equal(h5f['path_type'][:], results['path_type'])
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec('zarr') is None,
+    reason='"zarr" package not installed'
+    )
+def test_write_map_zarr(tmpdir_factory):
+
+    import zarr
+
+    fname = str(tmpdir_factory.mktemp('maps').join('atten.zarr'))
+    xcoords, ycoords, results = _map_results()
+    pathprof.write_map(fname, xcoords, ycoords, results, chunks=(32, 64))
+
+    group = zarr.open_group(fname, mode='r')
+    assert group['L_b'].chunks == (32, 64)
+    assert u.Unit(group['L_b'].attrs['unit']) == cnv.dB
+    assert_equal(group['ycoords'][:], ycoords)
+    assert_equal(group['L_b'][:], results['L_b'].value)
+    assert_equal(group['path_type'][:], results['path_type'])
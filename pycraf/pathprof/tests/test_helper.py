@@ -176,3 +176,58 @@ class TestHelper:
         assert pathprof.eff_earth_radius_beta() == (
             3 * 6371. * apu.km
             )
+
+
+def test_make_kmz_tiles(tmpdir_factory):
+
+    pytest.importorskip('matplotlib')
+    import zipfile
+
+    tdir = tmpdir_factory.mktemp('kmz')
+    kmz_name = str(tdir.join('tiles.kmz'))
+
+    atten_map = np.add.outer(np.arange(300.), np.arange(500.))
+    # memory maps are read tile by tile
+    np.save(str(tdir.join('map.npy')), atten_map)
+    atten_map = np.load(str(tdir.join('map.npy')), mmap_mode='r')
+
+    pathprof.make_kmz_tiles(
+        kmz_name, atten_map, (7., 50., 6., 50.5),
+        tile_size=128, max_workers=0,
+        )
+
+    with zipfile.ZipFile(kmz_name) as myzip:
+        names = set(myzip.namelist())
+        root_kml = myzip.read('doc.kml').decode('utf-8')
+        tile_kml = myzip.read('0/0/0.kml').decode('utf-8')
+        png = myzip.read('2/2/3.png')
+
+    # 3 levels with 1, 2x2, and 3x4 tiles
+    assert len(names) == 2 * (1 + 4 + 12) + 1
+    assert '<href>0/0/0.kml</href>' in root_kml
+    for j in [0, 1]:
+        assert '<href>../../1/0/{:d}.kml</href>'.format(j) in tile_kml
+    assert '<east>7.000000</east><west>6.000000</west>' in tile_kml
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+
+
+def test_make_xyz_tiles(tmpdir_factory):
+
+    pytest.importorskip('matplotlib')
+    import os
+
+    tile_dir = str(tmpdir_factory.mktemp('xyz'))
+
+    atten_map = np.add.outer(np.arange(100.), np.arange(200.))
+    atten_map[:10] = np.nan
+
+    zoom_levels = pathprof.make_xyz_tiles(
+        tile_dir, atten_map, (7., 50., 6., 50.5), max_workers=0,
+        )
+    assert zoom_levels == (8, 9)
+
+    # tile indices of the map corners
+    assert os.listdir(os.path.join(tile_dir, '8')) == ['132']
+    assert sorted(os.listdir(os.path.join(tile_dir, '9', '264'))) == [
+        '172.png', '173.png'
+        ]
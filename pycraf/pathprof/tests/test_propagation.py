@@ -17,10 +17,13 @@ from astropy import units as apu
 from astropy.units import Quantity
 from ... import conversions as cnv
 from ... import pathprof
-from ...utils import check_astro_quantities
+from ...pathprof import cyprop
+from ...utils import check_astro_quantities, PerformanceConf
 from astropy.utils.data import get_pkg_data_filename
 from astropy.utils.misc import NumpyRNGContext
 import json
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from itertools import product
 import importlib
 
@@ -378,6 +381,42 @@ class TestPropagation:
                         ]):
                     assert_quantity_allclose(tup[i + 7], loss_true[k + '_t'])
 
+    def test_pathprop_array(self):
+
+        freqs, h_tgs, time_percents, versions = (
+            np.array(v) for v in zip(*[
+                (freq, h_tg, time_percent, version)
+                for freq, (h_tg, _), time_percent, version, _ in self.cases
+                ]))
+        pparr = pathprof.PathPropArray(
+            freqs * apu.GHz,
+            self.temperature, self.pressure,
+            self.lon_t, self.lat_t,
+            self.lon_r, self.lat_r,
+            h_tgs * apu.m, h_tgs * apu.m,
+            self.hprof_step,
+            time_percents * apu.percent,
+            version=versions,
+            )
+
+        tot_loss = pathprof.loss_complete(pparr)
+        for idx in range(len(pparr)):
+            pprop = pathprof.PathProp(
+                freqs[idx] * apu.GHz,
+                self.temperature, self.pressure,
+                self.lon_t, self.lat_t,
+                self.lon_r, self.lat_r,
+                h_tgs[idx] * apu.m, h_tgs[idx] * apu.m,
+                self.hprof_step,
+                time_percents[idx] * apu.percent,
+                version=versions[idx],
+                )
+            assert_equal(pparr[idx]._pp, pprop._pp)
+            for r_arr, r_single in zip(
+                    tot_loss, pathprof.loss_complete(pprop)
+                    ):
+                assert_quantity_allclose(r_arr[idx], r_single)
+
     @skip_h5py
     def test_height_map_data_h5py(self, tmpdir_factory):
 
@@ -557,6 +596,351 @@ class TestPropagation:
             else:
                 assert_quantity_allclose(q1, q2, atol=1.e-6)
 
+    def test_height_map_data_landcover(self):
+
+        hprof_data = pathprof.height_map_data(
+            6.5 * apu.deg, 50.5 * apu.deg,
+            900 * apu.arcsec, 900 * apu.arcsec,
+            map_resolution=30 * apu.arcsec,
+            zone_r=pathprof.CLUTTER.SPARSE,
+            )
+        map_shape = hprof_data['zone_r_map'].shape
+
+        with NumpyRNGContext(1):
+            zones = np.random.randint(-1, 11, map_shape)
+
+        hprof_data_lc = pathprof.height_map_data(
+            6.5 * apu.deg, 50.5 * apu.deg,
+            900 * apu.arcsec, 900 * apu.arcsec,
+            map_resolution=30 * apu.arcsec,
+            zone_r=pathprof.CLUTTER.SPARSE,
+            landcover=zones,
+            )
+
+        assert hprof_data_lc['zone_r_map'].dtype == np.int32
+        assert_equal(
+            hprof_data_lc['zone_r_map'],
+            np.where(zones == -1, pathprof.CLUTTER.SPARSE, zones)
+            )
+        # everything else must be unchanged
+        assert_equal(hprof_data_lc['zone_t_map'], hprof_data['zone_t_map'])
+        assert_equal(hprof_data_lc['height_profs'], hprof_data['height_profs'])
+
+        with pytest.raises(ValueError):
+            pathprof.height_map_data(
+                6.5 * apu.deg, 50.5 * apu.deg,
+                900 * apu.arcsec, 900 * apu.arcsec,
+                map_resolution=30 * apu.arcsec,
+                landcover=zones[1:],
+                )
+
+    @pytest.mark.skipif(
+        importlib.util.find_spec('rasterio') is None,
+        reason='"rasterio" package not installed'
+        )
+    def test_height_map_data_landcover_geotiff(self):
+
+        import rasterio as rio
+
+        corine_test_file = get_pkg_data_filename(
+            'corine/CLC2018_CLC2018_V2018_20_cut.tif'
+            )
+
+        # map is partly outside of the Corine test file
+        with rio.open(corine_test_file) as geotiff:
+
+            hprof_data = pathprof.height_map_data(
+                6.8 * apu.deg, 50.5 * apu.deg,
+                900 * apu.arcsec, 900 * apu.arcsec,
+                map_resolution=30 * apu.arcsec,
+                landcover=geotiff,
+                conversion_table=pathprof.CORINE_TO_P452_CLASSES,
+                )
+
+            xcoords = hprof_data['xcoords'] * apu.deg
+            ycoords = hprof_data['ycoords'] * apu.deg
+            zone_r_map = hprof_data['zone_r_map']
+
+            lons, lats = np.meshgrid(xcoords, ycoords)
+            px, py = pathprof.wgs84_to_geotiff_pixels(geotiff, lons, lats)
+            px, py = np.round(px), np.round(py)
+            inside = (
+                (px >= 0) & (px < geotiff.width) &
+                (py >= 0) & (py < geotiff.height)
+                )
+            landcover = pathprof.regrid_from_geotiff(
+                geotiff, lons[inside], lats[inside]
+                )
+
+        clutter = pathprof.landcover_to_p452_clutter_zones(
+            landcover, pathprof.CORINE_TO_P452_CLASSES
+            )
+        assert_equal(zone_r_map[inside], clutter)
+        assert np.all(zone_r_map[~inside] == pathprof.CLUTTER.UNKNOWN)
+
+    def test_height_map_data_landsea(self):
+
+        lon_t, lat_t = 6.5 * apu.deg, 50.5 * apu.deg
+        map_kwargs = dict(map_resolution=30 * apu.arcsec)
+
+        hprof_data = pathprof.height_map_data(
+            lon_t, lat_t, 900 * apu.arcsec, 900 * apu.arcsec, **map_kwargs
+            )
+
+        def inland_func(lons, lats):
+            return np.full(lons.shape, pathprof.LANDSEA.INLAND)
+
+        # only inland should be consistent with the default values
+        hprof_data_ls = pathprof.height_map_data(
+            lon_t, lat_t, 900 * apu.arcsec, 900 * apu.arcsec,
+            landsea=inland_func, **map_kwargs
+            )
+
+        for k in ['d_tm_map', 'd_lm_map', 'd_ct_map', 'd_cr_map', 'omega_map']:
+            assert_allclose(hprof_data_ls[k], hprof_data[k], atol=1.e-6)
+
+        # sea in an annulus around the map center (3.05 to 5.05 km)
+        def annulus_func(lons, lats):
+            dists = pathprof.geoid_inverse(
+                lon_t, lat_t, lons * apu.deg, lats * apu.deg
+                )[0].to_value(apu.km)
+            return np.where(
+                (dists > 3.05) & (dists < 5.05),
+                pathprof.LANDSEA.SEA, 4  # 4 is mapped to INLAND
+                )
+
+        hprof_data_ls = pathprof.height_map_data(
+            lon_t, lat_t, 900 * apu.arcsec, 900 * apu.arcsec,
+            landsea=annulus_func, **map_kwargs
+            )
+
+        # hprof_step is 0.3 km; sea starts at 3.3 km and ends at 4.8 km
+        d = hprof_data_ls['dist_map']
+        inner, outer = d < 3.05, d > 5.05
+        sea = ~inner & ~outer
+        d_land = np.where(inner, d, np.where(sea, 3.15, np.maximum(
+            3.15, d - 4.95
+            )))
+        assert_allclose(hprof_data_ls['d_tm_map'], d_land, atol=1.e-6)
+        assert_allclose(hprof_data_ls['d_lm_map'], d_land, atol=1.e-6)
+        assert_allclose(
+            hprof_data_ls['d_ct_map'],
+            np.where(inner, 50000., 3.15), atol=1.e-6
+            )
+        assert_allclose(
+            hprof_data_ls['d_cr_map'],
+            np.where(inner, 50000., np.where(sea, 0., d - 4.95)),
+            atol=1.e-6,
+            )
+        with np.errstate(invalid='ignore', divide='ignore'):
+            omega = np.where(
+                inner, 0., 100 * np.where(sea, d - 3.15, 1.8) / d
+                )
+        assert_allclose(
+            hprof_data_ls['omega_map'][d > 0], omega[d > 0], atol=1.e-6
+            )
+
+        # landsea_table
+        hprof_data_ls2 = pathprof.height_map_data(
+            lon_t, lat_t, 900 * apu.arcsec, 900 * apu.arcsec,
+            landsea=lambda lons, lats: annulus_func(lons, lats) + 10,
+            landsea_table={10: 'SEA', 14: 'INLAND'},
+            **map_kwargs
+            )
+        for k in ['d_tm_map', 'd_lm_map', 'd_ct_map', 'd_cr_map', 'omega_map']:
+            assert_equal(hprof_data_ls2[k], hprof_data_ls[k])
+
+    def test_height_map_data_adaptive_fan(self):
+
+        lon_t, lat_t = 6.5 * apu.deg, 50.5 * apu.deg
+        map_args = (lon_t, lat_t, 900 * apu.arcsec, 900 * apu.arcsec)
+        map_kwargs = dict(map_resolution=10 * apu.arcsec)
+
+        hprof_data = pathprof.height_map_data(*map_args, **map_kwargs)
+        hprof_data_ad = pathprof.height_map_data(
+            *map_args, adaptive_fan=True, **map_kwargs
+            )
+
+        assert_equal(hprof_data_ad['dist_prof'], hprof_data['dist_prof'])
+        assert_equal(hprof_data_ad['xcoords'], hprof_data['xcoords'])
+        assert_equal(hprof_data_ad['ycoords'], hprof_data['ycoords'])
+
+        # ragged layout: only the own section of each ray is stored
+        height_profs_ad = hprof_data_ad['height_profs']
+        assert height_profs_ad.ndim == 1
+        assert_equal(
+            hprof_data_ad['hprof_offsets'],
+            np.cumsum(hprof_data_ad['hprof_lengths']) -
+            hprof_data_ad['hprof_lengths']
+            )
+        assert height_profs_ad.size == np.sum(hprof_data_ad['hprof_lengths'])
+        assert height_profs_ad.size < 0.6 * hprof_data['height_profs'].size
+
+        # all pixels are reached within the same tolerance
+        assert (
+            hprof_data_ad['pix_dist_map'].max() <
+            1.01 * hprof_data['pix_dist_map'].max()
+            )
+        assert_allclose(
+            hprof_data_ad['dist_map'], hprof_data['dist_map'],
+            atol=hprof_data['hprof_step'] * 1.e-3,
+            )
+
+        args = (
+            1. * apu.GHz, self.temperature, self.pressure,
+            20 * apu.m, 10 * apu.m, 10 * apu.percent,
+            )
+        L_b = pathprof.atten_map_fast(*args, hprof_data)['L_b']
+        L_b_ad = pathprof.atten_map_fast(*args, hprof_data_ad)['L_b']
+        assert np.median(np.abs(L_b_ad.value - L_b.value)) < 0.5
+
+    def test_height_map_data_job(self):
+
+        map_args = (
+            6.5 * apu.deg, 50.5 * apu.deg, 0.1 * apu.deg, 0.1 * apu.deg
+            )
+        map_kwargs = dict(map_resolution=10 * apu.arcsec)
+
+        hprof_data = pathprof.height_map_data(*map_args, **map_kwargs)
+
+        for adaptive_fan in [False, True]:
+            job = pathprof.JobControl()
+            hprof_data_j = pathprof.height_map_data(
+                *map_args, adaptive_fan=adaptive_fan, job=job, **map_kwargs
+                )
+            assert job.fraction == 1.
+            if not adaptive_fan:
+                for k in hprof_data:
+                    assert_equal(hprof_data_j[k], hprof_data[k])
+
+            job.cancel()
+            with pytest.raises(pathprof.JobCancelledError):
+                pathprof.height_map_data(
+                    *map_args, adaptive_fan=adaptive_fan, job=job,
+                    **map_kwargs
+                    )
+
+    def test_power_map_aggregate(self):
+
+        res = 10. / 3600.
+        max_dist = 5. * apu.km
+        map_size = 2 * np.degrees(max_dist.to_value(apu.km) / 6371.) + 2 * res
+        lon_t, lat_t = 6.5 * apu.deg, 50.5 * apu.deg
+        args = (1. * apu.GHz, self.temperature, self.pressure)
+        targs = (10 * apu.m, 10 * apu.percent)
+
+        # single transmitter on its own map grid
+        hprof_data = pathprof.height_map_data(
+            lon_t, lat_t, map_size * apu.deg, map_size * apu.deg,
+            map_resolution=res * apu.deg,
+            )
+        L_b_corr = pathprof.atten_map_fast(
+            *args, 20 * apu.m, *targs, hprof_data
+            )['L_b_corr']
+        xcoords = hprof_data['xcoords'] * apu.deg
+        ycoords = hprof_data['ycoords'] * apu.deg
+
+        power = pathprof.power_map_aggregate(
+            *args, [lon_t.value] * apu.deg, [lat_t.value] * apu.deg,
+            20 * apu.m, 30 * cnv.dB_W, *targs, xcoords, ycoords, max_dist,
+            )
+        assert power.unit == cnv.dB_W
+        mask = (
+            (hprof_data['dist_map'] <= max_dist.to_value(apu.km)) &
+            (hprof_data['dist_end_idx_map'] >= 4)
+            )
+        # pixels on the rim may differ, due to numerical noise in the grid
+        valid = np.isfinite(power.value)
+        assert np.count_nonzero(valid & mask) > 0.95 * np.count_nonzero(mask)
+        assert np.count_nonzero(valid & ~mask) == 0
+        assert_allclose(
+            power.value[valid], 30 - L_b_corr.value[valid], atol=1.e-6
+            )
+
+        # direction-dependent antenna pattern (azimuth must be in deg)
+        power_pat = pathprof.power_map_aggregate(
+            *args, [lon_t.value] * apu.deg, [lat_t.value] * apu.deg,
+            20 * apu.m, 30 * cnv.dB_W, *targs, xcoords, ycoords, max_dist,
+            antenna_patterns=[
+                lambda azim, elev: -azim.to_value(apu.deg) / 36.
+                ],
+            )
+        assert_equal(np.isfinite(power_pat.value), valid)
+        assert_allclose(
+            power_pat.value[valid] - power.value[valid],
+            -np.degrees(hprof_data['bearing_map'][valid]) / 36.,
+            atol=1.e-6,
+            )
+
+        # antenna pattern and power sum of two transmitters
+        lons_t = [6.5, 6.52] * apu.deg
+        lats_t = [50.5, 50.49] * apu.deg
+        powers = [
+            pathprof.power_map_aggregate(
+                *args, lons_t[i:i + 1], lats_t[i:i + 1],
+                h_tg, eirp, *targs, xcoords, ycoords, max_dist,
+                ).value
+            for i, h_tg, eirp in [
+                (0, 20 * apu.m, 30 * cnv.dB_W),
+                (1, 30 * apu.m, 27 * cnv.dB_W),
+                ]
+            ]
+        power = pathprof.power_map_aggregate(
+            *args, lons_t, lats_t,
+            [20, 30] * apu.m, [30, 30] * cnv.dB_W, *targs,
+            xcoords, ycoords, max_dist,
+            antenna_patterns=[
+                None, lambda azim, elev: -3 * np.ones(azim.shape)
+                ],
+            )
+        assert_allclose(
+            10 ** (power.value / 10),
+            10 ** (powers[0] / 10) + 10 ** (powers[1] / 10),
+            rtol=1.e-6,
+            )
+
+    def test_atten_points_fast(self):
+
+        lon_t, lat_t = 6.5 * apu.deg, 50.5 * apu.deg
+        with NumpyRNGContext(1):
+            lons_r = lon_t + np.random.uniform(-0.1, 0.1, 200) * apu.deg
+            lats_r = lat_t + np.random.uniform(-0.1, 0.1, 200) * apu.deg
+
+        hprof_step = 30 * apu.m
+        hprof_data = pathprof.height_points_data(
+            lon_t, lat_t, lons_r, lats_r, hprof_step=hprof_step
+            )
+
+        # every point is represented by a close-by ray position
+        assert hprof_data['pos_dist'].max() < 1.5 * hprof_step.value
+        assert hprof_data['height_profs'].shape[0] == np.unique(
+            hprof_data['path_idx']
+            ).size
+
+        args = (
+            1. * apu.GHz, self.temperature, self.pressure,
+            20 * apu.m, 10 * apu.m, 10 * apu.percent,
+            )
+        results = pathprof.atten_points_fast(*args, hprof_data)
+        results_rs = pathprof.atten_points_fast(
+            *args, hprof_data, ray_sweep=True
+            )
+        assert results['L_b'].shape == (200, )
+        assert_allclose(results_rs['L_b'].value, results['L_b'].value)
+
+        # the ray positions are slightly offset from the true points
+        idx = np.arange(0, 200, 10)
+        L_b = [
+            pathprof.losses_complete(
+                args[0], args[1], args[2],
+                lon_t, lat_t, lons_r[i], lats_r[i],
+                args[3], args[4], hprof_step, args[5],
+                )['L_b'].value
+            for i in idx
+            ]
+        L_b_diff = np.squeeze(L_b) - results['L_b'].value[idx]
+        assert np.median(np.abs(L_b_diff)) < 2.
+
     def test_fast_atten_map_npz(self, tmpdir_factory):
 
         zipdir = tmpdir_factory.mktemp('zip')
@@ -851,3 +1235,703 @@ def test_clutter_imt():
             [35.01059545, 40.79036334, 43.68023698]
             ] * cnv.dB,
         )
+
+
+def test_losses_complete_broadcast_order():
+
+    # results must not depend on the order of the broadcasting axes
+    # (geometry is de-duplicated globally); using a generic height profile,
+    # such that no SRTM data is needed
+    with NumpyRNGContext(1):
+        hprof_heights = np.random.uniform(100, 300, 101) * apu.m
+    hprof_dists = np.linspace(0, 20, 101) * apu.km
+
+    freqs = np.array([0.1, 1., 10.]) * apu.GHz
+    h_tgs = np.array([10., 50.]) * apu.m
+    temps = np.array([270., 290.]) * apu.K
+    time_percents = np.logspace(-2, np.log10(50), 10) * apu.percent
+    zones = np.array([
+        pathprof.CLUTTER.UNKNOWN, pathprof.CLUTTER.URBAN
+        ])
+
+    kwargs = dict(
+        hprof_dists=hprof_dists, hprof_heights=hprof_heights,
+        hprof_bearing=45 * apu.deg, hprof_backbearing=-135 * apu.deg,
+        delta_N=38 / apu.km, N0=324 * cnv.dimless,
+        )
+
+    results = pathprof.losses_complete(
+        freqs[:, None, None, None, None],
+        temps[None, None, :, None, None],
+        1013 * apu.hPa,
+        6.5 * apu.deg, 50.5 * apu.deg, 6.7 * apu.deg, 50.6 * apu.deg,
+        h_tgs[None, :, None, None, None],
+        20 * apu.m,
+        100 * apu.m,
+        time_percents[None, None, None, :, None],
+        zone_t=zones[None, None, None, None, :],
+        **kwargs
+        )
+
+    results_t = pathprof.losses_complete(
+        freqs[None, None, None, None, :],
+        temps[None, None, :, None, None],
+        1013 * apu.hPa,
+        6.5 * apu.deg, 50.5 * apu.deg, 6.7 * apu.deg, 50.6 * apu.deg,
+        h_tgs[None, None, None, :, None],
+        20 * apu.m,
+        100 * apu.m,
+        time_percents[:, None, None, None, None],
+        zone_t=zones[None, :, None, None, None],
+        **kwargs
+        )
+
+    for k in results:
+        assert results[k].shape == (3, 2, 2, 10, 2)
+        assert_equal(
+            np.asarray(results[k]),
+            np.asarray(results_t[k]).transpose(4, 3, 2, 0, 1),
+            )
+
+    # compare with single-element computations
+    for idx in [(0, 0, 0, 0, 0), (2, 1, 1, 9, 1), (1, 0, 1, 4, 1)]:
+        fi, hi, ti, pi, zi = idx
+        res = pathprof.losses_complete(
+            freqs[fi], temps[ti], 1013 * apu.hPa,
+            6.5 * apu.deg, 50.5 * apu.deg, 6.7 * apu.deg, 50.6 * apu.deg,
+            h_tgs[hi], 20 * apu.m, 100 * apu.m, time_percents[pi],
+            zone_t=zones[zi], **kwargs
+            )
+        for k in results:
+            assert_equal(np.asarray(res[k]), np.asarray(results[k][idx]))
+
+
+def _synthetic_hprof_data(seed=1, num_paths=20, num_dists=200, ny=15, nx=20):
+
+    # minimal hprof_data (as returned by height_map_data) with random
+    # height profiles, such that no SRTM data is needed
+    with NumpyRNGContext(seed):
+        height_profs = 200. + np.cumsum(
+            np.random.normal(0., 10., (num_paths, num_dists)), axis=1
+            )
+        path_idx_map = np.random.randint(
+            0, num_paths, (ny, nx)
+            ).astype(np.int32)
+        dist_end_idx_map = np.random.randint(
+            0, num_dists, (ny, nx)
+            ).astype(np.int32)
+
+    dist_prof = np.arange(num_dists) * 0.1
+    shape = (ny, nx)
+    hprof_data = {
+        'lon_t': 6.5, 'lat_t': 50.5, 'hprof_step': 100.,
+        'xcoords': np.linspace(6.4, 6.6, nx),
+        'ycoords': np.linspace(50.4, 50.6, ny),
+        'path_idx_map': path_idx_map,
+        'dist_end_idx_map': dist_end_idx_map,
+        'dist_map': dist_prof[dist_end_idx_map],
+        'delta_N_map': np.full(shape, 38.),
+        'beta0_map': np.full(shape, 1.5),
+        'N0_map': np.full(shape, 324.),
+        'zone_t_map': np.full(shape, pathprof.CLUTTER.UNKNOWN, np.int32),
+        'zone_r_map': np.full(shape, pathprof.CLUTTER.UNKNOWN, np.int32),
+        'd_tm_map': dist_prof[dist_end_idx_map],
+        'd_lm_map': dist_prof[dist_end_idx_map],
+        'd_ct_map': np.full(shape, 50000.),
+        'd_cr_map': np.full(shape, 50000.),
+        'omega_map': np.zeros(shape),
+        'dist_prof': dist_prof,
+        'height_profs': height_profs,
+        'zheight_prof': np.zeros(num_dists),
+        }
+
+    return hprof_data
+
+
+def _ragged_hprof_data(hprof_data):
+
+    # convert the (dense) synthetic data to the ragged layout of the
+    # adaptive ray fan: rays (except every fourth) share the leading part
+    # of the profile with the previous ray, which is then its parent
+    height_profs = hprof_data['height_profs'].copy()
+    num_paths, num_dists = height_profs.shape
+    rays = np.arange(num_paths)
+    starts = 30 * (rays % 4)
+    parents = np.where(rays % 4 == 0, -1, rays - 1)
+    for i in rays[parents >= 0]:
+        height_profs[i, :starts[i]] = height_profs[parents[i], :starts[i]]
+
+    lengths = num_dists - starts
+    hprof_data = dict(hprof_data)
+    hprof_data['height_profs'] = height_profs
+    hprof_data_r = dict(hprof_data)
+    hprof_data_r['height_profs'] = np.concatenate([
+        height_profs[i, starts[i]:] for i in rays
+        ])
+    hprof_data_r['hprof_offsets'] = np.cumsum(lengths) - lengths
+    hprof_data_r['hprof_starts'] = starts
+    hprof_data_r['hprof_lengths'] = lengths
+    hprof_data_r['hprof_parents'] = parents
+
+    return hprof_data, hprof_data_r
+
+
+def test_atten_map_fast_ragged_hprof_data():
+
+    hprof_data, hprof_data_r = _ragged_hprof_data(_synthetic_hprof_data())
+
+    args = (
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        20. * apu.m, 10. * apu.m, 10. * apu.percent,
+        )
+    results = pathprof.atten_map_fast(*args, hprof_data)
+    for hprof_data_rc in [
+            hprof_data_r, pathprof.compact_hprof_data(hprof_data_r)
+            ]:
+        results_r = pathprof.atten_map_fast(*args, hprof_data_rc)
+        for k in results:
+            assert_allclose(
+                getattr(results_r[k], 'value', results_r[k]),
+                getattr(results[k], 'value', results[k]),
+                atol=1.e-2,
+                )
+
+    results_r = pathprof.atten_map_progressive(*args, hprof_data_r)
+    for k in results:
+        assert_equal(
+            getattr(results_r[k], 'value', results_r[k]),
+            getattr(results[k], 'value', results[k]),
+            )
+
+
+@pytest.mark.parametrize('version', [14, 16])
+def test_atten_map_fast_ray_sweep(version):
+
+    hprof_data = _synthetic_hprof_data(num_dists=500)
+    # rays are split by the transmitter zone, which changes h_ts
+    hprof_data['zone_t_map'][::3] = pathprof.CLUTTER.URBAN
+    with NumpyRNGContext(2):
+        hprof_data['delta_N_map'] = np.random.uniform(
+            30., 60., hprof_data['dist_map'].shape
+            )
+
+    args = (
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        20. * apu.m, 10. * apu.m, 10. * apu.percent,
+        )
+    for hprof_data_rs in _ragged_hprof_data(hprof_data):
+        results = pathprof.atten_map_fast(
+            *args, hprof_data_rs, version=version
+            )
+        results_rs = pathprof.atten_map_fast(
+            *args, hprof_data_rs, version=version, ray_sweep=True
+            )
+        for k in results:
+            assert_allclose(
+                getattr(results_rs[k], 'value', results_rs[k]),
+                getattr(results[k], 'value', results[k]),
+                atol=1.e-6,
+                )
+
+
+def test_compact_hprof_data():
+
+    hprof_data = _synthetic_hprof_data()
+    hprof_data['lon_mid_map'] = np.zeros_like(hprof_data['dist_map'])
+
+    args = (
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        20. * apu.m, 10. * apu.m, 10. * apu.percent,
+        )
+
+    def _check(hprof_data, hprof_data_c, atol):
+
+        results = pathprof.atten_map_fast(*args, hprof_data)
+        for ray_sweep in [False, True]:
+            results_c = pathprof.atten_map_fast(
+                *args, hprof_data_c, ray_sweep=ray_sweep
+                )
+            for k in results:
+                assert_allclose(
+                    getattr(results_c[k], 'value', results_c[k]),
+                    getattr(results[k], 'value', results[k]),
+                    atol=atol,
+                    )
+
+    hprof_data_c = pathprof.compact_hprof_data(hprof_data)
+    assert hprof_data_c['height_profs'].dtype == np.float32
+    for k in ['zone_t_map', 'zone_r_map', 'd_ct_map', 'omega_map']:
+        assert hprof_data_c[k].ndim == 0
+    for k in ['d_tm_map', 'd_lm_map', 'zheight_prof']:
+        assert k not in hprof_data_c
+    assert_equal(hprof_data_c['path_idx_map'], hprof_data['path_idx_map'])
+    assert 'lon_mid_map' in hprof_data_c
+    _check(hprof_data, hprof_data_c, 1.e-2)
+
+    # integer heights are stored losslessly
+    hprof_data['height_profs'] = np.round(hprof_data['height_profs'])
+    hprof_data_c = pathprof.compact_hprof_data(
+        hprof_data, drop_info_maps=True
+        )
+    assert hprof_data_c['height_profs'].dtype == np.int16
+    assert 'lon_mid_map' not in hprof_data_c
+    _check(hprof_data, hprof_data_c, 1.e-6)
+
+
+@skip_h5py
+@pytest.mark.parametrize('ragged', [False, True])
+@pytest.mark.parametrize('compact', [False, True])
+def test_atten_map_fast_lazy_hprof_data(tmpdir_factory, compact, ragged):
+
+    import h5py
+
+    hprof_data = _synthetic_hprof_data()
+    if ragged:
+        hprof_data = _ragged_hprof_data(hprof_data)[1]
+    if compact:
+        hprof_data = pathprof.compact_hprof_data(hprof_data)
+
+    args = (
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        20. * apu.m, 10. * apu.m, 10. * apu.percent,
+        )
+    results = pathprof.atten_map_fast(*args, hprof_data)
+
+    tdir = tmpdir_factory.mktemp('lazy')
+
+    # read-only memory maps are used without copying
+    np.savez(str(tdir.join('hprof.npz')), **hprof_data)
+    for k in ['height_profs', 'dist_map', 'path_idx_map']:
+        np.save(str(tdir.join(k + '.npy')), hprof_data[k])
+    hprof_data_mm = dict(hprof_data)
+    for k in ['height_profs', 'dist_map', 'path_idx_map']:
+        hprof_data_mm[k] = np.load(str(tdir.join(k + '.npy')), mmap_mode='r')
+
+    # hdf5 data sets are read block by block
+    tfile = str(tdir.join('hprof.hdf5'))
+    with h5py.File(tfile, 'w') as h5f:
+        for k, v in hprof_data.items():
+            h5f[k] = v
+
+    # (default block size is derived from the memory budget)
+    with h5py.File(tfile, 'r') as h5f, PerformanceConf.set(
+            memory_budget=2 ** 16
+            ):
+        for hprof_data_lazy, block_rows in [
+                (np.load(str(tdir.join('hprof.npz'))), 64),
+                (hprof_data_mm, 64),
+                (h5f, 4),
+                (h5f, 64),
+                (h5f, None),
+                ]:
+            float_res, int_res = cyprop.atten_map_fast_cython(
+                1., 290., 1013., 20., 10., 10., hprof_data_lazy,
+                block_rows=block_rows,
+                )
+            for i, k in enumerate(list(results)[:-1]):
+                assert_allclose(
+                    float_res[i], getattr(results[k], 'value', results[k]),
+                    atol=1.e-6,
+                    )
+            assert_equal(int_res[0], results['path_type'])
+
+
+def test_atten_points_fast_cython():
+
+    # a map can also be processed as a set of points
+    hprof_data = _synthetic_hprof_data()
+    hprof_data['zone_t_map'][::3] = pathprof.CLUTTER.URBAN
+
+    args = (1., 290., 1013., 20., 10., 10.)
+    float_res, int_res = cyprop.atten_map_fast_cython(*args, hprof_data)
+
+    points_data = {
+        k[:-4]: np.ravel(v)
+        for k, v in hprof_data.items() if k.endswith('_map')
+        }
+    for k in ['lon_t', 'lat_t', 'hprof_step', 'dist_prof', 'height_profs']:
+        points_data[k] = hprof_data[k]
+    lons_r, lats_r = np.meshgrid(hprof_data['xcoords'], hprof_data['ycoords'])
+    points_data['lons_r'] = lons_r.ravel()
+    points_data['lats_r'] = lats_r.ravel()
+
+    # points close to the transmitter are marked as invalid
+    close = points_data['dist_end_idx'] < 4
+    assert np.any(close)
+
+    for ray_sweep in [False, True]:
+        float_res_p, int_res_p = cyprop.atten_points_fast_cython(
+            *args, points_data, ray_sweep=ray_sweep
+            )
+        assert_allclose(
+            float_res_p[:, ~close], float_res.reshape((10, -1))[:, ~close],
+            atol=1.e-6
+            )
+        assert_equal(
+            int_res_p[:, ~close], int_res.reshape((1, -1))[:, ~close]
+            )
+        assert np.all(np.isnan(float_res_p[:, close]))
+        assert np.all(int_res_p[:, close] == -1)
+
+
+def test_pathprop_array():
+
+    # generic (ragged) height profiles, such that no SRTM data is needed
+    num_paths = 12
+    with NumpyRNGContext(1):
+        sizes = np.random.randint(20, 300, num_paths)
+        hprof_heights = [
+            (200. + np.cumsum(np.random.normal(0., 10., s))) * apu.m
+            for s in sizes
+            ]
+        zones = np.random.randint(-1, 4, num_paths)
+    hprof_dists = [np.arange(s) * 0.1 * apu.km for s in sizes]
+
+    freqs = np.array([0.1, 1., 10.]) * apu.GHz
+    time_percents = np.array([0.1, 2., 10., 50.]) * apu.percent
+    versions = np.array([14, 16, 16])
+
+    args = (
+        freqs[:, None], 290. * apu.K, 1013. * apu.hPa,
+        6.5 * apu.deg, 50.5 * apu.deg, 6.7 * apu.deg, 50.6 * apu.deg,
+        20. * apu.m, 10. * apu.m, 100. * apu.m, time_percents[None],
+        )
+    kwargs = dict(
+        zone_t=zones.reshape((3, 4)),
+        version=versions[:, None],
+        delta_N=38 / apu.km, N0=324 * cnv.dimless,
+        hprof_bearing=45 * apu.deg, hprof_backbearing=-135 * apu.deg,
+        )
+    G_t = np.arange(4) * 10. * cnv.dBi
+
+    pparr = pathprof.PathPropArray(
+        *args, hprof_dists=hprof_dists, hprof_heights=hprof_heights, **kwargs
+        )
+    assert len(pparr) == num_paths
+    assert pparr.shape == (3, 4)
+    assert pparr.distance.shape == (3, 4)
+    assert_quantity_allclose(
+        pparr.distance.ravel(), [d[-1] for d in hprof_dists]
+        )
+
+    losses = [
+        pathprof.loss_freespace(pparr),
+        (pathprof.loss_troposcatter(pparr, G_t=G_t),),
+        (pathprof.loss_ducting(pparr),),
+        pathprof.loss_diffraction(pparr),
+        pathprof.loss_complete(pparr, G_t=G_t),
+        ]
+
+    # the results do not depend on the number of threads
+    pparr_1 = pathprof.PathPropArray(
+        *args, hprof_dists=hprof_dists, hprof_heights=hprof_heights,
+        nthreads=1, **kwargs
+        )
+    assert pparr_1._pps.tobytes() == pparr._pps.tobytes()
+    losses_1 = [
+        pathprof.loss_freespace(pparr, nthreads=1),
+        (pathprof.loss_troposcatter(pparr, G_t=G_t, nthreads=2),),
+        (pathprof.loss_ducting(pparr, nthreads=1),),
+        pathprof.loss_diffraction(pparr, nthreads=2),
+        pathprof.loss_complete(pparr, G_t=G_t, nthreads=1),
+        ]
+    for res, res_1 in zip(losses, losses_1):
+        for r, r_1 in zip(res, res_1):
+            assert_equal(r_1.value, r.value)
+
+    for idx in range(num_paths):
+        i, j = np.unravel_index(idx, (3, 4))
+        pprop = pathprof.PathProp(
+            freqs[i], 290. * apu.K, 1013. * apu.hPa,
+            6.5 * apu.deg, 50.5 * apu.deg, 6.7 * apu.deg, 50.6 * apu.deg,
+            20. * apu.m, 10. * apu.m, 100. * apu.m, time_percents[j],
+            zone_t=zones[idx], version=versions[i],
+            delta_N=38 / apu.km, N0=324 * cnv.dimless,
+            hprof_dists=hprof_dists[idx], hprof_heights=hprof_heights[idx],
+            hprof_bearing=45 * apu.deg, hprof_backbearing=-135 * apu.deg,
+            )
+        assert_equal(pparr[idx]._pp, pprop._pp)
+        assert_quantity_allclose(pparr[idx].theta, pprop.theta)
+
+        losses_single = [
+            pathprof.loss_freespace(pprop),
+            (pathprof.loss_troposcatter(pprop, G_t=G_t[j]),),
+            (pathprof.loss_ducting(pprop),),
+            pathprof.loss_diffraction(pprop),
+            pathprof.loss_complete(pprop, G_t=G_t[j]),
+            ]
+        for res_arr, res_single in zip(losses, losses_single):
+            for r_arr, r_single in zip(res_arr, res_single):
+                assert_quantity_allclose(r_arr[i, j], r_single)
+
+    # slicing returns a PathPropArray
+    pparr_s = pparr[1:]
+    assert isinstance(pparr_s, pathprof.PathPropArray)
+    assert pparr_s.shape == (2, 4)
+    assert_quantity_allclose(
+        pathprof.loss_complete(pparr_s)[-1],
+        pathprof.loss_complete(pparr)[-1][1:],
+        )
+
+    with pytest.raises(ValueError):
+        pathprof.PathPropArray(
+            *args, hprof_dists=hprof_dists[1:],
+            hprof_heights=hprof_heights[1:], **kwargs
+            )
+
+
+def test_diffraction_v14_last_edge():
+
+    # regression test: the v14 (Deygout) helper returned uninitialized
+    # values, if the principal edge was the last interior profile point
+    num_dists = 50
+    hprof_dists = np.arange(num_dists) * 0.1 * apu.km
+    hprof_heights = np.zeros(num_dists) * apu.m
+    hprof_heights[-2] = 200. * apu.m
+
+    pparr = pathprof.PathPropArray(
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        6.5 * apu.deg, 50.5 * apu.deg, 6.6 * apu.deg, 50.5 * apu.deg,
+        20. * apu.m, 10. * apu.m, 100. * apu.m, 10. * apu.percent,
+        version=14,
+        delta_N=38 / apu.km, N0=324 * cnv.dimless,
+        hprof_dists=[hprof_dists], hprof_heights=[hprof_heights],
+        hprof_bearing=90 * apu.deg, hprof_backbearing=-90 * apu.deg,
+        )
+
+    pps = pparr._pps
+    assert_equal(pps['i_m50'], [num_dists - 2])
+    assert np.all(pps['nu_m50'] > -0.78)
+    # no receiver-side secondary edge
+    assert_equal(pps['i_r50'], [-1])
+    assert_equal(pps['nu_r50'], [-1.])
+    assert_equal(pps['nu_rbeta'], [-1.])
+    assert np.all(np.isnan(pps['zeta_r']))
+    assert np.all(pps['i_t50'] >= 1)
+
+    L_d = pathprof.loss_diffraction(pparr)
+    assert np.all(np.isfinite(np.squeeze([L.value for L in L_d])))
+
+
+def test_pathprop_pickle():
+
+    with NumpyRNGContext(1):
+        hprof_heights = (
+            200. + np.cumsum(np.random.normal(0., 10., 101))
+            ) * apu.m
+    hprof_dists = np.linspace(0, 10, 101) * apu.km
+
+    kwargs = dict(
+        zone_t=pathprof.CLUTTER.URBAN,
+        delta_N=38 / apu.km, N0=324 * cnv.dimless,
+        hprof_bearing=45 * apu.deg, hprof_backbearing=-135 * apu.deg,
+        )
+    pprop = pathprof.PathProp(
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        6.5 * apu.deg, 50.5 * apu.deg, 6.6 * apu.deg, 50.55 * apu.deg,
+        20. * apu.m, 10. * apu.m, 100. * apu.m, 2. * apu.percent,
+        hprof_dists=hprof_dists, hprof_heights=hprof_heights, **kwargs
+        )
+
+    pprop_p = pickle.loads(pickle.dumps(pprop))
+    assert isinstance(pprop_p, pathprof.PathProp)
+    assert_equal(pprop_p._pp, pprop._pp)
+    assert_quantity_allclose(pprop_p.theta, pprop.theta)
+    assert str(pprop_p) == str(pprop)
+    for r_p, r in zip(
+            pathprof.loss_complete(pprop_p), pathprof.loss_complete(pprop)
+            ):
+        assert_quantity_allclose(r_p, r)
+
+    pparr = pathprof.PathPropArray(
+        np.array([0.1, 1., 10.]) * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        6.5 * apu.deg, 50.5 * apu.deg, 6.6 * apu.deg, 50.55 * apu.deg,
+        20. * apu.m, 10. * apu.m, 100. * apu.m, 2. * apu.percent,
+        hprof_dists=[hprof_dists] * 3, hprof_heights=[hprof_heights] * 3,
+        **kwargs
+        )
+    pparr_p = pickle.loads(pickle.dumps(pparr))
+    assert pparr_p.shape == pparr.shape
+    assert_equal(pparr_p[1]._pp, pparr[1]._pp)
+    assert_quantity_allclose(
+        pathprof.loss_complete(pparr_p)[-1], pathprof.loss_complete(pparr)[-1]
+        )
+
+
+def _shared_hprof_worker(hprof_data):
+
+    return cyprop.atten_map_fast_cython(
+        1., 290., 1013., 20., 10., 10., hprof_data
+        )
+
+
+def test_shared_hprof_data():
+
+    hprof_data = _synthetic_hprof_data()
+    float_res, int_res = _shared_hprof_worker(hprof_data)
+
+    with pathprof.SharedHprofData(hprof_data) as shm_data:
+
+        assert set(shm_data) == set(hprof_data)
+        for k, v in hprof_data.items():
+            assert_equal(shm_data[k], v)
+        assert not shm_data['height_profs'].flags.writeable
+
+        # only the layout is pickled, not the data
+        assert len(pickle.dumps(shm_data)) < 2000
+        shm_data_p = pickle.loads(pickle.dumps(shm_data))
+        assert_equal(shm_data_p['height_profs'], hprof_data['height_profs'])
+        shm_data_p.close()
+
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(_shared_hprof_worker, [shm_data] * 2))
+
+    for float_res_p, int_res_p in results:
+        assert_equal(float_res_p, float_res)
+        assert_equal(int_res_p, int_res)
+
+
+class _FailingHprofData(dict):
+
+    # raises on the second access of "height_profs" (when it is copied)
+
+    def __getitem__(self, key):
+
+        if key == 'height_profs':
+            self.accessed = getattr(self, 'accessed', 0) + 1
+            if self.accessed > 1:
+                raise KeyError(key)
+
+        return super().__getitem__(key)
+
+
+def test_shared_hprof_data_cleanup(monkeypatch):
+
+    from multiprocessing import shared_memory
+
+    # data without any arrays
+    with pathprof.SharedHprofData({'lon_t': 1., 'lat_t': 2.}) as shm_data:
+        assert dict(shm_data) == {'lon_t': 1., 'lat_t': 2.}
+
+    # the block must be freed, if the data cannot be copied
+    blocks = []
+    _SharedMemory = shared_memory.SharedMemory
+
+    def _shared_memory(*args, **kwargs):
+        shm = _SharedMemory(*args, **kwargs)
+        blocks.append(shm.name)
+        return shm
+
+    monkeypatch.setattr(shared_memory, 'SharedMemory', _shared_memory)
+    with pytest.raises(KeyError):
+        pathprof.SharedHprofData(_FailingHprofData(_synthetic_hprof_data()))
+    monkeypatch.undo()
+
+    assert len(blocks) == 1
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=blocks[0])
+
+
+def test_job_control():
+
+    hprof_data = _synthetic_hprof_data()
+    args = (
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        20. * apu.m, 10. * apu.m, 10. * apu.percent, hprof_data,
+        )
+    results = pathprof.atten_map_fast(*args)
+
+    job = pathprof.JobControl()
+    assert job.fraction == 0.
+    results_j = pathprof.atten_map_fast(*args, job=job)
+    assert job.total == hprof_data['dist_map'].size
+    assert job.done == job.total
+    assert job.fraction == 1.
+    assert not job.cancelled
+    for k in results:
+        assert_equal(np.asarray(results_j[k]), np.asarray(results[k]))
+
+    job.cancel()
+    assert job.cancelled
+    with pytest.raises(pathprof.JobCancelledError):
+        pathprof.atten_map_fast(*args, job=job)
+    # no pixel was processed
+    assert job.done == 0
+
+    job.reset()
+    assert not job.cancelled
+    pathprof.atten_map_fast(*args, ray_sweep=True, job=job)
+    assert job.fraction == 1.
+
+    # one progress counter per thread, also for more threads than cores
+    pathprof.atten_map_fast(*args, job=job, nthreads=4)
+    assert job.done == job.total
+
+
+@pytest.mark.parametrize('ray_sweep', [False, True])
+def test_atten_map_progressive(ray_sweep):
+
+    hprof_data = _synthetic_hprof_data(ny=21, nx=30)
+    args = (
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        20. * apu.m, 10. * apu.m, 10. * apu.percent, hprof_data,
+        )
+    results = pathprof.atten_map_fast(*args, ray_sweep=ray_sweep)
+
+    passes = []
+
+    def callback(step, res):
+        passes.append((step, res))
+
+    job = pathprof.JobControl()
+    results_p = pathprof.atten_map_progressive(
+        *args, callback=callback, coarsest_step=5, ray_sweep=ray_sweep,
+        job=job,
+        )
+    assert job.done == job.total == hprof_data['dist_map'].size
+
+    for k in results:
+        assert_equal(np.asarray(results_p[k]), np.asarray(results[k]))
+
+    assert [step for step, _ in passes] == [8, 4, 2, 1]
+    for step, res in passes:
+        L_b = np.asarray(res['L_b'])
+        assert L_b.shape == results['L_b'].shape
+        # pixels on the coarse grid are final; others are filled
+        assert_equal(
+            L_b[::step, ::step], results['L_b'].value[::step, ::step]
+            )
+        assert np.all(L_b[:step, :step] == L_b[0, 0])
+
+    for k in results:
+        assert_equal(np.asarray(passes[-1][1][k]), np.asarray(results[k]))
+
+    job.cancel()
+    with pytest.raises(pathprof.JobCancelledError):
+        pathprof.atten_map_progressive(*args, callback=callback, job=job)
+
+
+def test_atten_map_fast_nthreads():
+
+    hprof_data = _synthetic_hprof_data()
+    args = (
+        1. * apu.GHz, 290. * apu.K, 1013. * apu.hPa,
+        20. * apu.m, 10. * apu.m, 10. * apu.percent, hprof_data,
+        )
+    results = pathprof.atten_map_fast(*args)
+
+    # the results must not depend on the number of threads
+    for nthreads in [1, 3]:
+        results_n = pathprof.atten_map_fast(*args, nthreads=nthreads)
+        for k in results:
+            assert_equal(np.asarray(results_n[k]), np.asarray(results[k]))
+
+    with PerformanceConf.set(num_threads=2):
+        results_n = pathprof.atten_map_fast(*args, ray_sweep=True)
+        for k in results:
+            assert_allclose(
+                np.asarray(results_n[k]), np.asarray(results[k]), atol=1.e-6
+                )
+
+    with pytest.raises(ValueError):
+        pathprof.atten_map_fast(*args, nthreads=-1)
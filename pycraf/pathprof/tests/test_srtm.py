@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import glob
 import pytest
 import numpy as np
 from numpy.testing import assert_equal, assert_allclose
@@ -87,6 +88,18 @@ class TestSrtmConf:
             with srtm.SrtmConf.set(server='bar'):
                 pass
 
+        with pytest.raises(ValueError):
+            with srtm.SrtmConf.set(pyramid='yes'):
+                pass
+
+        with pytest.raises(ValueError):
+            with srtm.SrtmConf.set(pyramid_dir=1):
+                pass
+
+        with pytest.raises(ValueError):
+            with srtm.SrtmConf.set(srtm_pack=1):
+                pass
+
 
 def test_hgt_filename():
 
@@ -428,6 +441,366 @@ def test_get_tile_warning(srtm_temp_dir):
         assert_allclose(tile, np.zeros((5, 5), dtype=np.float32))
 
 
+def _write_synthetic_tiles(srtm_dir, tile_size=121):
+    # smooth, but non-trivial terrain (continuous across tile borders)
+
+    for ilon, ilat in [(6, 50), (7, 50), (6, 51)]:
+        x, y = np.ogrid[0:tile_size, 0:tile_size]
+        lons = ilon + x / (tile_size - 1)
+        lats = ilat + y / (tile_size - 1)
+        tile = (
+            500 + 200 * np.sin(7 * lons) * np.cos(5 * lats) +
+            50 * np.cos(40 * lons + 30 * lats)
+            ).T.astype('>i2')
+        tile[::-1].tofile(
+            os.path.join(srtm_dir, srtm._hgt_filename(ilon, ilat))
+            )
+
+
+def test_get_tile_data_pyramid(tmpdir_factory):
+
+    srtm_dir = str(tmpdir_factory.mktemp('srtmpyramid'))
+    _write_synthetic_tiles(srtm_dir)
+
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir, pyramid=True):
+
+        lons, lats, tile = srtm.get_tile_data(6, 50)
+        assert tile.shape == (121, 121)
+        assert srtm.SrtmConf.tile_size == 121
+        assert_allclose(srtm.SrtmConf.hgt_res, 900.)
+        assert srtm._pyramid_max_level() == 3
+
+        lons2, lats2, tile2 = srtm.get_tile_data(6, 50, level=2)
+        assert tile2.shape == (31, 31)
+        assert os.path.isfile(
+            os.path.join(srtm_dir, 'pyramid', 'N50E006_L2.npy')
+            )
+        assert_allclose(lons2[:, 0], lons[::4, 0])
+        assert_allclose(lats2[0], lats[0, ::4])
+
+        # smoothed version of the decimated tile
+        assert_allclose(tile2, tile[::4, ::4], atol=60)
+        assert np.std(tile2) < np.std(tile[::4, ::4])
+
+        # second call loads the stored tile
+        _, _, tile2b = srtm.get_tile_data(6, 50, level=2)
+        assert_equal(tile2b, tile2)
+
+        # tiles with (partly) missing neighbors can still be smoothed
+        _, _, tile3 = srtm.get_tile_data(7, 50, level=1)
+        assert tile3.shape == (61, 61)
+
+        with srtm.SrtmConf.set(pyramid=False):
+            assert srtm._pyramid_params(1000.) == (0, 900., 1000. / 2.35)
+
+        assert srtm._pyramid_params(1000.)[0] == 0
+        level, res, width = srtm._pyramid_params(4000.)
+        assert (level, res) == (1, 1800.)
+        assert_allclose(width, np.sqrt(4000. ** 2 - 1800. ** 2) / 2.35)
+        assert srtm._pyramid_params(1.e5)[:2] == (3, 7200.)
+
+
+def test_srtm_height_profile_pyramid(tmpdir_factory):
+
+    from ...pathprof import heightprofile
+
+    srtm_dir = str(tmpdir_factory.mktemp('srtmpyramid'))
+    _write_synthetic_tiles(srtm_dir)
+
+    args = (
+        6.1 * apu.deg, 50.2 * apu.deg, 6.9 * apu.deg, 50.9 * apu.deg,
+        5. * apu.km
+        )
+
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir):
+        heights = heightprofile.srtm_height_profile(*args)[4]
+
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir, pyramid=True):
+        heights_p = heightprofile.srtm_height_profile(*args)[4]
+
+    assert_quantity_allclose(heights_p, heights, atol=10 * apu.m)
+    assert np.mean(np.abs(heights_p - heights)) < 3 * apu.m
+
+
+@pytest.mark.parametrize('step', [300., 5000.])
+def test_srtm_height_profiles(tmpdir_factory, step):
+
+    from ...pathprof import heightprofile
+
+    srtm_dir = str(tmpdir_factory.mktemp('srtmprofiles'))
+    _write_synthetic_tiles(srtm_dir)
+
+    lon_t = np.array([6.1, 6.5, 6.2, 6.8])
+    lat_t = np.array([50.2, 50.5, 51.3, 50.1])
+    lon_r = np.array([6.9, 7.4, 6.25, 6.3])
+    lat_r = np.array([50.9, 50.6, 50.4, 51.6])
+
+    # the batched version must give the same results as single profiles
+    # (note, hgt_res is only known after the first tile was loaded)
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir):
+        srtm.get_tile_data(6, 50)
+        profiles = heightprofile._srtm_height_profiles(
+            lon_t, lat_t, lon_r, lat_r, step
+            )
+        single_profiles = [
+            heightprofile._srtm_height_profile(
+                lon_t[i], lat_t[i], lon_r[i], lat_r[i], step
+                )
+            for i in range(lon_t.size)
+            ]
+
+    sizes = profiles[-1]
+    assert_equal(sizes, [len(prof[3]) for prof in single_profiles])
+    for idx in [2, 5, 6]:
+        assert_allclose(
+            profiles[idx], [prof[idx] for prof in single_profiles],
+            rtol=1.e-12,
+            )
+    for idx in [0, 1, 3, 4, 7]:
+        assert_allclose(
+            profiles[idx],
+            np.concatenate([prof[idx] for prof in single_profiles]),
+            rtol=1.e-12,
+            )
+
+
+@pytest.mark.parametrize('interp', ['nearest', 'linear', 'spline'])
+def test_srtm_height_grid(tmpdir_factory, interp):
+
+    srtm_dir = str(tmpdir_factory.mktemp('srtmgrid'))
+    _write_synthetic_tiles(srtm_dir)
+
+    # crosses tile borders; includes the exact tile edges
+    lons = np.linspace(6.5, 7.5, 67)
+    lats = np.linspace(50.2, 51.4, 49)[::-1]
+
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir, interp=interp):
+
+        heights = srtm._srtm_height_grid(lons, lats)
+        lons_g, lats_g = np.meshgrid(lons, lats)
+        heights_ref = srtm._srtm_height_data(lons_g, lats_g)
+
+    assert heights.shape == (49, 67)
+    assert heights.dtype == np.float32
+    assert_allclose(heights, heights_ref, atol=1.e-3)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_pack_srtm_tiles(tmpdir_factory, compress):
+
+    srtm_dir = str(tmpdir_factory.mktemp('srtmpack'))
+    empty_dir = str(tmpdir_factory.mktemp('srtmempty'))
+    pack_file = os.path.join(empty_dir, 'tiles.srtmpack')
+    _write_synthetic_tiles(srtm_dir)
+
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir):
+        assert srtm.pack_srtm_tiles(pack_file, compress=compress) == 3
+        _, _, tile_ref = srtm.get_tile_data(6, 50)
+
+        # explicit tile list; tiles not on the server are skipped
+        pack_file2 = os.path.join(empty_dir, 'tiles2.srtmpack')
+        assert srtm.pack_srtm_tiles(
+            pack_file2, tiles=[(6, 50), (7, 50), (28, 35)], compress=compress
+            ) == 2
+
+    with srtm.SrtmConf.set(srtm_dir=empty_dir, srtm_pack=pack_file):
+
+        lons, lats, tile = srtm.get_tile_data(6, 50)
+        assert tile.shape == (121, 121)
+        assert_equal(tile, tile_ref)
+
+        pack = srtm._open_tile_pack(pack_file)
+        assert len(pack) == 3
+        assert (7, 50) in pack and (7, 51) not in pack
+        if not compress:
+            # zero-copy access
+            assert not pack.tile(6, 50).flags.owndata
+
+        # not in pack file and not in srtm_dir
+        with pytest.warns(srtm.TileNotAvailableOnDiskWarning):
+            _, _, tile = srtm.get_tile_data(7, 51)
+        assert tile.shape == (5, 5)
+
+    with srtm.SrtmConf.set(srtm_dir=empty_dir, srtm_pack=pack_file2):
+        _, _, tile = srtm.get_tile_data(6, 50)
+        assert_equal(tile, tile_ref)
+
+    no_pack_file = os.path.join(srtm_dir, 'N50E006.hgt')
+    with pytest.raises(OSError):
+        with srtm.SrtmConf.set(srtm_pack=no_pack_file):
+            srtm.get_tile_data(6, 50)
+
+
+@pytest.fixture
+def local_srtm_server(tmpdir_factory):
+    '''
+    Local stand-in for the SRTM servers (supports HTTP range requests).
+
+    Yields the base URL, the served directory and a counter of the
+    requests per path.
+    '''
+
+    import threading
+    from collections import Counter
+    from functools import partial
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+    serve_dir = str(tmpdir_factory.mktemp('srtmserver'))
+    counts = Counter()
+
+    class RangeRequestHandler(SimpleHTTPRequestHandler):
+
+        def do_GET(self):
+
+            counts[self.path] += 1
+            path = self.translate_path(self.path)
+            if not os.path.isfile(path):
+                self.send_error(404)
+                return
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            start = 0
+            if 'Range' in self.headers:
+                counts['range'] += 1
+                start = int(self.headers['Range'][6:].split('-')[0])
+                if start >= len(data):
+                    self.send_error(416)
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                    start, len(data) - 1, len(data)
+                    ))
+            else:
+                self.send_response(200)
+
+            self.send_header('Content-Length', str(len(data) - start))
+            self.end_headers()
+            self.wfile.write(data[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(
+        ('127.0.0.1', 0),
+        partial(RangeRequestHandler, directory=serve_dir),
+        )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield 'http://127.0.0.1:{}/'.format(server.server_port), serve_dir, counts
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_srtm_tiles(tmpdir_factory, monkeypatch, local_srtm_server):
+
+    from zipfile import ZipFile
+    from concurrent.futures import ThreadPoolExecutor
+
+    base_url, serve_dir, counts = local_srtm_server
+    gen_dir = str(tmpdir_factory.mktemp('srtmgen'))
+    _write_synthetic_tiles(gen_dir)
+
+    # NASA-like structure: one zip per tile, in continent sub-directories
+    os.makedirs(os.path.join(serve_dir, 'nasa', 'Eurasia'))
+    # viewpano-like structure: several tiles per zip
+    os.makedirs(os.path.join(serve_dir, 'viewpano'))
+    pano_zip = ZipFile(os.path.join(serve_dir, 'viewpano', 'M32.zip'), 'w')
+
+    for ilon, ilat in [(6, 50), (7, 50), (6, 51)]:
+        tile_name = srtm._hgt_filename(ilon, ilat)
+        hgt_path = os.path.join(gen_dir, tile_name)
+        with ZipFile(os.path.join(
+                serve_dir, 'nasa', 'Eurasia', tile_name + '.zip'
+                ), 'w') as zf:
+            zf.write(hgt_path, tile_name)
+        pano_zip.write(hgt_path, 'M32/' + tile_name)
+
+    pano_zip.close()
+
+    def hgt_equal(srtm_dir, tile_name):
+        with open(os.path.join(gen_dir, tile_name), 'rb') as f:
+            data = f.read()
+        hgt_path = glob.glob(
+            os.path.join(srtm_dir, '**', tile_name), recursive=True
+            )
+        assert len(hgt_path) == 1
+        with open(hgt_path[0], 'rb') as f:
+            return f.read() == data
+
+    monkeypatch.setattr(srtm, '_SERVER_URLS', {
+        'nasa_v2.1': base_url + 'nasa/',
+        'viewpano': base_url + 'viewpano/',
+        })
+
+    with pytest.raises(ValueError):
+        srtm.download_srtm_tiles()
+
+    srtm_dir = str(tmpdir_factory.mktemp('srtmdl'))
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir, server='nasa_v2.1'):
+
+        # (28, 35) is not on the server
+        assert srtm.download_srtm_tiles(
+            tiles=[(6, 50), (7, 50), (6, 50), (28, 35)]
+            ) == 2
+        assert hgt_equal(srtm_dir, 'N50E006.hgt')
+        assert hgt_equal(srtm_dir, 'N50E007.hgt')
+        assert counts['/nasa/Eurasia/N50E006.hgt.zip'] == 1
+
+        # already on disk
+        assert srtm.download_srtm_tiles(bbox=(6.2, 7.8, 50.1, 50.9)) == 0
+        assert srtm.download_srtm_tiles(tiles=[(6, 50)], force=True) == 1
+        assert counts['/nasa/Eurasia/N50E006.hgt.zip'] == 2
+
+        # resume from an interrupted download
+        with open(os.path.join(
+                serve_dir, 'nasa', 'Eurasia', 'N51E006.hgt.zip'
+                ), 'rb') as f:
+            data = f.read()
+        with open(os.path.join(srtm_dir, 'N51E006.hgt.zip.part'), 'wb') as f:
+            f.write(data[:len(data) // 2])
+
+        assert srtm.download_srtm_tiles(tiles=[(6, 51)]) == 1
+        assert counts['range'] == 1
+        assert hgt_equal(srtm_dir, 'N51E006.hgt')
+        assert not os.path.exists(
+            os.path.join(srtm_dir, 'N51E006.hgt.zip.part')
+            )
+
+        # corrupt partial file: checksum fails, downloaded again
+        os.remove(os.path.join(srtm_dir, 'N51E006.hgt'))
+        with open(os.path.join(srtm_dir, 'N51E006.hgt.zip.part'), 'wb') as f:
+            f.write(b'\x00' * (len(data) // 2))
+
+        assert srtm.download_srtm_tiles(tiles=[(6, 51)]) == 1
+        assert hgt_equal(srtm_dir, 'N51E006.hgt')
+
+        # concurrent requests for the same tile only download it once
+        os.remove(os.path.join(srtm_dir, 'N50E007.hgt'))
+        counts.clear()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(
+                lambda _: srtm._download(7, 50, force=False), range(4)
+                ))
+        assert counts['/nasa/Eurasia/N50E007.hgt.zip'] == 1
+        assert hgt_equal(srtm_dir, 'N50E007.hgt')
+
+    # viewpano: archive with several tiles is only downloaded once
+    srtm_dir = str(tmpdir_factory.mktemp('srtmdl'))
+    counts.clear()
+    with srtm.SrtmConf.set(srtm_dir=srtm_dir, server='viewpano'):
+
+        assert srtm.download_srtm_tiles(
+            tiles=[(6, 50), (7, 50), (6, 51)], max_workers=3
+            ) == 1
+        assert counts['/viewpano/M32.zip'] == 1
+        for tile_name in ['N50E006.hgt', 'N50E007.hgt', 'N51E006.hgt']:
+            assert hgt_equal(srtm_dir, tile_name)
+
+
 @remote_data(source='any')
 def test_srtm_height_data_linear(srtm_temp_dir):
 
@@ -3,4 +3,5 @@
 
 from .decorators import *
 from .multistate import *
+from .performance import *
 from .testing import *
@@ -5,11 +5,79 @@
 
 import numpy as np
 import inspect
+from functools import lru_cache
 from astropy.utils.decorators import wraps
 from astropy.units.core import UnitsError, add_enabled_equivalencies
+from .multistate import MultiState
 
 
-__all__ = ['ranged_quantity_input']
+__all__ = ['ranged_quantity_input', 'QuantityInputConf']
+
+
+class QuantityInputConf(MultiState):
+    '''
+    Global settings for the `~pycraf.utils.ranged_quantity_input` decorator.
+
+    Currently, only one option is supported:
+
+    - `check_ranges` : bool
+
+      Whether to check that the input values are within the allowed
+      ranges (default: True). Unit checks (and conversion) are always
+      performed.
+
+    Disabling range checks can save a bit of time in trusted production
+    pipelines, where many functions are called with small inputs. As with
+    all `~pycraf.utils.MultiState` classes, the setting can be changed
+    globally or temporarily, using a context manager::
+
+        >>> from pycraf.utils import QuantityInputConf, ranged_quantity_input
+        >>> import astropy.units as u
+
+        >>> @ranged_quantity_input(a=(0, 1, u.m), strip_input_units=True)
+        ... def func(a):
+        ...     return a ** 2
+
+        >>> func(2 * u.m)
+        Traceback (most recent call last):
+        ...
+        ValueError: Argument 'a' to function 'func' out of range
+        (allowed 0 to 1 m).
+
+        >>> with QuantityInputConf.set(check_ranges=False):
+        ...     print(func(2 * u.m))
+        4.0
+
+    Note, that the decorated functions may fail in unexpected ways, if
+    the values are out of range.
+    '''
+
+    _attributes = ('check_ranges', )
+
+    check_ranges = True
+
+    @classmethod
+    def validate(cls, **kwargs):
+
+        for k, v in kwargs.items():
+            if not isinstance(v, bool):
+                raise TypeError('"{}" must be a boolean'.format(k))
+
+        return kwargs
+
+
+@lru_cache(maxsize=256)
+def _unit_scale(unit, target_unit):
+    # Scale factor to convert from unit to target_unit (if this is a plain
+    # scaling, i.e., no equivalencies needed); None otherwise
+
+    if unit is target_unit:
+        return 1.
+
+    try:
+        return float(unit._to(target_unit))
+    except Exception:
+        return None
 
 
 class RangedQuantityInput(object):
@@ -79,6 +147,12 @@ class RangedQuantityInput(object):
         The checking of arguments inside variable arguments to a
         function is not supported (i.e. \*arg or \**kwargs).
 
+        To keep the overhead small, the parameters are analyzed only once
+        (when the function is decorated) and unit conversion factors are
+        cached. If an argument is already in the target unit, no conversion
+        is performed. Range checks can be disabled globally, using
+        `~pycraf.utils.QuantityInputConf`.
+
         Examples
         --------
 
@@ -218,115 +292,165 @@ class RangedQuantityInput(object):
 
         # Extract the function signature for the function we are wrapping.
         wrapped_signature = inspect.signature(wrapped_function)
+        func_name = wrapped_function.__name__
+
+        # Prepare a "plan" for all registered parameters, such that only
+        # little work is left to do during each function call. For
+        # positional parameters, also store the index in the arguments
+        # tuple, which saves us from binding the arguments to the signature
+        plan = []
+        argpos_valid = True
+        for argpos, param in enumerate(wrapped_signature.parameters.values()):
+            # We do not support variable arguments (*args, **kwargs)
+            if param.kind in (inspect.Parameter.VAR_KEYWORD,
+                              inspect.Parameter.VAR_POSITIONAL):
+                argpos_valid = False
+                continue
+
+            if param.name not in self.decorator_kwargs:
+                continue
+
+            target_min, target_max, target_unit = self.decorator_kwargs[
+                param.name
+                ]
+
+            # If the target unit is empty, then no unit was specified
+            # so we move past it
+            if target_unit is inspect.Parameter.empty:
+                continue
+
+            if not argpos_valid or param.kind not in (
+                    inspect.Parameter.POSITIONAL_ONLY,
+                    inspect.Parameter.POSITIONAL_OR_KEYWORD
+                    ):
+                argpos = None
+
+            plan.append((
+                param.name, argpos, param.default,
+                target_min, target_max, target_unit,
+                ))
+
+        def to_value(name, arg, target_unit):
+            # Check unit of arg and return its value in target_unit
+
+            try:
+                unit = arg.unit
+            except AttributeError:
+                raise TypeError(
+                    "Argument '{0}' to function '{1}' has no 'unit' "
+                    "attribute. You may want to pass in an astropy Quantity "
+                    "instead.".format(name, func_name)
+                    )
+
+            try:
+                scale = _unit_scale(unit, target_unit)
+            except TypeError:
+                # unhashable unit
+                scale = None
+
+            if scale is not None:
+                value = arg.value
+                if scale != 1.:
+                    return value * scale
+                elif isinstance(value, np.ndarray):
+                    # don't want to give out views to the input
+                    return value.copy()
+                return value
+
+            # slow path; equivalencies may be necessary
+            try:
+                equivalent = unit.is_equivalent(
+                    target_unit, equivalencies=self.equivalencies
+                    )
+            except AttributeError:
+                raise TypeError(
+                    "Argument '{0}' to function '{1}' has a 'unit' attribute "
+                    "without an 'is_equivalent' method. You may want to pass "
+                    "in an astropy Quantity instead.".format(name, func_name)
+                    )
+
+            if not equivalent:
+                raise UnitsError(
+                    "Argument '{0}' to function '{1}'"
+                    " must be in units convertible to"
+                    " '{2}'.".format(name, func_name, target_unit.to_string())
+                    )
+
+            return arg.to(target_unit, equivalencies=self.equivalencies).value
 
         # Define a new function to return in place of the wrapped one
         @wraps(wrapped_function)
         def wrapper(*func_args, **func_kwargs):
-            # Bind the arguments to our new function to the
-            # signature of the original.
-            bound_args = wrapped_signature.bind(*func_args, **func_kwargs)
-
-            # Iterate through the parameters of the original signature
-            for param in wrapped_signature.parameters.values():
-                # We do not support variable arguments (*args, **kwargs)
-                if param.kind in (inspect.Parameter.VAR_KEYWORD,
-                                  inspect.Parameter.VAR_POSITIONAL):
-                    continue
-                # Catch the (never triggered) case where bind relied on
-                #  a default value.
-                if (
-                        param.name not in bound_args.arguments and
-                        param.default is not param.empty
-                        ):
-                    bound_args.arguments[param.name] = param.default
 
-                # Get the value of this parameter (argument to new function)
-                arg = bound_args.arguments[param.name]
+            check_ranges = QuantityInputConf.check_ranges
+            if self.strip_input_units:
+                func_args = list(func_args)
+
+            for (
+                    name, argpos, default, target_min, target_max, target_unit
+                    ) in plan:
 
-                # Get target unit, either from decorator kwargs or annotations
-                if param.name in self.decorator_kwargs:
-                    (
-                        target_min, target_max, target_unit
-                        ) = self.decorator_kwargs[param.name]
+                if argpos is not None and argpos < len(func_args):
+                    arg = func_args[argpos]
+                elif name in func_kwargs:
+                    arg = func_kwargs[name]
+                elif default is not inspect.Parameter.empty:
+                    arg = default
                 else:
+                    # missing argument; the wrapped function will complain
                     continue
 
-                # If the target unit is empty, then no unit was specified
-                # so we move past it
-                if target_unit is not inspect.Parameter.empty:
+                # skip over None values, if desired
+                if arg is None and self.allow_none:
+                    continue
 
-                    # skip over None values, if desired
-                    if arg is None and self.allow_none:
-                        continue
+                if not check_ranges:
+                    target_min = target_max = None
 
+                if (
+                        target_min is None and target_max is None and
+                        not self.strip_input_units
+                        ):
+                    # only need to check units
                     try:
-                        equivalent = arg.unit.is_equivalent(
-                            target_unit, equivalencies=self.equivalencies
-                            )
+                        scale = _unit_scale(arg.unit, target_unit)
+                    except (AttributeError, TypeError):
+                        scale = None
 
-                        if not equivalent:
-                            raise UnitsError(
-                                "Argument '{0}' to function '{1}'"
-                                " must be in units convertible to"
-                                " '{2}'.".format(
-                                    param.name, wrapped_function.__name__,
-                                    target_unit.to_string()
-                                ))
-
-                    # Either there is no .unit or no .is_equivalent
-                    except AttributeError:
-                        if hasattr(arg, "unit"):
-                            error_msg = (
-                                "a 'unit' attribute without an "
-                                "'is_equivalent' method"
-                                )
-                        else:
-                            error_msg = "no 'unit' attribute"
-                        raise TypeError(
-                            "Argument '{0}' to function '{1}' has {2}. You "
-                            "may want to pass in an astropy Quantity "
-                            "instead.".format(
-                                param.name, wrapped_function.__name__,
-                                error_msg
-                            ))
+                    if scale is None:
+                        to_value(name, arg, target_unit)
+
+                    continue
+
+                value = to_value(name, arg, target_unit)
 
-                    # test value range
-                    if target_min is not None:
-                        quantity = bound_args.arguments[param.name]
-                        value = quantity.to(target_unit).value
-                        if np.any(value < target_min):
-                            raise ValueError(
-                                "Argument '{0}' to function '{1}' out of "
-                                "range (allowed {2} to {3} {4}).".format(
-                                    param.name, wrapped_function.__name__,
-                                    target_min, target_max, target_unit,
-                                    )
-                                )
-
-                    if target_max is not None:
-                        quantity = bound_args.arguments[param.name]
-                        value = quantity.to(target_unit).value
-                        if np.any(value > target_max):
-                            raise ValueError(
-                                "Argument '{0}' to function '{1}' out of "
-                                "range (allowed {2} to {3} {4}).".format(
-                                    param.name, wrapped_function.__name__,
-                                    target_min, target_max, target_unit,
-                                    )
-                                )
-                    if self.strip_input_units:
-                        bound_args.arguments[param.name] = (
-                            bound_args.arguments[param.name].to(
-                                target_unit
-                                ).value
+                # test value range
+                if (
+                        (target_min is not None and
+                         np.any(value < target_min)) or
+                        (target_max is not None and
+                         np.any(value > target_max))
+                        ):
+                    raise ValueError(
+                        "Argument '{0}' to function '{1}' out of "
+                        "range (allowed {2} to {3} {4}).".format(
+                            name, func_name,
+                            *self.decorator_kwargs[name]
                             )
+                        )
+
+                if self.strip_input_units:
+                    if argpos is not None and argpos < len(func_args):
+                        func_args[argpos] = value
+                    else:
+                        func_kwargs[name] = value
 
             # Call the original function with any equivalencies in force.
-            with add_enabled_equivalencies(self.equivalencies):
-                # result = wrapped_function(*func_args, **func_kwargs)
-                result = wrapped_function(
-                    *bound_args.args, **bound_args.kwargs
-                    )
+            if self.equivalencies:
+                with add_enabled_equivalencies(self.equivalencies):
+                    result = wrapped_function(*func_args, **func_kwargs)
+            else:
+                result = wrapped_function(*func_args, **func_kwargs)
 
             if self.output_unit is not None:
                 # test, if return values are tuple-like
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from .multistate import MultiState
+
+
+__all__ = ['PerformanceConf', 'get_num_threads']
+
+
+class PerformanceConf(MultiState):
+    '''
+    Global performance settings of pycraf.
+
+    The following options are supported:
+
+    - `num_threads` : int
+
+      Number of threads used by the parallelized (OpenMP) kernels, e.g.,
+      in `~pycraf.pathprof`, `~pycraf.geometry`, and `~pycraf.antenna`.
+      If zero, the OpenMP default is used, which is the number of CPUs
+      or the value of the `OMP_NUM_THREADS` environment variable
+      (default: 0). Most functions that use these kernels also accept
+      an `nthreads` argument, which takes precedence.
+
+    - `memory_budget` : int
+
+      Approximate amount of memory [bytes] that chunked computations
+      (e.g., `~pycraf.pathprof.height_map_data`, or
+      `~pycraf.pathprof.atten_map_fast` with data sets that are not held
+      in memory) use for their temporary arrays (default: 256 MiB).
+
+    - `srtm_cache_size` : int
+
+      Number of SRTM tiles (interpolators) that are kept in memory
+      (default: 36).
+
+    - `geotiff_cache_size` : int
+
+      Default number of raster blocks (per band) that a
+      `~pycraf.pathprof.GeoTiffSampler` keeps in memory (default: 128).
+
+    As with all `~pycraf.utils.MultiState` classes, the settings can be
+    changed globally or temporarily, using a context manager::
+
+        >>> from pycraf.utils import PerformanceConf
+
+        >>> with PerformanceConf.set(num_threads=1):
+        ...     print(PerformanceConf.num_threads)
+        1
+
+    This is especially useful if pycraf is used in a pool of worker
+    processes, where each process should only use a single thread to
+    avoid oversubscription of the CPUs::
+
+        >>> from concurrent.futures import ProcessPoolExecutor
+
+        >>> def init_worker():
+        ...     PerformanceConf.set(num_threads=1)
+
+        >>> pool = ProcessPoolExecutor(initializer=init_worker)  # doctest: +SKIP
+
+    Unlike `~pycraf.pathprof.set_num_threads`, which changes the OpenMP
+    setting for the whole process, the `num_threads` option only
+    affects pycraf.
+    '''
+
+    _attributes = (
+        'num_threads', 'memory_budget', 'srtm_cache_size',
+        'geotiff_cache_size',
+        )
+
+    num_threads = 0
+    memory_budget = 256 * 2 ** 20
+    srtm_cache_size = 36
+    geotiff_cache_size = 128
+
+    @classmethod
+    def validate(cls, **kwargs):
+
+        for k, v in kwargs.items():
+            if not isinstance(v, int) or isinstance(v, bool):
+                raise TypeError('"{}" must be an integer'.format(k))
+
+            if v < (0 if k == 'num_threads' else 1):
+                raise ValueError('"{}" out of range'.format(k))
+
+        return kwargs
+
+
+def get_num_threads(nthreads=None):
+    '''
+    Number of threads to use for a parallelized computation.
+
+    Parameters
+    ----------
+    nthreads : int or None, optional
+        Number of threads requested for a particular call. If None (or
+        zero), `PerformanceConf.num_threads` is used. (default: None)
+
+    Returns
+    -------
+    nthreads : int
+        Number of threads; zero means that the OpenMP default should be
+        used.
+    '''
+
+    if nthreads is None or nthreads == 0:
+        return PerformanceConf.num_threads
+
+    if nthreads < 0:
+        raise ValueError('"nthreads" must not be negative')
+
+    return int(nthreads)
@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import pytest
+import numpy as np
 import astropy.units as apu
 from astropy.tests.helper import assert_quantity_allclose
-from ...utils import ranged_quantity_input
+from ...utils import ranged_quantity_input, QuantityInputConf
 
 
 def test_ranged_quantity_input_simple():
@@ -138,3 +139,75 @@ def test_ranged_quantity_input_applyoutput():
     res = func(0.5 * apu.m, 2 * apu.s)
     assert_quantity_allclose(res[0], 0.25 * apu.m ** 2)
     assert_quantity_allclose(res[1], 0.5 / apu.s)
+
+
+def test_ranged_quantity_input_conversion():
+
+    @ranged_quantity_input(
+        a=(0, 1, apu.m), b=(0, None, apu.s), c=(0, 1, apu.m),
+        strip_input_units=True
+        )
+    def func(a, b, *, c=50 * apu.cm):
+        return a, b, c
+
+    res = func(50 * apu.cm, b=2 * apu.min)
+    assert_quantity_allclose(res, (0.5, 120., 0.5))
+
+    res = func(0.25 * apu.m, 2 * apu.s, c=1 * apu.mm)
+    assert_quantity_allclose(res, (0.25, 2., 0.001))
+
+    with pytest.raises(ValueError):
+        func(2000 * apu.mm, 2 * apu.s)
+
+    with pytest.raises(ValueError):
+        func(0.5 * apu.m, 2 * apu.s, c=2000 * apu.mm)
+
+    with pytest.raises(apu.UnitsError):
+        func(0.5 * apu.m, 2 * apu.m)
+
+    # missing arguments are handled by the wrapped function
+    with pytest.raises(TypeError):
+        func(0.5 * apu.m)
+
+    # must not return views of the input arrays
+    a = np.array([0.1, 0.2]) * apu.m
+    res = func(a, 2 * apu.s)
+    res[0][0] = 0.
+    assert_quantity_allclose(a, [0.1, 0.2] * apu.m)
+
+    # equivalencies
+    @ranged_quantity_input(
+        a=(0, 1, apu.m), strip_input_units=True,
+        equivalencies=apu.spectral(),
+        )
+    def func(a):
+        return a
+
+    assert_quantity_allclose(func(1 * apu.GHz), 0.299792458)
+
+    with pytest.raises(ValueError):
+        func(100 * apu.MHz)
+
+
+def test_ranged_quantity_input_conf():
+
+    @ranged_quantity_input(a=(0, 1, apu.m), strip_input_units=True)
+    def func(a):
+        return a ** 2
+
+    with pytest.raises(ValueError):
+        func(2 * apu.m)
+
+    with QuantityInputConf.set(check_ranges=False):
+        assert_quantity_allclose(func(2 * apu.m), 4.)
+        assert_quantity_allclose(func(200 * apu.cm), 4.)
+
+        # unit checks are still performed
+        with pytest.raises(apu.UnitsError):
+            func(2 * apu.s)
+
+    with pytest.raises(ValueError):
+        func(2 * apu.m)
+
+    with pytest.raises(TypeError):
+        QuantityInputConf.set(check_ranges=1)
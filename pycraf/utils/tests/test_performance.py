@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+import numpy as np
+from numpy.testing import assert_equal
+from astropy import units as apu
+from ...utils import PerformanceConf, get_num_threads
+from ... import geometry
+
+
+class TestPerformanceConf:
+
+    def test_defaults(self):
+
+        assert PerformanceConf.num_threads == 0
+        assert PerformanceConf.memory_budget == 256 * 2 ** 20
+        assert PerformanceConf.srtm_cache_size == 36
+        assert PerformanceConf.geotiff_cache_size == 128
+
+    def test_validation(self):
+
+        with pytest.raises(TypeError):
+            PerformanceConf.set(num_threads=1.5)
+
+        with pytest.raises(TypeError):
+            PerformanceConf.set(srtm_cache_size=True)
+
+        with pytest.raises(ValueError):
+            PerformanceConf.set(num_threads=-1)
+
+        with pytest.raises(ValueError):
+            PerformanceConf.set(memory_budget=0)
+
+        with pytest.raises(ValueError):
+            PerformanceConf.set(geotiff_cache_size=0)
+
+        assert PerformanceConf.num_threads == 0
+
+    def test_context_manager(self):
+
+        with PerformanceConf.set(num_threads=2, srtm_cache_size=4):
+            assert PerformanceConf.num_threads == 2
+            assert PerformanceConf.srtm_cache_size == 4
+            assert PerformanceConf.memory_budget == 256 * 2 ** 20
+
+        assert PerformanceConf.num_threads == 0
+        assert PerformanceConf.srtm_cache_size == 36
+
+    def test_get_num_threads(self):
+
+        assert get_num_threads() == 0
+        assert get_num_threads(3) == 3
+
+        with PerformanceConf.set(num_threads=2):
+            assert get_num_threads() == 2
+            assert get_num_threads(0) == 2
+            assert get_num_threads(1) == 1
+
+        with pytest.raises(ValueError):
+            get_num_threads(-1)
+
+    def test_kernel_nthreads(self):
+
+        l1, b1 = np.linspace(0, 10, 101), np.linspace(-80, 80, 101)
+        adist = geometry.true_angular_distance(
+            l1 * apu.deg, b1 * apu.deg, 30 * apu.deg, 10 * apu.deg
+            )
+
+        for nthreads in [1, 4]:
+            assert_equal(
+                geometry.true_angular_distance(
+                    l1 * apu.deg, b1 * apu.deg, 30 * apu.deg, 10 * apu.deg,
+                    nthreads=nthreads,
+                    ).value,
+                adist.value,
+                )
+
+        with PerformanceConf.set(num_threads=1):
+            assert_equal(
+                geometry.true_angular_distance(
+                    l1 * apu.deg, b1 * apu.deg, 30 * apu.deg, 10 * apu.deg,
+                    ).value,
+                adist.value,
+                )